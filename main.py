@@ -7,36 +7,61 @@ Six cheap gates in front of one expensive call:
 
 Everything a document has to survive before it can cost money, or before it
 can tell a steward that something changed, lives in `steward/`. This module
-sequences those gates, keeps the per-document state in hashes.json, and writes
-the artefacts the dashboard reads.
+sequences those gates, keeps the per-document state (in the state store,
+exported to hashes.json), and writes the artefacts the dashboard reads.
 """
 
 from __future__ import annotations
 
 import argparse
+import functools
 import hashlib
-import json
 import logging
 import os
 import re
-import shutil
 import sys
+import time
 import uuid
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional, Tuple
-
-from steward import PIPELINE_VERSION, analysis as llm, content, diffing, fetching, health, history, runlog
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from steward import (
+    PIPELINE_VERSION,
+    analysis as llm,
+    analytics,
+    archive,
+    blobs,
+    budget,
+    commit,
+    content,
+    diffing,
+    examine,
+    fetching,
+    health,
+    history,
+    jsonio,
+    pipeline,
+    routing,
+    runlog,
+    state,
+    triage,
+    versions,
+)
+from steward.cache import CACHE_FILE, AnalysisCache
 from steward.config import ConfigError, load_config
-from steward.validation import validate_capture
 
 # --- Paths -----------------------------------------------------------------
 
 POLICY_SETS_FILE = "policy_sets.json"
 HASHES_FILE = "hashes.json"
+CHECKS_FILE = state.CHECKS_FILE
 SNAPSHOTS_DIR = "snapshots"
 ANALYSIS_DIR = "analysis"
 DIFFS_DIR = "diffs"
 LOG_DIR = "logs"
+BLOB_DIR = blobs.BLOB_DIR
 
 AEST_TZ = timezone(timedelta(hours=10))
 
@@ -46,10 +71,13 @@ DOC_NOT_MODIFIED = "not_modified"
 DOC_CHANGED = "changed"
 DOC_NEW = "new"
 DOC_REBASELINED = "rebaselined"
+DOC_REVERTED = "reverted"
 DOC_SUSPECT = "suspect_scrape"
 DOC_FETCH_FAILED = "fetch_failed"
 
-_HEALTHY_OUTCOMES = {DOC_UNCHANGED, DOC_NOT_MODIFIED, DOC_CHANGED, DOC_NEW, DOC_REBASELINED}
+_HEALTHY_OUTCOMES = {
+    DOC_UNCHANGED, DOC_NOT_MODIFIED, DOC_CHANGED, DOC_NEW, DOC_REBASELINED, DOC_REVERTED,
+}
 
 logging.basicConfig(
     level=logging.INFO,
@@ -59,12 +87,21 @@ logging.basicConfig(
 )
 log = logging.getLogger("steward")
 
+# Every version of every document, stored once under its content hash.
+# main() applies cfg.blobs; the defaults are what the tests use.
+blob_store = blobs.BlobStore(BLOB_DIR)
+
+# The run's artefacts, staged until they are all written; see
+# steward/commit.py. Open only inside main(); tests that call the set
+# functions directly write straight to disk.
+transaction: Optional[commit.Transaction] = None
+
 
 # --- Small helpers ---------------------------------------------------------
 
 
 def setup_directories() -> None:
-    for path in (SNAPSHOTS_DIR, ANALYSIS_DIR, DIFFS_DIR, LOG_DIR):
+    for path in (SNAPSHOTS_DIR, ANALYSIS_DIR, DIFFS_DIR, LOG_DIR, BLOB_DIR):
         os.makedirs(path, exist_ok=True)
 
 
@@ -76,16 +113,26 @@ def load_json_file(path: str, default: Any) -> Any:
     if not os.path.exists(path):
         return default
     try:
-        with open(path, "r", encoding="utf-8") as handle:
-            return json.load(handle)
-    except (OSError, json.JSONDecodeError):
+        return jsonio.load(path)
+    except (OSError, ValueError):
         log.warning("Failed to read %s, using default", path)
         return default
 
 
+def _destination(path: str) -> str:
+    """Where a write to `path` goes: staged, while the run's transaction is open."""
+    return transaction.stage(path) if transaction is not None else path
+
+
+def _current(path: str) -> str:
+    """`path` as this run has left it so far, staged or not."""
+    return transaction.current(path) if transaction is not None else path
+
+
+# Both writers replace the file rather than rewriting it, so a hard link to the
+# old one (archive_previous_version) keeps the old content.
 def save_json_file(data: Any, path: str) -> None:
-    with open(path, "w", encoding="utf-8") as handle:
-        json.dump(data, handle, indent=4, ensure_ascii=False)
+    jsonio.save(data, _destination(path), pretty=True)
 
 
 def read_text(path: str) -> str:
@@ -97,14 +144,25 @@ def read_text(path: str) -> str:
 
 def write_text(path: str, text: str) -> None:
     os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-    with open(path, "w", encoding="utf-8") as handle:
+    target = _destination(path)
+    tmp = f"{target}.tmp"
+    with open(tmp, "w", encoding="utf-8") as handle:
         handle.write(text)
+    os.replace(tmp, target)
 
 
 def document_snapshot_path(file_id: str, doc_id: str) -> str:
+    """Where per-document baselines lived before the blob store; read, never written."""
     return os.path.join(SNAPSHOTS_DIR, file_id, f"{doc_id}.txt")
 
 
+def stored_document_text(file_id: str, doc_id: str, text_hash: Optional[str]) -> str:
+    """A document's stored baseline: the blob for its hash, else a pre-blob file."""
+    if text_hash and blob_store.has(text_hash):
+        return blob_store.get_or(text_hash)
+    return read_text(document_snapshot_path(file_id, doc_id))
+
+
 def aggregate_snapshot_path(file_id: str) -> str:
     return os.path.join(SNAPSHOTS_DIR, f"{file_id}.txt")
 
@@ -123,26 +181,92 @@ def rollup_hash(document_hashes: List[str]) -> str:
     return hashlib.sha256(joined.encode("utf-8")).hexdigest()
 
 
-def archive_previous_version(file_id: str, timestamp: str) -> None:
-    """Copy the current analysis, snapshot and diff into logs/ before replacing.
+def archive_previous_version(file_id: str, timestamp: str) -> Optional[str]:
+    """Link the current analysis and diff into logs/ before replacing them, and
+    record the snapshot as a manifest of blob ids beside them.
+
+    A hard link (or a reflink, or failing both a copy; `archive.preserve`)
+    makes archiving a metadata operation, not a second write of each file.
 
     Named by file_id, matching the 500+ archives already on disk and the
-    filename grammar history.build_index parses. The previous implementation
-    passed file_id where a set name was expected; the parameter is gone rather
-    than corrected, because introducing set names here would break both.
+    filename grammar steward/archive.py parses, and filed in the set's shard
+    for the month. The previous implementation passed file_id where a set
+    name was expected; the parameter is gone rather than corrected, because
+    introducing set names here would break both.
+
+    Returns where the analysis was archived to, or None if there was none.
     """
     try:
         stamp = datetime.fromisoformat(timestamp).strftime("%Y%m%d_%H%M%S")
     except (TypeError, ValueError):
         stamp = datetime.now(AEST_TZ).strftime("%Y%m%d_%H%M%S")
 
+    archived = None
+    os.makedirs(archive.shard_dir(LOG_DIR, file_id, stamp), exist_ok=True)
     for source, suffix in (
-        (analysis_path(file_id), "analysis.json"),
-        (aggregate_snapshot_path(file_id), "snapshot.txt"),
-        (diff_path(file_id), "diff.txt"),
+        (analysis_path(file_id), archive.ANALYSIS),
+        (diff_path(file_id), archive.DIFF),
     ):
+        source = _current(source)
         if os.path.exists(source):
-            shutil.copy(source, os.path.join(LOG_DIR, f"{file_id}_{stamp}_{suffix}"))
+            target = archive.path_for(LOG_DIR, file_id, stamp, suffix)
+            archive.preserve(source, _destination(target))
+            if suffix == archive.ANALYSIS:
+                archived = target
+
+    snapshot = _current(aggregate_snapshot_path(file_id))
+    if os.path.exists(snapshot):
+        with open(snapshot, "r", encoding="utf-8", newline="") as handle:
+            manifest = blob_store.put_snapshot(handle.read())
+        blobs.write_manifest(
+            _destination(archive.path_for(LOG_DIR, file_id, stamp, archive.SNAPSHOT_MANIFEST)), manifest
+        )
+    return archived
+
+
+# --- Known versions ---------------------------------------------------------
+#
+# Each document record carries `seen_hashes`, a bounded ring of content hashes
+# it has held before, oldest first, each pointing at the analysis that covered
+# it. A capture whose hash is in the ring is a return to a known version —
+# the 9 August Perplexity "restoration" is the type specimen — and is
+# recognised with one dict lookup instead of a diff and a model call.
+
+
+def _known_versions(prior: dict, timestamp: str) -> Dict[str, dict]:
+    """The prior ring, seeded with the prior hash for pre-ring records."""
+    known = dict(prior.get("seen_hashes") or {})
+    current = prior.get("hash")
+    if current and current not in known:
+        known[current] = {"seen_at": prior.get("last_changed") or prior.get("last_success") or timestamp}
+    return known
+
+
+def _remember(known: Dict[str, dict], text_hash: str, info: dict, size: int) -> Dict[str, dict]:
+    """Move a hash to the newest end of the ring and trim the oldest."""
+    ring = {k: v for k, v in known.items() if k != text_hash}
+    ring[text_hash] = {**known.get(text_hash, {}), **info}
+    while len(ring) > size:
+        del ring[next(iter(ring))]
+    return ring
+
+
+def _repoint_versions(documents: Dict[str, dict], old_path: str, new_path: Optional[str]) -> None:
+    """The current analysis was just archived; follow it into logs/."""
+    if not new_path:
+        return
+    for record in documents.values():
+        for info in (record.get("seen_hashes") or {}).values():
+            if info.get("analysis_path") == old_path:
+                info["analysis_path"] = new_path
+
+
+def _version_date(timestamp: Optional[str]) -> str:
+    try:
+        then = datetime.fromisoformat(timestamp or "")
+    except ValueError:
+        return "an unknown date"
+    return f"{then.day} {then:%B %Y}"
 
 
 def validate_policy_sets(policy_sets: list) -> list:
@@ -199,7 +323,7 @@ def seed_documents_from_legacy(policy_set: dict, file_id: str, cfg) -> Dict[str,
         text = content.normalise(sections[url], cfg.noise_patterns_for(content.host_of(url)))
         if not text:
             continue
-        write_text(document_snapshot_path(file_id, doc_id), text)
+        blob_store.put(text)
         seeded[url] = {
             "doc_id": doc_id,
             "label": content.document_label(url_data),
@@ -233,16 +357,67 @@ def process_document(
 
     Returns (record, outcome, diff_or_None, current_text).
     """
+    result = fetching.fetch_document(url_data, prior, cfg, policy_set)
+    return check_document(result, url_data, policy_set, file_id, prior, cfg, timestamp)
+
+
+def check_document(
+    result: fetching.FetchResult,
+    url_data: dict,
+    policy_set: dict,
+    file_id: str,
+    prior: dict,
+    cfg,
+    timestamp: str,
+    pool: Optional[Executor] = None,
+) -> Tuple[dict, str, Optional[diffing.DiffResult], str]:
+    """Every gate after the download: extraction, if the fetch left it, onwards.
+
+    The CPU work is `examine.examine`, run in `pool` when there is one.
+    """
     url = url_data["url"]
     doc_id = prior.get("doc_id") or content.document_id(url)
     label = content.document_label(url_data)
-    stored_text = read_text(document_snapshot_path(file_id, doc_id))
+    stored_text = stored_document_text(file_id, doc_id, prior.get("hash"))
 
     record = dict(prior)
     record.update({"doc_id": doc_id, "label": label, "last_checked": timestamp})
     record.setdefault("consecutive_failures", 0)
 
-    result = fetching.fetch_document(url_data, prior, cfg, policy_set)
+    history_size = cfg.diff.history_size
+    known = _known_versions(prior, timestamp) if history_size else {}
+    # The extractor or the normalisation rules changed underneath the stored
+    # baseline, so the two are not comparable.
+    stale_pipeline = int(prior.get("pipeline_version", 0)) != PIPELINE_VERSION
+
+    def examined(result: fetching.FetchResult) -> examine.Finding:
+        page = examine.Page(
+            url=url,
+            label=label,
+            html=result.html,
+            text="" if result.html else result.text,
+            selector=url_data.get("selector"),
+            noise_patterns=cfg.noise_patterns_for(content.host_of(url)),
+            prior_hash=prior.get("hash") or "",
+            prior_length=prior.get("length"),
+            known_hashes=frozenset(known),
+            baseline="" if stale_pipeline else stored_text,
+        )
+        rules = examine.Rules.from_config(cfg)
+        if pool is None:
+            return examine.examine(page, rules)
+        return pool.submit(examine.examine, page, rules).result()
+
+    finding = examined(result) if result.ok else None
+    if finding is not None and not finding.usable:
+        # A page left unread that gave no usable text goes back through
+        # `fetch_document`, which escalates exactly as it would have: the
+        # GET once more, then the browser.
+        log.info("    Plain fetch of %s gave no usable text, escalating", url)
+        salvaged = fetching.fetch_document(url_data, prior, cfg, policy_set)
+        salvaged.duration_ms += result.duration_ms
+        result = salvaged
+        finding = examined(result) if result.ok else None
     record["http_status"] = result.http_status
     record["fetch_ms"] = result.duration_ms
 
@@ -274,35 +449,28 @@ def process_document(
     # Stage 2 pass 1 — normalise, then decide whether this is plausibly the
     # document at all. A capture that fails validation never overwrites the
     # stored snapshot and never reaches the model.
-    normalised = content.normalise(result.text, cfg.noise_patterns_for(content.host_of(url)))
-    verdict = validate_capture(
-        normalised,
-        prior.get("length"),
-        min_length=cfg.validation.min_length,
-        shrink_ratio=cfg.validation.shrink_ratio,
-        growth_ratio=cfg.validation.growth_ratio,
-        failure_signatures=cfg.validation.failure_signatures,
-    )
+    verdict = finding.verdict
     if not verdict.ok:
         record.update(
             {
                 "status": DOC_SUSPECT,
                 "consecutive_failures": int(prior.get("consecutive_failures", 0)) + 1,
                 "last_error": f"{verdict.reason}: {verdict.detail}",
-                "suspect_length": len(normalised),
+                "suspect_length": finding.length,
             }
         )
         log.warning("    Rejected capture of %s — %s (%s)", url, verdict.reason, verdict.detail)
         return record, DOC_SUSPECT, None, stored_text
 
-    new_hash = content.content_hash(normalised)
+    new_hash = finding.hash
+    normalised = stored_text if finding.text is None else finding.text
     record.update(
         {
             "hash": new_hash,
-            "length": len(normalised),
+            "length": finding.length,
             "etag": result.etag,
             "last_modified": result.last_modified,
-            "extractor": result.extractor,
+            "extractor": finding.extractor or result.extractor,
             "pipeline_version": PIPELINE_VERSION,
             "consecutive_failures": 0,
             "last_success": timestamp,
@@ -314,32 +482,38 @@ def process_document(
     if not prior.get("hash"):
         record["status"] = DOC_NEW
         record["last_changed"] = timestamp
+        if history_size:
+            record["seen_hashes"] = {new_hash: {"seen_at": timestamp}}
         return record, DOC_NEW, None, normalised
 
-    # The extractor or the normalisation rules changed underneath the stored
-    # baseline, so the two are not comparable. Re-baseline and say so, rather
-    # than reporting a change that did not happen.
-    stale_pipeline = int(prior.get("pipeline_version", 0)) != PIPELINE_VERSION
+    # Re-baseline and say so, rather than reporting a change that did not
+    # happen.
     if stale_pipeline or not stored_text:
         reason = "extraction pipeline changed" if stale_pipeline else "stored snapshot missing"
         log.info("    Re-baselining %s (%s)", label, reason)
         record["status"] = DOC_REBASELINED
         record["rebaseline_reason"] = reason
+        if history_size:
+            # Hashes from another pipeline are not comparable; start over.
+            record["seen_hashes"] = {new_hash: {"seen_at": timestamp}}
         return record, DOC_REBASELINED, None, normalised
 
     if new_hash == prior.get("hash"):
         record["status"] = DOC_UNCHANGED
         return record, DOC_UNCHANGED, None, normalised
 
+    # A return to a version already seen and already analysed.
+    if new_hash in known:
+        earlier = known[new_hash]
+        log.info("    %s: reverted to the version of %s — no analysis", label, _version_date(earlier.get("seen_at")))
+        record["status"] = DOC_REVERTED
+        record["last_changed"] = timestamp
+        record["reverted_to"] = earlier.get("seen_at")
+        record["seen_hashes"] = _remember(known, new_hash, {}, history_size)
+        return record, DOC_REVERTED, None, normalised
+
     # Stage 2 pass 2 — the diff, and the cosmetic gate.
-    diff = diffing.compute_diff(
-        stored_text,
-        normalised,
-        label=label,
-        context_lines=cfg.diff.context_lines,
-        max_chars=cfg.diff.max_diff_chars,
-        watchlist=cfg.fingerprint.watchlist,
-    )
+    diff = finding.diff
     if diff.is_empty:
         log.info("    %s: hash moved but the diff is empty — cosmetic, no analysis", label)
         record["status"] = DOC_UNCHANGED
@@ -349,46 +523,280 @@ def process_document(
     record["last_changed"] = timestamp
     record["diff_added"] = diff.added
     record["diff_removed"] = diff.removed
+    if history_size:
+        record["seen_hashes"] = _remember(known, new_hash, {"seen_at": timestamp}, history_size)
     return record, DOC_CHANGED, diff, normalised
 
 
 # --- Per-set processing ----------------------------------------------------
 
 
+@dataclass
+class SetContext:
+    """What every document of a set is checked against: fixed before the first one is fetched."""
+
+    policy_set: dict
+    previous_entry: dict
+    set_name: str
+    file_id: str
+    timestamp: str
+    prior_documents: Dict[str, dict]
+
+
+@dataclass
+class DocumentJob:
+    """One document on its way through the run's stages (steward/pipeline.py)."""
+
+    context: SetContext
+    url_data: dict
+    cfg: Any
+    # Where its answer goes: the set's place in the run, the URL's in the set.
+    index: int = 0
+    position: int = 0
+    result: Optional[fetching.FetchResult] = None
+    checked: Optional[Tuple[dict, str, Optional[diffing.DiffResult], str]] = None
+
+    @property
+    def prior(self) -> dict:
+        return self.context.prior_documents.get(self.url_data["url"], {})
+
+
+@dataclass
+class PendingAnalysis:
+    """A set that survived every gate and is waiting on its one model call.
+
+    Everything `complete_policy_set` needs to write the set's artefacts once
+    the outcome is known, so the calls for several sets can be in flight at
+    the same time.
+    """
+
+    set_name: str
+    file_id: str
+    timestamp: str
+    previous_entry: dict
+    entry: Dict[str, Any]
+    prior_documents: Dict[str, dict]
+    documents: Dict[str, dict]
+    outcomes: Dict[str, str]
+    texts_to_write: List[Tuple[str, Optional[str]]]
+    sections: List[Tuple[str, str]]
+    combined_diff: str
+    changed_labels: List[str]
+    tags: List[str] = field(default_factory=list)
+    added: int = 0
+    removed: int = 0
+    estimated_tokens: int = 0
+    route: routing.Route = field(default_factory=lambda: routing.Route(routing.MAIN, ""))
+    # The answer, when steward/triage.py could give it without a model call.
+    local: Optional[llm.AnalysisOutcome] = None
+    # Parts of a diff too long for one prompt, analysed map-reduce.
+    chunks: List[str] = field(default_factory=list)
+
+    @property
+    def request(self) -> llm.AnalysisRequest:
+        return llm.AnalysisRequest(
+            set_name=self.set_name,
+            diff_text="\n\n".join(self.chunks) if self.chunks else self.combined_diff,
+            changed_documents=self.changed_labels,
+            tags=self.tags,
+            model=self.route.model,
+            tier=self.route.tier,
+            escalate_to=self.route.escalate_to,
+            chunks=self.chunks,
+        )
+
+
 def process_policy_set(
     policy_set: dict,
     previous_entry: dict,
     cfg,
     run_log: runlog.RunLog,
     dry_run: bool,
+    cache: Optional[AnalysisCache] = None,
 ) -> dict:
+    """Run one set end to end, making its model call inline."""
+    entry, pending = prepare_policy_set(policy_set, previous_entry, cfg, run_log, dry_run)
+    if pending is None:
+        return entry
+    if pending.local is not None:
+        return complete_policy_set(pending, pending.local, run_log)
+
+    request = pending.request
+    outcome = llm.analyse_change(
+        request.set_name,
+        request.diff_text,
+        model=request.model,
+        changed_documents=request.changed_documents,
+        tags=request.tags,
+        cache=cache,
+        tier=request.tier,
+        escalate_to=request.escalate_to,
+        chunks=request.chunks,
+    )
+    return complete_policy_set(pending, outcome, run_log)
+
+
+def prepare_policy_set(
+    policy_set: dict,
+    previous_entry: dict,
+    cfg,
+    run_log: runlog.RunLog,
+    dry_run: bool,
+) -> Tuple[dict, Optional[PendingAnalysis]]:
+    """Every gate up to the model call, one document after another.
+
+    Returns (entry, None) when the set is finished without one, or
+    (entry, pending) when it needs analysis.
+    """
+    context = open_policy_set(policy_set, previous_entry, cfg)
+    checked = [
+        process_document(
+            url_data,
+            policy_set,
+            context.file_id,
+            context.prior_documents.get(url_data["url"], {}),
+            cfg,
+            context.timestamp,
+        )
+        for url_data in policy_set["urls"]
+    ]
+    return assemble_policy_set(context, checked, cfg, run_log, dry_run)
+
+
+def _fetch_stage(job: DocumentJob) -> DocumentJob:
+    job.result = fetching.fetch_document(
+        job.url_data, job.prior, job.cfg, job.context.policy_set, extract=False
+    )
+    return job
+
+
+def _check_stage(job: DocumentJob, pool: Optional[Executor] = None) -> DocumentJob:
+    context = job.context
+    job.checked = check_document(
+        job.result,
+        job.url_data,
+        context.policy_set,
+        context.file_id,
+        job.prior,
+        job.cfg,
+        context.timestamp,
+        pool,
+    )
+    job.result = None
+    return job
+
+
+def document_stages(cfg, pool: Optional[Executor] = None) -> pipeline.Pipeline:
+    """Downloads on the fetch workers; extraction and every gate after it on the check workers.
+
+    With `pool`, each check worker hands its page's CPU work to it and waits.
+    """
+    return pipeline.Pipeline(
+        [
+            pipeline.Stage("fetch", _fetch_stage, cfg.pipeline.fetch_workers),
+            pipeline.Stage("check", functools.partial(_check_stage, pool=pool), cfg.pipeline.check_workers),
+        ],
+        depth=cfg.pipeline.queue_depth,
+    )
+
+
+def check_policy_sets(
+    policy_sets: List[dict],
+    previous_hashes: Dict[str, Any],
+    cfg,
+    stages: pipeline.Pipeline,
+) -> Iterator[Tuple[dict, Optional[SetContext], Any]]:
+    """Every document of every set through `stages`, all sets at once.
+
+    Yields (policy_set, context, checked) in the order of `policy_sets`, each
+    set once its documents and every earlier set's are done, so sets settle
+    in the order they always have. `checked` is what `process_document`
+    returns, for each URL in order, or the exception that stopped one of
+    them. `context` is None when the set could not be opened.
+    """
+    opened: List[Tuple[dict, Optional[SetContext], Any]] = []
+    jobs: List[DocumentJob] = []
+    for index, policy_set in enumerate(policy_sets):
+        try:
+            context = open_policy_set(policy_set, previous_hashes.get(policy_set["setName"], {}), cfg)
+        except Exception as exc:  # noqa: BLE001 — reported with the set, in its turn
+            opened.append((policy_set, None, exc))
+            continue
+        opened.append((policy_set, context, [None] * len(policy_set["urls"])))
+        jobs.extend(
+            DocumentJob(context, url_data, cfg, index=index, position=position)
+            for position, url_data in enumerate(policy_set["urls"])
+        )
+
+    remaining = [len(checked) if isinstance(checked, list) else 0 for _, _, checked in opened]
+    ready = 0
+    for job, value in stages.run(jobs):
+        policy_set, context, checked = opened[job.index]
+        if isinstance(value, Exception):
+            if isinstance(checked, list):
+                opened[job.index] = (policy_set, context, value)
+        elif isinstance(checked, list):
+            checked[job.position] = value.checked
+        remaining[job.index] -= 1
+        while ready < len(opened) and remaining[ready] == 0:
+            yield opened[ready]
+            ready += 1
+    yield from opened[ready:]
+
+
+def open_policy_set(policy_set: dict, previous_entry: dict, cfg) -> SetContext:
     set_name = policy_set["setName"]
     file_id = slugify_set_name(set_name)
-    timestamp = datetime.now(AEST_TZ).isoformat()
     log.info("Processing policy set: %s", set_name)
 
     prior_documents: Dict[str, dict] = previous_entry.get("documents") or {}
     if not prior_documents and previous_entry.get("hash"):
         prior_documents = seed_documents_from_legacy(policy_set, file_id, cfg)
+    return SetContext(
+        policy_set=policy_set,
+        previous_entry=previous_entry,
+        set_name=set_name,
+        file_id=file_id,
+        timestamp=datetime.now(AEST_TZ).isoformat(),
+        prior_documents=prior_documents,
+    )
+
+
+def assemble_policy_set(
+    context: SetContext,
+    checked: List[Tuple[dict, str, Optional[diffing.DiffResult], str]],
+    cfg,
+    run_log: runlog.RunLog,
+    dry_run: bool,
+) -> Tuple[dict, Optional[PendingAnalysis]]:
+    """The set-level gates, once each of its documents has been checked
+    (`checked` is in the order of its URLs)."""
+    policy_set = context.policy_set
+    previous_entry = context.previous_entry
+    set_name = context.set_name
+    file_id = context.file_id
+    timestamp = context.timestamp
+    prior_documents = context.prior_documents
 
     documents: Dict[str, dict] = {}
     sections: List[Tuple[str, str]] = []
     changed: List[Tuple[str, diffing.DiffResult]] = []
     outcomes: Dict[str, str] = {}
     tags: List[str] = []
-    texts_to_write: List[Tuple[str, str]] = []
+    # (text, hash of the version it replaces), so the old one can become a delta.
+    texts_to_write: List[Tuple[str, Optional[str]]] = []
+    reverted: List[str] = []
 
-    for url_data in policy_set["urls"]:
+    for url_data, (record, outcome, diff, text) in zip(policy_set["urls"], checked):
         url = url_data["url"]
-        record, outcome, diff, text = process_document(
-            url_data, policy_set, file_id, prior_documents.get(url, {}), cfg, timestamp
-        )
         documents[url] = record
         outcomes[url] = outcome
         sections.append((url, text))
 
-        if outcome in (DOC_CHANGED, DOC_NEW, DOC_REBASELINED):
-            texts_to_write.append((document_snapshot_path(file_id, record["doc_id"]), text))
+        if outcome in (DOC_CHANGED, DOC_NEW, DOC_REBASELINED, DOC_REVERTED):
+            texts_to_write.append((text, prior_documents.get(url, {}).get("hash")))
+        if outcome == DOC_REVERTED:
+            reverted.append(url)
         if diff is not None:
             changed.append((record["label"], diff))
             tags.extend(diff.tags)
@@ -436,7 +844,7 @@ def process_policy_set(
 
     if not readable:
         log.warning("  No document in '%s' could be read — carrying the previous state forward", set_name)
-        return entry
+        return entry, None
 
     # Nothing survived to the diff stage: either genuinely unchanged, or a
     # re-baseline, or a first capture. None of those is a policy amendment.
@@ -446,7 +854,10 @@ def process_policy_set(
         new_docs = [documents[u]["label"] for u, o in outcomes.items() if o == DOC_NEW]
         rebaselined = [documents[u]["label"] for u, o in outcomes.items() if o == DOC_REBASELINED]
 
-        if new_docs and not previous_entry.get("hash"):
+        if reverted:
+            entry["last_review"] = _revert_review(documents, reverted, timestamp)
+            log.info("  %s", entry["last_review"]["summary"])
+        elif new_docs and not previous_entry.get("hash"):
             log.info("  First scan for '%s'", set_name)
             entry["last_amended"] = timestamp
             entry["last_priority"] = "low"
@@ -475,7 +886,7 @@ def process_policy_set(
             }
         else:
             log.info("  No changes detected for '%s'", set_name)
-        return entry
+        return entry, None
 
     # Stage 3 — one diff artefact, one model call.
     combined_diff = diffing.combine_diffs(changed)
@@ -483,27 +894,83 @@ def process_policy_set(
     unique_tags = sorted(set(tags))
     total_added = sum(d.added for _, d in changed)
     total_removed = sum(d.removed for _, d in changed)
+    route = routing.route(total_added + total_removed, unique_tags, cfg)
 
     log.info(
-        "  Change detected in %s (+%d / -%d lines)%s",
+        "  Change detected in %s (+%d / -%d lines)%s — %s model (%s)",
         ", ".join(changed_labels),
         total_added,
         total_removed,
         f", tags: {', '.join(unique_tags)}" if unique_tags else "",
+        route.tier,
+        route.reason,
     )
 
+    local = None
+    if cfg.triage.enabled:
+        verdict = triage.classify(
+            changed,
+            rules=cfg.triage.rules,
+            max_changed_lines=cfg.triage.max_changed_lines,
+            tags=unique_tags,
+        )
+        if verdict is not None:
+            log.info("  Classified locally as %s — no model call", verdict.rule)
+            local = verdict.outcome()
+
+    chunks: List[str] = []
+    if local is None and cfg.analysis.chunked and any(d.truncated for _, d in changed):
+        chunks = diffing.chunk_diffs(changed, cfg.diff.max_diff_chars)
+        if len(chunks) > cfg.analysis.max_chunks:
+            log.warning(
+                "  Diff needs %d parts, over analysis.max_chunks (%d) — analysing it truncated",
+                len(chunks),
+                cfg.analysis.max_chunks,
+            )
+            chunks = []
+        else:
+            log.info("  Diff exceeds diff.max_diff_chars — analysing it in %d parts", len(chunks))
+
     if dry_run:
         log.info("  [dry-run] Skipping analysis and leaving stored state untouched")
-        return previous_entry or entry
+        return previous_entry or entry, None
 
-    outcome = llm.analyse_change(
-        set_name,
-        combined_diff,
-        model=cfg.model,
-        changed_documents=changed_labels,
+    return entry, PendingAnalysis(
+        set_name=set_name,
+        file_id=file_id,
+        timestamp=timestamp,
+        previous_entry=previous_entry,
+        entry=entry,
+        prior_documents=prior_documents,
+        documents=documents,
+        outcomes=outcomes,
+        texts_to_write=texts_to_write,
+        sections=sections,
+        combined_diff=combined_diff,
+        changed_labels=changed_labels,
         tags=unique_tags,
+        added=total_added,
+        removed=total_removed,
+        route=route,
+        local=local,
+        chunks=chunks,
     )
 
+
+def complete_policy_set(
+    pending: PendingAnalysis, outcome: llm.AnalysisOutcome, run_log: runlog.RunLog
+) -> dict:
+    """Record the model's answer for a set and write its artefacts."""
+    set_name = pending.set_name
+    file_id = pending.file_id
+    timestamp = pending.timestamp
+    previous_entry = pending.previous_entry
+    entry = pending.entry
+    changed_labels = pending.changed_labels
+    unique_tags = pending.tags
+    total_added = pending.added
+    total_removed = pending.removed
+
     run_log.record(
         timestamp=timestamp,
         set_name=set_name,
@@ -514,10 +981,24 @@ def process_policy_set(
         diff_added=total_added,
         diff_removed=total_removed,
         tags=unique_tags,
-        llm_called=True,
+        llm_called=not (outcome.cached or outcome.local_rule),
+        cache_hit=outcome.cached,
+        local_rule=outcome.local_rule,
+        model=outcome.model,
+        model_tier=outcome.tier,
+        escalated=len(outcome.tiers) > 1,
+        tiers=outcome.tiers,
+        estimated_tokens=pending.estimated_tokens,
         llm_attempts=outcome.attempts,
+        llm_retries=outcome.retries,
+        llm_chunks=len(pending.chunks),
+        llm_bundle=outcome.bundled,
+        llm_ms=outcome.latency_ms,
         prompt_tokens=outcome.prompt_tokens,
         output_tokens=outcome.output_tokens,
+        cached_prompt_tokens=outcome.cached_tokens,
+        llm_abandoned=outcome.abandoned,
+        prefix_cached=outcome.prefix_cached,
         verdict=(outcome.result or {}).get("verdict"),
         priority=(outcome.result or {}).get("priority"),
         error=outcome.error,
@@ -529,16 +1010,18 @@ def process_policy_set(
         log.error("  Analysis of '%s' failed schema validation twice — skipping", set_name)
         entry["schema_failures"] = entry["schema_failures"] + 1
         entry["hash"] = previous_entry.get("hash", entry["hash"])
-        entry["documents"] = _revert_changed_documents(documents, prior_documents, outcomes)
+        entry["documents"] = _revert_changed_documents(
+            pending.documents, pending.prior_documents, pending.outcomes
+        )
         return entry
 
     entry["schema_failures"] = 0
     result = outcome.result
     verdict = result["verdict"]
 
-    _commit_texts(texts_to_write)
-    _write_aggregate(file_id, sections)
-    write_text(diff_path(file_id), combined_diff)
+    _commit_texts(pending.texts_to_write)
+    _write_aggregate(file_id, pending.sections)
+    write_text(diff_path(file_id), pending.combined_diff)
 
     change_record = {
         "timestamp": timestamp,
@@ -561,13 +1044,17 @@ def process_policy_set(
             "changed_documents": changed_labels,
         }
         archive_previous_version(file_id, timestamp)
+        archived = archive.path_for(LOG_DIR, file_id, _stamp(timestamp), archive.ANALYSIS)
         save_json_file(
             {**result, "date_time": timestamp, "changed_documents": changed_labels},
-            os.path.join(LOG_DIR, f"{file_id}_{_stamp(timestamp)}_analysis.json"),
+            archived,
         )
+        _point_changed_versions(pending, result, archived)
         return entry
 
-    archive_previous_version(file_id, previous_entry.get("last_checked") or timestamp)
+    archived = archive_previous_version(file_id, previous_entry.get("last_checked") or timestamp)
+    _repoint_versions(entry["documents"], analysis_path(file_id), archived)
+    _point_changed_versions(pending, result, analysis_path(file_id))
     save_json_file(
         {
             "verdict": verdict,
@@ -597,6 +1084,105 @@ def process_policy_set(
     return entry
 
 
+def defer_policy_set(pending: PendingAnalysis, run_log: runlog.RunLog) -> dict:
+    """Leave a set for the next run: nothing written, prior hashes restored.
+
+    The same path a schema failure takes, without counting as one, so the
+    diff comes back next run as `analysis_pending`.
+    """
+    run_log.record(
+        timestamp=pending.timestamp,
+        set_name=pending.set_name,
+        file_id=pending.file_id,
+        url="",
+        label="(policy set)",
+        outcome="deferred",
+        diff_added=pending.added,
+        diff_removed=pending.removed,
+        tags=pending.tags,
+        llm_called=False,
+        estimated_tokens=pending.estimated_tokens,
+    )
+    entry = pending.entry
+    entry["hash"] = pending.previous_entry.get("hash", entry["hash"])
+    entry["documents"] = _revert_changed_documents(
+        pending.documents, pending.prior_documents, pending.outcomes
+    )
+    log.info("  Deferred analysis of '%s' to the next run (token budget)", pending.set_name)
+    return entry
+
+
+def schedule_analyses(
+    pending: List[PendingAnalysis], cfg, cache: Optional[AnalysisCache] = None
+) -> Tuple[List[PendingAnalysis], List[PendingAnalysis]]:
+    """Estimate every prompt and split the sets into (admitted, deferred)."""
+    for job in pending:
+        job.estimated_tokens = llm.estimate_request_tokens(job.request, model=cfg.model, cache=cache)
+
+    start_of_day = datetime.now(AEST_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+    spent_today = runlog.tokens_since(start_of_day) if cfg.budget.day_tokens else 0
+    plan = budget.schedule(
+        [
+            budget.Candidate(job.set_name, job.entry.get("category", ""), job.tags, job.estimated_tokens)
+            for job in pending
+        ],
+        run_tokens=cfg.budget.run_tokens,
+        day_tokens=cfg.budget.day_tokens,
+        spent_today=spent_today,
+        category_order=cfg.budget.category_order,
+    )
+    return [pending[i] for i in plan.admitted], [pending[i] for i in plan.deferred]
+
+
+def _point_changed_versions(pending: PendingAnalysis, result: dict, path: str) -> None:
+    """Record which analysis covered the versions this run introduced."""
+    for url, outcome in pending.outcomes.items():
+        if outcome != DOC_CHANGED:
+            continue
+        record = pending.documents[url]
+        info = (record.get("seen_hashes") or {}).get(record.get("hash"))
+        if info is not None:
+            info.update(
+                {
+                    "analysis_path": path,
+                    "analysed_at": pending.timestamp,
+                    "verdict": result["verdict"],
+                    "priority": result["priority"],
+                    "summary": result["summary"],
+                }
+            )
+
+
+def _revert_review(documents: Dict[str, dict], reverted: List[str], timestamp: str) -> dict:
+    """A `last_review` carrying the earlier analysis each reverted document returns to."""
+    notes = []
+    earlier = []
+    for url in reverted:
+        record = documents[url]
+        info = record["seen_hashes"][record["hash"]]
+        note = f"{record['label']} reverted to version of {_version_date(info.get('seen_at'))}"
+        if info.get("summary"):
+            note += f" ({info['summary']})"
+        notes.append(note)
+        earlier.append(
+            {
+                "document": record["label"],
+                "seen_at": info.get("seen_at"),
+                "analysis_path": info.get("analysis_path"),
+                "verdict": info.get("verdict"),
+                "priority": info.get("priority"),
+                "summary": info.get("summary"),
+            }
+        )
+    return {
+        "timestamp": timestamp,
+        "verdict": DOC_REVERTED,
+        "summary": "; ".join(notes) + ". No analysis was needed.",
+        "changed_documents": [documents[url]["label"] for url in reverted],
+        "reverted_to": earlier,
+    }
+
+
 def _stamp(timestamp: str) -> str:
     try:
         return datetime.fromisoformat(timestamp).strftime("%Y%m%d_%H%M%S")
@@ -604,9 +1190,9 @@ def _stamp(timestamp: str) -> str:
         return datetime.now(AEST_TZ).strftime("%Y%m%d_%H%M%S")
 
 
-def _commit_texts(pending: List[Tuple[str, str]]) -> None:
-    for path, text in pending:
-        write_text(path, text)
+def _commit_texts(pending: List[Tuple[str, Optional[str]]]) -> None:
+    for text, previous in pending:
+        blob_store.put(text, previous)
 
 
 def _write_aggregate(file_id: str, sections: List[Tuple[str, str]]) -> None:
@@ -617,14 +1203,22 @@ def _write_aggregate(file_id: str, sections: List[Tuple[str, str]]) -> None:
 def _revert_changed_documents(
     documents: Dict[str, dict], prior: Dict[str, dict], outcomes: Dict[str, str]
 ) -> Dict[str, dict]:
-    """Keep health fields but restore the prior hash for unanalysed changes."""
+    """Keep health fields but restore the prior hash for unanalysed changes.
+
+    The known-version ring goes back too: a change that was never analysed
+    must not be recognised as a known version on the retry.
+    """
     reverted = {}
     for url, record in documents.items():
-        if outcomes.get(url) == DOC_CHANGED and url in prior:
+        if outcomes.get(url) in (DOC_CHANGED, DOC_REVERTED) and url in prior:
             merged = dict(record)
             merged["hash"] = prior[url].get("hash", record.get("hash"))
             merged["length"] = prior[url].get("length", record.get("length"))
             merged["status"] = "analysis_pending"
+            if "seen_hashes" in prior[url]:
+                merged["seen_hashes"] = prior[url]["seen_hashes"]
+            else:
+                merged.pop("seen_hashes", None)
             reverted[url] = merged
         else:
             reverted[url] = record
@@ -653,10 +1247,19 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
         metavar="SET_NAME",
         help="Limit the run to the named policy set. Repeatable.",
     )
+    parser.add_argument(
+        "--rebuild-history",
+        action="store_true",
+        help="Re-read every archive for history.json instead of only the new ones.",
+    )
     return parser.parse_args(argv)
 
 
 def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["history"]:
+        # Read-only time travel over the archive; see steward/versions.py.
+        return versions.main(argv[1:])
     args = parse_args(argv)
     setup_directories()
 
@@ -665,6 +1268,7 @@ def main(argv: Optional[List[str]] = None) -> int:
     except ConfigError as exc:
         log.error("Configuration error — %s", exc)
         return 1
+    blob_store.configure(cfg.blobs)
 
     if not args.dry_run and not os.environ.get("GEMINI_API_KEY"):
         log.error("GEMINI_API_KEY is not set. Exiting.")
@@ -683,25 +1287,126 @@ def main(argv: Optional[List[str]] = None) -> int:
         log.error("No valid policy sets to check. Exiting.")
         return 1
 
-    previous_hashes = load_json_file(HASHES_FILE, {})
-    if not isinstance(previous_hashes, dict):
-        previous_hashes = {}
+    if not args.dry_run:
+        # Finish or undo a run that stopped part way; see steward/commit.py.
+        recovered = commit.recover()
+        if recovered:
+            log.warning("The previous run stopped before its commit finished — %s", recovered.replace("_", " "))
+        # A no-op once logs/ holds only shards; see steward/archive.py.
+        moved = archive.migrate(LOG_DIR, HASHES_FILE)
+        if moved:
+            log.info("Moved %d archive file(s) in logs/ into per-source monthly shards", len(moved))
+
+    # Settled sets go to the state store as they happen, and hashes.json is
+    # exported from it at the end. Sets a run settled and never committed —
+    # rolled back just now, or by a workflow run that failed — are reconciled
+    # against hashes.json by `sync_from`. A dry run reads hashes.json and
+    # touches neither.
+    store = None
+    if cfg.state.store == "sqlite" and not args.dry_run:
+        store = state.StateStore.open(cfg.state.path)
+        store.sync_from(HASHES_FILE)
+        previous_hashes = store.load()
+    else:
+        try:
+            previous_hashes = state.read_hashes(HASHES_FILE, CHECKS_FILE)
+        except FileNotFoundError:
+            previous_hashes = {}
+        except (OSError, ValueError):
+            log.warning("Failed to read %s, using default", HASHES_FILE)
+            previous_hashes = {}
+
+    global transaction
+    transaction = None if args.dry_run else commit.Transaction.open()
+    try:
+        return _check(args, cfg, policy_sets, store, previous_hashes)
+    finally:
+        # Committed, or left for the next run's `commit.recover` to roll back.
+        transaction = None
+
 
+def _check(
+    args: argparse.Namespace,
+    cfg,
+    policy_sets: List[dict],
+    store: Optional[state.StateStore],
+    previous_hashes: Dict[str, Any],
+) -> int:
     run_id = uuid.uuid4().hex[:12]
     run_log = runlog.RunLog(run_id)
     log.info("Run %s starting — %d policy set(s)%s", run_id, len(policy_sets), " [dry-run]" if args.dry_run else "")
 
+    cache = None
+    if cfg.cache.enabled and not args.dry_run:
+        cache = AnalysisCache.load(
+            CACHE_FILE, max_age_days=cfg.cache.max_age_days, max_entries=cfg.cache.max_entries
+        )
+
     current_hashes: Dict[str, Any] = {}
-    for policy_set in policy_sets:
-        set_name = policy_set["setName"]
-        try:
-            current_hashes[set_name] = process_policy_set(
-                policy_set, previous_hashes.get(set_name, {}), cfg, run_log, args.dry_run
-            )
-        except Exception as exc:  # noqa: BLE001 — one bad source must not lose the run
-            log.exception("Unhandled error processing '%s': %s", set_name, exc)
-            if set_name in previous_hashes:
-                current_hashes[set_name] = previous_hashes[set_name]
+
+    def settle(set_name: str, entry: dict) -> None:
+        current_hashes[set_name] = entry
+        if store is not None:
+            store.put_set(set_name, entry)
+
+    # Stages 1 and 2 for every document at once, the checks' CPU work in
+    # worker processes when the backend says so.
+    pool = None
+    if cfg.pipeline.check_backend == "process":
+        pool = examine.process_pool(cfg.pipeline.check_workers)
+    stages = document_stages(cfg, pool)
+    pending: List[PendingAnalysis] = []
+    try:
+        for policy_set, context, checked in check_policy_sets(policy_sets, previous_hashes, cfg, stages):
+            set_name = policy_set["setName"]
+            try:
+                if isinstance(checked, Exception):
+                    raise checked
+                entry, job = assemble_policy_set(context, checked, cfg, run_log, args.dry_run)
+            except Exception as exc:  # noqa: BLE001 — one bad source must not lose the run
+                log.exception("Unhandled error processing '%s': %s", set_name, exc)
+                if set_name in previous_hashes:
+                    current_hashes[set_name] = previous_hashes[set_name]
+                continue
+            if job is None:
+                settle(set_name, entry)
+            else:
+                # Not final until its analysis is recorded.
+                current_hashes[set_name] = entry
+                pending.append(job)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # Stage 3 for every changed set at once. Sets triage answered locally
+    # are done; the rest are estimated, admitted in priority order under the
+    # token budget, then sent through one client, concurrently, held under the
+    # configured quotas.
+    analysed = pipeline.StageStats("analyse", cfg.analysis.concurrency)
+    if pending:
+        answered = [(job, job.local) for job in pending if job.local is not None]
+        pending = [job for job in pending if job.local is None]
+        pending, deferred = schedule_analyses(pending, cfg, cache)
+        for job in deferred:
+            settle(job.set_name, defer_policy_set(job, run_log))
+        log.info(
+            "Analysing %d changed set(s); %d answered locally", len(pending), len(answered)
+        )
+        started = time.monotonic()
+        outcomes = llm.analyse_changes(
+            [job.request for job in pending], model=cfg.model, settings=cfg.analysis, cache=cache
+        )
+        analysed.record(started, time.monotonic(), count=len(pending))
+        answered.extend(zip(pending, outcomes))
+        for job, outcome in answered:
+            try:
+                settle(job.set_name, complete_policy_set(job, outcome, run_log))
+            except Exception as exc:  # noqa: BLE001 — one bad source must not lose the run
+                log.exception("Unhandled error recording analysis for '%s': %s", job.set_name, exc)
+                if job.set_name in previous_hashes:
+                    current_hashes[job.set_name] = previous_hashes[job.set_name]
+                else:
+                    current_hashes.pop(job.set_name, None)
 
     # Sets that were skipped this run keep their stored state rather than
     # vanishing from the dashboard.
@@ -712,37 +1417,96 @@ def main(argv: Optional[List[str]] = None) -> int:
 
     if args.dry_run:
         _report_dry_run(run_log, report)
+        _report_stages(stages, analysed)
         return 0
 
-    save_json_file(current_hashes, HASHES_FILE)
-    health.write_report(report)
-    if health.write_alert(report):
+    # hashes.json is staged after every artefact it points at, and the health
+    # report after hashes.json, so the commit renames them in that order.
+    # The store is made to hold exactly this run's sets — including those kept
+    # from before or put back after an error, which were never settled.
+    if store is not None:
+        store.replace_all(current_hashes)
+        store.export(transaction.stage(HASHES_FILE), transaction.stage(CHECKS_FILE))
+    else:
+        state.write_hashes(current_hashes, transaction.stage(HASHES_FILE), transaction.stage(CHECKS_FILE))
+    if cache is not None:
+        cache.save()
+    health.write_report(report, transaction.stage(health.HEALTH_FILE))
+    if health.write_alert(report, transaction.stage(health.ALERT_FILE)):
         log.warning("Health alerts raised: %d — see %s", len(report["alerts"]), health.ALERT_FILE)
-    elif os.path.exists(health.ALERT_FILE):
-        os.remove(health.ALERT_FILE)
-
-    pruned = history.prune(LOG_DIR, cfg.retention.log_days)
-    if pruned:
-        log.info("Pruned %d archived file(s) past %d-day retention", pruned, cfg.retention.log_days)
-
-    known = {entry["file_id"] for entry in current_hashes.values() if entry.get("file_id")}
-    history.write_index(history.build_index(LOG_DIR, known))
+    else:
+        transaction.remove(health.ALERT_FILE)
+    changed = transaction.commit()
+    if store is not None:
+        store.committed()
+        store.close()
+
+    # A run that moved nothing but check times has nothing new to index, and
+    # retention catches up on the next run that does change something.
+    if _quiet(changed) and not args.rebuild_history:
+        log.info("Nothing changed but check times — skipping pruning and the history indexes")
+    else:
+        pruned = history.prune(LOG_DIR, cfg.retention.log_days)
+        if pruned:
+            log.info("Pruned %d archived file(s) past %d-day retention", pruned, cfg.retention.log_days)
+        swept = blobs.sweep(blob_store, blobs.referenced(current_hashes, LOG_DIR))
+        if swept:
+            log.info("Removed %d blob(s) no record or archive refers to", swept)
+
+        known = {entry["file_id"] for entry in current_hashes.values() if entry.get("file_id")}
+        history.write_index(history.update_index(LOG_DIR, known, rebuild=args.rebuild_history))
+        versions.write_index(versions.build_index(LOG_DIR, current_hashes, blob_store))
 
     run_log.flush(cfg.retention.run_log_days)
+    analytics.append(run_log.records)
 
     totals = run_log.token_totals()
     log.info(
-        "Run %s complete — outcomes: %s; %d model call(s), %d prompt / %d output tokens; health: %s",
+        "Run %s complete — outcomes: %s; %d model call(s), %d prompt (%d cached) / %d output "
+        "tokens (~%d estimated); health: %s",
         run_id,
         run_log.counts_by_outcome(),
         totals["llm_calls"],
         totals["prompt_tokens"],
+        totals["cached_prompt_tokens"],
         totals["output_tokens"],
+        totals["estimated_tokens"],
         report["overall"],
     )
+    for tier, spent in sorted(totals["by_tier"].items()):
+        log.info(
+            "  %s tier: %d call(s), %d prompt / %d output tokens, %d ms",
+            tier,
+            spent["calls"],
+            spent["prompt_tokens"],
+            spent["output_tokens"],
+            spent["ms"],
+        )
+    _report_stages(stages, analysed)
     return 0
 
 
+def _quiet(changed: List[str]) -> bool:
+    """Whether a commit changed only checks.json, with both indexes already built."""
+    return (
+        all(path == CHECKS_FILE for path in changed)
+        and os.path.exists(history.HISTORY_FILE)
+        and os.path.exists(versions.VERSION_INDEX_FILE)
+    )
+
+
+def _report_stages(stages: pipeline.Pipeline, analysed: pipeline.StageStats) -> None:
+    for line in stages.report():
+        log.info("  stage %s", line)
+    if analysed.items:
+        log.info(
+            "  stage analyse: %d set(s) in %.1fs, up to %d at once",
+            analysed.items,
+            analysed.seconds,
+            analysed.workers,
+        )
+
+
 def _report_dry_run(run_log: runlog.RunLog, report: Dict[str, Any]) -> None:
     log.info("--- dry run summary ---")
     for outcome, count in sorted(run_log.counts_by_outcome().items()):
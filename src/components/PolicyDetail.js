@@ -65,7 +65,7 @@ function PolicyDetail({ policySets, health }) {
   const changedDocuments = analysis?.changed_documents || [];
   const verdict = analysis?.verdict;
   const review = policySet.last_review;
-  const declined = review?.verdict === 'no_material_change' || review?.verdict === 'rebaselined';
+  const declined = ['no_material_change', 'rebaselined', 'reverted'].includes(review?.verdict);
 
   return (
     <div className="policy-detail">
@@ -1,6 +1,30 @@
 import { useState, useEffect } from 'react';
 import { BASE_URL, fetchWithTimeout } from '../utils/constants';
 
+/**
+ * When each set and document was last checked and read lives in checks.json,
+ * so that hashes.json only changes when something did. This puts it back.
+ */
+export function mergeChecks(data, checks) {
+  if (!checks) return data;
+  const merged = {};
+  Object.keys(data).forEach((setName) => {
+    const entry = data[setName];
+    const moved = checks[setName];
+    if (!moved || !entry || typeof entry !== 'object') {
+      merged[setName] = entry;
+      return;
+    }
+    const { documents: movedDocuments, ...fields } = moved;
+    const documents = { ...(entry.documents || {}) };
+    Object.keys(movedDocuments || {}).forEach((url) => {
+      if (documents[url]) documents[url] = { ...documents[url], ...movedDocuments[url] };
+    });
+    merged[setName] = entry.documents ? { ...entry, ...fields, documents } : { ...entry, ...fields };
+  });
+  return merged;
+}
+
 /**
  * Loads hashes.json (the monitored sets and their state) alongside health.json
  * (whether each source is actually being read). A source that has not been
@@ -29,7 +53,19 @@ export function usePolicySets() {
         if (!response.ok) {
           throw new Error(`Failed to load monitored policies. Status: ${response.status}`);
         }
-        const data = await response.json();
+        let data = await response.json();
+
+        // Optional: before the split, hashes.json carried these fields itself.
+        try {
+          const checks = await fetchWithTimeout(
+            `${BASE_URL}/checks.json${cacheBuster}`,
+            { signal: controller.signal }
+          );
+          if (checks.ok) data = mergeChecks(data, await checks.json());
+        } catch (err) {
+          if (err.name === 'AbortError') throw err;
+          console.warn('checks.json unavailable:', err);
+        }
 
         const setList = Object.keys(data)
           .map((setName) => ({ setName, ...data[setName] }))
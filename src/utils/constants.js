@@ -38,6 +38,7 @@ export const VERDICT_LABELS = {
   no_material_change: 'No material change',
   uncertain: 'Uncertain',
   rebaselined: 'Baseline re-recorded',
+  reverted: 'Reverted to an earlier version',
 };
 
 export const HEALTH_LABELS = {
@@ -7,6 +7,7 @@ import {
   timestampOf,
 } from './constants';
 import { buildBriefing } from './briefing';
+import { mergeChecks } from '../hooks/usePolicySets';
 
 describe('formatDate', () => {
   test('renders a valid ISO timestamp', () => {
@@ -101,3 +102,19 @@ describe('buildBriefing', () => {
     expect(text).toContain('#/policy/Anthropic_Legal_Policies');
   });
 });
+
+describe('mergeChecks', () => {
+  test('puts check times back on sets and documents', () => {
+    const merged = mergeChecks(
+      { Set: { file_id: 'Set', documents: { 'https://a': { hash: 'h' } } } },
+      { Set: { last_checked: '2026-10-19T09:00:00+10:00', documents: { 'https://a': { fetch_ms: 12 } } } }
+    );
+    expect(merged.Set.last_checked).toBe('2026-10-19T09:00:00+10:00');
+    expect(merged.Set.documents['https://a']).toEqual({ hash: 'h', fetch_ms: 12 });
+  });
+
+  test('leaves data from before the split as it is', () => {
+    const data = { Set: { file_id: 'Set', last_checked: 'then' } };
+    expect(mergeChecks(data, null)).toBe(data);
+  });
+});
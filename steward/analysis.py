@@ -14,27 +14,76 @@ Three properties the previous implementation lacked:
   the provided documents" and then being forced to pick a priority anyway.
   `no_material_change` says that cleanly, and when it does the set is not
   badged and `last_amended` is not touched.
+
+A run that finds several changed sets analyses them concurrently through one
+shared client (`analyse_changes`), under a requests- and tokens-per-minute
+limiter, retrying 429 and 5xx responses with backoff. The schema retry and the
+transport retry are separate budgets: a rate-limited call has not been
+answered, so it does not spend the model's one chance to correct itself.
+
+A diff longer than `diff.max_diff_chars` can be analysed whole rather than
+truncated: each part is analysed on its own in a compact schema
+(`CHUNK_PROMPT_TEMPLATE`, `parse_chunk`), concurrently on the async path, and
+one reduce call merges the parts' findings into the standard answer.
+
+Both paths consult the analysis cache first (`steward/cache.py`): a diff the
+model has already answered is answered again from disk for zero tokens.
+
+A request may name its own model and a model to escalate to
+(`steward/routing.py`). An `uncertain` or failed answer from the first is
+asked again of the second, and the outcome carries the latency and tokens of
+each tier separately.
+
+With `analysis.bundle`, several small diffs bound for the same model share one
+call (`BUNDLE_PROMPT_TEMPLATE`) and are answered under per-set keys. Each
+entry is validated on its own; a set whose entry fails is sent again alone,
+so one malformed entry never costs the others their answers.
+
+The fixed instructions — role, answer schema, verdict and priority
+definitions — are `SYSTEM_INSTRUCTION`, sent as the system instruction or as
+cached context (`steward/prefix.py`) rather than inside every prompt. The
+schema retry is a follow-up turn: the model sees its rejected answer and the
+error, not the whole instruction block a second time.
+
+With streaming on, an answer is checked as it arrives (`early_schema_error`)
+and abandoned the moment it cannot be valid, so a malformed reply costs the
+characters it took to go wrong rather than the whole generation.
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import logging
 import os
 import re
-from dataclasses import dataclass, field
-from typing import Optional, Sequence
+import time
+from dataclasses import dataclass, field, replace
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Sequence
+
+from .cache import AnalysisCache
+from .prefix import PrefixCache
+from .ratelimit import RateLimiter
+from .routing import MAIN
 
 log = logging.getLogger(__name__)
 
 PRIORITIES = ("critical", "high", "medium", "low")
 VERDICTS = ("material_change", "no_material_change", "uncertain")
 
+# Bumped whenever PROMPT_TEMPLATE (or the map-reduce templates) changes in a way that could change the
+# answer. Part of the cache key, so cached analyses from an older prompt are
+# never served.
+PROMPT_VERSION = 2
+
 MATERIAL_CHANGE = "material_change"
 NO_MATERIAL_CHANGE = "no_material_change"
 UNCERTAIN = "uncertain"
 
 _FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.MULTILINE)
+_OPENING_FENCE = re.compile(r"\s*```(?:json)?\s*")
 
 
 class SchemaError(ValueError):
@@ -49,24 +98,53 @@ class AnalysisOutcome:
     prompt_tokens: int = 0
     output_tokens: int = 0
     raw: str = ""
+    retries: int = 0
+    latency_ms: int = 0
+    cached: bool = False
+    # Set when steward/triage.py answered without a model call.
+    local_rule: str = ""
+    # Number of sets that shared the call that answered this one; 0 if none.
+    bundled: int = 0
+    # Prompt tokens the provider served from cached context, and whether this
+    # run's instructions were registered as cached context for the call.
+    cached_tokens: int = 0
+    prefix_cached: bool = False
+    # Streamed answers abandoned part-way because they could not be valid.
+    abandoned: int = 0
+    model: str = ""
+    tier: str = ""
+    # Per tier: calls, prompt_tokens, output_tokens, ms. Cache hits add none.
+    tiers: Dict[str, Dict[str, int]] = field(default_factory=dict)
 
     @property
     def ok(self) -> bool:
         return self.result is not None
 
 
-PROMPT_TEMPLATE = """You are an AI policy analyst advising Australian public servants on \
-changes to Terms of Service, privacy policies and government AI policy.
+@dataclass
+class AnalysisRequest:
+    """One changed set waiting on its model call."""
 
-A monitored policy set named "{set_name}" has changed. Below is the unified diff \
-between the stored version and the current one. Lines beginning with `-` were \
-removed; lines beginning with `+` were added. Unmarked lines are surrounding \
-context and did not change.
+    set_name: str
+    diff_text: str
+    changed_documents: Sequence[str] = ()
+    tags: Sequence[str] = ()
+    # Empty model means the `model` passed to `analyse_changes`.
+    model: str = ""
+    tier: str = MAIN
+    escalate_to: str = ""
+    # Parts of an oversized diff, for map-reduce; `diff_text` is then the whole.
+    chunks: Sequence[str] = ()
 
-{documents_note}{fingerprint_note}
-Respond with a single JSON object and nothing else:
 
-{{
+_ANALYST = """You are an AI policy analyst advising Australian public servants on \
+changes to Terms of Service, privacy policies and government AI policy.
+
+"""
+
+# The answer every full analysis returns, whether from one call, a reduce,
+# or one entry of a bundle.
+_ANSWER_SCHEMA = """{{
   "verdict": "One of: material_change, no_material_change, uncertain",
   "summary": "1-2 sentences in plain language describing what changed",
   "analysis": "Markdown covering: 1) what specifically changed, 2) who is affected, \
@@ -74,7 +152,9 @@ Respond with a single JSON object and nothing else:
   "priority": "One of: critical, high, medium, low"
 }}
 
-Verdict definitions:
+"""
+
+_DEFINITIONS = """Verdict definitions:
 - **material_change**: the wording that changed alters meaning, obligations or rights.
 - **no_material_change**: the diff is formatting, reordering, typography or \
 boilerplate with no change in meaning. Say so plainly — do not manufacture \
@@ -90,25 +170,99 @@ Priority definitions (they describe the change, not the document):
 
 Do not include a timestamp. Do not include any key other than the four above.
 
+"""
+
+# The fixed part of every prompt, sent as the system instruction and
+# registered once per model as cached context (steward/prefix.py). The
+# templates below carry only what changes from call to call.
+SYSTEM_INSTRUCTION = (
+    _ANALYST
+    + "Unless a request asks for a different shape, respond with a single JSON "
+    "object and nothing else:\n\n"
+    + _ANSWER_SCHEMA
+    + _DEFINITIONS
+).format().rstrip() + "\n"
+
+PROMPT_TEMPLATE = """A monitored policy set named "{set_name}" has changed. Below is the unified diff \
+between the stored version and the current one. Lines beginning with `-` were \
+removed; lines beginning with `+` were added. Unmarked lines are surrounding \
+context and did not change.
+
+{documents_note}{fingerprint_note}Answer with the JSON object described in your instructions.
+
 UNIFIED DIFF:
 ---
 {diff}
 ---"""
 
-_RETRY_SUFFIX = """
+# Map step: one part of an oversized diff, answered in a compact schema.
+CHUNK_PROMPT_TEMPLATE = """A monitored policy set named "{set_name}" has a change too large to review \
+in one pass. Below is part {index} of {total} of the unified diff between the \
+stored version and the current one. Lines beginning with `-` were removed; lines \
+beginning with `+` were added. Unmarked lines are context.
+
+{fingerprint_note}Report on this part only. Instead of the usual answer, respond with a \
+single JSON object of this shape and nothing else:
+
+{{
+  "material": "true or false — whether anything in this part alters meaning, obligations or rights",
+  "priority": "One of: critical, high, medium, low",
+  "findings": ["One short sentence per substantive change, naming the clause or heading the diff shows"]
+}}
+
+If this part is only formatting, reordering, typography or boilerplate, set \
+"material" to false, "priority" to "low" and "findings" to [].
+
+UNIFIED DIFF (part {index} of {total}):
+---
+{diff}
+---"""
+
+# Reduce step: the parts' findings merged into the standard answer.
+REDUCE_PROMPT_TEMPLATE = """A monitored policy set named "{set_name}" has changed. The diff was too large \
+to review in one pass, so it was reviewed in {total} parts; the findings from each \
+part are below, in document order. Assess the change as a whole.
+
+{documents_note}{fingerprint_note}Answer with the JSON object described in your instructions.
+
+FINDINGS BY PART:
+---
+{findings}
+---"""
+
+# Several small changes in one call, answered per set under keys set_1, set_2...
+BUNDLE_PROMPT_TEMPLATE = """{count} monitored policy sets have changed. Each is listed below under its \
+own key, with the unified diff between its stored version and the current one. \
+Lines beginning with `-` were removed; lines beginning with `+` were added. \
+Unmarked lines are surrounding context and did not change. Assess each set on \
+its own; do not let one set's change colour another's.
+
+Respond with a single JSON object and nothing else, with exactly one entry for \
+each of the keys {keys}, each entry the JSON object described in your instructions.
+
+{sets}"""
+
+_BUNDLE_SET = """=== {key}: "{set_name}" ===
+{documents_note}{fingerprint_note}UNIFIED DIFF:
+---
+{diff}
+---
+
+"""
 
-Your previous response was rejected: {error}
+# Sent as a follow-up turn after the rejected answer, not appended to the prompt.
+_RETRY_SUFFIX = """Your previous response was rejected: {error}
 
 Return only the JSON object described above, with all four keys present and \
 "verdict" and "priority" drawn from the permitted values."""
 
+_CHUNK_RETRY_SUFFIX = """Your previous response was rejected: {error}
 
-def build_prompt(
-    set_name: str,
-    diff_text: str,
-    changed_documents: Sequence[str] = (),
-    tags: Sequence[str] = (),
-) -> str:
+Return only the JSON object described above: "material" true or false, \
+"priority" drawn from the permitted values, and "findings" a list of strings."""
+
+
+def _documents_note(changed_documents: Sequence[str]) -> str:
     documents_note = ""
     if changed_documents:
         listed = ", ".join(changed_documents)
@@ -116,33 +270,161 @@ def build_prompt(
             f"Documents in this set that changed: {listed}. "
             "Other documents in the set were checked and are unchanged.\n\n"
         )
+    return documents_note
 
+
+def _fingerprint_note(tags: Sequence[str]) -> str:
     fingerprint_note = ""
     if tags:
         fingerprint_note = (
             f"A pattern scan of the changed lines flagged: {', '.join(tags)}. "
             "Treat this as a hint about where to look, not as a conclusion.\n\n"
         )
+    return fingerprint_note
+
 
+def build_prompt(
+    set_name: str,
+    diff_text: str,
+    changed_documents: Sequence[str] = (),
+    tags: Sequence[str] = (),
+) -> str:
     return PROMPT_TEMPLATE.format(
         set_name=set_name,
-        documents_note=documents_note,
-        fingerprint_note=fingerprint_note,
+        documents_note=_documents_note(changed_documents),
+        fingerprint_note=_fingerprint_note(tags),
         diff=diff_text,
     )
 
 
-def parse_and_validate(raw_text: str) -> dict:
-    """Parse the model's reply and enforce the schema, or raise SchemaError."""
+def bundle_key(index: int) -> str:
+    return f"set_{index}"
+
+
+def build_bundle_prompt(requests: Sequence[AnalysisRequest]) -> str:
+    sets = "".join(
+        _BUNDLE_SET.format(
+            key=bundle_key(index),
+            set_name=request.set_name,
+            documents_note=_documents_note(request.changed_documents),
+            fingerprint_note=_fingerprint_note(request.tags),
+            diff=request.diff_text,
+        )
+        for index, request in enumerate(requests, 1)
+    )
+    return BUNDLE_PROMPT_TEMPLATE.format(
+        count=len(requests),
+        keys=", ".join(bundle_key(i) for i in range(1, len(requests) + 1)),
+        sets=sets.rstrip() + "\n",
+    )
+
+
+def build_chunk_prompt(
+    set_name: str, chunk: str, index: int, total: int, tags: Sequence[str] = ()
+) -> str:
+    return CHUNK_PROMPT_TEMPLATE.format(
+        set_name=set_name,
+        index=index,
+        total=total,
+        fingerprint_note=_fingerprint_note(tags),
+        diff=chunk,
+    )
+
+
+def build_reduce_prompt(
+    set_name: str,
+    parts: Sequence[dict],
+    changed_documents: Sequence[str] = (),
+    tags: Sequence[str] = (),
+) -> str:
+    blocks = []
+    for index, part in enumerate(parts, 1):
+        if not part["material"] and not part["findings"]:
+            blocks.append(f"Part {index}: no material change.")
+            continue
+        rated = "material" if part["material"] else "not material"
+        listed = "\n".join(f"- {finding}" for finding in part["findings"]) or "- (no detail given)"
+        blocks.append(f"Part {index} ({rated}, {part['priority']}):\n{listed}")
+    return REDUCE_PROMPT_TEMPLATE.format(
+        set_name=set_name,
+        total=len(parts),
+        documents_note=_documents_note(changed_documents),
+        fingerprint_note=_fingerprint_note(tags),
+        findings="\n\n".join(blocks),
+    )
+
+
+def _parse_json(raw_text: str):
     if not raw_text or not raw_text.strip():
         raise SchemaError("response was empty")
 
     cleaned = _FENCE.sub("", raw_text).strip()
     try:
-        parsed = json.loads(cleaned)
+        return json.loads(cleaned)
     except json.JSONDecodeError as exc:
         raise SchemaError(f"response was not valid JSON ({exc})") from exc
 
+
+def parse_and_validate(raw_text: str) -> dict:
+    """Parse the model's reply and enforce the schema, or raise SchemaError."""
+    return validate_result(_parse_json(raw_text))
+
+
+def parse_bundle(raw_text: str, count: int) -> List[tuple[Optional[dict], str]]:
+    """Each set's (result, error) from a bundled reply, validated entry by entry."""
+    try:
+        parsed = _parse_json(raw_text)
+        if not isinstance(parsed, dict):
+            raise SchemaError(f"expected a JSON object, got {type(parsed).__name__}")
+    except SchemaError as exc:
+        return [(None, str(exc))] * count
+
+    entries: List[tuple[Optional[dict], str]] = []
+    for index in range(1, count + 1):
+        key = bundle_key(index)
+        if key not in parsed:
+            entries.append((None, f"no entry for {key}"))
+            continue
+        try:
+            entries.append((validate_result(parsed[key]), ""))
+        except SchemaError as exc:
+            entries.append((None, str(exc)))
+    return entries
+
+
+def parse_chunk(raw_text: str) -> dict:
+    """Parse one map-step reply: material, priority, findings."""
+    parsed = _parse_json(raw_text)
+    if not isinstance(parsed, dict):
+        raise SchemaError(f"expected a JSON object, got {type(parsed).__name__}")
+
+    missing = [key for key in ("material", "priority", "findings") if key not in parsed]
+    if missing:
+        raise SchemaError(f"missing required key(s): {', '.join(missing)}")
+
+    material = parsed["material"]
+    if isinstance(material, str) and material.strip().lower() in ("true", "false"):
+        material = material.strip().lower() == "true"
+    if not isinstance(material, bool):
+        raise SchemaError(f"material must be true or false, got {material!r}")
+
+    priority = parsed["priority"]
+    if not isinstance(priority, str) or priority.strip().lower() not in PRIORITIES:
+        raise SchemaError(f"priority must be one of {', '.join(PRIORITIES)}, got {priority!r}")
+
+    findings = parsed["findings"]
+    if not isinstance(findings, list) or not all(isinstance(f, str) for f in findings):
+        raise SchemaError("findings must be a list of strings")
+
+    return {
+        "material": material,
+        "priority": priority.strip().lower(),
+        "findings": [f.strip() for f in findings if f.strip()],
+    }
+
+
+def validate_result(parsed) -> dict:
+    """Enforce the schema on an already-parsed result, or raise SchemaError."""
     if not isinstance(parsed, dict):
         raise SchemaError(f"expected a JSON object, got {type(parsed).__name__}")
 
@@ -176,6 +458,104 @@ def parse_and_validate(raw_text: str) -> dict:
     }
 
 
+_PERMITTED = {"verdict": VERDICTS, "priority": PRIORITIES}
+
+
+def _string_end(text: str, start: int) -> int:
+    """Index of the quote closing the JSON string opened at `start`, or -1."""
+    i = start + 1
+    while i < len(text):
+        if text[i] == "\\":
+            i += 2
+            continue
+        if text[i] == '"':
+            return i
+        i += 1
+    return -1
+
+
+def early_schema_error(partial: str) -> str:
+    """Why a reply still streaming cannot be valid, or "" while it still could be.
+
+    Only what is already certain counts: a reply that is not an object, a
+    top-level key outside the four the prompt permits, or a complete
+    `verdict`/`priority` string outside its permitted values. Everything else
+    waits for `parse_and_validate` on the whole reply.
+    """
+    fence = _OPENING_FENCE.match(partial)
+    text = partial[fence.end():] if fence else partial.lstrip()
+    if not text:
+        return ""
+    if text[0] != "{":
+        return "response was not a JSON object"
+
+    depth = 0
+    expect_key = False
+    key = ""
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == '"':
+            end = _string_end(text, i)
+            if end < 0:
+                return ""
+            if depth == 1:
+                try:
+                    value = json.loads(text[i:end + 1])
+                except json.JSONDecodeError:
+                    return ""
+                if expect_key:
+                    if value not in _PERMITTED and value not in ("summary", "analysis"):
+                        return f"unexpected key {value!r}"
+                    key, expect_key = value, False
+                elif key in _PERMITTED and value.strip().lower() not in _PERMITTED[key]:
+                    return f"{key} must be one of {', '.join(_PERMITTED[key])}, got {value!r}"
+            i = end + 1
+            continue
+        if char in "{[":
+            depth += 1
+            if depth == 1:
+                expect_key = True
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return ""
+        elif char == "," and depth == 1:
+            expect_key, key = True, ""
+        i += 1
+    return ""
+
+
+@dataclass
+class _Streamed:
+    """A streamed reply read to its end, or to the point it was abandoned."""
+
+    text: str
+    usage_metadata: object
+    abandoned: str = ""
+
+
+def _estimated_usage(contents, text: str):
+    # An abandoned stream may end before the provider reports usage.
+    return SimpleNamespace(
+        prompt_token_count=estimate_tokens(_contents_text(contents))
+        + estimate_tokens(SYSTEM_INSTRUCTION),
+        candidates_token_count=estimate_tokens(text),
+    )
+
+
+def _read_stream(chunks, contents, early_check) -> _Streamed:
+    text, usage = "", None
+    for chunk in chunks:
+        text += getattr(chunk, "text", "") or ""
+        usage = getattr(chunk, "usage_metadata", None) or usage
+        error = early_check(text)
+        if error:
+            getattr(chunks, "close", lambda: None)()
+            return _Streamed(text, usage or _estimated_usage(contents, text), error)
+    return _Streamed(text, usage)
+
+
 def _usage(response) -> tuple[int, int]:
     usage = getattr(response, "usage_metadata", None)
     if usage is None:
@@ -186,6 +566,272 @@ def _usage(response) -> tuple[int, int]:
     )
 
 
+def cache_key(
+    model: str,
+    diff_text: str,
+    changed_documents: Sequence[str] = (),
+    tags: Sequence[str] = (),
+) -> str:
+    """Hash of everything that shapes the model's answer."""
+    material = json.dumps(
+        {
+            "model": model,
+            "prompt_version": PROMPT_VERSION,
+            "diff": diff_text,
+            "changed_documents": list(changed_documents),
+            "tags": sorted(tags),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _from_cache(
+    cache: Optional[AnalysisCache],
+    model: str,
+    set_name: str,
+    diff_text: str,
+    changed_documents: Sequence[str],
+    tags: Sequence[str],
+) -> tuple[Optional[str], Optional[AnalysisOutcome]]:
+    """(key, outcome) — the outcome is set only on a hit."""
+    if cache is None:
+        return None, None
+    key = cache_key(model, diff_text, changed_documents, tags)
+    result = cache.get(key)
+    if result is None:
+        return key, None
+    log.info("  Analysis cache hit for '%s' — no model call", set_name)
+    return key, AnalysisOutcome(result=result, cached=True)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token for English prose."""
+    return (len(text) + 3) // 4
+
+
+# Expected size of one answer. The four-key object is a few hundred tokens;
+# this leaves room for a long `analysis` field.
+OUTPUT_TOKEN_ALLOWANCE = 1024
+# One part's findings in a map-reduce analysis.
+CHUNK_OUTPUT_ALLOWANCE = 256
+
+
+def estimate_request_tokens(
+    request: AnalysisRequest, *, model: str = "", cache: Optional[AnalysisCache] = None
+) -> int:
+    """Pre-flight cost of one request: its built prompt plus an answer.
+
+    A request the cache will answer costs nothing.
+    """
+    if cache is not None and cache.has(
+        cache_key(request.model or model, request.diff_text, request.changed_documents, request.tags)
+    ):
+        return 0
+    # Every call carries the instructions, cached or not.
+    instructions = estimate_tokens(SYSTEM_INSTRUCTION)
+    if request.chunks:
+        total = len(request.chunks)
+        parts = sum(
+            estimate_tokens(build_chunk_prompt(request.set_name, chunk, i, total, request.tags))
+            + instructions
+            + CHUNK_OUTPUT_ALLOWANCE
+            for i, chunk in enumerate(request.chunks, 1)
+        )
+        reduce = estimate_tokens(
+            build_reduce_prompt(request.set_name, [], request.changed_documents, request.tags)
+        )
+        return (
+            parts + reduce + instructions + total * CHUNK_OUTPUT_ALLOWANCE + OUTPUT_TOKEN_ALLOWANCE
+        )
+    prompt = build_prompt(
+        request.set_name, request.diff_text, request.changed_documents, request.tags
+    )
+    return estimate_tokens(prompt) + instructions + OUTPUT_TOKEN_ALLOWANCE
+
+
+def make_client(base_url: str = "", api_key: str = ""):
+    """One client for the whole run, or None without an API key.
+
+    `base_url` points the client at a stand-in server instead of the real API;
+    `api_key` overrides GEMINI_API_KEY, which a stand-in does not check.
+    """
+    from google import genai
+    from google.genai import types
+
+    api_key = api_key or os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        return None
+    options = types.HttpOptions(base_url=base_url) if base_url else None
+    return genai.Client(api_key=api_key, http_options=options)
+
+
+def _generate_config(cached_content: str = ""):
+    """JSON output, with the instructions by cached context name or inline."""
+    from google.genai import types
+
+    if cached_content:
+        return types.GenerateContentConfig(
+            cached_content=cached_content, response_mime_type="application/json"
+        )
+    return types.GenerateContentConfig(
+        system_instruction=SYSTEM_INSTRUCTION, response_mime_type="application/json"
+    )
+
+
+def _contents(prompt: str, rejected: Optional[str], retry_suffix: str, error: str):
+    """The first attempt's prompt, or the schema retry as a follow-up turn.
+
+    After a rejected answer the model sees its own reply and only the error;
+    after an API error it never answered, so the prompt is sent again as is.
+    """
+    if rejected is None:
+        return prompt
+    return [
+        {"role": "user", "parts": [{"text": prompt}]},
+        {"role": "model", "parts": [{"text": rejected}]},
+        {"role": "user", "parts": [{"text": retry_suffix.format(error=error)}]},
+    ]
+
+
+def _contents_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    return "".join(part["text"] for turn in contents for part in turn["parts"])
+
+
+def _cached_tokens(response) -> int:
+    usage = getattr(response, "usage_metadata", None)
+    return int(getattr(usage, "cached_content_token_count", 0) or 0)
+
+
+def _status_of(exc: BaseException) -> Optional[int]:
+    for attr in ("code", "status_code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Rate limiting and server errors are worth another attempt; 4xx is not."""
+    status = _status_of(exc)
+    return status is not None and (status == 429 or 500 <= status < 600)
+
+
+def _accept(outcome: AnalysisOutcome, response, attempt: int, parse) -> tuple[Optional[dict], str]:
+    """Fold one response's usage into the outcome. Returns (parsed, schema error)."""
+    prompt_tokens, output_tokens = _usage(response)
+    outcome.prompt_tokens += prompt_tokens
+    outcome.output_tokens += output_tokens
+    outcome.cached_tokens += _cached_tokens(response)
+    raw = getattr(response, "text", "") or ""
+    outcome.raw = raw
+
+    abandoned = getattr(response, "abandoned", "")
+    if abandoned:
+        outcome.abandoned += 1
+        log.warning(
+            "  Model response abandoned after %d characters on attempt %d: %s",
+            len(raw),
+            attempt,
+            abandoned,
+        )
+        return None, abandoned
+    try:
+        return parse(raw), ""
+    except SchemaError as exc:
+        log.warning("  Model response rejected on attempt %d: %s", attempt, exc)
+        return None, str(exc)
+
+
+def _ask(
+    client,
+    model: str,
+    prompt: str,
+    outcome: AnalysisOutcome,
+    *,
+    parse=parse_and_validate,
+    retry_suffix: str = _RETRY_SUFFIX,
+    cached_content: str = "",
+    early_check=None,
+) -> Optional[dict]:
+    """One prompt: call, validate, retry once with the error. None on failure.
+
+    With `early_check`, the reply is streamed and abandoned as soon as the
+    check finds it cannot be valid, and the retry starts at once.
+    """
+    last_error = ""
+    rejected: Optional[str] = None
+    for attempt in (1, 2):
+        outcome.attempts += 1
+        contents = _contents(prompt, rejected, retry_suffix, last_error)
+        try:
+            if early_check is None:
+                response = client.models.generate_content(
+                    model=model, contents=contents, config=_generate_config(cached_content)
+                )
+            else:
+                response = _read_stream(
+                    client.models.generate_content_stream(
+                        model=model, contents=contents, config=_generate_config(cached_content)
+                    ),
+                    contents,
+                    early_check,
+                )
+        except Exception as exc:  # noqa: BLE001 — an API failure must not kill the run
+            last_error = f"{type(exc).__name__}: {exc}"
+            rejected = None
+            log.error("  Gemini API error on attempt %d: %s", attempt, last_error)
+            continue
+
+        parsed, last_error = _accept(outcome, response, attempt, parse)
+        if parsed is not None:
+            outcome.error = ""
+            return parsed
+        rejected = outcome.raw
+    outcome.error = last_error
+    return None
+
+
+def _finish(outcome: AnalysisOutcome, model: str, tier: str, started: float) -> AnalysisOutcome:
+    outcome.latency_ms = int((time.monotonic() - started) * 1000)
+    outcome.model = model
+    outcome.tier = tier
+    outcome.tiers[tier] = {
+        "calls": outcome.attempts + outcome.retries,
+        "prompt_tokens": outcome.prompt_tokens,
+        "output_tokens": outcome.output_tokens,
+        "ms": outcome.latency_ms,
+    }
+    return outcome
+
+
+def needs_escalation(outcome: AnalysisOutcome) -> bool:
+    """An answer the larger model should be asked for instead."""
+    return not outcome.ok or outcome.result.get("verdict") == UNCERTAIN
+
+
+def _followed_by(first: AnalysisOutcome, second: AnalysisOutcome) -> AnalysisOutcome:
+    """The second answer — an escalation or a fallback — carrying what the first cost."""
+    second.attempts += first.attempts
+    second.retries += first.retries
+    second.prompt_tokens += first.prompt_tokens
+    second.output_tokens += first.output_tokens
+    second.cached_tokens += first.cached_tokens
+    second.latency_ms += first.latency_ms
+    tiers = {tier: dict(spent) for tier, spent in first.tiers.items()}
+    for tier, spent in second.tiers.items():
+        total = tiers.setdefault(tier, dict.fromkeys(spent, 0))
+        for key, value in spent.items():
+            total[key] = total.get(key, 0) + value
+    second.tiers = tiers
+    second.cached = first.cached and second.cached
+    second.bundled = second.bundled or first.bundled
+    return second
+
+
 def analyse_change(
     set_name: str,
     diff_text: str,
@@ -194,51 +840,556 @@ def analyse_change(
     changed_documents: Sequence[str] = (),
     tags: Sequence[str] = (),
     client=None,
+    cache: Optional[AnalysisCache] = None,
+    tier: str = MAIN,
+    escalate_to: str = "",
+    chunks: Sequence[str] = (),
+    prefix: Optional[PrefixCache] = None,
+    stream: bool = False,
 ) -> AnalysisOutcome:
-    """Call the model, validate, retry once, then give up cleanly."""
-    from google import genai
-    from google.genai import types
+    """Call the model, validate, retry once, then give up cleanly.
+
+    With `escalate_to`, an `uncertain` or failed answer is asked again of
+    that model. With `chunks`, the change is analysed map-reduce: one call
+    per part, then one call to merge them. With `prefix`, the instructions
+    are sent as cached context where the provider allows it. With `stream`,
+    an answer that cannot be valid is abandoned mid-stream.
+    """
+    outcome = _analyse_once(
+        set_name, diff_text, model=model, changed_documents=changed_documents,
+        tags=tags, client=client, cache=cache, tier=tier, chunks=chunks, prefix=prefix,
+        stream=stream,
+    )
+    if escalate_to and needs_escalation(outcome):
+        log.info("  Escalating '%s' from %s to %s", set_name, model, escalate_to)
+        outcome = _followed_by(
+            outcome,
+            _analyse_once(
+                set_name, diff_text, model=escalate_to, changed_documents=changed_documents,
+                tags=tags, client=client, cache=cache, tier=MAIN, chunks=chunks, prefix=prefix,
+                stream=stream,
+            ),
+        )
+    return outcome
+
+
+def _analyse_once(
+    set_name: str,
+    diff_text: str,
+    *,
+    model: str,
+    changed_documents: Sequence[str],
+    tags: Sequence[str],
+    client,
+    cache: Optional[AnalysisCache],
+    tier: str,
+    chunks: Sequence[str],
+    prefix: Optional[PrefixCache],
+    stream: bool,
+) -> AnalysisOutcome:
+    key, hit = _from_cache(cache, model, set_name, diff_text, changed_documents, tags)
+    if hit is not None:
+        hit.model, hit.tier = model, tier
+        return hit
 
-    api_key = os.environ.get("GEMINI_API_KEY")
     if client is None:
-        if not api_key:
+        client = make_client()
+        if client is None:
             return AnalysisOutcome(error="GEMINI_API_KEY is not set")
-        client = genai.Client(api_key=api_key)
 
-    prompt = build_prompt(set_name, diff_text, changed_documents, tags)
-    outcome = AnalysisOutcome()
-    last_error = ""
+    cached_content = prefix.lookup(client, model) if prefix is not None else ""
+    early_check = early_schema_error if stream else None
+    outcome = AnalysisOutcome(prefix_cached=bool(cached_content))
+    started = time.monotonic()
+    if chunks:
+        parts = []
+        for index, chunk in enumerate(chunks, 1):
+            part = _ask(
+                client, model, build_chunk_prompt(set_name, chunk, index, len(chunks), tags),
+                outcome, parse=parse_chunk, retry_suffix=_CHUNK_RETRY_SUFFIX,
+                cached_content=cached_content,
+            )
+            if part is None:
+                outcome.error = f"part {index} of {len(chunks)}: {outcome.error}"
+                break
+            parts.append(part)
+        else:
+            outcome.result = _ask(
+                client, model, build_reduce_prompt(set_name, parts, changed_documents, tags), outcome,
+                cached_content=cached_content, early_check=early_check,
+            )
+    else:
+        outcome.result = _ask(
+            client, model, build_prompt(set_name, diff_text, changed_documents, tags), outcome,
+            cached_content=cached_content, early_check=early_check,
+        )
+    return _settle(outcome, set_name, model, tier, started, cache, key)
+
+
+def _settle(
+    outcome: AnalysisOutcome,
+    set_name: str,
+    model: str,
+    tier: str,
+    started: float,
+    cache: Optional[AnalysisCache],
+    key: Optional[str],
+) -> AnalysisOutcome:
+    _finish(outcome, model, tier, started)
+    if outcome.ok:
+        if cache is not None:
+            cache.put(key, outcome.result, model=model)
+    else:
+        log.error("  Giving up on '%s' after %d attempt(s): %s", set_name, outcome.attempts, outcome.error)
+    return outcome
+
+
+# --- Concurrent path -------------------------------------------------------
+
+# Ceiling on a single backoff, however many 429s in a row.
+_MAX_BACKOFF_SECONDS = 60.0
 
-    for attempt in (1, 2):
-        outcome.attempts = attempt
-        text = prompt if attempt == 1 else prompt + _RETRY_SUFFIX.format(error=last_error)
 
+async def _generate_with_retry(
+    client,
+    model: str,
+    contents,
+    outcome: AnalysisOutcome,
+    *,
+    limiter: Optional[RateLimiter],
+    max_retries: int,
+    backoff_seconds: float,
+    sleep=asyncio.sleep,
+    cached_content: str = "",
+    early_check=None,
+):
+    """One answered call, retrying 429 and 5xx. Other errors propagate.
+
+    With `early_check` the reply is streamed (see `_ask`).
+    """
+    estimate = estimate_tokens(_contents_text(contents)) + estimate_tokens(SYSTEM_INSTRUCTION)
+    retry = 0
+    while True:
+        if limiter is not None:
+            await limiter.acquire(estimate)
+        try:
+            if early_check is None:
+                response = await client.aio.models.generate_content(
+                    model=model, contents=contents, config=_generate_config(cached_content)
+                )
+            else:
+                # google-genai 1.29's async stream reader needs aiohttp, which
+                # is not a dependency; the sync stream runs in a worker thread.
+                response = await asyncio.to_thread(
+                    lambda: _read_stream(
+                        client.models.generate_content_stream(
+                            model=model, contents=contents, config=_generate_config(cached_content)
+                        ),
+                        contents,
+                        early_check,
+                    )
+                )
+        except Exception as exc:  # noqa: BLE001 — classified below
+            if not is_retryable(exc) or retry >= max_retries:
+                raise
+            retry += 1
+            outcome.retries += 1
+            delay = min(_MAX_BACKOFF_SECONDS, backoff_seconds * 2 ** (retry - 1))
+            log.warning(
+                "  Gemini returned %s, retrying in %.1fs (%d/%d)",
+                _status_of(exc),
+                delay,
+                retry,
+                max_retries,
+            )
+            await sleep(delay)
+            continue
+
+        if limiter is not None:
+            prompt_tokens, output_tokens = _usage(response)
+            limiter.correct(estimate, prompt_tokens + output_tokens)
+        return response
+
+
+async def _ask_async(
+    client,
+    model: str,
+    prompt: str,
+    outcome: AnalysisOutcome,
+    *,
+    limiter: Optional[RateLimiter],
+    max_retries: int,
+    backoff_seconds: float,
+    sleep,
+    parse=parse_and_validate,
+    retry_suffix: str = _RETRY_SUFFIX,
+    cached_content: str = "",
+    early_check=None,
+) -> Optional[dict]:
+    """`_ask` through the async client, with transport retries under the limiter."""
+    last_error = ""
+    rejected: Optional[str] = None
+    for attempt in (1, 2):
+        outcome.attempts += 1
         try:
-            response = client.models.generate_content(
-                model=model,
-                contents=text,
-                config=types.GenerateContentConfig(response_mime_type="application/json"),
+            response = await _generate_with_retry(
+                client,
+                model,
+                _contents(prompt, rejected, retry_suffix, last_error),
+                outcome,
+                limiter=limiter,
+                max_retries=max_retries,
+                backoff_seconds=backoff_seconds,
+                sleep=sleep,
+                cached_content=cached_content,
+                early_check=early_check,
             )
         except Exception as exc:  # noqa: BLE001 — an API failure must not kill the run
             last_error = f"{type(exc).__name__}: {exc}"
+            rejected = None
             log.error("  Gemini API error on attempt %d: %s", attempt, last_error)
-            outcome.error = last_error
             continue
 
-        prompt_tokens, output_tokens = _usage(response)
-        outcome.prompt_tokens += prompt_tokens
-        outcome.output_tokens += output_tokens
-        raw = getattr(response, "text", "") or ""
-        outcome.raw = raw
-
-        try:
-            outcome.result = parse_and_validate(raw)
+        parsed, last_error = _accept(outcome, response, attempt, parse)
+        if parsed is not None:
             outcome.error = ""
-            return outcome
-        except SchemaError as exc:
-            last_error = str(exc)
-            outcome.error = last_error
-            log.warning("  Model response rejected on attempt %d: %s", attempt, last_error)
+            return parsed
+        rejected = outcome.raw
+    outcome.error = last_error
+    return None
+
+
+async def analyse_change_async(
+    request: AnalysisRequest,
+    *,
+    model: str,
+    client,
+    limiter: Optional[RateLimiter] = None,
+    max_retries: int = 3,
+    backoff_seconds: float = 2.0,
+    sleep=asyncio.sleep,
+    cache: Optional[AnalysisCache] = None,
+    prefix: Optional[PrefixCache] = None,
+    stream: bool = False,
+) -> AnalysisOutcome:
+    """`analyse_change` for the shared async client, with transport retries.
 
-    log.error("  Giving up on '%s' after 2 attempts: %s", set_name, outcome.error)
+    `model` is used when the request does not name its own.
+    """
+    options = dict(
+        client=client,
+        limiter=limiter,
+        max_retries=max_retries,
+        backoff_seconds=backoff_seconds,
+        sleep=sleep,
+        cache=cache,
+        prefix=prefix,
+        stream=stream,
+    )
+    first = request.model or model
+    outcome = await _analyse_once_async(request, model=first, tier=request.tier, **options)
+    if request.escalate_to and needs_escalation(outcome):
+        log.info("  Escalating '%s' from %s to %s", request.set_name, first, request.escalate_to)
+        outcome = _followed_by(
+            outcome,
+            await _analyse_once_async(request, model=request.escalate_to, tier=MAIN, **options),
+        )
     return outcome
+
+
+async def _analyse_once_async(
+    request: AnalysisRequest,
+    *,
+    model: str,
+    tier: str,
+    client,
+    limiter: Optional[RateLimiter],
+    max_retries: int,
+    backoff_seconds: float,
+    sleep,
+    cache: Optional[AnalysisCache],
+    prefix: Optional[PrefixCache],
+    stream: bool,
+) -> AnalysisOutcome:
+    key, hit = _from_cache(
+        cache, model, request.set_name, request.diff_text, request.changed_documents, request.tags
+    )
+    if hit is not None:
+        hit.model, hit.tier = model, tier
+        return hit
+
+    cached_content = await prefix.lookup_async(client, model) if prefix is not None else ""
+    calls = dict(
+        limiter=limiter,
+        max_retries=max_retries,
+        backoff_seconds=backoff_seconds,
+        sleep=sleep,
+        cached_content=cached_content,
+    )
+    early_check = early_schema_error if stream else None
+    outcome = AnalysisOutcome(prefix_cached=bool(cached_content))
+    started = time.monotonic()
+    chunks = request.chunks
+    if chunks:
+        # Each part gets its own outcome so concurrent calls never share one;
+        # their usage is folded back before the reduce call.
+        part_outcomes = [AnalysisOutcome() for _ in chunks]
+        parts = await asyncio.gather(
+            *(
+                _ask_async(
+                    client, model,
+                    build_chunk_prompt(request.set_name, chunk, index, len(chunks), request.tags),
+                    part_outcome, parse=parse_chunk, retry_suffix=_CHUNK_RETRY_SUFFIX, **calls,
+                )
+                for index, (chunk, part_outcome) in enumerate(zip(chunks, part_outcomes), 1)
+            )
+        )
+        for part_outcome in part_outcomes:
+            outcome.attempts += part_outcome.attempts
+            outcome.retries += part_outcome.retries
+            outcome.prompt_tokens += part_outcome.prompt_tokens
+            outcome.output_tokens += part_outcome.output_tokens
+            outcome.cached_tokens += part_outcome.cached_tokens
+        failed = [i for i, part in enumerate(parts, 1) if part is None]
+        if failed:
+            outcome.error = f"part {failed[0]} of {len(chunks)}: {part_outcomes[failed[0] - 1].error}"
+        else:
+            prompt = build_reduce_prompt(
+                request.set_name, parts, request.changed_documents, request.tags
+            )
+            outcome.result = await _ask_async(
+                client, model, prompt, outcome, early_check=early_check, **calls
+            )
+    else:
+        prompt = build_prompt(
+            request.set_name, request.diff_text, request.changed_documents, request.tags
+        )
+        outcome.result = await _ask_async(
+            client, model, prompt, outcome, early_check=early_check, **calls
+        )
+    return _settle(outcome, request.set_name, model, tier, started, cache, key)
+
+
+def plan_bundles(
+    requests: Sequence[AnalysisRequest],
+    *,
+    model: str,
+    max_sets: int,
+    max_chars: int,
+    cache: Optional[AnalysisCache] = None,
+) -> List[List[int]]:
+    """Indices of the requests to send together, in groups of two or more.
+
+    Only whole, small diffs are bundled, and only with others bound for the
+    same model. A diff the cache will answer is left out: it costs nothing
+    alone.
+    """
+    groups: Dict[str, List[List[int]]] = {}
+    for index, request in enumerate(requests):
+        target = request.model or model
+        if request.chunks or len(request.diff_text) > max_chars:
+            continue
+        if cache is not None and cache.has(
+            cache_key(target, request.diff_text, request.changed_documents, request.tags)
+        ):
+            continue
+        open_groups = groups.setdefault(target, [[]])
+        current = open_groups[-1]
+        size = sum(len(requests[i].diff_text) for i in current)
+        if len(current) >= max_sets or size + len(request.diff_text) > max_chars:
+            current = []
+            open_groups.append(current)
+        current.append(index)
+    return [g for per_model in groups.values() for g in per_model if len(g) > 1]
+
+
+async def _analyse_bundle(
+    requests: Sequence[AnalysisRequest],
+    *,
+    model: str,
+    client,
+    limiter: Optional[RateLimiter],
+    max_retries: int,
+    backoff_seconds: float,
+    sleep=asyncio.sleep,
+    cache: Optional[AnalysisCache] = None,
+    prefix: Optional[PrefixCache] = None,
+) -> List[AnalysisOutcome]:
+    """One call for several sets. Returns one outcome per request, in order.
+
+    An entry that fails validation — or every entry, if the reply as a whole
+    is unusable — comes back failed for the caller to send alone. The call's
+    tokens are shared out evenly; every set was asked once, but the call is
+    counted once, on the first set's tier totals.
+    """
+    cached_content = await prefix.lookup_async(client, model) if prefix is not None else ""
+    shared = AnalysisOutcome(attempts=1)
+    started = time.monotonic()
+    names = ", ".join(f"'{r.set_name}'" for r in requests)
+    log.info("  Bundling %d sets into one call to %s: %s", len(requests), model, names)
+    try:
+        response = await _generate_with_retry(
+            client,
+            model,
+            build_bundle_prompt(requests),
+            shared,
+            limiter=limiter,
+            max_retries=max_retries,
+            backoff_seconds=backoff_seconds,
+            sleep=sleep,
+            cached_content=cached_content,
+        )
+    except Exception as exc:  # noqa: BLE001 — every set falls back to its own call
+        entries = [(None, f"{type(exc).__name__}: {exc}")] * len(requests)
+        log.error("  Gemini API error on the bundled call: %s", entries[0][1])
+    else:
+        shared.prompt_tokens, shared.output_tokens = _usage(response)
+        shared.cached_tokens = _cached_tokens(response)
+        shared.raw = getattr(response, "text", "") or ""
+        entries = parse_bundle(shared.raw, len(requests))
+
+    count = len(requests)
+    latency_ms = int((time.monotonic() - started) * 1000)
+    outcomes = []
+    for index, (request, (result, error)) in enumerate(zip(requests, entries)):
+        first = index == 0
+        outcome = AnalysisOutcome(
+            result=result,
+            error=error,
+            attempts=1,
+            retries=shared.retries if first else 0,
+            prompt_tokens=shared.prompt_tokens // count + (shared.prompt_tokens % count if first else 0),
+            output_tokens=shared.output_tokens // count + (shared.output_tokens % count if first else 0),
+            cached_tokens=shared.cached_tokens // count + (shared.cached_tokens % count if first else 0),
+            prefix_cached=bool(cached_content),
+            raw=shared.raw,
+            latency_ms=latency_ms,
+            bundled=count,
+            model=model,
+            tier=request.tier,
+        )
+        outcome.tiers[request.tier] = {
+            "calls": 1 + shared.retries if first else 0,
+            "prompt_tokens": outcome.prompt_tokens,
+            "output_tokens": outcome.output_tokens,
+            "ms": latency_ms if first else 0,
+        }
+        if outcome.ok and cache is not None:
+            key = cache_key(model, request.diff_text, request.changed_documents, request.tags)
+            cache.put(key, outcome.result, model=model)
+        elif not outcome.ok:
+            log.warning("  Bundled answer for '%s' rejected: %s", request.set_name, error)
+        outcomes.append(outcome)
+    return outcomes
+
+
+async def _analyse_all(
+    requests: Sequence[AnalysisRequest],
+    *,
+    model: str,
+    settings,
+    client,
+    cache: Optional[AnalysisCache] = None,
+) -> List[AnalysisOutcome]:
+    limiter = RateLimiter(settings.requests_per_minute, settings.tokens_per_minute)
+    slots = asyncio.Semaphore(settings.concurrency)
+    prefix = None
+    if settings.context_cache:
+        prefix = PrefixCache(
+            SYSTEM_INSTRUCTION,
+            ttl_seconds=settings.context_cache_ttl_seconds,
+            min_tokens=settings.context_cache_min_tokens,
+        )
+    options = dict(
+        model=model,
+        client=client,
+        limiter=limiter,
+        max_retries=settings.max_retries,
+        backoff_seconds=settings.backoff_seconds,
+        cache=cache,
+        prefix=prefix,
+    )
+
+    async def one(request: AnalysisRequest) -> AnalysisOutcome:
+        async with slots:
+            return await analyse_change_async(request, stream=settings.streaming, **options)
+
+    async def bundle(indices: List[int]) -> List[AnalysisOutcome]:
+        members = [requests[i] for i in indices]
+        async with slots:
+            answers = await _analyse_bundle(
+                members, **{**options, "model": members[0].model or model}
+            )
+        return list(await asyncio.gather(*(follow(r, a) for r, a in zip(members, answers))))
+
+    async def follow(request: AnalysisRequest, answer: AnalysisOutcome) -> AnalysisOutcome:
+        if not answer.ok:
+            # Only the sets whose entry failed pay for a call of their own.
+            return _followed_by(answer, await one(request))
+        if request.escalate_to and needs_escalation(answer):
+            log.info(
+                "  Escalating '%s' from %s to %s", request.set_name, answer.model, request.escalate_to
+            )
+            escalated = replace(request, model=request.escalate_to, tier=MAIN, escalate_to="")
+            return _followed_by(answer, await one(escalated))
+        return answer
+
+    bundles = []
+    if settings.bundle:
+        bundles = plan_bundles(
+            requests,
+            model=model,
+            max_sets=settings.bundle_max_sets,
+            max_chars=settings.bundle_max_chars,
+            cache=cache,
+        )
+    bundled = {i for group in bundles for i in group}
+    singles = [i for i in range(len(requests)) if i not in bundled]
+
+    try:
+        results = await asyncio.gather(
+            *(bundle(group) for group in bundles), *(one(requests[i]) for i in singles)
+        )
+    finally:
+        if prefix is not None:
+            await prefix.release_async(client)
+    outcomes: List[Optional[AnalysisOutcome]] = [None] * len(requests)
+    for group, answers in zip(bundles, results):
+        for index, answer in zip(group, answers):
+            outcomes[index] = answer
+    for index, answer in zip(singles, results[len(bundles):]):
+        outcomes[index] = answer
+    if limiter.waited:
+        log.info("  Rate limiter held calls for %.1fs in total", limiter.waited)
+    return list(outcomes)
+
+
+def analyse_changes(
+    requests: Sequence[AnalysisRequest],
+    *,
+    model: str,
+    settings,
+    client=None,
+    cache: Optional[AnalysisCache] = None,
+) -> List[AnalysisOutcome]:
+    """Analyse every changed set concurrently. Outcomes come back in order.
+
+    `settings` is the `analysis` section of steward_config.yaml.
+    """
+    if not requests:
+        return []
+    if client is None:
+        client = make_client(settings.base_url)
+    if client is None:
+        # Cache hits need no client; everything else fails cleanly.
+        outcomes = []
+        for request in requests:
+            _, hit = _from_cache(
+                cache, request.model or model, request.set_name, request.diff_text,
+                request.changed_documents, request.tags,
+            )
+            outcomes.append(hit or AnalysisOutcome(error="GEMINI_API_KEY is not set"))
+        return outcomes
+    return asyncio.run(
+        _analyse_all(requests, model=model, settings=settings, client=client, cache=cache)
+    )
@@ -0,0 +1,539 @@
+"""Run records as columns, for questions asked across years of runs.
+
+"How often does Perplexity actually change?", "p95 fetch_ms per host" and
+"tokens per month" used to mean parsing every line of the run log into dicts.
+Each run's records are also appended here as columns: numbers as float64 (NaN
+where a record has none), strings dictionary-encoded as uint32 codes into a
+string table. Partitions are calendar months (AEST), so a run only appends to
+the current month's files, and a query skips months outside its window.
+
+A query loads only the columns it names, filters and groups on the integer
+codes, and aggregates. With numpy installed each step is an array operation;
+without it the same query runs as loops over `array` columns and gives the
+same answer.
+
+    python -m steward.analytics query --by host --metric p95:fetch_ms
+    python -m steward.analytics query --by month --metric sum:prompt_tokens --metric sum:output_tokens
+    python -m steward.analytics query --where "set_name=Perplexity AI Legal Policies" --by outcome
+    python -m steward.analytics rebuild
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import sys
+from array import array
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from . import content, jsonio, runlog, versions
+
+log = logging.getLogger(__name__)
+
+ANALYTICS_DIR = os.path.join(runlog.RUN_LOG_DIR, "columns")
+
+STRING_COLUMNS = (
+    "run_id",
+    "set_name",
+    "file_id",
+    "host",
+    "label",
+    "outcome",
+    "model",
+    "model_tier",
+    "verdict",
+    "priority",
+    "local_rule",
+)
+NUMBER_COLUMNS = (
+    "timestamp",
+    "fetch_ms",
+    "http_status",
+    "length",
+    "diff_added",
+    "diff_removed",
+    "llm_called",
+    "cache_hit",
+    "llm_ms",
+    "prompt_tokens",
+    "cached_prompt_tokens",
+    "output_tokens",
+    "estimated_tokens",
+)
+# Group keys computed from `timestamp`, in AEST.
+DERIVED_COLUMNS = ("day", "month", "year")
+AGGREGATES = ("count", "sum", "mean", "min", "max", "p50", "p90", "p95", "p99")
+
+_META = "meta.json"
+_STRINGS = "strings.jsonl"
+_PARTITION_RE = re.compile(r"^\d{4}-\d{2}$")
+_AEST_OFFSET = 10 * 3600
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class AnalyticsError(ValueError):
+    """A query names a column or aggregate that does not exist."""
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+# --- writing -----------------------------------------------------------------------
+
+
+def _number(value: Any) -> float:
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+    try:
+        return float(value) if value is not None else math.nan
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _epoch(timestamp: Any) -> float:
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _column_path(partition: str, name: str) -> str:
+    return os.path.join(partition, f"{name}.u32" if name in STRING_COLUMNS else f"{name}.f64")
+
+
+def _read_meta(partition: str) -> Dict[str, int]:
+    try:
+        return jsonio.load(os.path.join(partition, _META))
+    except (OSError, ValueError):
+        return {"rows": 0, "strings": 0, "strings_bytes": 0}
+
+
+def _read_strings(partition: str, meta: Dict[str, int]) -> List[str]:
+    try:
+        with open(os.path.join(partition, _STRINGS), "rb") as handle:
+            raw = handle.read(meta["strings_bytes"])
+    except FileNotFoundError:
+        raw = b""
+    return [jsonio.loads(line) for line in raw.splitlines()] or [""]
+
+
+def _write_column(path: str, values: array, keep: int) -> None:
+    """Append to a column, first cutting off anything a killed run left past `keep` items."""
+    with open(path, "ab+") as handle:
+        handle.truncate(keep * values.itemsize)
+        handle.seek(0, os.SEEK_END)
+        if sys.byteorder != "little":
+            values = array(values.typecode, values)
+            values.byteswap()
+        values.tofile(handle)
+
+
+def _append_partition(partition: str, records: Sequence[Dict[str, Any]]) -> None:
+    os.makedirs(partition, exist_ok=True)
+    meta = _read_meta(partition)
+    strings = _read_strings(partition, meta)
+    codes = {value: code for code, value in enumerate(strings)}
+    known = len(strings) if meta["strings"] else 0
+
+    columns = {name: array("I") for name in STRING_COLUMNS}
+    columns.update({name: array("d") for name in NUMBER_COLUMNS})
+    for entry in records:
+        row = {name: str(entry.get(name) or "") for name in STRING_COLUMNS}
+        row["host"] = content.host_of(entry.get("url") or "")
+        for name, value in row.items():
+            if value not in codes:
+                codes[value] = len(strings)
+                strings.append(value)
+            columns[name].append(codes[value])
+        for name in NUMBER_COLUMNS:
+            columns[name].append(_epoch(entry.get(name)) if name == "timestamp" else _number(entry.get(name)))
+
+    for name, values in columns.items():
+        _write_column(_column_path(partition, name), values, meta["rows"])
+    with open(os.path.join(partition, _STRINGS), "ab+") as handle:
+        handle.truncate(meta["strings_bytes"])
+        handle.seek(0, os.SEEK_END)
+        for value in strings[known:]:
+            handle.write(jsonio.line(value))
+        strings_bytes = handle.tell()
+
+    # The row count is what readers trust, so it is written last.
+    meta = {"rows": meta["rows"] + len(records), "strings": len(strings), "strings_bytes": strings_bytes}
+    jsonio.save(meta, os.path.join(partition, _META))
+
+
+def append(records: Iterable[Dict[str, Any]], directory: str = ANALYTICS_DIR) -> int:
+    """Add run records to their month partitions. Returns how many were added."""
+    by_month: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in records:
+        by_month.setdefault(runlog.segment_day(entry).strftime("%Y-%m"), []).append(entry)
+    for month, rows in sorted(by_month.items()):
+        _append_partition(os.path.join(directory, month), rows)
+    return sum(len(rows) for rows in by_month.values())
+
+
+def rebuild(directory: str = ANALYTICS_DIR, run_dir: str = runlog.RUN_LOG_DIR) -> int:
+    """Rebuild the columns from whatever the run log still holds."""
+    records = runlog.records_between(datetime.fromtimestamp(0).astimezone(), directory=run_dir)
+    shutil.rmtree(directory, ignore_errors=True)
+    return append(records, directory)
+
+
+# --- reading -----------------------------------------------------------------------
+
+
+def _partitions(directory: str, first: Optional[str], last: Optional[str]) -> List[str]:
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return []
+    return [
+        os.path.join(directory, name)
+        for name in names
+        if _PARTITION_RE.match(name) and (first is None or name >= first) and (last is None or name <= last)
+    ]
+
+
+def _read_column(path: str, name: str, rows: int, np):
+    """`rows` items of a column; a column added after the partition was written reads as empty."""
+    typecode, fill = ("I", 0) if name in STRING_COLUMNS else ("d", math.nan)
+    values = array(typecode)
+    try:
+        with open(path, "rb") as handle:
+            values.frombytes(handle.read(rows * values.itemsize))
+    except FileNotFoundError:
+        pass
+    if sys.byteorder != "little":
+        values.byteswap()
+    values.extend([fill] * (rows - len(values)))
+    return np.frombuffer(values, dtype=values.typecode).copy() if np is not None else values
+
+
+def load(
+    names: Iterable[str],
+    directory: str = ANALYTICS_DIR,
+    *,
+    first_month: Optional[str] = None,
+    last_month: Optional[str] = None,
+    use_numpy: Optional[bool] = None,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """The named columns across partitions, string codes mapped to one shared table."""
+    np = _numpy() if use_numpy in (None, True) else None
+    if use_numpy and np is None:
+        raise AnalyticsError("numpy is not installed")
+    names = list(dict.fromkeys(names))
+    strings: List[str] = []
+    codes: Dict[str, int] = {}
+    parts: Dict[str, List[Any]] = {name: [] for name in names}
+
+    for partition in _partitions(directory, first_month, last_month):
+        meta = _read_meta(partition)
+        if not meta["rows"]:
+            continue
+        remap = []
+        for value in _read_strings(partition, meta):
+            if value not in codes:
+                codes[value] = len(strings)
+                strings.append(value)
+            remap.append(codes[value])
+        for name in names:
+            values = _read_column(_column_path(partition, name), name, meta["rows"], np)
+            if name in STRING_COLUMNS:
+                if np is not None:
+                    values = np.asarray(remap, dtype=np.uint32)[values]
+                else:
+                    values = array("I", [remap[code] for code in values])
+            parts[name].append(values)
+
+    columns: Dict[str, Any] = {}
+    for name, chunks in parts.items():
+        typecode = "I" if name in STRING_COLUMNS else "d"
+        if np is not None:
+            columns[name] = np.concatenate(chunks) if chunks else np.array([], dtype=typecode)
+        else:
+            columns[name] = array(typecode)
+            for chunk in chunks:
+                columns[name].extend(chunk)
+    return columns, strings
+
+
+# --- querying ----------------------------------------------------------------------
+
+
+def _parse_metric(metric: str) -> Tuple[str, str]:
+    aggregate, _, column = metric.partition(":")
+    if aggregate not in AGGREGATES:
+        raise AnalyticsError(f"unknown aggregate {aggregate!r}; use one of {', '.join(AGGREGATES)}")
+    if aggregate == "count":
+        if column:
+            raise AnalyticsError("count takes no column")
+        return aggregate, ""
+    if column not in NUMBER_COLUMNS:
+        raise AnalyticsError(f"{metric!r}: {column!r} is not a numeric column")
+    return aggregate, column
+
+
+def _day_label(day_number: float, key: str) -> str:
+    if math.isnan(day_number):
+        return ""
+    text = date.fromordinal(_EPOCH_ORDINAL + int(day_number)).isoformat()
+    return {"day": text, "month": text[:7], "year": text[:4]}[key]
+
+
+def _bound(value: Optional[str], end_of_day: bool) -> Optional[float]:
+    if not value:
+        return None
+    return datetime.fromisoformat(versions.as_timestamp(value, end_of_day=end_of_day)).timestamp()
+
+
+def _rank(count: int, percent: int) -> int:
+    """Nearest-rank index into `count` sorted values."""
+    return max(0, -(-percent * count // 100) - 1)
+
+
+def _plain(value: float) -> Any:
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def query(
+    by: Sequence[str] = (),
+    metrics: Sequence[str] = ("count",),
+    *,
+    where: Optional[Dict[str, Any]] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    directory: str = ANALYTICS_DIR,
+    use_numpy: Optional[bool] = None,
+) -> List[Dict[str, Any]]:
+    """One row per group: the `by` keys, then each metric, e.g. `p95:fetch_ms`.
+
+    `where` maps string columns to a value or a list of accepted values;
+    `since` and `until` take anything `versions.as_timestamp` does.
+    """
+    where = {
+        name: [value] if isinstance(value, str) else list(value) for name, value in (where or {}).items()
+    }
+    for name in list(by) + list(where):
+        if name not in STRING_COLUMNS and not (name in DERIVED_COLUMNS and name not in where):
+            raise AnalyticsError(f"cannot group or filter on {name!r}")
+    parsed = [_parse_metric(metric) for metric in metrics]
+    start, end = _bound(since, False), _bound(until, True)
+
+    needed = [name for name in list(by) + list(where) if name in STRING_COLUMNS]
+    needed += [column for _, column in parsed if column]
+    if start is not None or end is not None or any(name in DERIVED_COLUMNS for name in by) or not needed:
+        needed.append("timestamp")
+    first = versions.as_timestamp(since)[:7] if since else None
+    last = versions.as_timestamp(until, end_of_day=True)[:7] if until else None
+    columns, strings = load(needed, directory, first_month=first, last_month=last, use_numpy=use_numpy)
+    codes = {value: code for code, value in enumerate(strings)}
+    accepted = {name: {codes[v] for v in values if v in codes} for name, values in where.items()}
+
+    run = _query_numpy if (use_numpy is not False and _numpy() is not None) else _query_python
+    groups = run(columns, strings, list(by), parsed, accepted, start, end)
+    return [
+        {**dict(zip(by, key)), **{metric: value for metric, value in zip(metrics, values)}}
+        for key, values in sorted(groups.items())
+    ]
+
+
+def _query_python(columns, strings, by, parsed, accepted, start, end):
+    rows = len(next(iter(columns.values()))) if columns else 0
+    timestamps = columns.get("timestamp")
+    labels: Dict[Tuple[str, float], str] = {}
+    groups: Dict[Tuple[str, ...], List[int]] = {}
+    for i in range(rows):
+        if any(columns[name][i] not in allowed for name, allowed in accepted.items()):
+            continue
+        if start is not None and not timestamps[i] >= start:
+            continue
+        if end is not None and not timestamps[i] <= end:
+            continue
+        key = []
+        for name in by:
+            if name in STRING_COLUMNS:
+                key.append(strings[columns[name][i]])
+                continue
+            day = math.nan
+            if not math.isnan(timestamps[i]):
+                day = math.floor((timestamps[i] + _AEST_OFFSET) / 86400)
+            if (name, day) not in labels:
+                labels[(name, day)] = _day_label(day, name)
+            key.append(labels[(name, day)])
+        groups.setdefault(tuple(key), []).append(i)
+
+    results = {}
+    for key, members in groups.items():
+        values = []
+        for aggregate, column in parsed:
+            if aggregate == "count":
+                values.append(len(members))
+                continue
+            present = sorted(v for v in (columns[column][i] for i in members) if not math.isnan(v))
+            if not present:
+                values.append(None)
+            elif aggregate == "sum":
+                values.append(_plain(sum(present)))
+            elif aggregate == "mean":
+                values.append(sum(present) / len(present))
+            elif aggregate == "min":
+                values.append(_plain(present[0]))
+            elif aggregate == "max":
+                values.append(_plain(present[-1]))
+            else:
+                values.append(_plain(present[_rank(len(present), int(aggregate[1:]))]))
+        results[key] = values
+    return results
+
+
+def _query_numpy(columns, strings, by, parsed, accepted, start, end):
+    np = _numpy()
+    rows = len(next(iter(columns.values()))) if columns else 0
+    mask = np.ones(rows, dtype=bool)
+    for name, allowed in accepted.items():
+        mask &= np.isin(columns[name], np.fromiter(allowed, dtype=np.uint32, count=len(allowed)))
+    timestamps = columns.get("timestamp")
+    if start is not None:
+        mask &= timestamps >= start
+    if end is not None:
+        mask &= timestamps <= end
+
+    # Every key becomes an integer column with a label list; groups are the distinct rows.
+    keys, key_labels = [], []
+    for name in by:
+        if name in STRING_COLUMNS:
+            keys.append(columns[name][mask].astype(np.int64))
+            key_labels.append(strings)
+            continue
+        days = np.floor((timestamps[mask] + _AEST_OFFSET) / 86400)
+        distinct, inverse = np.unique(days, return_inverse=True)
+        # Several days share a month or a year: group on the label, not the day.
+        labels, label_of_day = np.unique([_day_label(day, name) for day in distinct], return_inverse=True)
+        keys.append(label_of_day.astype(np.int64)[inverse.reshape(-1)])
+        key_labels.append([str(label) for label in labels])
+    selected = int(mask.sum())
+    if keys:
+        distinct_keys, gid = np.unique(np.stack(keys, axis=1), axis=0, return_inverse=True)
+        gid = gid.reshape(-1)
+    else:
+        distinct_keys = np.zeros((1 if selected else 0, 0), dtype=np.int64)
+        gid = np.zeros(selected, dtype=np.int64)
+    count = len(distinct_keys)
+    per_group: List[List[Any]] = [[] for _ in range(count)]
+
+    for aggregate, column in parsed:
+        if aggregate == "count":
+            found = np.bincount(gid, minlength=count)
+            for g in range(count):
+                per_group[g].append(int(found[g]))
+            continue
+        values = columns[column][mask]
+        present = ~np.isnan(values)
+        groups_of, values = gid[present], values[present]
+        sizes = np.bincount(groups_of, minlength=count)
+        if aggregate in ("sum", "mean"):
+            totals = np.bincount(groups_of, weights=values, minlength=count)
+            for g in range(count):
+                if not sizes[g]:
+                    per_group[g].append(None)
+                elif aggregate == "sum":
+                    per_group[g].append(_plain(totals[g]))
+                else:
+                    per_group[g].append(float(totals[g]) / int(sizes[g]))
+            continue
+        order = np.lexsort((values, groups_of))
+        ordered = values[order]
+        starts = np.searchsorted(groups_of[order], np.arange(count), side="left")
+        if aggregate == "min":
+            picks = starts
+        elif aggregate == "max":
+            picks = starts + sizes - 1
+        else:
+            percent = int(aggregate[1:])
+            picks = starts + np.maximum(0, -(-percent * sizes // 100) - 1)
+        for g in range(count):
+            per_group[g].append(_plain(ordered[picks[g]]) if sizes[g] else None)
+
+    return {
+        tuple(key_labels[k][int(code)] for k, code in enumerate(row)): per_group[g]
+        for g, row in enumerate(distinct_keys)
+    }
+
+
+# --- CLI ---------------------------------------------------------------------------
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    return f"{value:.1f}" if isinstance(value, float) else str(value)
+
+
+def _format(rows: List[Dict[str, Any]]) -> str:
+    if not rows:
+        return "No records match."
+    headers = list(rows[0])
+    cells = [[_cell(row[h]) for h in headers] for row in rows]
+    widths = [max(len(h), *(len(line[i]) for line in cells)) for i, h in enumerate(headers)]
+    lines = ["  ".join(h.ljust(w) for h, w in zip(headers, widths)).rstrip()]
+    lines += ["  ".join(cell.ljust(w) for cell, w in zip(line, widths)).rstrip() for line in cells]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Aggregate run records by outcome, set, host and time.")
+    parser.add_argument("--dir", default=ANALYTICS_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ask = commands.add_parser("query", help="group-by aggregates over every recorded run")
+    ask.add_argument("--by", action="append", default=[], help=", ".join(STRING_COLUMNS + DERIVED_COLUMNS))
+    ask.add_argument("--metric", action="append", default=[], help="count, or AGG:COLUMN such as p95:fetch_ms")
+    ask.add_argument("--where", action="append", default=[], help="COLUMN=VALUE; repeat to accept several")
+    ask.add_argument("--since")
+    ask.add_argument("--until")
+    ask.add_argument("--json", action="store_true")
+
+    redo = commands.add_parser("rebuild", help="rebuild the columns from the run log")
+    redo.add_argument("--runs", default=runlog.RUN_LOG_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        print(f"Rebuilt {args.dir} from {rebuild(args.dir, args.runs)} record(s)")
+        return 0
+
+    where: Dict[str, List[str]] = {}
+    for clause in args.where:
+        name, sep, value = clause.partition("=")
+        if not sep:
+            parser.error(f"--where {clause!r}: expected COLUMN=VALUE")
+        where.setdefault(name, []).append(value)
+    try:
+        rows = query(
+            args.by,
+            args.metric or ["count"],
+            where=where,
+            since=args.since,
+            until=args.until,
+            directory=args.dir,
+        )
+    except (AnalyticsError, ValueError) as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    print(json.dumps(rows, indent=1, ensure_ascii=False) if args.json else _format(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
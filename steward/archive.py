@@ -0,0 +1,258 @@
+"""Where archived analyses, diffs and snapshots live in logs/.
+
+Archives used to sit flat in logs/, so pruning and indexing listed and
+regex-matched every file of every source, and the directory grows by a few
+files per change per source. They now live in one shard per source per
+month:
+
+    logs/{file_id}/{YYYY}/{MM}/{file_id}_{YYYYmmdd}_{HHMMSS}_{suffix}
+
+The file names are unchanged, so everything that parses them still does.
+Readers visit only the sources and months they need. Files still flat in
+logs/ are read as well, so an unmigrated checkout keeps working until
+
+    python -m steward.archive migrate
+
+moves them into their shards and rewrites any `logs/...` path recorded in
+hashes.json to match.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import re
+import shutil
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import jsonio
+
+log = logging.getLogger(__name__)
+
+ANALYSIS = "analysis.json"
+DIFF = "diff.txt"
+SNAPSHOT_MANIFEST = "snapshot.json"
+SNAPSHOT_TEXT = "snapshot.txt"
+SUFFIXES = (ANALYSIS, DIFF, SNAPSHOT_MANIFEST, SNAPSHOT_TEXT)
+
+_NAME_RE = re.compile(
+    r"^(?P<file_id>.+)_(?P<stamp>\d{8}_\d{6})_(?P<suffix>analysis\.json|diff\.txt|snapshot\.json|snapshot\.txt)$"
+)
+_YEAR_RE = re.compile(r"^\d{4}$")
+_MONTH_RE = re.compile(r"^\d{2}$")
+
+
+@dataclass(frozen=True)
+class ArchiveFile:
+    file_id: str
+    stamp: str
+    suffix: str
+    path: str
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    @property
+    def prefix(self) -> str:
+        """The path without `_{suffix}`: what an archive's siblings share."""
+        return self.path[: -len(self.suffix) - 1]
+
+
+def parse(name: str) -> Optional[Tuple[str, str, str]]:
+    """(file_id, stamp, suffix) of an archive file name, or None."""
+    match = _NAME_RE.match(name)
+    return (match.group("file_id"), match.group("stamp"), match.group("suffix")) if match else None
+
+
+def shard_dir(log_dir: str, file_id: str, stamp: str) -> str:
+    return os.path.join(log_dir, file_id, stamp[:4], stamp[4:6])
+
+
+def path_for(log_dir: str, file_id: str, stamp: str, suffix: str) -> str:
+    """Where an archive file is written."""
+    return os.path.join(shard_dir(log_dir, file_id, stamp), f"{file_id}_{stamp}_{suffix}")
+
+
+def relative(path: str, log_dir: str) -> str:
+    """`logs/...` as recorded for the dashboard, whatever `log_dir` is called here."""
+    return "/".join(["logs", *os.path.relpath(path, log_dir).split(os.sep)])
+
+
+def _listdir(path: str) -> List[str]:
+    try:
+        return sorted(os.listdir(path))
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def shards(
+    log_dir: str,
+    file_ids: Optional[Iterable[str]] = None,
+    *,
+    first_month: str = "",
+    last_month: str = "",
+) -> Iterator[Tuple[str, str, str]]:
+    """(file_id, "YYYYMM", directory) for each shard, oldest first per source.
+
+    Only the named sources and the months between `first_month` and
+    `last_month` ("YYYYMM", inclusive) are listed.
+    """
+    wanted = sorted(file_ids) if file_ids is not None else _listdir(log_dir)
+    for file_id in wanted:
+        source = os.path.join(log_dir, file_id)
+        for year in _listdir(source):
+            if not _YEAR_RE.match(year) or (first_month and year < first_month[:4]):
+                continue
+            if last_month and year > last_month[:4]:
+                break
+            for month in _listdir(os.path.join(source, year)):
+                key = year + month
+                if not _MONTH_RE.match(month) or (first_month and key < first_month):
+                    continue
+                if last_month and key > last_month:
+                    break
+                yield file_id, key, os.path.join(source, year, month)
+
+
+def flat_files(log_dir: str) -> Iterator[ArchiveFile]:
+    """Archive files not yet moved into a shard."""
+    for name in _listdir(log_dir):
+        parsed = parse(name)
+        if parsed and os.path.isfile(os.path.join(log_dir, name)):
+            yield ArchiveFile(*parsed, os.path.join(log_dir, name))
+
+
+def files_in(directory: str) -> Iterator[ArchiveFile]:
+    for name in _listdir(directory):
+        parsed = parse(name)
+        if parsed:
+            yield ArchiveFile(*parsed, os.path.join(directory, name))
+
+
+def files(
+    log_dir: str,
+    file_ids: Optional[Iterable[str]] = None,
+    *,
+    suffixes: Iterable[str] = SUFFIXES,
+) -> Iterator[ArchiveFile]:
+    """Every archive file of the named sources (all of them by default)."""
+    suffixes = set(suffixes)
+    wanted = set(file_ids) if file_ids is not None else None
+    for found in flat_files(log_dir):
+        if found.suffix in suffixes and (wanted is None or found.file_id in wanted):
+            yield found
+    for _, _, directory in shards(log_dir, wanted):
+        for found in files_in(directory):
+            if found.suffix in suffixes:
+                yield found
+
+
+def locate(log_dir: str, file_id: str, stamp: str, suffix: str) -> str:
+    """The sharded path of an archive file, or its flat path if only that exists."""
+    sharded = path_for(log_dir, file_id, stamp, suffix)
+    flat = os.path.join(log_dir, os.path.basename(sharded))
+    return flat if not os.path.exists(sharded) and os.path.exists(flat) else sharded
+
+
+# --- Migration -----------------------------------------------------------------
+
+
+def _rewrite(value: Any, moved: Dict[str, str]) -> Any:
+    if isinstance(value, str):
+        return moved.get(value, value)
+    if isinstance(value, list):
+        return [_rewrite(item, moved) for item in value]
+    if isinstance(value, dict):
+        return {key: _rewrite(item, moved) for key, item in value.items()}
+    return value
+
+
+def migrate(log_dir: str = "logs", hashes_path: Optional[str] = "hashes.json") -> Dict[str, str]:
+    """Move flat archive files into their shards. Returns {old: new} `logs/...` paths.
+
+    Paths recorded in `hashes_path` are rewritten to the new ones. A file
+    whose shard already holds a file of that name is left where it is.
+    """
+    moved: Dict[str, str] = {}
+    for found in list(flat_files(log_dir)):
+        target = path_for(log_dir, found.file_id, found.stamp, found.suffix)
+        if os.path.exists(target):
+            log.warning("Not moving %s: %s already exists", found.path, target)
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(found.path, target)
+        moved[relative(found.path, log_dir)] = relative(target, log_dir)
+
+    if moved and hashes_path and os.path.exists(hashes_path):
+        hashes = jsonio.load(hashes_path)
+        rewritten = _rewrite(hashes, moved)
+        if rewritten != hashes:
+            jsonio.save(rewritten, hashes_path, pretty=True)
+    return moved
+
+
+_FICLONE = 0x40049409  # Linux ioctl: share the source's extents (btrfs, XFS)
+
+
+def _reflink(source: str, target: str) -> None:
+    try:
+        import fcntl
+    except ImportError as exc:
+        raise OSError("reflinks need fcntl") from exc
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target)
+            raise
+
+
+def preserve(source: str, target: str) -> str:
+    """Put `source` at `target` as a hard link, else a reflink, else a copy.
+
+    Returns which it was. A link is only safe because nothing writes the live
+    analysis or diff in place: main.py replaces them (temp file, then
+    os.replace), so the archived inode keeps the old content.
+    """
+    if os.path.lexists(target):
+        os.remove(target)
+    try:
+        os.link(source, target)
+        return "link"
+    except OSError:
+        pass
+    try:
+        _reflink(source, target)
+        return "reflink"
+    except OSError:
+        pass
+    shutil.copy(source, target)
+    return "copy"
+
+
+def remove_shard(directory: str) -> int:
+    """Delete a whole shard. Returns how many archive files went with it."""
+    count = sum(1 for _ in files_in(directory))
+    shutil.rmtree(directory)
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Move flat logs/ archives into per-source monthly shards.")
+    parser.add_argument("command", choices=("migrate",))
+    parser.add_argument("log_dir", nargs="?", default="logs")
+    parser.add_argument("--hashes", default="hashes.json")
+    args = parser.parse_args(argv)
+
+    moved = migrate(args.log_dir, args.hashes)
+    sources = {path.split("/")[1] for path in moved.values()}
+    print(f"Moved {len(moved)} archive file(s) into shards for {len(sources)} source(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
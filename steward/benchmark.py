@@ -0,0 +1,194 @@
+"""Throughput of the analysis stage, measured against the local stand-in.
+
+    python -m steward.benchmark [logs] --sets 60 --latency-ms 400 --burst-every 20 --burst-length 3
+
+Every change in the archive (`history.archived_changes`) is turned into the
+request a run would have sent for it — combined diff, changed documents,
+fingerprint tags — and the lot is analysed through `analyse_changes` with the
+real client, limiter and retry paths, against `steward.standin` rather than
+Gemini. The `analysis` section of the config applies, with any override given
+on the command line, so a limiter or concurrency setting can be tried before
+it is shipped.
+
+Reported: sets and model calls per minute, p50/p95 latency per set and per
+call, the share of calls that were 429s and retried, and the share of sets
+that needed the schema retry. Nothing here spends tokens or touches state.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import time
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Sequence
+
+from . import analysis, diffing, history, standin
+
+log = logging.getLogger(__name__)
+
+
+def requests_from_archive(
+    log_dir: str, *, limit: int = 0, max_chars: int = 40000
+) -> List[analysis.AnalysisRequest]:
+    """The requests the archive's changes would have made, oldest first per source."""
+    requests = []
+    for change in history.archived_changes(log_dir, max_chars=max_chars):
+        tags = sorted({tag for _, diff in change.changed for tag in diff.tags})
+        requests.append(
+            analysis.AnalysisRequest(
+                set_name=f"{change.file_id} {change.stamp}",
+                diff_text=diffing.combine_diffs(change.changed),
+                changed_documents=[label for label, _ in change.changed],
+                tags=tags,
+            )
+        )
+        if limit and len(requests) >= limit:
+            break
+    return requests
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile; 0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-int(fraction * 100) * len(ordered) // 100))
+    return float(ordered[min(rank, len(ordered)) - 1])
+
+
+def summarise(
+    outcomes: Sequence[analysis.AnalysisOutcome],
+    elapsed: float,
+    stats: standin.Stats,
+    call_ms: Sequence[float],
+) -> Dict[str, Any]:
+    minutes = max(elapsed, 1e-9) / 60
+    set_ms = [o.latency_ms for o in outcomes]
+    return {
+        "sets": len(outcomes),
+        "analysed": sum(1 for o in outcomes if o.ok),
+        "seconds": round(elapsed, 2),
+        "sets_per_minute": round(len(outcomes) / minutes, 1),
+        "calls": stats.requests,
+        "calls_per_minute": round(stats.requests / minutes, 1),
+        "set_p50_ms": percentile(set_ms, 0.50),
+        "set_p95_ms": percentile(set_ms, 0.95),
+        "call_p50_ms": round(percentile(call_ms, 0.50), 1),
+        "call_p95_ms": round(percentile(call_ms, 0.95), 1),
+        "rate_limited": stats.rate_limited,
+        "transport_retry_rate": round(stats.rate_limited / stats.requests, 3) if stats.requests else 0.0,
+        "schema_retry_rate": (
+            round(sum(1 for o in outcomes if o.attempts > 1) / len(outcomes), 3) if outcomes else 0.0
+        ),
+        "abandoned": sum(o.abandoned for o in outcomes),
+        "prompt_tokens": sum(o.prompt_tokens for o in outcomes),
+        "output_tokens": sum(o.output_tokens for o in outcomes),
+    }
+
+
+def _timed(client, call_ms: List[float]):
+    """Record the wall time of every generate call the client makes."""
+    generate = client.aio.models.generate_content
+    generate_stream = client.models.generate_content_stream
+
+    async def timed_generate(**kwargs):
+        started = time.monotonic()
+        try:
+            return await generate(**kwargs)
+        finally:
+            call_ms.append((time.monotonic() - started) * 1000)
+
+    def timed_stream(**kwargs):
+        started = time.monotonic()
+        try:
+            yield from generate_stream(**kwargs)
+        finally:
+            call_ms.append((time.monotonic() - started) * 1000)
+
+    client.aio.models.generate_content = timed_generate
+    client.models.generate_content_stream = timed_stream
+    return client
+
+
+def run(
+    requests: Sequence[analysis.AnalysisRequest],
+    *,
+    settings,
+    behaviour: Optional[standin.Behaviour] = None,
+    model: str = "stand-in",
+) -> Dict[str, Any]:
+    """Analyse `requests` against a fresh stand-in and summarise the run."""
+    call_ms: List[float] = []
+    with standin.StandInServer(behaviour) as server:
+        client = _timed(analysis.make_client(server.url, api_key="stand-in"), call_ms)
+        started = time.monotonic()
+        outcomes = analysis.analyse_changes(
+            list(requests), model=model, settings=replace(settings, base_url=server.url), client=client
+        )
+        elapsed = time.monotonic() - started
+        return summarise(outcomes, elapsed, server.stats, call_ms)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from .config import ConfigError, load_config
+
+    parser = argparse.ArgumentParser(
+        description="Measure the analysis stage against a local stand-in for Gemini."
+    )
+    parser.add_argument("log_dir", nargs="?", default="logs")
+    parser.add_argument("--config", default="steward_config.yaml")
+    parser.add_argument("--sets", type=int, default=0, help="at most this many changes (0: all)")
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--requests-per-minute", type=int)
+    parser.add_argument("--tokens-per-minute", type=int)
+    parser.add_argument("--streaming", action=argparse.BooleanOptionalAction)
+    parser.add_argument("--bundle", action=argparse.BooleanOptionalAction)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    standin.add_behaviour_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        cfg = load_config(args.config)
+    except ConfigError as exc:
+        print(f"Configuration error — {exc}")
+        return 1
+
+    settings = cfg.analysis
+    overrides = {
+        "concurrency": args.concurrency,
+        "requests_per_minute": args.requests_per_minute,
+        "tokens_per_minute": args.tokens_per_minute,
+        "streaming": args.streaming,
+        "bundle": args.bundle,
+    }
+    settings = replace(settings, **{k: v for k, v in overrides.items() if v is not None})
+
+    requests = requests_from_archive(args.log_dir, limit=args.sets, max_chars=cfg.diff.max_diff_chars)
+    if not requests:
+        print(f"No archived changes found in {args.log_dir}")
+        return 1
+    summary = run(requests, settings=settings, behaviour=standin.behaviour_from(args))
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+    print(
+        f"{summary['sets']} set(s), {summary['analysed']} analysed, in {summary['seconds']}s "
+        f"(concurrency {settings.concurrency}, {settings.requests_per_minute} rpm, "
+        f"{settings.tokens_per_minute} tpm)"
+    )
+    print(f"  {summary['sets_per_minute']} sets/min, {summary['calls_per_minute']} calls/min")
+    print(f"  per set:  p50 {summary['set_p50_ms']:.0f} ms, p95 {summary['set_p95_ms']:.0f} ms")
+    print(f"  per call: p50 {summary['call_p50_ms']:.0f} ms, p95 {summary['call_p95_ms']:.0f} ms")
+    print(
+        f"  429s: {summary['rate_limited']} of {summary['calls']} calls "
+        f"({summary['transport_retry_rate']:.1%}); schema retries: "
+        f"{summary['schema_retry_rate']:.1%} of sets; {summary['abandoned']} stream(s) abandoned"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,697 @@
+"""Content-addressed, compressed store for document text.
+
+The same text used to be written three times: per document under
+`snapshots/{file_id}/`, again inside the aggregate `snapshots/{file_id}.txt`,
+and again as a full `_snapshot.txt` copy in logs/ every time a set was
+archived. Most archives differ from the one before in a single document, so
+logs/ was mostly the same text over and over.
+
+A blob is one text, compressed, stored under the sha256 of its UTF-8 bytes —
+the same value as `content.content_hash`, so a document record's `hash` and
+every key of its `seen_hashes` are blob ids. Writing a blob that already
+exists is a no-op, which is the whole point. An archived snapshot is a small
+manifest, `{"documents": [[url, blob_id], ...]}`, that rebuilds the aggregate
+byte for byte. An aggregate that does not split cleanly is kept as one blob
+instead (`{"blob": blob_id}`).
+
+Blobs are zstd-compressed when `zstandard` is installed and zlib-compressed
+otherwise; lzma is there for anyone who prefers size over speed. A dictionary
+trained on the corpus (`python -m steward.blobs train`) helps with the many
+small, similar documents. Every blob names its codec and dictionary in its
+header, so changing either never makes an old blob unreadable.
+
+The only plain-text snapshot still written is `snapshots/{file_id}.txt`,
+because the dashboard shows it.
+
+Older versions of a document are reverse deltas. When a new version is
+stored with the version it replaces, the new one is kept whole and the old
+one is rewritten as the line edits that rebuild it from the new one. The
+newest text is always one read away, and history costs only what changed.
+Every `keyframe_interval` versions, one is left whole, so any version is at
+most that many delta applications from a full text. A return to an older
+version makes that version whole again.
+
+    python -m steward.blobs migrate      # move the plain-text snapshots in
+    python -m steward.blobs verify       # rebuild every archive and compare
+    python -m steward.blobs train        # (re)train the dictionary
+    python -m steward.blobs stats
+"""
+
+from __future__ import annotations
+
+import argparse
+import difflib
+import hashlib
+import logging
+import lzma
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import archive, content, jsonio
+
+log = logging.getLogger(__name__)
+
+BLOB_DIR = "blobs"
+CODECS = ("auto", "zstd", "zlib", "lzma")
+_MAGIC = b"SB1"
+_DICTIONARY_POINTER = "DICTIONARY"
+_BLOB_ID = re.compile(r"^[0-9a-f]{64}$")
+# Far past any keyframe interval; a longer chain means a damaged store.
+_MAX_CHAIN = 256
+
+
+class BlobError(ValueError):
+    """A blob that is missing, corrupt, or needs a codec this machine lacks."""
+
+
+def blob_id(text: str) -> str:
+    return content.content_hash(text)
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def resolve_codec(codec: str) -> str:
+    """The codec "auto" means here: zstd when zstandard is installed, else zlib."""
+    if codec == "auto":
+        return "zstd" if _zstandard() is not None else "zlib"
+    return codec
+
+
+def train_dictionary(texts: Iterable[str], size: int = 32768) -> bytes:
+    """Lines that recur across documents, commonest last, up to `size` bytes.
+
+    A raw-content dictionary: both zlib and zstd look back into it as if it
+    preceded the text, and favour its end.
+    """
+    counts: Counter = Counter()
+    for text in texts:
+        counts.update({line for line in text.splitlines() if len(line) >= 12})
+    picked: List[bytes] = []
+    total = 0
+    for line, seen in counts.most_common():
+        if seen < 2:
+            break
+        encoded = (line + "\n").encode("utf-8")
+        if total + len(encoded) > size:
+            continue
+        picked.append(encoded)
+        total += len(encoded)
+    return b"".join(reversed(picked))
+
+
+def line_delta(old: str, new: str) -> list:
+    """Ops that rebuild `old` from `new`: `[start, end]` copies lines of `new`,
+    a string is inserted as is. Line endings are kept, so the rebuild is exact."""
+    base = new.splitlines(keepends=True)
+    target = old.splitlines(keepends=True)
+    ops: list = []
+    matcher = difflib.SequenceMatcher(None, base, target, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(target[j1:j2]))
+    return ops
+
+
+def apply_delta(base: str, ops: list) -> str:
+    lines = base.splitlines(keepends=True)
+    return "".join("".join(lines[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+
+class BlobStore:
+    """Blobs under `root`, two hex characters of fan-out: `root/ab/abcdef…`."""
+
+    def __init__(
+        self,
+        root: str = BLOB_DIR,
+        *,
+        codec: str = "auto",
+        level: int = 9,
+        dictionary: bool = True,
+        keyframe_interval: int = 8,
+    ) -> None:
+        self.root = root
+        self.codec = codec
+        self.level = level
+        self.dictionary = dictionary
+        self.keyframe_interval = keyframe_interval
+        self._dictionaries: Dict[str, bytes] = {}
+
+    @classmethod
+    def from_config(cls, settings, root: str = BLOB_DIR) -> "BlobStore":
+        store = cls(root)
+        store.configure(settings)
+        return store
+
+    def configure(self, settings) -> None:
+        self.codec = settings.codec
+        self.level = settings.level
+        self.dictionary = settings.dictionary
+        self.keyframe_interval = settings.keyframe_interval
+
+    # --- paths --------------------------------------------------------------
+
+    def path_for(self, blob: str) -> str:
+        return os.path.join(self.root, blob[:2], blob)
+
+    def has(self, blob: str) -> bool:
+        return bool(blob) and os.path.exists(self.path_for(blob))
+
+    def ids(self) -> Iterator[str]:
+        if not os.path.isdir(self.root):
+            return
+        for shard in sorted(os.listdir(self.root)):
+            folder = os.path.join(self.root, shard)
+            if len(shard) != 2 or not os.path.isdir(folder):
+                continue
+            for name in sorted(os.listdir(folder)):
+                if _BLOB_ID.match(name):
+                    yield name
+
+    # --- dictionary ---------------------------------------------------------
+
+    def _dictionary_path(self, dictionary_id: str) -> str:
+        return os.path.join(self.root, "dictionaries", dictionary_id)
+
+    def _load_dictionary(self, dictionary_id: str) -> bytes:
+        if dictionary_id not in self._dictionaries:
+            try:
+                with open(self._dictionary_path(dictionary_id), "rb") as handle:
+                    self._dictionaries[dictionary_id] = handle.read()
+            except OSError as exc:
+                raise BlobError(f"dictionary {dictionary_id} is missing") from exc
+        return self._dictionaries[dictionary_id]
+
+    def active_dictionary(self) -> str:
+        """The id of the dictionary new blobs use, or "" for none."""
+        if not self.dictionary:
+            return ""
+        try:
+            with open(os.path.join(self.root, _DICTIONARY_POINTER), "r", encoding="ascii") as handle:
+                return handle.read().strip()
+        except OSError:
+            return ""
+
+    def install_dictionary(self, data: bytes) -> str:
+        """Store a dictionary and make it the one new blobs are written with."""
+        dictionary_id = hashlib.sha256(data).hexdigest()[:16]
+        os.makedirs(os.path.dirname(self._dictionary_path(dictionary_id)), exist_ok=True)
+        _write_atomic(self._dictionary_path(dictionary_id), data)
+        _write_atomic(os.path.join(self.root, _DICTIONARY_POINTER), f"{dictionary_id}\n".encode("ascii"))
+        self._dictionaries[dictionary_id] = data
+        return dictionary_id
+
+    # --- encoding -----------------------------------------------------------
+
+    def _encode(self, data: bytes, layout: str) -> bytes:
+        """Header line, then the compressed payload. `layout` is `run=N` for a
+        full text, `delta=<base id>` for a reverse delta."""
+        codec = resolve_codec(self.codec)
+        dictionary_id = self.active_dictionary() if codec != "lzma" else ""
+        dictionary = self._load_dictionary(dictionary_id) if dictionary_id else b""
+        if codec == "zstd":
+            zstandard = _zstandard()
+            if zstandard is None:
+                raise BlobError("blobs.codec is zstd but zstandard is not installed")
+            compressor = zstandard.ZstdCompressor(
+                level=min(self.level, 22),
+                dict_data=(
+                    zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+                    if dictionary
+                    else None
+                ),
+            )
+            payload = compressor.compress(data)
+        elif codec == "lzma":
+            payload = lzma.compress(data, preset=min(self.level, 9))
+        else:
+            codec = "zlib"
+            level = min(self.level, 9)
+            compressor = zlib.compressobj(level, zdict=dictionary) if dictionary else zlib.compressobj(level)
+            payload = compressor.compress(data) + compressor.flush()
+        header = " ".join([_MAGIC.decode("ascii"), codec, dictionary_id or "-", layout])
+        return header.encode("ascii") + b"\n" + payload
+
+    @staticmethod
+    def _layout(header: bytes, blob: str) -> Tuple[str, str, str]:
+        """(codec, dictionary id, layout) from a header line."""
+        parts = header.decode("ascii", "replace").split(" ")
+        if len(parts) == 3:
+            parts.append("run=0")  # written before reverse deltas existed
+        if len(parts) != 4 or parts[0] != _MAGIC.decode("ascii"):
+            raise BlobError(f"blob {blob} has no recognisable header")
+        return parts[1], parts[2], parts[3]
+
+    def _decode(self, raw: bytes, blob: str) -> bytes:
+        header, _, payload = raw.partition(b"\n")
+        codec, dictionary_id, _ = self._layout(header, blob)
+        dictionary = self._load_dictionary(dictionary_id) if dictionary_id != "-" else b""
+        if codec == "zstd":
+            zstandard = _zstandard()
+            if zstandard is None:
+                raise BlobError(f"blob {blob} is zstd-compressed and zstandard is not installed")
+            decompressor = zstandard.ZstdDecompressor(
+                dict_data=(
+                    zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+                    if dictionary
+                    else None
+                )
+            )
+            return decompressor.decompress(payload)
+        if codec == "lzma":
+            return lzma.decompress(payload)
+        if codec == "zlib":
+            decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+            return decompressor.decompress(payload) + decompressor.flush()
+        raise BlobError(f"blob {blob} uses unknown codec {codec!r}")
+
+    def _read(self, blob: str) -> bytes:
+        try:
+            with open(self.path_for(blob), "rb") as handle:
+                return handle.read()
+        except OSError as exc:
+            raise BlobError(f"blob {blob} is missing") from exc
+
+    def layout(self, blob: str) -> Tuple[str, str]:
+        """("run", N) for a blob stored in full, ("delta", base id) for a delta."""
+        try:
+            with open(self.path_for(blob), "rb") as handle:
+                header = handle.readline().rstrip(b"\n")
+        except OSError as exc:
+            raise BlobError(f"blob {blob} is missing") from exc
+        kind, _, value = self._layout(header, blob)[2].partition("=")
+        if kind not in ("run", "delta"):
+            raise BlobError(f"blob {blob} has an unknown layout {kind!r}")
+        return kind, value
+
+    def bases(self, blob: str) -> Iterator[str]:
+        """The blobs `blob` is rebuilt from, nearest first."""
+        for _ in range(_MAX_CHAIN):
+            kind, value = self.layout(blob)
+            if kind == "run":
+                return
+            blob = value
+            yield blob
+        raise BlobError(f"blob {blob} is more than {_MAX_CHAIN} deltas from a full text")
+
+    # --- read and write -----------------------------------------------------
+
+    def _write(self, blob: str, text: str, run: int) -> None:
+        path = self.path_for(blob)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, self._encode(text.encode("utf-8"), f"run={run}"))
+
+    def put(self, text: str, previous: Optional[str] = None) -> str:
+        """Store `text` and return its id. Text already stored is not rewritten.
+
+        `previous` is the version of the same document that `text` replaces.
+        It is re-stored as a reverse delta against `text`, unless it closes a
+        run of `keyframe_interval` versions and so stays whole as a keyframe.
+        """
+        blob = blob_id(text)
+        if not self.has(blob):
+            run = self._next_run(previous, blob)
+            self._write(blob, text, run)
+        else:
+            kind, value = self.layout(blob)
+            if kind == "delta" and previous and previous != blob:
+                # A return to an older version: it is the newest again, so it
+                # is stored whole. Kept as a keyframe, since its own older
+                # deltas may already hang off it.
+                run = self.keyframe_interval
+                self._write(blob, text, run)
+            else:
+                run = int(value) if kind == "run" else 0
+
+        if previous and previous != blob and self.has(previous):
+            self._chain(previous, blob, text, run)
+        return blob
+
+    def _next_run(self, previous: Optional[str], blob: str) -> int:
+        """The run a new full text starts with: one more than the version it
+        replaces, if that version will become a delta against it."""
+        if not previous or previous == blob or not self.has(previous):
+            return 0
+        kind, value = self.layout(previous)
+        if kind == "run" and int(value) + 1 < self.keyframe_interval:
+            return int(value) + 1
+        return 0
+
+    def _chain(self, previous: str, blob: str, text: str, run: int) -> None:
+        kind, value = self.layout(previous)
+        if kind != "run" or int(value) + 1 >= self.keyframe_interval:
+            return  # already a delta, or a keyframe
+        older = self.get(previous)
+        encoded = self._encode(jsonio.dumps(line_delta(older, text)), f"delta={blob}")
+        if len(encoded) >= os.path.getsize(self.path_for(previous)):
+            return  # the delta would be no smaller than the text
+        if int(value) + 1 > run:
+            self._write(blob, text, int(value) + 1)
+        _write_atomic(self.path_for(previous), encoded)
+
+    def get(self, blob: str) -> str:
+        """The text stored under `blob`; BlobError if it is missing or damaged."""
+        deltas = []
+        current = blob
+        for _ in range(_MAX_CHAIN + 1):
+            raw = self._read(current)
+            header = raw.partition(b"\n")[0]
+            kind, _, value = self._layout(header, current)[2].partition("=")
+            try:
+                data = self._decode(raw, current).decode("utf-8")
+            except (zlib.error, lzma.LZMAError, UnicodeDecodeError) as exc:
+                raise BlobError(f"blob {current} is corrupt: {exc}") from exc
+            if kind != "delta":
+                break
+            try:
+                deltas.append(jsonio.loads(data))
+            except ValueError as exc:
+                raise BlobError(f"blob {current} is corrupt: {exc}") from exc
+            current = value
+        else:
+            raise BlobError(f"blob {blob} is more than {_MAX_CHAIN} deltas from a full text")
+
+        text = data
+        for ops in reversed(deltas):
+            text = apply_delta(text, ops)
+        if blob_id(text) != blob:
+            raise BlobError(f"blob {blob} does not hash to its id")
+        return text
+
+    def get_or(self, blob: str, default: str = "") -> str:
+        try:
+            return self.get(blob) if blob else default
+        except BlobError:
+            return default
+
+    # --- snapshots ----------------------------------------------------------
+
+    def put_snapshot(self, aggregate: str, previous: Optional[Dict[str, str]] = None) -> dict:
+        """Store an aggregate snapshot as per-document blobs; return its manifest.
+
+        `previous` maps url to the blob each document held before, for
+        `put`'s reverse deltas.
+        """
+        previous = previous or {}
+        sections = content.split_aggregate(aggregate)
+        if sections and content.build_aggregate(sections.items()) == aggregate:
+            return {
+                "documents": [[url, self.put(text, previous.get(url))] for url, text in sections.items()]
+            }
+        return {"blob": self.put(aggregate)}
+
+    def get_snapshot(self, manifest: dict) -> str:
+        """The aggregate a manifest from `put_snapshot` was made from."""
+        if "blob" in manifest:
+            return self.get(manifest["blob"])
+        return content.build_aggregate(
+            (url, self.get(blob)) for url, blob in manifest.get("documents") or []
+        )
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as handle:
+        handle.write(data)
+    os.replace(tmp, path)
+
+
+# --- Archived snapshots --------------------------------------------------------
+
+SNAPSHOT_MANIFEST_SUFFIX = "_snapshot.json"
+LEGACY_SNAPSHOT_SUFFIX = "_snapshot.txt"
+
+
+def write_manifest(path: str, manifest: dict) -> None:
+    jsonio.save(manifest, path)
+
+
+def read_manifest(path: str) -> Optional[dict]:
+    try:
+        manifest = jsonio.load(path)
+    except (OSError, ValueError):
+        return None
+    return manifest if isinstance(manifest, dict) else None
+
+
+def manifest_ids(manifest: dict) -> List[str]:
+    if "blob" in manifest:
+        return [manifest["blob"]]
+    return [blob for _, blob in manifest.get("documents") or []]
+
+
+def read_archived_snapshot(store: BlobStore, prefix: str) -> str:
+    """The aggregate archived as `{prefix}_snapshot.json`, or the plain-text
+    `{prefix}_snapshot.txt` from before the blob store; "" if neither."""
+    manifest = read_manifest(prefix + SNAPSHOT_MANIFEST_SUFFIX)
+    if manifest is not None:
+        try:
+            return store.get_snapshot(manifest)
+        except BlobError as exc:
+            log.warning("Archived snapshot %s is unreadable: %s", prefix, exc)
+    try:
+        with open(prefix + LEGACY_SNAPSHOT_SUFFIX, "r", encoding="utf-8") as handle:
+            return handle.read()
+    except OSError:
+        return ""
+
+
+def store_for(log_dir: str) -> BlobStore:
+    """The store that sits beside a logs/ directory, as blobs/ sits beside logs/."""
+    return BlobStore(os.path.join(os.path.dirname(os.path.abspath(log_dir)), BLOB_DIR))
+
+
+def referenced(hashes: Dict[str, dict], log_dir: str) -> set:
+    """Every blob a document record or an archived snapshot still points at."""
+    keep = set()
+    for entry in hashes.values():
+        for record in (entry.get("documents") or {}).values() if isinstance(entry, dict) else ():
+            keep.add(record.get("hash"))
+            keep.update(record.get("seen_hashes") or {})
+    for member in archive.files(log_dir, suffixes=(archive.SNAPSHOT_MANIFEST,)):
+        keep.update(manifest_ids(read_manifest(member.path) or {}))
+    keep.discard(None)
+    return keep
+
+
+def sweep(store: BlobStore, keep: set) -> int:
+    """Delete blobs nothing points at any more, once their archives are pruned.
+
+    A blob that a kept blob is rebuilt from is kept too.
+    """
+    needed = set()
+    for blob in keep:
+        if store.has(blob):
+            needed.add(blob)
+            try:
+                needed.update(store.bases(blob))
+            except BlobError as exc:
+                log.warning("Keeping blobs around %s: %s", blob, exc)
+                return 0
+    removed = 0
+    for blob in list(store.ids()):
+        if blob not in needed:
+            try:
+                os.remove(store.path_for(blob))
+                removed += 1
+            except OSError as exc:
+                log.warning("Could not remove blob %s: %s", blob, exc)
+    return removed
+
+
+# --- Migration -----------------------------------------------------------------
+
+def archived_snapshots(log_dir: str) -> Dict[str, List[Tuple[str, str]]]:
+    """{file_id: [(stamp, path), ...]} of archived snapshots, oldest first.
+
+    Where a stamp has both a manifest and a plain-text original, the manifest
+    is listed.
+    """
+    found: Dict[str, Dict[str, str]] = {}
+    for member in archive.files(log_dir, suffixes=(archive.SNAPSHOT_MANIFEST, archive.SNAPSHOT_TEXT)):
+        stamps = found.setdefault(member.file_id, {})
+        if member.suffix == archive.SNAPSHOT_MANIFEST or member.stamp not in stamps:
+            stamps[member.stamp] = member.path
+    return {file_id: sorted(stamps.items()) for file_id, stamps in found.items()}
+
+
+def _legacy_documents(snapshots_dir: str, file_id: str) -> Dict[str, str]:
+    """{doc_id: path} of a set's pre-blob per-document snapshots."""
+    folder = os.path.join(snapshots_dir, file_id)
+    if not os.path.isdir(folder):
+        return {}
+    return {
+        name[: -len(".txt")]: os.path.join(folder, name)
+        for name in sorted(os.listdir(folder))
+        if name.endswith(".txt")
+    }
+
+
+def _read_exact(path: str) -> str:
+    with open(path, "r", encoding="utf-8", newline="") as handle:
+        return handle.read()
+
+
+def migrate(
+    store: BlobStore, *, snapshots_dir: str = "snapshots", log_dir: str = "logs", remove: bool = True
+) -> Dict[str, int]:
+    """Move per-document snapshots and archived `_snapshot.txt` files into the store.
+
+    Each set's archives are stored oldest first, so every document forms one
+    chain: older versions become reverse deltas of newer ones, and the
+    current per-document snapshot is the newest, stored whole. Archives
+    already migrated are re-chained the same way. Nothing is deleted until
+    every archive has been rebuilt from the store and compared byte for byte
+    with its original.
+    """
+    counts = {"documents": 0, "archives": 0, "bytes_before": 0}
+    originals: Dict[str, str] = {}
+    manifests: Dict[str, dict] = {}
+    legacy: List[str] = []
+
+    archives = archived_snapshots(log_dir)
+    file_ids = set(archives)
+    if os.path.isdir(snapshots_dir):
+        file_ids.update(n for n in os.listdir(snapshots_dir) if os.path.isdir(os.path.join(snapshots_dir, n)))
+
+    for file_id in sorted(file_ids):
+        latest: Dict[str, str] = {}
+        for _, path in archives.get(file_id, []):
+            if path.endswith(LEGACY_SNAPSHOT_SUFFIX):
+                aggregate = _read_exact(path)
+                originals[path] = aggregate
+                manifest = store.put_snapshot(aggregate, previous=latest)
+                manifests[path[: -len(LEGACY_SNAPSHOT_SUFFIX)] + SNAPSHOT_MANIFEST_SUFFIX] = manifest
+                counts["archives"] += 1
+                counts["bytes_before"] += len(aggregate.encode("utf-8"))
+            else:
+                manifest = read_manifest(path) or {}
+                for url, blob in manifest.get("documents") or []:
+                    store.put(store.get(blob), previous=latest.get(url))
+            latest.update(manifest.get("documents") or [])
+
+        by_doc_id = {content.document_id(url): blob for url, blob in latest.items()}
+        for doc_id, path in _legacy_documents(snapshots_dir, file_id).items():
+            with open(path, "r", encoding="utf-8") as handle:
+                text = handle.read()
+            store.put(text, previous=by_doc_id.get(doc_id))
+            legacy.append(path)
+            counts["documents"] += 1
+            counts["bytes_before"] += os.path.getsize(path)
+
+    for path, manifest in manifests.items():
+        write_manifest(path, manifest)
+    problems = verify(store, log_dir, originals)
+    if problems:
+        raise BlobError(f"{len(problems)} archive(s) did not survive migration, originals kept: {problems[:3]}")
+
+    if remove:
+        for path in [*originals, *legacy]:
+            os.remove(path)
+        for name in os.listdir(snapshots_dir) if os.path.isdir(snapshots_dir) else []:
+            folder = os.path.join(snapshots_dir, name)
+            if os.path.isdir(folder) and not os.listdir(folder):
+                os.rmdir(folder)
+    return counts
+
+
+def verify(store: BlobStore, log_dir: str, originals: Optional[Dict[str, str]] = None) -> List[str]:
+    """Rebuild every archived snapshot from the store; name the ones that fail.
+
+    Each blob is checked against its own hash as it is read. Where the
+    plain-text original is still on disk, or given in `originals` by path,
+    the rebuild must equal it byte for byte.
+    """
+    problems = []
+    for file_id, archives in sorted(archived_snapshots(log_dir).items()):
+        for stamp, path in archives:
+            if not path.endswith(SNAPSHOT_MANIFEST_SUFFIX):
+                continue
+            prefix = path[: -len(SNAPSHOT_MANIFEST_SUFFIX)]
+            original_path = prefix + LEGACY_SNAPSHOT_SUFFIX
+            try:
+                rebuilt = store.get_snapshot(read_manifest(path) or {})
+            except BlobError as exc:
+                problems.append(f"{file_id} {stamp}: {exc}")
+                continue
+            if originals is not None and original_path in originals:
+                original = originals[original_path]
+            elif os.path.exists(original_path):
+                original = _read_exact(original_path)
+            else:
+                continue
+            if rebuilt.encode("utf-8") != original.encode("utf-8"):
+                problems.append(f"{file_id} {stamp}: rebuilt text differs from the original")
+    return problems
+
+
+def chain_depths(store: BlobStore) -> Counter:
+    """How many blobs sit how many deltas from a full text."""
+    return Counter(len(list(store.bases(blob))) for blob in store.ids())
+
+
+def stats(store: BlobStore) -> Dict[str, int]:
+    blobs = 0
+    size = 0
+    for blob in store.ids():
+        blobs += 1
+        size += os.path.getsize(store.path_for(blob))
+    return {"blobs": blobs, "bytes": size}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .config import ConfigError, load_config
+
+    parser = argparse.ArgumentParser(description="Manage the content-addressed snapshot store.")
+    parser.add_argument("command", choices=("migrate", "verify", "train", "stats"))
+    parser.add_argument("--config", default="steward_config.yaml")
+    parser.add_argument("--keep", action="store_true", help="migrate without deleting the originals")
+    parser.add_argument("--dictionary-bytes", type=int, default=32768)
+    args = parser.parse_args(argv)
+
+    try:
+        cfg = load_config(args.config)
+    except ConfigError as exc:
+        print(f"Configuration error — {exc}")
+        return 1
+    store = BlobStore.from_config(cfg.blobs)
+
+    if args.command == "migrate":
+        counts = migrate(store, remove=not args.keep)
+        after = stats(store)
+        print(
+            f"Moved {counts['documents']} document snapshot(s) and {counts['archives']} archive(s), "
+            f"{counts['bytes_before']} bytes, into {after['blobs']} blob(s) of {after['bytes']} bytes"
+        )
+    elif args.command == "verify":
+        problems = verify(store, "logs")
+        for problem in problems:
+            print(f"  {problem}")
+        print(f"{len(problems)} archive(s) failed to rebuild" if problems else "Every archive rebuilds exactly")
+        return 1 if problems else 0
+    elif args.command == "train":
+        data = train_dictionary((store.get(blob) for blob in store.ids()), args.dictionary_bytes)
+        if not data:
+            print("Not enough recurring text to train a dictionary")
+            return 1
+        print(f"Dictionary {store.install_dictionary(data)} ({len(data)} bytes) is now used for new blobs")
+    else:
+        found = stats(store)
+        depths = ", ".join(f"{n} at {depth}" for depth, n in sorted(chain_depths(store).items()))
+        print(f"{found['blobs']} blob(s), {found['bytes']} bytes, codec {resolve_codec(store.codec)}")
+        print(f"  deltas from a full text: {depths or 'none'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
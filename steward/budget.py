@@ -0,0 +1,114 @@
+"""Token budget: decide before sending which changes this run can afford.
+
+`_usage` only reports what a call cost after it returned, and nothing bounded
+a run in which every source changed at once. Each changed set's prompt is
+estimated before any call is made, and the sets are admitted in priority
+order until the run's budget — or what is left of the day's — is spent.
+
+A set that does not fit is deferred, not dropped: `main.py` restores its
+prior hashes exactly as it does after a schema failure, so the same diff comes
+back next run as `analysis_pending`.
+
+Priority, highest first: watchlist hits, then the other fingerprint tags,
+then the set's category in `budget.category_order`. A change that does not fit
+does not block smaller ones behind it.
+
+A set whose estimate alone is over `budget.run_tokens` (or `day_tokens`)
+would never fit. It would wait in `analysis_pending` for good. So when a run
+admits nothing else, the first such set is admitted on its own, as long as
+the day's budget is not already spent. The run goes over its budget by that
+one set, and the log says so.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class Candidate:
+    set_name: str
+    category: str
+    tags: Sequence[str]
+    estimated_tokens: int
+
+
+@dataclass
+class Schedule:
+    admitted: List[int] = field(default_factory=list)
+    deferred: List[int] = field(default_factory=list)
+    estimated_tokens: int = 0
+
+
+def priority_key(candidate: Candidate, category_order: Sequence[str]) -> tuple:
+    watchlist = sum(1 for tag in candidate.tags if tag.startswith("watchlist:"))
+    patterns = len(candidate.tags) - watchlist
+    try:
+        rank = list(category_order).index(candidate.category)
+    except ValueError:
+        rank = len(category_order)
+    return (-watchlist, -patterns, rank)
+
+
+def remaining(limit: int, spent: int) -> Optional[int]:
+    """Tokens left under a limit, or None when the limit is 0 (unlimited)."""
+    if not limit:
+        return None
+    return max(0, limit - spent)
+
+
+def schedule(
+    candidates: Sequence[Candidate],
+    *,
+    run_tokens: int = 0,
+    day_tokens: int = 0,
+    spent_today: int = 0,
+    category_order: Sequence[str] = (),
+) -> Schedule:
+    """Indices of the candidates to analyse now and those to defer."""
+    limits = [r for r in (remaining(run_tokens, 0), remaining(day_tokens, spent_today)) if r is not None]
+    allowance = min(limits) if limits else None
+    # The most any run could ever admit, for telling "not now" from "never".
+    ceilings = [limit for limit in (run_tokens, day_tokens) if limit]
+    ceiling = min(ceilings) if ceilings else None
+
+    order = sorted(
+        range(len(candidates)),
+        key=lambda i: (priority_key(candidates[i], category_order), i),
+    )
+
+    plan = Schedule()
+    for index in order:
+        cost = candidates[index].estimated_tokens
+        if allowance is not None and plan.estimated_tokens + cost > allowance:
+            plan.deferred.append(index)
+            continue
+        plan.admitted.append(index)
+        plan.estimated_tokens += cost
+
+    never_fit = [i for i in plan.deferred if ceiling is not None and candidates[i].estimated_tokens > ceiling]
+    if not plan.admitted and never_fit and allowance:
+        index = never_fit[0]
+        plan.deferred.remove(index)
+        plan.admitted.append(index)
+        plan.estimated_tokens += candidates[index].estimated_tokens
+        log.warning(
+            "'%s' needs ~%d tokens, more than the budget allows any run (%d); admitted alone",
+            candidates[index].set_name,
+            candidates[index].estimated_tokens,
+            ceiling,
+        )
+
+    if plan.deferred:
+        log.warning(
+            "Token budget admits %d of %d changed set(s) (~%d tokens); deferring: %s",
+            len(plan.admitted),
+            len(candidates),
+            plan.estimated_tokens,
+            ", ".join(candidates[i].set_name for i in plan.deferred),
+        )
+    return plan
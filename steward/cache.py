@@ -0,0 +1,116 @@
+"""Content-addressed cache of validated analyses.
+
+Perplexity's page flips between two versions often enough to have filled
+logs/ with a few hundred archives, and an `analysis_pending` change is sent
+again on the next run. Both send the model a diff it has already answered.
+The cache is keyed by a hash of everything that shapes the answer — model,
+prompt version, diff, changed documents and fingerprint — so an identical
+question is answered from disk for zero tokens, and any change to the prompt
+or the model is a miss rather than a stale answer.
+
+Only results that passed `parse_and_validate` are stored. Entries expire by
+age, and the least recently used are dropped past the size cap, when the
+cache is saved at the end of a run.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from . import commit, jsonio
+
+log = logging.getLogger(__name__)
+
+CACHE_FILE = "analysis_cache.json"
+
+
+class AnalysisCache:
+    def __init__(
+        self,
+        path: str = CACHE_FILE,
+        *,
+        max_age_days: int = 180,
+        max_entries: int = 500,
+        entries: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> None:
+        self.path = path
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        self.entries: Dict[str, Dict[str, Any]] = entries or {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path: str = CACHE_FILE, **kwargs: Any) -> "AnalysisCache":
+        entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                loaded = jsonio.load(path)
+                if isinstance(loaded, dict):
+                    entries = {k: v for k, v in loaded.items() if isinstance(v, dict)}
+            except (OSError, ValueError):
+                log.warning("Failed to read %s, starting with an empty analysis cache", path)
+        return cls(path, entries=entries, **kwargs)
+
+    def _now(self) -> datetime:
+        return datetime.now().astimezone()
+
+    def _expired(self, entry: Dict[str, Any], now: datetime) -> bool:
+        try:
+            stored = datetime.fromisoformat(entry.get("stored_at", ""))
+        except (TypeError, ValueError):
+            return True
+        return stored < now - timedelta(days=self.max_age_days)
+
+    def has(self, key: str) -> bool:
+        """Whether `get` would hit, without counting it as a lookup."""
+        entry = self.entries.get(key)
+        return entry is not None and not self._expired(entry, self._now())
+
+    def get(self, key: str) -> Optional[dict]:
+        """The stored result for this key, or None."""
+        entry = self.entries.get(key)
+        now = self._now()
+        if entry is None or self._expired(entry, now) or not isinstance(entry.get("result"), dict):
+            self.misses += 1
+            return None
+        entry["last_used"] = now.isoformat()
+        self.hits += 1
+        return dict(entry["result"])
+
+    def put(self, key: str, result: dict, *, model: str = "") -> None:
+        now = self._now().isoformat()
+        self.entries[key] = {
+            "result": dict(result),
+            "model": model,
+            "stored_at": now,
+            "last_used": now,
+        }
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used past the cap."""
+        now = self._now()
+        before = len(self.entries)
+        self.entries = {k: v for k, v in self.entries.items() if not self._expired(v, now)}
+        if len(self.entries) > self.max_entries:
+            ranked = sorted(
+                self.entries.items(),
+                key=lambda item: item[1].get("last_used") or item[1].get("stored_at") or "",
+                reverse=True,
+            )
+            self.entries = dict(ranked[: self.max_entries])
+        return before - len(self.entries)
+
+    def save(self) -> None:
+        evicted = self.evict()
+        commit.replace_if_changed(self.path, jsonio.dumps(self.entries, sort_keys=True))
+        log.info(
+            "Analysis cache: %d hit(s), %d miss(es), %d evicted, %d stored",
+            self.hits,
+            self.misses,
+            evicted,
+            len(self.entries),
+        )
@@ -0,0 +1,212 @@
+"""A run's artefacts, put in place together or not at all.
+
+Each set's snapshot, diff, analysis and archives, then hashes.json and the
+health report, used to be written one file at a time as the run went. A run
+killed half way (a timeout, a cancelled workflow) left some sets' files
+updated and hashes.json not, or the reverse. Now `main.py` stages every
+artefact under `.commit/` as it goes, and at the end:
+
+1. drops each staged file whose bytes are the ones already in place, and
+   fsyncs the rest back to back;
+2. writes the journal, `.commit/journal.json`, listing each staged file and
+   where it goes, in the order they were staged, and fsyncs it and the
+   staging directory;
+3. renames each staged file over its target in that order, and deletes the
+   files marked for removal;
+4. fsyncs the target directories and deletes `.commit/`.
+
+The journal is only written once everything it names is on disk, so the
+next run's `recover` can always settle an interrupted run. With a journal
+it rolls forward: a staged file that is still there has not been renamed
+yet, one that is gone has. Without one it rolls back and deletes what was
+staged. Either way the result is one run's files, whole.
+
+Blobs are not staged. They are named by their content, so a blob from a
+rolled-back run is only a file nothing refers to, and the next sweep deletes
+it. The analysis cache is not staged either: an answer that was paid for is
+worth keeping even if the run that asked for it rolls back.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+from typing import Dict, List, Optional
+
+from . import jsonio
+
+log = logging.getLogger(__name__)
+
+STAGING_DIR = ".commit"
+JOURNAL_NAME = "journal.json"
+
+ROLLED_FORWARD = "rolled_forward"
+ROLLED_BACK = "rolled_back"
+
+
+def _fsync(path: str) -> None:
+    """fsync a file or a directory. Directories can't be opened on Windows; skip them."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Transaction:
+    """Files staged for one run, keyed by the path each one replaces.
+
+    Nothing outside `directory` changes until `commit`. Staging the same
+    target again replaces what was staged for it, in the same place in the
+    order.
+    """
+
+    def __init__(self, directory: str = STAGING_DIR) -> None:
+        self.directory = directory
+        # target -> staged path, or None to delete the target. Insertion
+        # ordered, so this is also the order of the renames.
+        self._ops: Dict[str, Optional[str]] = {}
+        self._count = 0
+        self.committed = False
+
+    @classmethod
+    def open(cls, directory: str = STAGING_DIR) -> "Transaction":
+        """Start one. The staging directory exists from here until the commit
+        finishes, so a run that stops anywhere in between is rolled back."""
+        os.makedirs(directory, exist_ok=True)
+        return cls(directory)
+
+    def stage(self, target: str) -> str:
+        """Where to write `target`'s new content. It goes in place at commit."""
+        previous = self._ops.get(target)
+        if previous and os.path.lexists(previous):
+            os.remove(previous)
+        self._count += 1
+        staged = os.path.join(self.directory, f"{self._count:05d}_{os.path.basename(target)}")
+        self._ops[target] = staged
+        return staged
+
+    def remove(self, target: str) -> None:
+        """Delete `target` at commit, if it exists then."""
+        previous = self._ops.get(target)
+        if previous and os.path.lexists(previous):
+            os.remove(previous)
+        self._ops[target] = None
+
+    def current(self, path: str) -> str:
+        """`path` as this run left it: its staged file if there is one."""
+        return self._ops.get(path) or path
+
+    def commit(self) -> List[str]:
+        """Put every staged file in place. Returns the targets that changed."""
+        if self.committed:
+            return []
+        self.committed = True
+        for target, staged in list(self._ops.items()):
+            if staged is None and not os.path.lexists(target):
+                del self._ops[target]
+            elif staged and same_bytes(staged, target):
+                os.remove(staged)
+                del self._ops[target]
+        if not self._ops:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            return []
+
+        for staged in self._ops.values():
+            if staged:
+                _fsync(staged)
+
+        # Renamed into place, so a journal that exists is a whole one.
+        journal = os.path.join(self.directory, JOURNAL_NAME)
+        ops = [{"target": target, "staged": staged} for target, staged in self._ops.items()]
+        with open(f"{journal}.tmp", "wb") as handle:
+            handle.write(jsonio.dumps({"ops": ops}))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(f"{journal}.tmp", journal)
+        _fsync(self.directory)
+
+        _apply(ops)
+        shutil.rmtree(self.directory, ignore_errors=True)
+        return list(self._ops)
+
+
+
+def same_bytes(path: str, other: str) -> bool:
+    """Whether two files hold the same bytes. False if either is missing."""
+    try:
+        if os.path.getsize(path) != os.path.getsize(other):
+            return False
+        with open(path, "rb") as one, open(other, "rb") as two:
+            while True:
+                block = one.read(1 << 16)
+                if block != two.read(1 << 16):
+                    return False
+                if not block:
+                    return True
+    except OSError:
+        return False
+
+
+def replace_if_changed(path: str, data: bytes) -> bool:
+    """Write `data` to `path` (temp file, then rename) unless it holds exactly that already.
+
+    Returns whether it wrote. For the indexes rebuilt after the commit.
+    """
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, "rb") as handle:
+                if handle.read() == data:
+                    return False
+    except OSError:
+        pass
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as handle:
+        handle.write(data)
+    os.replace(tmp, path)
+    return True
+
+
+def _apply(ops: List[dict]) -> None:
+    touched = set()
+    for op in ops:
+        target, staged = op["target"], op.get("staged")
+        if staged is None:
+            if os.path.lexists(target):
+                os.remove(target)
+        elif os.path.lexists(staged):
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            os.replace(staged, target)
+        touched.add(os.path.dirname(target) or ".")
+    for directory in sorted(touched):
+        _fsync(directory)
+
+
+def recover(directory: str = STAGING_DIR) -> Optional[str]:
+    """Settle a run that stopped before its commit finished.
+
+    Returns ROLLED_FORWARD, ROLLED_BACK, or None when there was nothing to do.
+    """
+    if not os.path.isdir(directory):
+        return None
+    journal = os.path.join(directory, JOURNAL_NAME)
+    try:
+        ops = jsonio.load(journal)["ops"]
+    except FileNotFoundError:
+        ops = None
+    except (OSError, ValueError, KeyError, TypeError):
+        log.warning("Unreadable commit journal %s, rolling back", journal)
+        ops = None
+
+    if ops is None:
+        shutil.rmtree(directory, ignore_errors=True)
+        return ROLLED_BACK
+    _apply(ops)
+    shutil.rmtree(directory, ignore_errors=True)
+    return ROLLED_FORWARD
@@ -33,6 +33,16 @@ class FetchConfig:
     )
 
 
+@dataclass
+class PipelineConfig:
+    fetch_workers: int = 4
+    check_workers: int = 2
+    queue_depth: int = 8
+    # "thread": check workers do the CPU work themselves. "process": they
+    # hand it to a pool of check_workers processes (steward/examine.py).
+    check_backend: str = "thread"
+
+
 @dataclass
 class ValidationConfig:
     min_length: int = 500
@@ -51,6 +61,7 @@ class NormalisationConfig:
 class DiffConfig:
     context_lines: int = 3
     max_diff_chars: int = 40000
+    history_size: int = 20
 
 
 @dataclass
@@ -58,6 +69,54 @@ class FingerprintConfig:
     watchlist: List[str] = field(default_factory=list)
 
 
+@dataclass
+class TriageConfig:
+    enabled: bool = True
+    rules: List[str] = field(default_factory=lambda: ["date_stamp", "typography", "link"])
+    max_changed_lines: int = 20
+
+
+@dataclass
+class AnalysisConfig:
+    concurrency: int = 4
+    requests_per_minute: int = 10
+    tokens_per_minute: int = 250000
+    max_retries: int = 3
+    backoff_seconds: float = 2.0
+    base_url: str = ""
+    chunked: bool = True
+    max_chunks: int = 12
+    bundle: bool = False
+    bundle_max_sets: int = 6
+    bundle_max_chars: int = 6000
+    context_cache: bool = True
+    context_cache_ttl_seconds: int = 900
+    context_cache_min_tokens: int = 1024
+    streaming: bool = False
+
+
+@dataclass
+class RoutingConfig:
+    fast_model: str = ""
+    max_changed_lines: int = 10
+    fast_tags: List[str] = field(default_factory=list)
+    escalate_uncertain: bool = True
+
+
+@dataclass
+class CacheConfig:
+    enabled: bool = True
+    max_age_days: int = 180
+    max_entries: int = 500
+
+
+@dataclass
+class BudgetConfig:
+    run_tokens: int = 0
+    day_tokens: int = 0
+    category_order: List[str] = field(default_factory=list)
+
+
 @dataclass
 class HealthConfig:
     consecutive_failure_threshold: int = 3
@@ -65,6 +124,20 @@ class HealthConfig:
     schema_failure_threshold: int = 2
 
 
+@dataclass
+class BlobConfig:
+    codec: str = "auto"
+    level: int = 9
+    dictionary: bool = True
+    keyframe_interval: int = 8
+
+
+@dataclass
+class StateConfig:
+    store: str = "sqlite"
+    path: str = "steward_state.db"
+
+
 @dataclass
 class RetentionConfig:
     log_days: int = 365
@@ -75,11 +148,19 @@ class RetentionConfig:
 class StewardConfig:
     model: str = "gemini-2.5-flash"
     fetch: FetchConfig = field(default_factory=FetchConfig)
+    pipeline: PipelineConfig = field(default_factory=PipelineConfig)
     validation: ValidationConfig = field(default_factory=ValidationConfig)
     normalisation: NormalisationConfig = field(default_factory=NormalisationConfig)
     diff: DiffConfig = field(default_factory=DiffConfig)
     fingerprint: FingerprintConfig = field(default_factory=FingerprintConfig)
+    triage: TriageConfig = field(default_factory=TriageConfig)
+    analysis: AnalysisConfig = field(default_factory=AnalysisConfig)
+    routing: RoutingConfig = field(default_factory=RoutingConfig)
+    cache: CacheConfig = field(default_factory=CacheConfig)
+    budget: BudgetConfig = field(default_factory=BudgetConfig)
     health: HealthConfig = field(default_factory=HealthConfig)
+    blobs: BlobConfig = field(default_factory=BlobConfig)
+    state: StateConfig = field(default_factory=StateConfig)
     retention: RetentionConfig = field(default_factory=RetentionConfig)
 
     def noise_patterns_for(self, host: str) -> List[str]:
@@ -171,6 +252,11 @@ def _build(cls: Any, data: Any, path: str = "") -> Any:
 # --- Range checks ----------------------------------------------------------
 
 
+# steward/triage.py RULES; repeated here so loading config imports nothing else.
+_TRIAGE_RULES = ("date_stamp", "typography", "link")
+_BLOB_CODECS = ("auto", "zstd", "zlib", "lzma")
+
+
 def _check(condition: bool, message: str) -> None:
     if not condition:
         raise ConfigError(message)
@@ -186,6 +272,12 @@ def validate(cfg: StewardConfig) -> StewardConfig:
     _check(f.page_load_timeout > 0, "fetch.page_load_timeout: must be greater than 0")
     _check(bool(f.user_agent.strip()), "fetch.user_agent: must not be empty")
 
+    p = cfg.pipeline
+    _check(p.fetch_workers >= 1, "pipeline.fetch_workers: must be at least 1")
+    _check(p.check_workers >= 1, "pipeline.check_workers: must be at least 1")
+    _check(p.queue_depth >= 1, "pipeline.queue_depth: must be at least 1")
+    _check(p.check_backend in ("thread", "process"), "pipeline.check_backend: must be 'thread' or 'process'")
+
     v = cfg.validation
     _check(v.min_length >= 0, "validation.min_length: must not be negative")
     _check(0 < v.shrink_ratio < 1, "validation.shrink_ratio: must be between 0 and 1 exclusive")
@@ -195,6 +287,43 @@ def validate(cfg: StewardConfig) -> StewardConfig:
     d = cfg.diff
     _check(d.context_lines >= 0, "diff.context_lines: must not be negative")
     _check(d.max_diff_chars > 0, "diff.max_diff_chars: must be greater than 0")
+    _check(d.history_size >= 0, "diff.history_size: must not be negative")
+
+    t = cfg.triage
+    unknown = [rule for rule in t.rules if rule not in _TRIAGE_RULES]
+    _check(
+        not unknown,
+        f"triage.rules: unknown rule(s) {', '.join(unknown)}; expected {', '.join(_TRIAGE_RULES)}",
+    )
+    _check(t.max_changed_lines >= 0, "triage.max_changed_lines: must not be negative")
+
+    a = cfg.analysis
+    _check(a.concurrency >= 1, "analysis.concurrency: must be at least 1")
+    _check(a.requests_per_minute >= 0, "analysis.requests_per_minute: must not be negative")
+    _check(a.tokens_per_minute >= 0, "analysis.tokens_per_minute: must not be negative")
+    _check(a.max_retries >= 0, "analysis.max_retries: must not be negative")
+    _check(a.backoff_seconds >= 0, "analysis.backoff_seconds: must not be negative")
+    _check(a.max_chunks >= 1, "analysis.max_chunks: must be at least 1")
+    _check(a.bundle_max_sets >= 2, "analysis.bundle_max_sets: must be at least 2")
+    _check(a.bundle_max_chars >= 1, "analysis.bundle_max_chars: must be at least 1")
+    _check(
+        a.context_cache_ttl_seconds >= 60,
+        "analysis.context_cache_ttl_seconds: must be at least 60",
+    )
+    _check(a.context_cache_min_tokens >= 0, "analysis.context_cache_min_tokens: must not be negative")
+
+    _check(
+        cfg.routing.max_changed_lines >= 0,
+        "routing.max_changed_lines: must not be negative",
+    )
+
+    c = cfg.cache
+    _check(c.max_age_days > 0, "cache.max_age_days: must be greater than 0")
+    _check(c.max_entries >= 1, "cache.max_entries: must be at least 1")
+
+    b = cfg.budget
+    _check(b.run_tokens >= 0, "budget.run_tokens: must not be negative")
+    _check(b.day_tokens >= 0, "budget.day_tokens: must not be negative")
 
     h = cfg.health
     _check(
@@ -210,6 +339,15 @@ def validate(cfg: StewardConfig) -> StewardConfig:
         "health.schema_failure_threshold: must be at least 1",
     )
 
+    bl = cfg.blobs
+    _check(bl.codec in _BLOB_CODECS, f"blobs.codec: must be one of {', '.join(_BLOB_CODECS)}")
+    _check(1 <= bl.level <= 22, "blobs.level: must be between 1 and 22")
+    _check(bl.keyframe_interval >= 1, "blobs.keyframe_interval: must be at least 1")
+
+    s = cfg.state
+    _check(s.store in ("sqlite", "json"), "state.store: must be 'sqlite' or 'json'")
+    _check(bool(s.path.strip()), "state.path: must not be empty")
+
     r = cfg.retention
     _check(r.log_days > 0, "retention.log_days: must be greater than 0")
     _check(r.run_log_days > 0, "retention.run_log_days: must be greater than 0")
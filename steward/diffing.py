@@ -6,6 +6,10 @@ non-empty diff proceeds, and what proceeds is the diff itself rather than two
 50,000-character documents — which is both an order of magnitude fewer tokens
 and a sharper analysis, because the model is told where to look.
 
+A diff longer than `diff.max_diff_chars` is truncated for the single-call
+prompt and the stored artefact, but the whole of it is kept on the result so
+`chunk_diffs` can split it, by document and hunk, for map-reduce analysis.
+
 The fingerprint tags changed lines with the things a steward cares about and
 hands them to the model as context. It is never a gate: a genuine content
 change is analysed whether or not it matches anything on the watchlist.
@@ -45,6 +49,8 @@ class DiffResult:
     removed: int = 0
     truncated: bool = False
     tags: list[str] = field(default_factory=list)
+    # The untruncated diff, set only when `text` was truncated.
+    full_text: str = ""
 
     @property
     def is_empty(self) -> bool:
@@ -88,8 +94,12 @@ def compute_diff(
     context_lines: int = 3,
     max_chars: int = 40000,
     watchlist: Sequence[str] = (),
+    versions: tuple[str, str] = ("stored", "current"),
 ) -> DiffResult:
-    """Unified diff of two already-normalised documents."""
+    """Unified diff of two already-normalised documents.
+
+    `versions` names the two sides in the `---`/`+++` headers, after `label`.
+    """
     old_lines = old_text.splitlines()
     new_lines = new_text.splitlines()
 
@@ -97,8 +107,8 @@ def compute_diff(
         difflib.unified_diff(
             old_lines,
             new_lines,
-            fromfile=f"{label} (stored)",
-            tofile=f"{label} (current)",
+            fromfile=f"{label} ({versions[0]})",
+            tofile=f"{label} ({versions[1]})",
             lineterm="",
             n=context_lines,
         )
@@ -107,7 +117,8 @@ def compute_diff(
     added = sum(1 for line in diff_lines if line.startswith("+") and not line.startswith("+++"))
     removed = sum(1 for line in diff_lines if line.startswith("-") and not line.startswith("---"))
 
-    text = "\n".join(diff_lines)
+    full_text = "\n".join(diff_lines)
+    text = full_text
     truncated = False
     if len(text) > max_chars:
         text = text[:max_chars] + "\n… diff truncated …"
@@ -118,7 +129,8 @@ def compute_diff(
         added=added,
         removed=removed,
         truncated=truncated,
-        tags=fingerprint(text, watchlist),
+        tags=fingerprint(full_text, watchlist),
+        full_text=full_text if truncated else "",
     )
 
 
@@ -128,6 +140,69 @@ def combine_diffs(per_document: Sequence[tuple[str, DiffResult]]) -> str:
     for label, result in per_document:
         if result.is_empty:
             continue
-        header = f"===== {label} — +{result.added} / -{result.removed} ====="
-        blocks.append(f"{header}\n{result.text}")
+        blocks.append(f"{_document_header(label, result)}\n{result.text}")
     return "\n\n".join(blocks)
+
+
+def _document_header(label: str, result: DiffResult) -> str:
+    return f"===== {label} — +{result.added} / -{result.removed} ====="
+
+
+def split_hunks(diff_text: str) -> list[str]:
+    """The `@@` hunks of a unified diff, without its file header."""
+    hunks: list[list[str]] = []
+    for line in diff_text.splitlines():
+        if line.startswith("@@"):
+            hunks.append([line])
+        elif hunks:
+            hunks[-1].append(line)
+    return ["\n".join(lines) for lines in hunks]
+
+
+def _fit(hunk: str, budget: int) -> list[str]:
+    """A hunk as pieces of at most `budget` characters, split between lines."""
+    if len(hunk) <= budget:
+        return [hunk]
+    lines = hunk.splitlines()
+    marker = f"{lines[0]} (continued)"
+    pieces: list[str] = []
+    current: list[str] = [lines[0]]
+    size = len(lines[0])
+    for line in lines[1:]:
+        line = line[: budget - len(marker) - 1]
+        if size + 1 + len(line) > budget:
+            pieces.append("\n".join(current))
+            current, size = [marker], len(marker)
+        current.append(line)
+        size += 1 + len(line)
+    pieces.append("\n".join(current))
+    return pieces
+
+
+def chunk_diffs(per_document: Sequence[tuple[str, DiffResult]], max_chars: int) -> list[str]:
+    """The whole change as parts of at most about `max_chars`, split by document
+    and hunk, for map-reduce analysis. Each part names its documents."""
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+    for label, result in per_document:
+        if result.is_empty:
+            continue
+        header = _document_header(label, result)
+        budget = max(1, max_chars - len(header) - 1)
+        opened = False
+        for hunk in split_hunks(result.full_text or result.text):
+            for piece in _fit(hunk, budget):
+                cost = len(piece) + 1 + (0 if opened else len(header) + 1)
+                if current and size + cost > max_chars:
+                    chunks.append("\n".join(current))
+                    current, size, opened = [], 0, False
+                    cost = len(piece) + len(header) + 2
+                if not opened:
+                    current.append(header)
+                    opened = True
+                current.append(piece)
+                size += cost
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
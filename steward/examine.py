@@ -0,0 +1,269 @@
+"""The check stage's CPU work: extract, normalise, validate, hash, diff.
+
+`trafilatura.extract`, BeautifulSoup, `content.normalise` and difflib all
+hold the GIL, so check workers that are threads take turns at them however
+many there are. `examine` is that work as one function of plain data, a
+`Page` in and a `Finding` out, so it can run in another process instead:
+with `pipeline.check_backend: process` each check worker hands its page to a
+pool of `pipeline.check_workers` processes and waits for the answer.
+
+What goes to a process is the page as downloaded, the stored baseline and
+the little it is checked against. What comes back is the verdict, the hash
+and the diff, with the normalised text only when it differs from the
+baseline, which the caller already has.
+
+    python -m steward.examine bench [logs] [--workers 1,2,4] [--limit 0]
+
+times `examine` over the archive: each archived snapshot, as a page, against
+the one before it. It runs them inline, then on threads and on processes at
+each worker count given.
+"""
+
+from __future__ import annotations
+
+import argparse
+import html
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import repeat
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from . import archive, blobs, content, diffing, fetching
+from .validation import ValidationResult, check_failure_signature, validate_capture
+
+
+@dataclass
+class Page:
+    url: str
+    label: str
+    # The page as downloaded, when the fetch left it unread; otherwise
+    # `text` holds what the fetch extracted (the browser path).
+    html: str = ""
+    text: str = ""
+    selector: Optional[str] = None
+    noise_patterns: List[str] = field(default_factory=list)
+    prior_hash: str = ""
+    prior_length: Optional[int] = None
+    # Versions already seen and analysed: a return to one is not diffed.
+    known_hashes: FrozenSet[str] = frozenset()
+    # The stored text to diff against. Empty when there is none, or when it
+    # came from another pipeline version and is not comparable.
+    baseline: str = ""
+
+
+@dataclass(frozen=True)
+class Rules:
+    """The configuration `examine` needs, small enough to send with every page."""
+
+    min_length: int = 500
+    shrink_ratio: float = 0.6
+    growth_ratio: float = 2.5
+    failure_signatures: Tuple[str, ...] = ()
+    context_lines: int = 3
+    max_diff_chars: int = 40000
+    watchlist: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_config(cls, cfg) -> "Rules":
+        return cls(
+            min_length=cfg.validation.min_length,
+            shrink_ratio=cfg.validation.shrink_ratio,
+            growth_ratio=cfg.validation.growth_ratio,
+            failure_signatures=tuple(cfg.validation.failure_signatures),
+            context_lines=cfg.diff.context_lines,
+            max_diff_chars=cfg.diff.max_diff_chars,
+            watchlist=tuple(cfg.fingerprint.watchlist),
+        )
+
+
+@dataclass
+class Finding:
+    # False when a page left unread gave no usable text: the caller escalates.
+    usable: bool = True
+    extractor: Optional[str] = None
+    verdict: Optional[ValidationResult] = None
+    length: int = 0
+    hash: str = ""
+    # The normalised text; None when it is the baseline exactly.
+    text: Optional[str] = None
+    # Set when the text has a baseline to compare with, differs from it and
+    # is not a version already seen.
+    diff: Optional[diffing.DiffResult] = None
+
+
+def examine(page: Page, rules: Rules) -> Finding:
+    """Everything the check stage does to one page that needs no I/O."""
+    raw, extractor = page.text, None
+    if page.html:
+        raw, extractor = fetching.extract_text(page.html, page.url, page.selector)
+        if not raw.strip() or check_failure_signature(raw, rules.failure_signatures):
+            return Finding(usable=False, extractor=extractor)
+
+    normalised = content.normalise(raw, page.noise_patterns)
+    verdict = validate_capture(
+        normalised,
+        page.prior_length,
+        min_length=rules.min_length,
+        shrink_ratio=rules.shrink_ratio,
+        growth_ratio=rules.growth_ratio,
+        failure_signatures=rules.failure_signatures,
+    )
+    finding = Finding(extractor=extractor, verdict=verdict, length=len(normalised), text=normalised)
+    if not verdict.ok:
+        return finding
+
+    finding.hash = content.content_hash(normalised)
+    if page.baseline and normalised == page.baseline:
+        finding.text = None
+    elif (
+        page.baseline
+        and page.prior_hash
+        and finding.hash != page.prior_hash
+        and finding.hash not in page.known_hashes
+    ):
+        finding.diff = diffing.compute_diff(
+            page.baseline,
+            normalised,
+            label=page.label,
+            context_lines=rules.context_lines,
+            max_chars=rules.max_diff_chars,
+            watchlist=rules.watchlist,
+        )
+    return finding
+
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    """Worker processes for `examine`.
+
+    Started by spawning rather than forking: the run forks from inside its
+    stage threads, and a child forked while another thread holds a lock
+    inherits it held.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+# --- Benchmark ---------------------------------------------------------------------
+
+
+def _as_html(title: str, text: str) -> str:
+    """An archived snapshot as a page again, with the chrome extraction is there to remove."""
+    paragraphs = "".join(f"<p>{html.escape(line)}</p>" for line in text.splitlines() if line.strip())
+    return (
+        f"<html><head><title>{html.escape(title)}</title></head><body>"
+        "<nav><a href='/'>Home</a> | <a href='/about'>About us</a> | <a href='/contact'>Contact</a></nav>"
+        f"<main><article><h1>{html.escape(title)}</h1>{paragraphs}</article></main>"
+        "<footer><p>Copyright | Privacy | Accessibility</p></footer></body></html>"
+    )
+
+
+def archived_pages(log_dir: str, cfg, limit: int = 0) -> List[Page]:
+    """Each archived document as a page, against its text in the snapshot before."""
+    store = blobs.store_for(log_dir)
+    archives: Dict[str, Dict[str, str]] = {}
+    for member in archive.files(log_dir, suffixes=(archive.SNAPSHOT_MANIFEST, archive.SNAPSHOT_TEXT)):
+        archives.setdefault(member.file_id, {}).setdefault(member.stamp, member.prefix)
+
+    pages: List[Page] = []
+    for _, prefixes in sorted(archives.items()):
+        stamps = sorted(prefixes)
+        for older, newer in zip(stamps, stamps[1:]):
+            before = content.split_aggregate(blobs.read_archived_snapshot(store, prefixes[older]))
+            after = content.split_aggregate(blobs.read_archived_snapshot(store, prefixes[newer]))
+            for url, text in after.items():
+                if url not in before:
+                    continue
+                noise = cfg.noise_patterns_for(content.host_of(url))
+                baseline = content.normalise(before[url], noise)
+                pages.append(
+                    Page(
+                        url=url,
+                        label=url,
+                        html=_as_html(url, text),
+                        noise_patterns=noise,
+                        prior_hash=content.content_hash(baseline),
+                        prior_length=len(baseline),
+                        baseline=baseline,
+                    )
+                )
+                if limit and len(pages) >= limit:
+                    return pages
+    return pages
+
+
+def _ready(_: Any) -> int:
+    return os.getpid()
+
+
+def _timed(executor: Optional[Executor], pages: Sequence[Page], rules: Rules) -> float:
+    started = time.perf_counter()
+    if executor is None:
+        for page in pages:
+            examine(page, rules)
+    else:
+        list(executor.map(examine, pages, repeat(rules)))
+    return time.perf_counter() - started
+
+
+def bench(pages: Sequence[Page], rules: Rules, workers: Sequence[int] = (1, 2, 4)) -> List[Dict[str, Any]]:
+    """One row per backend per worker count: seconds, pages a second, speedup over inline.
+
+    A process pool's start-up (spawning, importing) is timed apart from the
+    run, as `start_s`: a run pays it once, however many pages it checks.
+    """
+    inline = _timed(None, pages, rules)
+    rows = [{"backend": "inline", "workers": 1, "start_s": 0.0, "seconds": inline}]
+    for count in workers:
+        with ThreadPoolExecutor(max_workers=count) as threads:
+            rows.append(
+                {"backend": "thread", "workers": count, "start_s": 0.0, "seconds": _timed(threads, pages, rules)}
+            )
+        started = time.perf_counter()
+        with process_pool(count) as processes:
+            list(processes.map(_ready, range(count * 4)))
+            start = time.perf_counter() - started
+            rows.append(
+                {"backend": "process", "workers": count, "start_s": start, "seconds": _timed(processes, pages, rules)}
+            )
+    for row in rows:
+        row["pages"] = len(pages)
+        row["pages_per_s"] = len(pages) / row["seconds"] if row["seconds"] else 0.0
+        row["speedup"] = inline / row["seconds"] if row["seconds"] else 0.0
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .config import ConfigError, load_config
+
+    parser = argparse.ArgumentParser(description="Time the check stage's CPU work over the archive.")
+    parser.add_argument("command", choices=("bench",))
+    parser.add_argument("log_dir", nargs="?", default="logs")
+    parser.add_argument("--config", default="steward_config.yaml")
+    parser.add_argument("--workers", default="1,2,4", help="worker counts, comma separated (default 1,2,4)")
+    parser.add_argument("--limit", type=int, default=0, help="pages to time; 0 for all (default)")
+    args = parser.parse_args(argv)
+
+    try:
+        cfg = load_config(args.config)
+    except ConfigError as exc:
+        print(f"Configuration error — {exc}")
+        return 1
+    counts = [int(part) for part in args.workers.split(",") if part.strip()]
+    pages = archived_pages(args.log_dir, cfg, args.limit)
+    if not pages:
+        print(f"No archived snapshot pairs under {args.log_dir}")
+        return 1
+    print(f"{len(pages)} page(s), {os.cpu_count()} CPU(s)")
+    print(f"{'backend':<9}{'workers':>8}{'start s':>9}{'seconds':>9}{'pages/s':>9}{'speedup':>9}")
+    for row in bench(pages, Rules.from_config(cfg), counts):
+        print(
+            f"{row['backend']:<9}{row['workers']:>8}{row['start_s']:>9.2f}{row['seconds']:>9.2f}"
+            f"{row['pages_per_s']:>9.1f}{row['speedup']:>8.2f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
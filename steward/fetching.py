@@ -13,6 +13,10 @@ replaces the hand-maintained tag blacklist that was a standing source of
 nav-and-whitespace noise. Selenium is reserved for URLs marked
 `"render": true` in policy_sets.json, and for salvaging a plain fetch that
 came back unusable.
+
+`fetch_document(..., extract=False)` stops at the download, leaving the page
+in `FetchResult.html`, so the run's fetch stage keeps to the network and its
+check stage does the extraction (steward/examine.py); see steward/pipeline.py.
 """
 
 from __future__ import annotations
@@ -20,6 +24,7 @@ from __future__ import annotations
 import logging
 import os
 import random
+import threading
 import time
 from dataclasses import dataclass, field
 from typing import Optional
@@ -50,6 +55,8 @@ class FetchResult:
     url: str
     status: str
     text: str = ""
+    # The page itself, when extraction was left to the check stage.
+    html: str = ""
     etag: Optional[str] = None
     last_modified: Optional[str] = None
     http_status: Optional[int] = None
@@ -142,7 +149,7 @@ def extract_text(html: str, url: str, selector: Optional[str] = None) -> tuple[s
 # --- Plain HTTP path -------------------------------------------------------
 
 
-def _http_fetch(url_data: dict, prior: dict, cfg, use_proxy: bool) -> FetchResult:
+def _http_fetch(url_data: dict, prior: dict, cfg, use_proxy: bool, extract: bool = True) -> FetchResult:
     url = url_data["url"]
     proxies = _proxies() if use_proxy else None
     if use_proxy and proxies is None:
@@ -177,6 +184,15 @@ def _http_fetch(url_data: dict, prior: dict, cfg, use_proxy: bool) -> FetchResul
         )
 
     html = response.text
+    if not extract:
+        return FetchResult(
+            url,
+            OK,
+            html=html,
+            etag=etag,
+            last_modified=last_modified,
+            http_status=response.status_code,
+        )
     text, extractor = extract_text(html, url, url_data.get("selector"))
     return FetchResult(
         url,
@@ -191,8 +207,17 @@ def _http_fetch(url_data: dict, prior: dict, cfg, use_proxy: bool) -> FetchResul
 
 # --- Selenium path ---------------------------------------------------------
 
+# One browser at a time, however many fetch workers there are: each is a
+# whole Chrome, and the runner has memory for one.
+_browser = threading.Lock()
+
 
 def _selenium_fetch(url_data: dict, cfg, use_proxy: bool) -> FetchResult:
+    with _browser:
+        return _render(url_data, cfg, use_proxy)
+
+
+def _render(url_data: dict, cfg, use_proxy: bool) -> FetchResult:
     """Render with headless Chrome. Imported lazily — a run where every URL
     is static should never pay for the Selenium import, let alone a browser."""
     url = url_data["url"]
@@ -308,11 +333,15 @@ def _looks_like_block_page(text: str, cfg) -> bool:
     return any(fold_for_matching(sig) in folded for sig in cfg.validation.failure_signatures)
 
 
-def fetch_document(url_data: dict, prior: dict, cfg, policy_set: Optional[dict] = None) -> FetchResult:
+def fetch_document(
+    url_data: dict, prior: dict, cfg, policy_set: Optional[dict] = None, extract: bool = True
+) -> FetchResult:
     """Fetch one document, escalating only as far as it has to.
 
     Order: conditional plain GET -> Selenium (if the page needs rendering or
-    the plain fetch was unusable) -> the same two through the proxy.
+    the plain fetch was unusable) -> the same two through the proxy. With
+    `extract=False` a plain GET that returns a page ends it there, unread;
+    the check stage extracts it, and calls back here if it is unusable.
     """
     url = url_data["url"]
     started = time.monotonic()
@@ -337,12 +366,16 @@ def fetch_document(url_data: dict, prior: dict, cfg, policy_set: Optional[dict]
 
             if not needs_render:
                 log.info("    [%s] conditional GET %s", route, url)
-                result = _http_fetch(url_data, prior, cfg, use_proxy)
+                result = _http_fetch(url_data, prior, cfg, use_proxy, extract)
                 if result.status == NOT_MODIFIED:
                     log.info("    [%s] 304 Not Modified — nothing to do", route)
                     result.attempts = attempts
                     result.duration_ms = int((time.monotonic() - started) * 1000)
                     return result
+                if result.ok and result.html.strip():
+                    result.attempts = attempts
+                    result.duration_ms = int((time.monotonic() - started) * 1000)
+                    return result
                 if result.ok and result.text.strip() and not _looks_like_block_page(result.text, cfg):
                     result.attempts = attempts
                     result.duration_ms = int((time.monotonic() - started) * 1000)
@@ -13,11 +13,12 @@ emitted as an alert the workflow turns into a GitHub issue.
 
 from __future__ import annotations
 
-import json
 import logging
 from datetime import datetime
 from typing import Any, Dict, List
 
+from . import jsonio
+
 log = logging.getLogger(__name__)
 
 HEALTH_FILE = "health.json"
@@ -150,8 +151,19 @@ def build_report(hashes: Dict[str, Any], cfg, run_error_rate: float = 0.0) -> Di
 
 
 def write_report(report: Dict[str, Any], path: str = HEALTH_FILE) -> None:
-    with open(path, "w", encoding="utf-8") as handle:
-        json.dump(report, handle, indent=2, ensure_ascii=False)
+    """Without the fields that move on every run, so an unchanged report is an
+    unchanged file: `generated_at`, and when a healthy source was last read
+    (this run; checks.json has it). The alert body keeps the time."""
+    saved = {key: value for key, value in report.items() if key != "generated_at"}
+    saved["sources"] = {
+        name: (
+            {k: v for k, v in source.items() if k not in ("last_success", "days_since_success")}
+            if source.get("status") == OK
+            else source
+        )
+        for name, source in report.get("sources", {}).items()
+    }
+    jsonio.save(saved, path, pretty=True)
 
 
 def render_alert_markdown(report: Dict[str, Any]) -> str:
@@ -6,22 +6,36 @@ able to enumerate it. One index generated at the end of each run turns the
 timeline into a rendering job over data already collected.
 
 Filenames are `{file_id}_{YYYYmmdd}_{HHMMSS}_analysis.json`, matching the 500+
-archives already on disk.
+archives already on disk; `steward/archive.py` says which shard each is in.
+
+`update_index` keeps `history_manifest.json` beside the index: every archive
+file's size, mtime and sha256, each shard directory's mtime, and the record
+built for each analysis. A shard whose directory hasn't changed is not listed
+again; in the rest, only archives whose files are new or changed are re-read.
+Records for pruned files are dropped and history.json is rendered from what
+remains. A checkout resets every mtime, so a size-and-mtime miss is settled by
+the digest before anything is parsed. `build_index` is the full scan it must
+agree with.
 """
 
 from __future__ import annotations
 
-import json
+import hashlib
 import logging
 import os
-import re
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Tuple
+
+from . import archive, blobs, commit, content, diffing, jsonio
 
 log = logging.getLogger(__name__)
 
 HISTORY_FILE = "history.json"
-_ARCHIVE_RE = re.compile(r"^(?P<file_id>.+)_(?P<stamp>\d{8}_\d{6})_analysis\.json$")
+HISTORY_MANIFEST_FILE = "history_manifest.json"
+# 3: records keep the key order they were built in, so history.json reads the
+# same whether a record came from the manifest or was just built.
+_MANIFEST_VERSION = 3
 
 
 def _parse_stamp(stamp: str) -> str | None:
@@ -33,88 +47,269 @@ def _parse_stamp(stamp: str) -> str | None:
 
 def build_index(log_dir: str, known_file_ids: set[str] | None = None) -> Dict[str, Any]:
     """Index every archived analysis, newest first, grouped by file_id."""
-    entries: Dict[str, List[Dict[str, Any]]] = {}
+    found = list(archive.files(log_dir, known_file_ids))
+    present = {f.path for f in found}
+    records = {}
+    for member in found:
+        built = _record(log_dir, member, present)
+        if built is not None:
+            records[archive.relative(member.path, log_dir)] = built
+    return _render(records, known_file_ids)
 
-    if not os.path.isdir(log_dir):
-        return {"generated_at": datetime.now().astimezone().isoformat(), "entries": {}}
 
-    for name in sorted(os.listdir(log_dir)):
-        match = _ARCHIVE_RE.match(name)
-        if not match:
-            continue
+def _record(log_dir: str, member: archive.ArchiveFile, present: set[str]) -> Dict[str, Any] | None:
+    """The index record for one archived analysis, or None if `member` isn't one.
+
+    `present` holds every archive path, so siblings are looked up, not stat'ed.
+    """
+    if member.suffix != archive.ANALYSIS:
+        return None
+
+    timestamp = _parse_stamp(member.stamp)
+    if timestamp is None:
+        return None
+
+    record: Dict[str, Any] = {
+        "timestamp": timestamp,
+        "analysis_path": archive.relative(member.path, log_dir),
+    }
+
+    manifest_path = f"{member.prefix}_{archive.SNAPSHOT_MANIFEST}"
+    manifest = _read_manifest(manifest_path) if manifest_path in present else {}
+    snapshot = f"{member.prefix}_{archive.SNAPSHOT_TEXT}"
+    if manifest:
+        record["snapshot_blobs"] = manifest
+    elif snapshot in present:
+        record["snapshot_path"] = archive.relative(snapshot, log_dir)
 
-        file_id = match.group("file_id")
+    diff = f"{member.prefix}_{archive.DIFF}"
+    if diff in present:
+        record["diff_path"] = archive.relative(diff, log_dir)
+
+    try:
+        analysis = jsonio.load(member.path)
+    except (OSError, ValueError):
+        analysis = {}
+
+    if isinstance(analysis, dict):
+        record["priority"] = analysis.get("priority")
+        record["verdict"] = analysis.get("verdict")
+        record["summary"] = analysis.get("summary")
+        record["changed_documents"] = analysis.get("changed_documents", [])
+
+    return {"file_id": member.file_id, "record": record}
+
+
+def _render(records: Dict[str, Dict[str, Any]], known_file_ids: set[str] | None) -> Dict[str, Any]:
+    entries: Dict[str, List[Dict[str, Any]]] = {}
+    for _, built in sorted(records.items()):
+        file_id = built["file_id"]
         if known_file_ids is not None and file_id not in known_file_ids:
             # Orphans from sources no longer monitored stay on disk but out of
             # the index, so the UI never links to a policy it cannot show.
             continue
+        entries.setdefault(file_id, []).append(built["record"])
 
-        timestamp = _parse_stamp(match.group("stamp"))
-        if timestamp is None:
-            continue
+    for file_records in entries.values():
+        file_records.sort(key=lambda r: r["timestamp"], reverse=True)
 
-        record: Dict[str, Any] = {
-            "timestamp": timestamp,
-            "analysis_path": f"logs/{name}",
-        }
+    return {"entries": entries}
 
-        snapshot = name.replace("_analysis.json", "_snapshot.txt")
-        if os.path.exists(os.path.join(log_dir, snapshot)):
-            record["snapshot_path"] = f"logs/{snapshot}"
 
-        diff = name.replace("_analysis.json", "_diff.txt")
-        if os.path.exists(os.path.join(log_dir, diff)):
-            record["diff_path"] = f"logs/{diff}"
+def _digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-        try:
-            with open(os.path.join(log_dir, name), "r", encoding="utf-8") as handle:
-                analysis = json.load(handle)
-        except (OSError, json.JSONDecodeError):
-            analysis = {}
 
-        if isinstance(analysis, dict):
-            record["priority"] = analysis.get("priority")
-            record["verdict"] = analysis.get("verdict")
-            record["summary"] = analysis.get("summary")
-            record["changed_documents"] = analysis.get("changed_documents", [])
+def _load_manifest(path: str) -> Dict[str, Any]:
+    try:
+        manifest = jsonio.load(path)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("version") != _MANIFEST_VERSION:
+        return {}
+    return manifest
+
 
-        entries.setdefault(file_id, []).append(record)
+def _member(log_dir: str, key: str) -> archive.ArchiveFile:
+    """The archive file a manifest key (`logs/...`) names."""
+    path = os.path.join(log_dir, *key.split("/")[1:])
+    return archive.ArchiveFile(*archive.parse(os.path.basename(path)), path)
 
-    for records in entries.values():
-        records.sort(key=lambda r: r["timestamp"], reverse=True)
 
-    return {
-        "generated_at": datetime.now().astimezone().isoformat(),
-        "entries": entries,
+def _scan(
+    directory: str, known_files: Dict[str, List[Any]], files: Dict[str, List[Any]], log_dir: str
+) -> set[str]:
+    """Stat one directory's archive files into `files`; the prefixes of any that changed."""
+    touched = set()
+    for member in archive.files_in(directory):
+        stat = os.stat(member.path)
+        key = archive.relative(member.path, log_dir)
+        seen = known_files.get(key)
+        if seen and seen[0] == stat.st_size and seen[1] == stat.st_mtime_ns:
+            files[key] = seen
+            continue
+        digest = _digest(member.path)
+        files[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        if not (seen and seen[0] == stat.st_size and seen[2] == digest):
+            touched.add(member.prefix)
+    return touched
+
+
+def update_index(
+    log_dir: str,
+    known_file_ids: set[str] | None = None,
+    *,
+    manifest_path: str = HISTORY_MANIFEST_FILE,
+    rebuild: bool = False,
+) -> Dict[str, Any]:
+    """`build_index`, re-reading only the archives that changed since the manifest was written."""
+    manifest = {} if rebuild else _load_manifest(manifest_path)
+    known_files: Dict[str, List[Any]] = manifest.get("files", {})
+    known_shards: Dict[str, int] = manifest.get("shards", {})
+    records: Dict[str, Dict[str, Any]] = manifest.get("records", {})
+    by_shard: Dict[str, Dict[str, List[Any]]] = {}
+    for key, seen in known_files.items():
+        by_shard.setdefault(key.rsplit("/", 1)[0], {})[key] = seen
+
+    files: Dict[str, List[Any]] = {}
+    shards: Dict[str, int] = {}
+    touched = _scan(log_dir, by_shard.get("logs", {}), files, log_dir)
+    for _, _, directory in archive.shards(log_dir, known_file_ids):
+        key = archive.relative(directory, log_dir)
+        shards[key] = os.stat(directory).st_mtime_ns
+        if known_shards.get(key) == shards[key]:
+            # Nothing was added, removed or replaced in this shard.
+            files.update(by_shard.get(key, {}))
+            continue
+        touched |= _scan(directory, by_shard.get(key, {}), files, log_dir)
+    for key in known_files.keys() - files.keys():
+        touched.add(_member(log_dir, key).prefix)
+
+    present = {_member(log_dir, key).path for key in files}
+    records = {
+        key: built for key, built in records.items() if key in files and _member(log_dir, key).prefix not in touched
     }
+    parsed = 0
+    for key in sorted(files.keys() - records.keys()):
+        built = _record(log_dir, _member(log_dir, key), present)
+        if built is not None:
+            records[key] = built
+            parsed += 1
+
+    if parsed or touched or files != known_files or shards != known_shards:
+        jsonio.save(
+            {"version": _MANIFEST_VERSION, "files": files, "shards": shards, "records": records},
+            manifest_path,
+        )
+    log.info("History index: %d archive(s) read, %d from the manifest", parsed, len(records) - parsed)
+    return _render(records, known_file_ids)
+
+
+def _read_manifest(path: str) -> Dict[str, str]:
+    """{url: blob id} from an archived snapshot manifest; {} if there is none."""
+    manifest = blobs.read_manifest(path)
+    if not manifest:
+        return {}
+    if "blob" in manifest:
+        return {"": manifest["blob"]}
+    return {url: blob for url, blob in manifest.get("documents") or []}
 
 
 def write_index(index: Dict[str, Any], path: str = HISTORY_FILE) -> None:
-    with open(path, "w", encoding="utf-8") as handle:
-        json.dump(index, handle, indent=2, ensure_ascii=False)
+    """Left untouched when the index is what's already there (no `generated_at`,
+    so it only changes when an archive does)."""
+    commit.replace_if_changed(path, jsonio.dumps(index))
     total = sum(len(v) for v in index.get("entries", {}).values())
     log.info("History index: %d archived analyses across %d sources", total, len(index.get("entries", {})))
 
 
 def prune(log_dir: str, retention_days: int) -> int:
-    """Delete archives past retention. Returns the number removed."""
+    """Delete archives past retention. Returns the number removed.
+
+    Shards from months wholly before the cutoff go in one piece; only the
+    cutoff month's shard is looked at file by file, and later ones not at all.
+    """
     if not os.path.isdir(log_dir):
         return 0
 
     cutoff = datetime.now() - timedelta(days=retention_days)
+    cutoff_month = cutoff.strftime("%Y%m")
+    expired: List[archive.ArchiveFile] = list(archive.flat_files(log_dir))
     removed = 0
-    for name in os.listdir(log_dir):
-        match = re.match(r"^.+_(\d{8}_\d{6})_(?:analysis\.json|snapshot\.txt|diff\.txt)$", name)
-        if not match:
-            continue
+    for _, month, directory in archive.shards(log_dir, last_month=cutoff_month):
+        if month < cutoff_month:
+            try:
+                removed += archive.remove_shard(directory)
+            except OSError as exc:
+                log.warning("Could not prune %s: %s", directory, exc)
+            _remove_if_empty(os.path.dirname(directory))
+        else:
+            expired.extend(archive.files_in(directory))
+
+    for member in expired:
         try:
-            when = datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+            when = datetime.strptime(member.stamp, "%Y%m%d_%H%M%S")
         except ValueError:
             continue
         if when < cutoff:
             try:
-                os.remove(os.path.join(log_dir, name))
+                os.remove(member.path)
                 removed += 1
             except OSError as exc:
-                log.warning("Could not prune %s: %s", name, exc)
+                log.warning("Could not prune %s: %s", member.name, exc)
     return removed
+
+
+def _remove_if_empty(directory: str) -> None:
+    try:
+        os.rmdir(directory)
+    except OSError:
+        pass
+
+
+@dataclass
+class ArchivedChange:
+    """One archived snapshot, diffed per document against the one before it."""
+
+    file_id: str
+    stamp: str
+    changed: List[Tuple[str, diffing.DiffResult]]
+    # The analysis archived with the newer snapshot; it may not exist.
+    analysis_path: str
+
+
+def archived_changes(log_dir: str, *, max_chars: int = 40000) -> Iterator[ArchivedChange]:
+    """Replay the archive: every change the model has been shown, oldest first per source.
+
+    An archived analysis describes the change into the snapshot archived with
+    it, so each snapshot is diffed against the one before it. Documents new in
+    the later snapshot, and snapshots with no changed document, are skipped.
+    """
+    store = blobs.store_for(log_dir)
+    archives: Dict[str, Dict[str, str]] = {}
+    for member in archive.files(log_dir, suffixes=(archive.SNAPSHOT_MANIFEST, archive.SNAPSHOT_TEXT)):
+        archives.setdefault(member.file_id, {}).setdefault(member.stamp, member.prefix)
+
+    for file_id, prefixes in sorted(archives.items()):
+        stamps = sorted(prefixes)
+        for older, newer in zip(stamps, stamps[1:]):
+            before = content.split_aggregate(blobs.read_archived_snapshot(store, prefixes[older]))
+            after = content.split_aggregate(blobs.read_archived_snapshot(store, prefixes[newer]))
+            changed = []
+            for url in after:
+                if url not in before:
+                    continue
+                diff = diffing.compute_diff(
+                    content.normalise(before[url]),
+                    content.normalise(after[url]),
+                    label=url,
+                    max_chars=max_chars,
+                )
+                if not diff.is_empty:
+                    changed.append((url, diff))
+            if changed:
+                yield ArchivedChange(file_id, newer, changed, f"{prefixes[newer]}_{archive.ANALYSIS}")
@@ -0,0 +1,175 @@
+"""Every state and artefact file is read and written through here.
+
+hashes.json and history.json grow with every source and every archived
+change, and each run loads and saves them whole, as well as the state
+store's rows, the run log and the indexes. `orjson` is used when it is
+installed and the standard library when it isn't. Both write the same bytes
+for these files, so switching backends never makes a file look changed
+(the one difference is floats that need an exponent: `1e-05` against
+`0.00001`). Two layouts:
+
+- pretty (two-space indent) for what people open or read in a diff:
+  hashes.json, health.json and the analyses;
+- compact for what only code reads: history.json, versions.json,
+  checks.json, the manifests, the cache, the run log and the journal.
+
+    python -m steward.jsonio bench [--scale 100] [--repeat 3]
+
+times loading and saving hashes.json and history.json grown to `scale` times
+their size, with each backend available.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Union
+
+
+def _orjson():
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+_fast = _orjson()
+
+
+def backend() -> str:
+    return "orjson" if _fast is not None else "json"
+
+
+def dumps(value: Any, *, pretty: bool = False, sort_keys: bool = False) -> bytes:
+    """UTF-8 JSON. TypeError for what JSON can't hold."""
+    if _fast is not None:
+        option = _fast.OPT_NON_STR_KEYS
+        if pretty:
+            option |= _fast.OPT_INDENT_2
+        if sort_keys:
+            option |= _fast.OPT_SORT_KEYS
+        return _fast.dumps(value, option=option)
+    if pretty:
+        text = json.dumps(value, indent=2, ensure_ascii=False, sort_keys=sort_keys)
+    else:
+        text = json.dumps(value, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":"))
+    return text.encode("utf-8")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """json.JSONDecodeError (a ValueError) for what isn't JSON, from either backend."""
+    if _fast is not None:
+        return _fast.loads(data)
+    return json.loads(data)
+
+
+def line(value: Any) -> bytes:
+    """One compact record and its newline, for a .jsonl file."""
+    return dumps(value) + b"\n"
+
+
+def load(path: str) -> Any:
+    """OSError if unreadable, ValueError if not JSON."""
+    with open(path, "rb") as handle:
+        return loads(handle.read())
+
+
+def save(value: Any, path: str, *, pretty: bool = False, sort_keys: bool = False) -> None:
+    """Write `path` whole: to a temp file, then renamed over it."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as handle:
+        handle.write(dumps(value, pretty=pretty, sort_keys=sort_keys))
+    os.replace(tmp, path)
+
+
+# --- Benchmark ---------------------------------------------------------------------
+
+
+def _grow_hashes(hashes: Dict[str, Any], scale: int) -> Dict[str, Any]:
+    return {f"{name} #{copy}": entry for copy in range(scale) for name, entry in hashes.items()}
+
+
+def _grow_history(index: Dict[str, Any], scale: int) -> Dict[str, Any]:
+    entries = index.get("entries", {})
+    return {
+        **index,
+        "entries": {
+            f"{file_id}_{copy}": records for copy in range(scale) for file_id, records in entries.items()
+        },
+    }
+
+
+def _time(action, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        runs.append((time.perf_counter() - start) * 1000)
+    return statistics.median(runs)
+
+
+def bench(
+    hashes_path: str = "hashes.json",
+    history_path: str = "history.json",
+    *,
+    scale: int = 100,
+    repeat: int = 3,
+) -> List[Dict[str, Any]]:
+    """One row per file per backend: size and median load / save milliseconds."""
+    global _fast
+    grown = {
+        "hashes.json": (_grow_hashes(load(hashes_path), scale), True),
+        "history.json": (_grow_history(load(history_path), scale), False),
+    }
+    backends = [("json", None)] + ([("orjson", _orjson())] if _orjson() is not None else [])
+    rows = []
+    installed = _fast
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, (data, pretty) in grown.items():
+                path = os.path.join(tmp, name)
+                for label, module in backends:
+                    _fast = module
+                    save_ms = _time(lambda: save(data, path, pretty=pretty), repeat)
+                    load_ms = _time(lambda: load(path), repeat)
+                    rows.append(
+                        {
+                            "file": name,
+                            "backend": label,
+                            "layout": "pretty" if pretty else "compact",
+                            "bytes": os.path.getsize(path),
+                            "load_ms": round(load_ms, 1),
+                            "save_ms": round(save_ms, 1),
+                        }
+                    )
+    finally:
+        _fast = installed
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Time JSON load/save of the state files at scale.")
+    parser.add_argument("command", choices=("bench",))
+    parser.add_argument("--hashes", default="hashes.json")
+    parser.add_argument("--history", default="history.json")
+    parser.add_argument("--scale", type=int, default=100, help="copies of every set / source (default 100)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rows = bench(args.hashes, args.history, scale=args.scale, repeat=args.repeat)
+    print(f"{'file':<14}{'backend':<9}{'layout':<9}{'MB':>7}{'load ms':>10}{'save ms':>10}")
+    for row in rows:
+        print(
+            f"{row['file']:<14}{row['backend']:<9}{row['layout']:<9}"
+            f"{row['bytes'] / 1e6:>7.1f}{row['load_ms']:>10}{row['save_ms']:>10}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,215 @@
+"""Stages joined by bounded queues, each with its own workers.
+
+A run used to take each document through the fetch, then extraction,
+normalisation, validation, hashing and the diff, before starting the next,
+so the network sat idle while the CPU worked and the other way round. Now
+`main.py` runs two stages:
+
+- fetch: network-bound. Conditional GETs, retries, the browser when a page
+  needs it. Several workers, each mostly waiting on a socket;
+- check: CPU-bound. Extraction and every gate after it.
+
+Every worker takes from its stage's queue and puts into the next one. The
+queues are bounded, so when the check stage falls behind, fetch workers wait
+to hand on their pages rather than piling raw HTML up in memory, and a
+stage never runs more than `depth` items ahead of the one after it.
+
+An item whose work raises carries the exception out in place of a result,
+and later stages pass it along untouched, so one bad document never stops
+the others. `Pipeline.stats` has one `StageStats` per stage at the end:
+items, throughput, how busy its workers were, how deep its queue got and how
+long its workers waited on the next stage.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# How often a blocked worker looks up to see whether the run has given up on it.
+_POLL_SECONDS = 0.1
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    work: Callable[[Any], Any]
+    workers: int = 1
+
+
+@dataclass
+class StageStats:
+    name: str
+    workers: int
+    capacity: int = 0
+    items: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    # Time spent waiting to hand a result to the next stage: its queue was full.
+    blocked_seconds: float = 0.0
+    queue_max: int = 0
+    queue_total: int = 0
+    queue_samples: int = 0
+    first: Optional[float] = None
+    last: Optional[float] = None
+
+    def record(self, started: float, finished: float, failed: bool = False, count: int = 1) -> None:
+        self.items += count
+        self.failed += int(failed)
+        self.busy_seconds += finished - started
+        self.first = started if self.first is None else min(self.first, started)
+        self.last = finished if self.last is None else max(self.last, finished)
+
+    def sample(self, depth: int) -> None:
+        self.queue_max = max(self.queue_max, depth)
+        self.queue_total += depth
+        self.queue_samples += 1
+
+    @property
+    def seconds(self) -> float:
+        """From the first item started to the last one finished."""
+        return (self.last - self.first) if self.first is not None and self.last is not None else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Items per second over `seconds`."""
+        return self.items / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def utilisation(self) -> float:
+        """Share of the workers' time over `seconds` spent working."""
+        span = self.seconds * self.workers
+        return min(self.busy_seconds / span, 1.0) if span > 0 else 0.0
+
+    @property
+    def queue_mean(self) -> float:
+        return self.queue_total / self.queue_samples if self.queue_samples else 0.0
+
+    def describe(self) -> str:
+        text = (
+            f"{self.name}: {self.items} item(s) in {self.seconds:.1f}s ({self.throughput:.1f}/s), "
+            f"{self.workers} worker(s) {self.utilisation:.0%} busy"
+        )
+        if self.capacity:
+            text += f", queue max {self.queue_max} mean {self.queue_mean:.1f} of {self.capacity}"
+        if self.blocked_seconds >= 0.05:
+            text += f", {self.blocked_seconds:.1f}s waiting on the next stage"
+        if self.failed:
+            text += f", {self.failed} failed"
+        return text
+
+
+class _Failed:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+class Pipeline:
+    def __init__(self, stages: Sequence[Stage], depth: int = 8) -> None:
+        if not stages:
+            raise ValueError("a pipeline needs at least one stage")
+        self.stages = list(stages)
+        self.depth = max(1, depth)
+        self.stats = [StageStats(stage.name, max(1, stage.workers), self.depth) for stage in self.stages]
+
+    def run(self, items: Iterable[Any]) -> Iterator[Tuple[Any, Any]]:
+        """(item, result) for each item, as each leaves the last stage.
+
+        `result` is what the last stage returned, or the exception a stage
+        raised. Stop iterating early and the workers are told to stop.
+        """
+        stop = threading.Event()
+        # inbound[i] feeds stage i; the last one feeds the caller.
+        inbound = [queue.Queue(maxsize=self.depth) for _ in range(len(self.stages) + 1)]
+        remaining = [stats.workers for stats in self.stats]
+        lock = threading.Lock()
+
+        def put(index: int, value: Any) -> float:
+            """Put into inbound[index]; returns how long it waited."""
+            started = time.monotonic()
+            while not stop.is_set():
+                try:
+                    inbound[index].put(value, timeout=_POLL_SECONDS)
+                except queue.Full:
+                    continue
+                if index < len(self.stats) and value is not _DONE:
+                    with lock:
+                        self.stats[index].sample(inbound[index].qsize())
+                break
+            return time.monotonic() - started
+
+        def get(index: int) -> Any:
+            while not stop.is_set():
+                try:
+                    return inbound[index].get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def feed() -> None:
+            try:
+                for item in items:
+                    if stop.is_set():
+                        return
+                    put(0, (item, item))
+            finally:
+                for _ in range(self.stats[0].workers):
+                    put(0, _DONE)
+
+        def work(index: int) -> None:
+            stage, stats = self.stages[index], self.stats[index]
+            try:
+                while True:
+                    entry = get(index)
+                    if entry is _DONE:
+                        return
+                    item, value = entry
+                    if not isinstance(value, _Failed):
+                        started = time.monotonic()
+                        try:
+                            value = stage.work(value)
+                        except Exception as exc:  # noqa: BLE001 — carried out to the caller
+                            value = _Failed(exc)
+                        finished = time.monotonic()
+                        with lock:
+                            stats.record(started, finished, failed=isinstance(value, _Failed))
+                    waited = put(index + 1, (item, value))
+                    with lock:
+                        stats.blocked_seconds += waited
+            finally:
+                with lock:
+                    remaining[index] -= 1
+                    last = remaining[index] == 0
+                if last:
+                    # The next stage's workers, or the caller, stop once all of this stage's have.
+                    following = self.stats[index + 1].workers if index + 1 < len(self.stats) else 1
+                    for _ in range(following):
+                        put(index + 1, _DONE)
+
+        threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+        for index, stats in enumerate(self.stats):
+            threads.extend(
+                threading.Thread(target=work, args=(index,), name=f"pipeline-{stats.name}-{n}", daemon=True)
+                for n in range(stats.workers)
+            )
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                entry = get(len(self.stages))
+                if entry is _DONE:
+                    break
+                item, value = entry
+                yield item, (value.error if isinstance(value, _Failed) else value)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def report(self) -> List[str]:
+        return [stats.describe() for stats in self.stats]
@@ -0,0 +1,105 @@
+"""The fixed instruction block, registered once per model as cached context.
+
+Every prompt used to open with the same role, schema and definitions, and the
+schema retry sent all of it again. That block is now the system instruction
+(`analysis.SYSTEM_INSTRUCTION`), and a run registers it with the provider once
+per model it calls, so each call sends only its own diff and names the cached
+context. Calls that share it are billed for those tokens at the cached rate.
+
+Caching is best effort. A prefix shorter than the provider's minimum is not
+offered at all, and a client that cannot create a cache — an older SDK, a
+stand-in server, a model that does not support it — falls back to sending the
+system instruction inline, once per model per run, without failing a call.
+Either way `usage_metadata.cached_content_token_count` reports what was
+actually served from cache, and that is what runs.jsonl records.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Dict
+
+log = logging.getLogger(__name__)
+
+
+def _create_config(text: str, ttl_seconds: int):
+    from google.genai import types
+
+    return types.CreateCachedContentConfig(
+        system_instruction=text,
+        ttl=f"{ttl_seconds}s",
+        display_name="steward-prefix",
+    )
+
+
+class PrefixCache:
+    """One cached context per model, created on first use and kept for the run."""
+
+    def __init__(self, text: str, *, ttl_seconds: int = 900, min_tokens: int = 1024) -> None:
+        self.text = text
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        # model -> cached content name; "" once creation has failed.
+        self.names: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+
+    def _too_short(self) -> bool:
+        # Four characters per token, as analysis.estimate_tokens counts.
+        return (len(self.text) + 3) // 4 < self.min_tokens
+
+    def _fell_back(self, model: str, exc: BaseException) -> str:
+        log.info(
+            "  Context caching unavailable for %s (%s: %s) — sending the instructions inline",
+            model,
+            type(exc).__name__,
+            exc,
+        )
+        self.names[model] = ""
+        return ""
+
+    def lookup(self, client, model: str) -> str:
+        """The cached content name for `model`, or "" to send the prefix inline."""
+        if model in self.names:
+            return self.names[model]
+        if self._too_short():
+            self.names[model] = ""
+            return ""
+        try:
+            cached = client.caches.create(
+                model=model, config=_create_config(self.text, self.ttl_seconds)
+            )
+        except Exception as exc:  # noqa: BLE001 — caching is an optimisation, never a failure
+            return self._fell_back(model, exc)
+        self.names[model] = cached.name
+        log.info("  Instructions cached for %s as %s", model, cached.name)
+        return cached.name
+
+    async def lookup_async(self, client, model: str) -> str:
+        """`lookup` through the async client. Concurrent callers share one creation."""
+        async with self._lock:
+            if model in self.names:
+                return self.names[model]
+            if self._too_short():
+                self.names[model] = ""
+                return ""
+            try:
+                cached = await client.aio.caches.create(
+                    model=model, config=_create_config(self.text, self.ttl_seconds)
+                )
+            except Exception as exc:  # noqa: BLE001 — caching is an optimisation, never a failure
+                return self._fell_back(model, exc)
+            self.names[model] = cached.name
+            log.info("  Instructions cached for %s as %s", model, cached.name)
+            return cached.name
+
+    async def release_async(self, client) -> None:
+        """Delete the contexts this run created rather than wait out their TTL."""
+        for model, name in list(self.names.items()):
+            if not name:
+                continue
+            try:
+                await client.aio.caches.delete(name=name)
+            except Exception as exc:  # noqa: BLE001 — it expires on its own
+                log.warning("  Could not delete cached context %s: %s", name, exc)
+            del self.names[model]
@@ -0,0 +1,92 @@
+"""A sliding one-minute window over model requests and tokens.
+
+Gemini enforces requests-per-minute and tokens-per-minute quotas per project.
+Running several sets' analyses at once only helps until the first 429, and a
+429 costs a backoff that is longer than the wait it was meant to save. The
+limiter keeps concurrent calls under both quotas before they are sent, so the
+retry path is for the provider's bad minutes rather than for our own bursts.
+
+A limit of 0 means unlimited. The clock and the sleep are injectable so the
+window can be tested without waiting a minute.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Tuple
+
+WINDOW_SECONDS = 60.0
+
+# Never spin: a wait shorter than this is rounded up.
+_MIN_WAIT = 0.01
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        *,
+        window: float = WINDOW_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self._clock = clock
+        self._sleep = sleep
+        self._requests: Deque[float] = deque()
+        self._tokens: Deque[Tuple[float, int]] = deque()
+        self._lock = asyncio.Lock()
+        self.waited = 0.0
+
+    def _expire(self, now: float) -> None:
+        while self._requests and self._requests[0] + self.window <= now:
+            self._requests.popleft()
+        while self._tokens and self._tokens[0][0] + self.window <= now:
+            self._tokens.popleft()
+
+    def _fits(self, tokens: int) -> bool:
+        if not self._requests and not self._tokens:
+            # An empty window always admits one call, even one larger than the
+            # whole token quota — otherwise an oversized prompt waits forever.
+            return True
+        if self.requests_per_minute and len(self._requests) >= self.requests_per_minute:
+            return False
+        if self.tokens_per_minute:
+            used = sum(n for _, n in self._tokens)
+            if used + tokens > self.tokens_per_minute:
+                return False
+        return True
+
+    def _next_expiry(self, now: float) -> float:
+        starts = []
+        if self._requests:
+            starts.append(self._requests[0])
+        if self._tokens:
+            starts.append(self._tokens[0][0])
+        return min(starts, default=now) + self.window - now
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """Wait until one call of `tokens` fits in the window. Returns seconds waited."""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = self._clock()
+                self._expire(now)
+                if self._fits(tokens):
+                    self._requests.append(now)
+                    self._tokens.append((now, tokens))
+                    self.waited += waited
+                    return waited
+                delay = max(_MIN_WAIT, self._next_expiry(now))
+                await self._sleep(delay)
+                waited += delay
+
+    def correct(self, estimated: int, actual: int) -> None:
+        """Charge the window for tokens the estimate missed."""
+        if actual > estimated:
+            self._tokens.append((self._clock(), actual - estimated))
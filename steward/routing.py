@@ -0,0 +1,53 @@
+"""Which model a changed set is sent to.
+
+A two-line date bump and a rewritten arbitration clause used to cost the
+same call to `cfg.model`. With `routing.fast_model` set, a diff that is small
+and carries no fingerprint tags worth a closer look goes to the cheaper model
+first, and is escalated to `cfg.model` only if the cheaper model answers
+`uncertain` (or cannot answer at all). Anything large, or tagged, or matching
+the watchlist goes straight to `cfg.model`.
+
+Watchlist hits always go to `cfg.model`; `routing.fast_tags` names the pattern
+tags a diff may carry and still be treated as routine.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+FAST = "fast"
+MAIN = "main"
+
+
+@dataclass
+class Route:
+    tier: str
+    model: str
+    # Model to ask again when the first answer is `uncertain`; "" for none.
+    escalate_to: str = ""
+    reason: str = ""
+
+
+def flagged_tags(tags: Sequence[str], fast_tags: Sequence[str]) -> list[str]:
+    """The tags that rule out the fast model."""
+    allowed = set(fast_tags)
+    return [t for t in tags if t.startswith("watchlist:") or t not in allowed]
+
+
+def route(changed_lines: int, tags: Sequence[str], cfg) -> Route:
+    """Pick the tier for one changed set. `cfg` is the whole StewardConfig."""
+    rules = cfg.routing
+    if not rules.fast_model:
+        return Route(MAIN, cfg.model, reason="routing disabled")
+    if changed_lines > rules.max_changed_lines:
+        return Route(MAIN, cfg.model, reason=f"{changed_lines} changed lines")
+    flagged = flagged_tags(tags, rules.fast_tags)
+    if flagged:
+        return Route(MAIN, cfg.model, reason=f"tagged {', '.join(flagged)}")
+    return Route(
+        FAST,
+        rules.fast_model,
+        escalate_to=cfg.model if rules.escalate_uncertain else "",
+        reason=f"{changed_lines} changed lines, untagged",
+    )
@@ -1,28 +1,41 @@
-"""One JSON record per document per run, appended to runs.jsonl.
+"""One JSON record per document per run, appended to a daily segment in runs/.
 
 Without this you cannot answer "how often does Perplexity actually change?"
 or "what is this costing?" — and both questions get sharper the moment
 anything else starts making model calls. It is also what lets the size-delta
 thresholds be calibrated against real distributions rather than guesses.
+
+Records are grouped by the AEST day of their timestamp into
+`runs/YYYY-MM-DD.jsonl`. A segment is only ever appended to, so a flush costs
+what the run wrote, and retention deletes whole days without reading them.
+Readers open only the segments a window overlaps, and parse timestamps only in
+the first and last of those.
 """
 
 from __future__ import annotations
 
-import json
 import logging
 import os
-from datetime import datetime, timedelta
-from typing import Any, Dict, Iterable, List
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import jsonio
 
 log = logging.getLogger(__name__)
 
+RUN_LOG_DIR = "runs"
+# The single file the log used to be; split into segments on the next flush.
 RUN_LOG_FILE = "runs.jsonl"
 
+SEGMENT_TZ = timezone(timedelta(hours=10))
+_SEGMENT_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.jsonl$")
+
 
 class RunLog:
-    def __init__(self, run_id: str, path: str = RUN_LOG_FILE) -> None:
+    def __init__(self, run_id: str, directory: str = RUN_LOG_DIR) -> None:
         self.run_id = run_id
-        self.path = path
+        self.directory = directory
         self.records: List[Dict[str, Any]] = []
 
     def record(self, **fields: Any) -> Dict[str, Any]:
@@ -31,15 +44,17 @@ class RunLog:
         return entry
 
     def flush(self, retention_days: int = 90) -> None:
-        """Append this run's records, dropping anything past retention."""
-        kept = _load_recent(self.path, retention_days)
-        kept.extend(self.records)
-        tmp = f"{self.path}.tmp"
-        with open(tmp, "w", encoding="utf-8") as handle:
-            for entry in kept:
-                handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
-        os.replace(tmp, self.path)
-        log.info("Run log: %d records this run, %d retained", len(self.records), len(kept))
+        """Append this run's records to their segments, dropping expired days."""
+        os.makedirs(self.directory, exist_ok=True)
+        legacy = os.path.join(os.path.dirname(os.path.abspath(self.directory)), RUN_LOG_FILE)
+        if os.path.exists(legacy):
+            moved = split_legacy(legacy, self.directory)
+            log.info("Run log: moved %d record(s) from %s into daily segments", moved, legacy)
+        _append(self.directory, self.records)
+        expired = expire(self.directory, retention_days)
+        log.info(
+            "Run log: %d records this run, %d expired segment(s) removed", len(self.records), expired
+        )
 
     # --- Summaries used by the health check and the run's closing log ---
 
@@ -50,47 +65,144 @@ class RunLog:
             counts[outcome] = counts.get(outcome, 0) + 1
         return counts
 
-    def token_totals(self) -> Dict[str, int]:
+    def token_totals(self) -> Dict[str, Any]:
+        """Run totals, plus calls, tokens and latency per model tier."""
+        by_tier: Dict[str, Dict[str, int]] = {}
+        for entry in self.records:
+            for tier, spent in (entry.get("tiers") or {}).items():
+                total = by_tier.setdefault(
+                    tier, {"calls": 0, "prompt_tokens": 0, "output_tokens": 0, "ms": 0}
+                )
+                for key in total:
+                    total[key] += int(spent.get(key, 0) or 0)
         return {
             "prompt_tokens": sum(e.get("prompt_tokens", 0) for e in self.records),
             "output_tokens": sum(e.get("output_tokens", 0) for e in self.records),
+            "cached_prompt_tokens": sum(e.get("cached_prompt_tokens", 0) for e in self.records),
             "llm_calls": sum(1 for e in self.records if e.get("llm_called")),
+            "estimated_tokens": sum(
+                e.get("estimated_tokens", 0) for e in self.records if e.get("llm_called")
+            ),
+            "by_tier": by_tier,
         }
 
 
-def _load_recent(path: str, retention_days: int) -> List[Dict[str, Any]]:
-    if not os.path.exists(path):
-        return []
+def segment_day(entry: Dict[str, Any]) -> date:
+    """The AEST day a record belongs to; today for one without a usable timestamp."""
+    try:
+        return datetime.fromisoformat(entry.get("timestamp", "")).astimezone(SEGMENT_TZ).date()
+    except (TypeError, ValueError):
+        return datetime.now(SEGMENT_TZ).date()
 
-    cutoff = datetime.now().astimezone() - timedelta(days=retention_days)
-    kept: List[Dict[str, Any]] = []
+
+def segments(directory: str = RUN_LOG_DIR) -> List[Tuple[date, str]]:
+    """(day, path) for every segment, oldest first."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    found = []
+    for name in names:
+        match = _SEGMENT_RE.match(name)
+        if match:
+            found.append((date.fromisoformat(match.group(1)), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def _append(directory: str, records: Iterable[Dict[str, Any]]) -> None:
+    by_day: Dict[date, List[bytes]] = {}
+    for entry in records:
+        by_day.setdefault(segment_day(entry), []).append(jsonio.line(entry))
+    for day, lines in sorted(by_day.items()):
+        path = os.path.join(directory, f"{day.isoformat()}.jsonl")
+        with open(path, "ab+") as handle:
+            # A run killed mid-write leaves a partial line; start on a fresh one.
+            end = handle.seek(0, os.SEEK_END)
+            if end:
+                handle.seek(end - 1)
+                if handle.read(1) != b"\n":
+                    handle.write(b"\n")
+            handle.writelines(lines)
+
+
+def expire(directory: str = RUN_LOG_DIR, retention_days: int = 90) -> int:
+    """Delete segments whose whole day is past retention. Returns how many went."""
+    cutoff = (datetime.now(SEGMENT_TZ) - timedelta(days=retention_days)).date()
+    removed = 0
+    for day, path in segments(directory):
+        if day >= cutoff:
+            break
+        os.remove(path)
+        removed += 1
+    return removed
+
+
+def split_legacy(path: str = RUN_LOG_FILE, directory: str = RUN_LOG_DIR) -> int:
+    """Move the single-file log into daily segments, then remove it."""
+    records = list(_read_segment(path))
+    _append(directory, records)
+    os.remove(path)
+    return len(records)
+
+
+def _read_segment(
+    path: str, start: Optional[datetime] = None, end: Optional[datetime] = None
+):
     with open(path, "r", encoding="utf-8") as handle:
         for line in handle:
             line = line.strip()
             if not line:
                 continue
             try:
-                entry = json.loads(line)
-            except json.JSONDecodeError:
+                entry = jsonio.loads(line)
+            except ValueError:
                 continue
-            timestamp = entry.get("timestamp")
-            if timestamp:
+            if start is not None or end is not None:
                 try:
-                    if datetime.fromisoformat(timestamp) < cutoff:
-                        continue
-                except ValueError:
-                    pass
-            kept.append(entry)
+                    when = datetime.fromisoformat(entry.get("timestamp", ""))
+                except (TypeError, ValueError):
+                    continue
+                if (start is not None and when < start) or (end is not None and when > end):
+                    continue
+            yield entry
+
+
+def records_between(
+    start: datetime, end: Optional[datetime] = None, directory: str = RUN_LOG_DIR
+) -> List[Dict[str, Any]]:
+    """Records timestamped within [start, end], reading only the segments that overlap."""
+    first = start.astimezone(SEGMENT_TZ).date()
+    last = end.astimezone(SEGMENT_TZ).date() if end is not None else date.max
+    kept: List[Dict[str, Any]] = []
+    for day, path in segments(directory):
+        if day < first or day > last:
+            continue
+        # Days strictly inside the window are taken whole, without parsing timestamps.
+        kept.extend(_read_segment(path, start if day == first else None, end if day == last else None))
     return kept
 
 
-def load_records(path: str = RUN_LOG_FILE, days: int = 90) -> List[Dict[str, Any]]:
+def load_records(directory: str = RUN_LOG_DIR, days: int = 90) -> List[Dict[str, Any]]:
     """Read back recent records, for reporting."""
-    return _load_recent(path, days)
+    return records_between(datetime.now(SEGMENT_TZ) - timedelta(days=days), directory=directory)
+
+
+def tokens_since(since: datetime, directory: str = RUN_LOG_DIR) -> int:
+    """Prompt and output tokens recorded at or after `since`, for the day budget."""
+    return sum(
+        int(entry.get("prompt_tokens", 0) or 0) + int(entry.get("output_tokens", 0) or 0)
+        for entry in records_between(since, directory=directory)
+    )
 
 
-def error_rate(records: Iterable[Dict[str, Any]]) -> float:
-    records = list(records)
+def error_rate(
+    records: Optional[Iterable[Dict[str, Any]]] = None,
+    *,
+    days: int = 1,
+    directory: str = RUN_LOG_DIR,
+) -> float:
+    """Share of records that failed; the last `days` of segments when no records are given."""
+    records = list(records) if records is not None else load_records(directory, days)
     if not records:
         return 0.0
     failures = sum(
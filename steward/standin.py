@@ -0,0 +1,287 @@
+"""A local stand-in for the subset of the Gemini API the analysis stage uses.
+
+The tests inject a fake `client`, which says nothing about how the real
+client, the limiter and the retry paths behave together over HTTP, and the
+only other way to find out was to spend real tokens. The stand-in answers
+`models/{model}:generateContent` and `:streamGenerateContent` on localhost
+with well-formed answers in whichever schema the prompt asks for — a single
+answer, one part of a chunked diff, or a bundle — after a configurable delay,
+and can be told to misbehave: bursts of 429s, a share of malformed answers.
+`cachedContents` is refused, as the real API refuses instructions below its
+minimum, so the inline fallback is what gets measured.
+
+Point `analysis.base_url` at it, or run `python -m steward.benchmark`:
+
+    python -m steward.standin --port 8765 --latency-ms 400 --burst-every 20 --burst-length 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Sequence
+
+log = logging.getLogger(__name__)
+
+_MODEL_PATH = re.compile(r"^/v1beta/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)$")
+_BUNDLE_KEYS = re.compile(r"exactly one entry for each of the keys ((?:set_\d+(?:, )?)+)")
+
+ANSWER = {
+    "verdict": "no_material_change",
+    "summary": "Stand-in answer: nothing of substance changed.",
+    "analysis": "Generated by steward.standin; no model was consulted.",
+    "priority": "low",
+}
+CHUNK_ANSWER = {"material": False, "priority": "low", "findings": []}
+# Replies that fail `parse_and_validate`, in the ways real models have failed it.
+MALFORMED = (
+    '{"verdict": "material_change", "summary": "Cut off mid-',
+    '{"verdict": "significant", "summary": "s", "analysis": "a", "priority": "high"}',
+    "Here is the analysis you asked for.",
+    '{"verdict": "material_change", "summary": "s", "analysis": "a", "priority": "unknown"}',
+)
+
+
+@dataclass
+class Behaviour:
+    latency_ms: float = 300.0
+    jitter_ms: float = 100.0
+    # Tokens reported per call; 0 counts four characters to the token.
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    # The last `burst_length` of every `burst_every` requests get a 429.
+    burst_every: int = 0
+    burst_length: int = 0
+    # Share of answered calls that get a malformed reply.
+    malformed_rate: float = 0.0
+    seed: int = 0
+
+
+@dataclass
+class Stats:
+    requests: int = 0
+    answered: int = 0
+    rate_limited: int = 0
+    malformed: int = 0
+    streamed: int = 0
+    by_model: Dict[str, int] = field(default_factory=dict)
+
+
+def _prompt_text(body: dict) -> str:
+    texts = []
+    for turn in body.get("contents") or []:
+        for part in turn.get("parts") or []:
+            texts.append(part.get("text") or "")
+    return "".join(texts)
+
+
+def answer_for(prompt: str) -> str:
+    """A valid reply in the schema this prompt asks for."""
+    bundle = _BUNDLE_KEYS.search(prompt)
+    if bundle:
+        keys = [k.strip() for k in bundle.group(1).split(",") if k.strip()]
+        return json.dumps({key: ANSWER for key in keys})
+    if "Instead of the usual answer" in prompt:
+        return json.dumps(CHUNK_ANSWER)
+    return json.dumps(ANSWER)
+
+
+class StandInServer:
+    """The stand-in on a background thread. Port 0 picks a free one."""
+
+    def __init__(self, behaviour: Optional[Behaviour] = None, *, host: str = "127.0.0.1", port: int = 0):
+        self.behaviour = behaviour or Behaviour()
+        self.stats = Stats()
+        self._random = random.Random(self.behaviour.seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _decide(self, model: str, streamed: bool) -> tuple[bool, bool, float]:
+        """(rate limited, malformed, delay in seconds) for the next request."""
+        b = self.behaviour
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.by_model[model] = self.stats.by_model.get(model, 0) + 1
+            position = (self.stats.requests - 1) % b.burst_every if b.burst_every else -1
+            if b.burst_every and position >= b.burst_every - b.burst_length:
+                self.stats.rate_limited += 1
+                return True, False, 0.0
+            malformed = self._random.random() < b.malformed_rate
+            self.stats.answered += 1
+            self.stats.malformed += malformed
+            self.stats.streamed += streamed
+            jitter = self._random.uniform(-b.jitter_ms, b.jitter_ms) if b.jitter_ms else 0.0
+        return False, malformed, max(0.0, b.latency_ms + jitter) / 1000
+
+    def _reply(self, prompt: str, malformed: bool) -> str:
+        if malformed:
+            with self._lock:
+                return self._random.choice(MALFORMED)
+        return answer_for(prompt)
+
+    def _usage(self, prompt: str, reply: str) -> dict:
+        b = self.behaviour
+        prompt_tokens = b.prompt_tokens or (len(prompt) + 3) // 4
+        output_tokens = b.output_tokens or (len(reply) + 3) // 4
+        return {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):  # noqa: D401 — quiet by default
+                log.debug("standin: " + fmt, *args)
+
+            def _send_json(self, status: int, payload: dict) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _error(self, status: int, message: str, reason: str) -> None:
+                self._send_json(status, {"error": {"code": status, "message": message, "status": reason}})
+
+            def do_POST(self):  # noqa: N802 — http.server's naming
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._error(400, "Invalid JSON payload", "INVALID_ARGUMENT")
+                    return
+
+                path = self.path.split("?", 1)[0]
+                if path.endswith("/cachedContents"):
+                    self._error(400, "Cached content is not supported by the stand-in", "INVALID_ARGUMENT")
+                    return
+                match = _MODEL_PATH.match(path)
+                if not match:
+                    self._error(404, f"Unknown method {path}", "NOT_FOUND")
+                    return
+
+                streamed = match.group("method") == "streamGenerateContent"
+                limited, malformed, delay = server._decide(match.group("model"), streamed)
+                if limited:
+                    self._error(429, "Resource has been exhausted (stand-in burst)", "RESOURCE_EXHAUSTED")
+                    return
+
+                prompt = _prompt_text(body)
+                reply = server._reply(prompt, malformed)
+                usage = server._usage(prompt, reply)
+                if streamed:
+                    self._stream(reply, usage, delay)
+                    return
+                time.sleep(delay)
+                self._send_json(200, _response(reply, usage))
+
+            def _stream(self, reply: str, usage: dict, delay: float) -> None:
+                # Three pieces, the delay spread across them, usage on the last.
+                size = max(1, -(-len(reply) // 3))
+                pieces = [reply[i:i + size] for i in range(0, len(reply), size)] or [""]
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for index, piece in enumerate(pieces, 1):
+                    time.sleep(delay / len(pieces))
+                    payload = _response(piece, usage if index == len(pieces) else None)
+                    try:
+                        self.wfile.write(f"data: {json.dumps(payload)}\r\n\r\n".encode("utf-8"))
+                        self.wfile.flush()
+                    except (BrokenPipeError, ConnectionResetError):
+                        return  # the client abandoned the stream
+
+        return Handler
+
+
+def _response(text: str, usage: Optional[dict]) -> dict:
+    payload = {
+        "candidates": [
+            {"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}
+        ],
+        "modelVersion": "stand-in",
+    }
+    if usage is not None:
+        payload["usageMetadata"] = usage
+    return payload
+
+
+def add_behaviour_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = Behaviour()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms)
+    parser.add_argument("--prompt-tokens", type=int, default=defaults.prompt_tokens)
+    parser.add_argument("--output-tokens", type=int, default=defaults.output_tokens)
+    parser.add_argument("--burst-every", type=int, default=defaults.burst_every)
+    parser.add_argument("--burst-length", type=int, default=defaults.burst_length)
+    parser.add_argument("--malformed-rate", type=float, default=defaults.malformed_rate)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def behaviour_from(args: argparse.Namespace) -> Behaviour:
+    return Behaviour(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        prompt_tokens=args.prompt_tokens,
+        output_tokens=args.output_tokens,
+        burst_every=args.burst_every,
+        burst_length=args.burst_length,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Gemini API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_behaviour_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = StandInServer(behaviour_from(args), host=args.host, port=args.port)
+    print(f"Stand-in Gemini API on {server.url} — set analysis.base_url to use it. Ctrl-C stops it.")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+        print(f"{server.stats.requests} request(s), {server.stats.rate_limited} rate limited")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
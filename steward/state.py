@@ -0,0 +1,496 @@
+"""Per-set state in SQLite, written as each set is settled.
+
+hashes.json used to be the only record of what every document last looked
+like: loaded whole at the start of a run, rewritten whole at the end, so a
+crash in between lost every set the run had already finished. The store
+keeps the same entries in three tables — `sets`, `documents`, and `changes`
+(each document's known versions, its `seen_hashes`) — in WAL mode, and
+`main.py` writes a set in one transaction as soon as its outcome is final.
+A set whose analysis is still pending is not written until it settles,
+exactly as its hashes were never saved before the analysis succeeded.
+
+A settled set's files (its snapshot, diff, analysis and archives) only land
+when the run commits (steward/commit.py), so the store also lists the sets
+written since the last commit landed, in `uncommitted`. `main.py` clears it
+after the commit. If the run dies first, the next one's `reconcile` keeps
+each listed set whose recorded versions are still the ones in hashes.json —
+a set checked, deferred or failed keeps its check times and health — and
+puts every other one back as hashes.json has it, so the change whose files
+were lost is found and analysed again. The rest of the run's work is kept.
+
+hashes.json is still what the dashboard reads and what the workflow commits.
+`export` writes it from the store in the same shape and formatting. `import_json` loads it
+into an empty store, and again whenever the file on disk is no longer the
+one the store last wrote or read — after a `git pull`, say — so the file
+stays authoritative across checkouts and the store is never stale.
+
+The fields that move on every check whether or not anything else did
+(`VOLATILE_FIELDS`: when a set or document was last checked or last read,
+and how long the fetch took) are written to checks.json instead. A quiet run
+then leaves hashes.json byte for byte as it was. `read_hashes` puts them
+back, so everything past loading still sees one entry per set.
+
+    python -m steward.state import [hashes.json]
+    python -m steward.state export [hashes.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import jsonio
+
+log = logging.getLogger(__name__)
+
+STATE_FILE = "steward_state.db"
+HASHES_FILE = "hashes.json"
+CHECKS_FILE = "checks.json"
+
+# Kept out of hashes.json: they change on every run.
+VOLATILE_FIELDS = ("last_checked", "last_success", "fetch_ms")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sets (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    hash TEXT,
+    file_id TEXT,
+    status TEXT,
+    last_checked TEXT,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    set_name TEXT NOT NULL REFERENCES sets(name) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    doc_id TEXT,
+    hash TEXT,
+    status TEXT,
+    last_checked TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (set_name, url)
+);
+CREATE TABLE IF NOT EXISTS changes (
+    set_name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    seen_at TEXT,
+    verdict TEXT,
+    analysis_path TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (set_name, url, hash),
+    FOREIGN KEY (set_name, url) REFERENCES documents(set_name, url) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS uncommitted (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Stands in for the nested mapping in a row's JSON, so the key keeps its place
+# and an export reproduces the entry's key order exactly.
+_NESTED = None
+
+
+def _dumps(value: Any) -> str:
+    return jsonio.dumps(value).decode("utf-8")
+
+
+def _versions(entry: Dict[str, Any]) -> Tuple[Any, ...]:
+    """What a set's files are a record of: its hash, and each document's hash and known versions."""
+    documents = entry.get("documents") or {}
+    return (
+        entry.get("hash"),
+        tuple(
+            (url, doc.get("hash"), tuple(doc.get("seen_hashes") or ()))
+            for url, doc in documents.items()
+            if isinstance(doc, dict)
+        ),
+    )
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's bytes, or "" if it does not exist."""
+    if not os.path.exists(path):
+        return ""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def split_checks(hashes: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(hashes.json, checks.json): the entries without their volatile fields, and those fields.
+
+    checks.json mirrors hashes.json's shape, holding only the volatile fields:
+    {set: {field: value, "documents": {url: {field: value}}}}.
+    """
+    stable: Dict[str, Any] = {}
+    checks: Dict[str, Any] = {}
+    for name, entry in hashes.items():
+        if not isinstance(entry, dict):
+            stable[name] = entry
+            continue
+        kept = {key: value for key, value in entry.items() if key not in VOLATILE_FIELDS}
+        moved = {key: entry[key] for key in VOLATILE_FIELDS if key in entry}
+        if isinstance(entry.get("documents"), dict):
+            kept["documents"] = {}
+            for url, record in entry["documents"].items():
+                if not isinstance(record, dict):
+                    kept["documents"][url] = record
+                    continue
+                kept["documents"][url] = {k: v for k, v in record.items() if k not in VOLATILE_FIELDS}
+                fields = {key: record[key] for key in VOLATILE_FIELDS if key in record}
+                if fields:
+                    moved.setdefault("documents", {})[url] = fields
+        stable[name] = kept
+        if moved:
+            checks[name] = moved
+    return stable, checks
+
+
+def merge_checks(hashes: Dict[str, Any], checks: Dict[str, Any]) -> Dict[str, Any]:
+    """Put checks.json's fields back into the entries; `split_checks` undone."""
+    for name, moved in checks.items():
+        entry = hashes.get(name)
+        if not isinstance(entry, dict) or not isinstance(moved, dict):
+            continue
+        entry.update({key: value for key, value in moved.items() if key != "documents"})
+        documents = entry.get("documents")
+        for url, fields in (moved.get("documents") or {}).items():
+            if isinstance(documents, dict) and isinstance(documents.get(url), dict):
+                documents[url].update(fields)
+    return hashes
+
+
+def checks_beside(path: str) -> str:
+    """checks.json in the same directory as `path`, a hashes.json."""
+    return os.path.join(os.path.dirname(path), CHECKS_FILE)
+
+
+def read_hashes(path: str = HASHES_FILE, checks_path: Optional[str] = None) -> Dict[str, Any]:
+    """hashes.json with checks.json merged in. OSError or ValueError if hashes.json is unreadable."""
+    hashes = jsonio.load(path)
+    if not isinstance(hashes, dict):
+        raise ValueError(f"{path} is not a JSON object")
+    checks_path = checks_path or checks_beside(path)
+    try:
+        checks = jsonio.load(checks_path)
+    except FileNotFoundError:
+        # Written before the split: the fields are still in hashes.json.
+        return hashes
+    except (OSError, ValueError):
+        log.warning("Failed to read %s, check times start again", checks_path)
+        return hashes
+    return merge_checks(hashes, checks if isinstance(checks, dict) else {})
+
+
+def write_hashes(hashes: Dict[str, Any], path: str = HASHES_FILE, checks_path: Optional[str] = None) -> None:
+    """Write the entries as hashes.json and checks.json."""
+    stable, checks = split_checks(hashes)
+    jsonio.save(stable, path, pretty=True)
+    jsonio.save(checks, checks_path or checks_beside(path))
+
+
+def hashes_digest(path: str = HASHES_FILE, checks_path: Optional[str] = None) -> str:
+    """Of both files, so an edit to either one is seen. "" if hashes.json is missing."""
+    digest = file_digest(path)
+    return f"{digest}:{file_digest(checks_path or checks_beside(path))}" if digest else ""
+
+
+class StateStore:
+    def __init__(self, connection: sqlite3.Connection, path: str = STATE_FILE) -> None:
+        self.connection = connection
+        self.path = path
+
+    @classmethod
+    def open(cls, path: str = STATE_FILE) -> "StateStore":
+        connection = sqlite3.connect(path, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA foreign_keys=ON")
+        connection.executescript(_SCHEMA)
+        return cls(connection, path)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "StateStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # --- meta ---------------------------------------------------------------
+
+    def _meta(self, key: str) -> str:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else ""
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self.connection.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def is_empty(self) -> bool:
+        return self.connection.execute("SELECT 1 FROM sets LIMIT 1").fetchone() is None
+
+    # --- writes -------------------------------------------------------------
+
+    def _write_set(self, name: str, entry: Dict[str, Any], position: int, now: str) -> None:
+        documents = entry.get("documents") or {}
+        data = {k: (_NESTED if k == "documents" else v) for k, v in entry.items()}
+        self.connection.execute(
+            "INSERT INTO sets (name, position, hash, file_id, status, last_checked, data, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET position = excluded.position, hash = excluded.hash, "
+            "file_id = excluded.file_id, status = excluded.status, "
+            "last_checked = excluded.last_checked, data = excluded.data, updated_at = excluded.updated_at "
+            "WHERE sets.data IS NOT excluded.data OR sets.position IS NOT excluded.position",
+            (
+                name, position, entry.get("hash"), entry.get("file_id"), entry.get("status"),
+                entry.get("last_checked"), _dumps(data), now,
+            ),
+        )
+
+        kept = list(documents)
+        self.connection.execute(
+            f"DELETE FROM documents WHERE set_name = ? AND url NOT IN ({','.join('?' * len(kept))})",
+            (name, *kept),
+        )
+        for doc_position, (url, doc) in enumerate(documents.items()):
+            seen = doc.get("seen_hashes") or {}
+            doc_data = {k: (_NESTED if k == "seen_hashes" else v) for k, v in doc.items()}
+            self.connection.execute(
+                "INSERT INTO documents (set_name, url, position, doc_id, hash, status, last_checked, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(set_name, url) DO UPDATE SET position = excluded.position, "
+                "doc_id = excluded.doc_id, hash = excluded.hash, status = excluded.status, "
+                "last_checked = excluded.last_checked, data = excluded.data "
+                "WHERE documents.data IS NOT excluded.data OR documents.position IS NOT excluded.position",
+                (
+                    name, url, doc_position, doc.get("doc_id"), doc.get("hash"), doc.get("status"),
+                    doc.get("last_checked"), _dumps(doc_data),
+                ),
+            )
+            hashes = list(seen)
+            self.connection.execute(
+                "DELETE FROM changes WHERE set_name = ? AND url = ? "
+                f"AND hash NOT IN ({','.join('?' * len(hashes))})",
+                (name, url, *hashes),
+            )
+            self.connection.executemany(
+                "INSERT INTO changes (set_name, url, hash, position, seen_at, verdict, analysis_path, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(set_name, url, hash) DO UPDATE SET position = excluded.position, "
+                "seen_at = excluded.seen_at, verdict = excluded.verdict, "
+                "analysis_path = excluded.analysis_path, data = excluded.data "
+                "WHERE changes.data IS NOT excluded.data OR changes.position IS NOT excluded.position",
+                [
+                    (
+                        name, url, text_hash, change_position,
+                        info.get("seen_at") if isinstance(info, dict) else None,
+                        info.get("verdict") if isinstance(info, dict) else None,
+                        info.get("analysis_path") if isinstance(info, dict) else None,
+                        _dumps(info),
+                    )
+                    for change_position, (text_hash, info) in enumerate(seen.items())
+                ],
+            )
+
+    def _position_of(self, name: str) -> int:
+        row = self.connection.execute("SELECT position FROM sets WHERE name = ?", (name,)).fetchone()
+        if row is not None:
+            return row[0]
+        row = self.connection.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM sets").fetchone()
+        return row[0]
+
+    def put_set(self, name: str, entry: Dict[str, Any], position: Optional[int] = None) -> None:
+        """Write one set's settled entry, documents and versions in one transaction.
+
+        Rows whose content has not changed are left untouched. The set stays
+        in `uncommitted` until `committed` is called.
+        """
+        now = datetime.now().astimezone().isoformat()
+        with self._transaction():
+            self._write_set(name, entry, self._position_of(name) if position is None else position, now)
+            self.connection.execute("INSERT OR IGNORE INTO uncommitted (name) VALUES (?)", (name,))
+
+    def committed(self) -> None:
+        """The run's files have landed: its settled sets are hashes.json's now."""
+        with self._transaction():
+            self.connection.execute("DELETE FROM uncommitted")
+
+    def replace_all(self, hashes: Dict[str, Dict[str, Any]]) -> None:
+        """Make the store hold exactly these entries, in this order."""
+        now = datetime.now().astimezone().isoformat()
+        with self._transaction():
+            names = list(hashes)
+            self.connection.execute(
+                f"DELETE FROM sets WHERE name NOT IN ({','.join('?' * len(names))})", names
+            )
+            for position, (name, entry) in enumerate(hashes.items()):
+                if isinstance(entry, dict):
+                    self._write_set(name, entry, position, now)
+
+    def _transaction(self):
+        return _Transaction(self.connection)
+
+    # --- reads --------------------------------------------------------------
+
+    def load(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Entries in hashes.json's shape, in export order; `names` limits them."""
+        wanted = set(names) if names is not None else None
+        entries: Dict[str, Dict[str, Any]] = {}
+        for name, data in self.connection.execute("SELECT name, data FROM sets ORDER BY position, name"):
+            if wanted is None or name in wanted:
+                entries[name] = jsonio.loads(data)
+
+        documents: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for set_name, url, data in self.connection.execute(
+            "SELECT set_name, url, data FROM documents ORDER BY set_name, position"
+        ):
+            if set_name in entries:
+                documents.setdefault(set_name, {})[url] = jsonio.loads(data)
+
+        seen: Dict[tuple, Dict[str, Any]] = {}
+        for set_name, url, text_hash, data in self.connection.execute(
+            "SELECT set_name, url, hash, data FROM changes ORDER BY set_name, url, position"
+        ):
+            if set_name in entries:
+                seen.setdefault((set_name, url), {})[text_hash] = jsonio.loads(data)
+
+        for name, entry in entries.items():
+            docs = documents.get(name, {})
+            for url, doc in docs.items():
+                if "seen_hashes" in doc:
+                    doc["seen_hashes"] = seen.get((name, url), {})
+            if "documents" in entry:
+                entry["documents"] = docs
+        return entries
+
+    def get_set(self, name: str) -> Dict[str, Any]:
+        return self.load([name]).get(name, {})
+
+    # --- hashes.json --------------------------------------------------------
+
+    def import_json(self, path: str = HASHES_FILE, checks_path: Optional[str] = None) -> int:
+        """Load hashes.json (and checks.json) into the store, replacing what it held. Returns sets read."""
+        try:
+            hashes = read_hashes(path, checks_path)
+        except (OSError, ValueError) as exc:
+            log.warning("Failed to read %s (%s), leaving the state store as it is", path, exc)
+            return 0
+        self.replace_all(hashes)
+        self._set_meta("hashes_digest", hashes_digest(path, checks_path))
+        self.committed()
+        return len(hashes)
+
+    def reconcile(self, path: str = HASHES_FILE, checks_path: Optional[str] = None) -> List[str]:
+        """Settle the sets a run wrote and never committed. Returns those put back.
+
+        A set whose versions are still hashes.json's is kept as the run left
+        it. Any other is put back as hashes.json has it, or dropped if it is
+        not there, since the files recording its change never landed.
+        """
+        names = [row[0] for row in self.connection.execute("SELECT name FROM uncommitted ORDER BY name")]
+        if not names:
+            return []
+        try:
+            saved = read_hashes(path, checks_path)
+        except FileNotFoundError:
+            saved = {}
+        except (OSError, ValueError) as exc:
+            log.warning("Failed to read %s (%s), leaving uncommitted sets for the next run", path, exc)
+            return []
+
+        now = datetime.now().astimezone().isoformat()
+        reverted = []
+        with self._transaction():
+            for name in names:
+                entry = self.load([name]).get(name)
+                before = saved.get(name)
+                if entry is not None and isinstance(before, dict) and _versions(entry) == _versions(before):
+                    continue
+                reverted.append(name)
+                if isinstance(before, dict):
+                    self._write_set(name, before, self._position_of(name), now)
+                else:
+                    self.connection.execute("DELETE FROM sets WHERE name = ?", (name,))
+            self.connection.execute("DELETE FROM uncommitted")
+        return reverted
+
+    def sync_from(self, path: str = HASHES_FILE, checks_path: Optional[str] = None) -> bool:
+        """Import `path` if the store is empty or the files are not the ones it last saw.
+
+        Otherwise the store stands, after `reconcile` has settled what a run
+        that died left in it. Returns whether it imported.
+        """
+        digest = hashes_digest(path, checks_path)
+        if digest and (self.is_empty() or digest != self._meta("hashes_digest")):
+            count = self.import_json(path, checks_path)
+            log.info("State store loaded %d set(s) from %s", count, path)
+            return True
+        left = self.connection.execute("SELECT COUNT(*) FROM uncommitted").fetchone()[0]
+        reverted = self.reconcile(path, checks_path)
+        if left:
+            log.info(
+                "State store kept %d set(s) settled by a run that did not commit; put back: %s",
+                left - len(reverted), ", ".join(reverted) or "none",
+            )
+        return False
+
+    def export(self, path: str = HASHES_FILE, checks_path: Optional[str] = None) -> int:
+        """Write hashes.json and checks.json from the store, formatted as they always have been."""
+        entries = self.load()
+        write_hashes(entries, path, checks_path)
+        self._set_meta("hashes_digest", hashes_digest(path, checks_path))
+        return len(entries)
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on any exception."""
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Move state between hashes.json and the state store.")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("hashes", nargs="?", default=HASHES_FILE)
+    parser.add_argument("--checks", default=None, help="default: checks.json beside HASHES")
+    parser.add_argument("--db", default=STATE_FILE)
+    args = parser.parse_args(argv)
+
+    with StateStore.open(args.db) as store:
+        if args.command == "import":
+            print(f"Imported {store.import_json(args.hashes, args.checks)} set(s) from {args.hashes} into {args.db}")
+        else:
+            print(f"Exported {store.export(args.hashes, args.checks)} set(s) from {args.db} to {args.hashes}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
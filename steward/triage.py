@@ -0,0 +1,322 @@
+"""Local triage: answer the obviously trivial diffs without a model call.
+
+Most analyses in logs/ end in `no_material_change`, and most of those are one
+of a few shapes: a "Last updated" stamp moved, a straight quote became a curly
+one, a download link's file size moved from 157KB to 156KB. Each costs a full prompt to be
+told what the diff already shows.
+
+Triage runs after the cosmetic gate. Every removed line is paired with the
+line that replaced it, and each rule masks one kind of difference — dates and
+version stamps on a line that labels them as such ("Last updated", "Version",
+"©"), quote and dash styles, spacing and case, link targets, and link labels
+that differ only in a file size, a URL or typography.
+If every pair is equal once masked, the set gets a local `no_material_change`
+verdict in the same schema `parse_and_validate` enforces, and no model call.
+A change that adds or removes lines, was truncated, exceeds
+`triage.max_changed_lines`, or was fingerprinted with a watchlist term, an
+obligation, an amount or a duration always goes to the model.
+
+Every decision is logged and recorded in runs.jsonl (`local_rule`), and
+
+    python -m steward.triage [logs]
+
+replays the archive to show how the rules would have answered the diffs the
+model has already judged.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import analysis, diffing, history
+
+log = logging.getLogger(__name__)
+
+DATE_STAMP = "date_stamp"
+TYPOGRAPHY = "typography"
+LINK = "link"
+RULES = (DATE_STAMP, TYPOGRAPHY, LINK)
+
+_SUBJECTS = {
+    DATE_STAMP: "a date or version stamp",
+    TYPOGRAPHY: "punctuation or typography",
+    LINK: "a link label or link parameters",
+}
+
+# Pairs quoted in the local analysis, per document.
+_QUOTED_PAIRS = 5
+
+_MONTHS = (
+    "January|February|March|April|May|June|July|August|September|October|November|December"
+    "|Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sept|Sep|Oct|Nov|Dec"
+)
+_DATE = re.compile(
+    rf"\b(?:\d{{1,2}}(?:st|nd|rd|th)?\s+(?:{_MONTHS})\.?,?(?:\s+\d{{4}})?"
+    rf"|(?:{_MONTHS})\.?\s+\d{{1,2}}(?:st|nd|rd|th)?,?(?:\s+\d{{4}})?"
+    rf"|(?:{_MONTHS})\.?\s+\d{{4}}"
+    r"|\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4})\b"
+    # A bare year, but not an amount: "$2000" is money, not a stamp.
+    r"|(?<![$€£\d.,])\b(?:19|20)\d{2}\b",
+    re.IGNORECASE,
+)
+_VERSION = re.compile(
+    r"\bv\d+(?:\.\d+)*\b|\bversion\s+\d+(?:\.\d+)*\b|\b\d+\.\d+\.\d+(?:\.\d+)?\b",
+    re.IGNORECASE,
+)
+# A date is a stamp, not a term, only on a line that says so. Not "effective":
+# when terms take effect is itself a term.
+_STAMP_WORDS = re.compile(
+    r"\b(?:updated|revised|modified|published|reviewed|version|copyright)\b|©",
+    re.IGNORECASE,
+)
+_MASKED = re.compile(r"<(?:date|version)>")
+
+_TYPOGRAPHY = str.maketrans(
+    {
+        "\u2018": "'", "\u2019": "'", "\u201a": "'",
+        "\u201c": '"', "\u201d": '"', "\u201e": '"',
+        "\u2013": "-", "\u2014": "-", "\u2011": "-",
+        "\u00a0": " ", "\u2026": "...",
+    }
+)
+_QUOTES = re.compile(r"['\"`]")
+_SPACE_BEFORE = re.compile(r"\s+(?=[.,;:!?)\]}])")
+_SPACE_AFTER = re.compile(r"(?<=[(\[{])\s+")
+_TERMINAL = re.compile(r"[.;:!?]+$")
+_WHITESPACE = re.compile(r"\s+")
+
+# Fingerprint tags (steward/diffing.py) that make a change the model's to judge,
+# however trivial it looks.
+_SUBSTANTIVE_TAGS = ("obligation", "money", "duration")
+
+_MARKDOWN_LINK = re.compile(r"\[([^\]]*)\]\(")
+# Download links are labelled with their size ("157KB .xlsx" on the ISM page).
+_FILE_SIZE = re.compile(r"\b\d+(?:\.\d+)?\s?(?:bytes|[KMG]i?B)\b", re.IGNORECASE)
+_URL = re.compile(r"(https?)://([^/\s)\]>?#]+)([^\s)\]>?#]*)(?:\?[^\s)\]>#]*)?(?:#[^\s)\]>]*)?")
+
+
+def _mask_dates(line: str) -> str:
+    return _VERSION.sub("<version>", _DATE.sub("<date>", line))
+
+
+def _is_stamp_line(line: str) -> bool:
+    # Searched outside the masks, or "kept for version 1.2" would label itself.
+    return bool(_STAMP_WORDS.search(_MASKED.sub(" ", _mask_dates(line))))
+
+
+def _mask_typography(line: str) -> str:
+    # Quote and dash styles, runs of spaces, space before a comma, a closing
+    # full stop and case. Words, signs and commas stay where they are, so
+    # "notable" is not "not able" and "will not" is not "will, not".
+    line = _QUOTES.sub("", line.translate(_TYPOGRAPHY))
+    line = _WHITESPACE.sub(" ", line).strip()
+    line = _SPACE_AFTER.sub("", _SPACE_BEFORE.sub("", line))
+    return _TERMINAL.sub("", line).casefold()
+
+
+def _substantive(tags: Sequence[str]) -> List[str]:
+    return [t for t in tags if t in _SUBSTANTIVE_TAGS or t.startswith("watchlist:")]
+
+
+def _mask_label(match: "re.Match[str]") -> str:
+    # A label that is only the link's URL says nothing the target doesn't.
+    # Any other is kept, up to typography, so "do not sell" is not "sell".
+    label = match.group(1).strip()
+    return "[<url>](" if _URL.fullmatch(label) else f"[{_mask_typography(label)}]("
+
+
+def _mask_links(line: str) -> str:
+    line = _MARKDOWN_LINK.sub(_mask_label, _FILE_SIZE.sub("<size>", line))
+    return _URL.sub(lambda m: f"{m.group(2).lower()}{m.group(3).rstrip('/')}", line)
+
+
+_MASKS: Dict[str, Callable[[str], str]] = {
+    DATE_STAMP: _mask_dates,
+    TYPOGRAPHY: _mask_typography,
+    LINK: _mask_links,
+}
+
+
+@dataclass
+class LocalVerdict:
+    rule: str
+    result: dict
+
+    def outcome(self) -> analysis.AnalysisOutcome:
+        return analysis.AnalysisOutcome(result=dict(self.result), local_rule=self.rule)
+
+
+def changed_pairs(diff_text: str) -> Optional[List[Tuple[str, str]]]:
+    """(removed, added) line pairs, or None if lines were added or removed outright."""
+    pairs: List[Tuple[str, str]] = []
+    removed: List[str] = []
+    added: List[str] = []
+
+    def close() -> bool:
+        if len(removed) != len(added):
+            return False
+        pairs.extend(zip(removed, added))
+        removed.clear()
+        added.clear()
+        return True
+
+    for line in diff_text.splitlines():
+        if line.startswith(("+++", "---", "@@")):
+            if not close():
+                return None
+            continue
+        if line.startswith("-") or line.startswith("+"):
+            if not line[1:].strip():
+                continue  # A blank line moving is layout.
+            (removed if line.startswith("-") else added).append(line[1:])
+            continue
+        if not close():
+            return None
+    if not close():
+        return None
+    return pairs
+
+
+def _pair_rule(old: str, new: str, rules: Sequence[str]) -> Optional[str]:
+    """The rule that explains this pair, "a+b" for a combination, or None."""
+    usable = [r for r in rules if r != DATE_STAMP or (_is_stamp_line(old) and _is_stamp_line(new))]
+    for rule in usable:
+        if _MASKS[rule](old) == _MASKS[rule](new):
+            return rule
+    if len(usable) > 1:
+        masked_old, masked_new = old, new
+        for rule in usable:
+            masked_old, masked_new = _MASKS[rule](masked_old), _MASKS[rule](masked_new)
+        if masked_old == masked_new:
+            return "+".join(usable)
+    return None
+
+
+def classify(
+    per_document: Sequence[Tuple[str, diffing.DiffResult]],
+    *,
+    rules: Sequence[str] = RULES,
+    max_changed_lines: int = 20,
+    tags: Sequence[str] = (),
+) -> Optional[LocalVerdict]:
+    """A local verdict for a trivial change, or None to ask the model.
+
+    `tags` is the set's fingerprint, as routed; each diff's own tags count too.
+    """
+    changed = [(label, d) for label, d in per_document if not d.is_empty]
+    if not changed or not rules:
+        return None
+    if _substantive([*tags, *(t for _, d in changed for t in d.tags)]):
+        return None
+    if any(d.truncated for _, d in changed):
+        return None
+    if sum(d.changed_lines for _, d in changed) > max_changed_lines:
+        return None
+
+    used: List[str] = []
+    quoted: List[str] = []
+    for label, diff in changed:
+        pairs = changed_pairs(diff.text)
+        if not pairs:
+            return None
+        lines = []
+        for old, new in pairs:
+            rule = _pair_rule(old, new, rules)
+            if rule is None:
+                return None
+            used.extend(r for r in rule.split("+") if r not in used)
+            if len(lines) < _QUOTED_PAIRS:
+                lines.append(f"- `{old.strip()}` → `{new.strip()}`")
+        quoted.append(f"**{label}**\n\n" + "\n".join(lines))
+
+    rule = "+".join(r for r in RULES if r in used)
+    summary = f"Only {' and '.join(_SUBJECTS[r] for r in RULES if r in used)} changed."
+    result = analysis.validate_result(
+        {
+            "verdict": analysis.NO_MATERIAL_CHANGE,
+            "summary": summary,
+            "analysis": (
+                f"Classified locally without a model call (rule: `{rule}`).\n\n"
+                + "\n\n".join(quoted)
+            ),
+            "priority": "low",
+        }
+    )
+    return LocalVerdict(rule=rule, result=result)
+
+
+# --- Audit against the archive ---------------------------------------------
+
+def _agreement(judged: Any) -> str:
+    """How the model's archived answer compares with a local no_material_change."""
+    if not isinstance(judged, dict) or str(judged.get("summary", "")).startswith("Analysis failed"):
+        return "no verdict"
+    if judged.get("verdict"):
+        return "agrees" if judged["verdict"] == analysis.NO_MATERIAL_CHANGE else "disagrees"
+    # Archives from before the verdict field rated every change; `low` is the
+    # nearest they came to declining.
+    return "agrees" if str(judged.get("priority", "")).lower() == "low" else "disagrees"
+
+
+def audit(
+    log_dir: str, *, rules: Sequence[str] = RULES, max_changed_lines: int = 20
+) -> List[Dict[str, Any]]:
+    """Replay each archived change through triage beside the model's answer."""
+    rows: List[Dict[str, Any]] = []
+    for change in history.archived_changes(log_dir):
+        try:
+            with open(change.analysis_path, "r", encoding="utf-8") as handle:
+                judged = json.load(handle)
+        except (OSError, json.JSONDecodeError):
+            judged = None
+        changed = change.changed
+        local = classify(changed, rules=rules, max_changed_lines=max_changed_lines)
+        rows.append(
+            {
+                "file_id": change.file_id,
+                "stamp": change.stamp,
+                "changed_lines": sum(d.changed_lines for _, d in changed),
+                "local_rule": local.rule if local else "",
+                "model": _agreement(judged),
+                "model_priority": judged.get("priority") if isinstance(judged, dict) else None,
+            }
+        )
+    return rows
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from .config import ConfigError, load_config
+
+    parser = argparse.ArgumentParser(
+        description="Compare local triage with the model's archived answers."
+    )
+    parser.add_argument("log_dir", nargs="?", default="logs")
+    parser.add_argument("--config", default="steward_config.yaml")
+    args = parser.parse_args(argv)
+
+    try:
+        cfg = load_config(args.config)
+    except ConfigError as exc:
+        print(f"Configuration error — {exc}")
+        return 1
+
+    rows = audit(
+        args.log_dir, rules=cfg.triage.rules, max_changed_lines=cfg.triage.max_changed_lines
+    )
+    classified = [r for r in rows if r["local_rule"]]
+    print(f"{len(rows)} archived change(s); {len(classified)} would be classified locally")
+    for row in classified:
+        print(
+            f"  {row['model']:<10} {row['file_id']} {row['stamp']}: {row['local_rule']}"
+            f" (model priority: {row['model_priority'] or '-'})"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
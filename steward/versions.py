@@ -0,0 +1,353 @@
+"""Any document's text as of any time, and the diff between any two versions.
+
+The dashboard shows the current snapshot and the last diff. Anything older
+meant downloading archived aggregates and diffing them by hand. This module
+reads the same archive the pipeline writes, and indexes it.
+
+versions.json maps each document (`file_id`, `doc_id`) to its versions,
+oldest first. A row is `[timestamp, hash, where]`:
+
+- `timestamp` is the earliest time the text was observed.
+- `hash` is `content.content_hash` of the text.
+- `where` is `blobs` when the text is in the blob store under that hash, or
+  the path of a pre-blob file that holds it.
+
+Observations come from three places:
+
+- each archived snapshot, at its stamp;
+- each known version in a record's `seen_hashes`, at its `seen_at`;
+- the current text, at `last_checked`.
+
+They are sorted, and consecutive observations of the same text are collapsed.
+A return to an earlier text is a new row. Finding the version in force at a
+given time is a bisection, not a scan of logs/. The index is rebuilt at the
+end of every run, next to history.json.
+
+    python main.py history list <file_id> [<doc>]
+    python main.py history show <file_id> <doc> --at 2026-08-08
+    python main.py history diff <file_id> <doc> 2026-08-07 2026-08-09
+
+`<doc>` is a doc_id, a URL, or a document label.
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import logging
+import os
+import re
+import sys
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from . import blobs, commit, content, diffing, jsonio, state
+
+log = logging.getLogger(__name__)
+
+VERSION_INDEX_FILE = "versions.json"
+IN_BLOBS = "blobs"
+
+# Archive stamps and run timestamps are AEST, as main.py writes them.
+AEST_TZ = timezone(timedelta(hours=10))
+
+Row = Tuple[str, str, str]
+
+
+def as_timestamp(value: str, *, end_of_day: bool = False) -> str:
+    """An ISO timestamp in AEST, the one form every row is compared in.
+
+    Accepts ISO timestamps, with or without an offset (AEST assumed), archive
+    stamps (`20260807_125653`), and bare dates, which mean the start of the day
+    or, with `end_of_day`, its last second.
+    """
+    value = value.strip()
+    try:
+        when = datetime.strptime(value, "%Y%m%d_%H%M%S")
+    except ValueError:
+        try:
+            when = datetime.fromisoformat(value)
+        except ValueError as exc:
+            raise ValueError(f"not a timestamp: {value!r}") from exc
+        if end_of_day and len(value) == 10:
+            when = datetime.combine(when.date(), time(23, 59, 59))
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=AEST_TZ)
+    return when.astimezone(AEST_TZ).isoformat()
+
+
+class VersionIndex:
+    def __init__(self, sets: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None) -> None:
+        # file_id -> doc_id -> {"url": ..., "label": ..., "versions": [Row, ...]}
+        self.sets = sets or {}
+
+    # --- building -----------------------------------------------------------
+
+    def observe(
+        self, file_id: str, url: str, timestamp: str, text_hash: str, where: str, label: str = ""
+    ) -> None:
+        doc = self.sets.setdefault(file_id, {}).setdefault(
+            content.document_id(url), {"url": url, "label": label, "versions": []}
+        )
+        if label:
+            doc["label"] = label
+        doc["versions"].append((as_timestamp(timestamp), text_hash, where))
+
+    def settle(self) -> "VersionIndex":
+        """Sort each document's observations and keep only where the text changed."""
+        for documents in self.sets.values():
+            for doc in documents.values():
+                rows: List[Row] = []
+                # At one instant, a text in the blob store beats a file.
+                for row in sorted(doc["versions"], key=lambda r: (r[0], r[2] != IN_BLOBS)):
+                    if rows and rows[-1][1] == row[1]:
+                        if rows[-1][2] != IN_BLOBS and row[2] == IN_BLOBS:
+                            rows[-1] = (rows[-1][0], row[1], IN_BLOBS)
+                        continue
+                    rows.append(tuple(row))
+                doc["versions"] = rows
+        return self
+
+    # --- lookups ------------------------------------------------------------
+
+    def find(self, file_id: str, doc: str) -> Tuple[str, Dict[str, Any]]:
+        """(doc_id, entry) for a doc_id, URL or label; KeyError if there is none."""
+        documents = self.sets.get(file_id)
+        if documents is None:
+            raise KeyError(f"no versions recorded for {file_id!r}")
+        if doc in documents:
+            return doc, documents[doc]
+        for doc_id, entry in documents.items():
+            if doc == entry["url"] or doc.lower() == str(entry.get("label", "")).lower():
+                return doc_id, entry
+        raise KeyError(f"{file_id!r} has no document {doc!r}; known: {', '.join(sorted(documents))}")
+
+    def versions(self, file_id: str, doc: str) -> List[Row]:
+        return [tuple(row) for row in self.find(file_id, doc)[1]["versions"]]
+
+    def at(self, file_id: str, doc: str, timestamp: str) -> Optional[Row]:
+        """The version in force at `timestamp`, or None if it predates them all."""
+        rows = self.find(file_id, doc)[1]["versions"]
+        position = bisect.bisect_right(rows, as_timestamp(timestamp, end_of_day=True), key=lambda r: r[0])
+        return tuple(rows[position - 1]) if position else None
+
+    # --- persistence --------------------------------------------------------
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "sets": {
+                file_id: {
+                    doc_id: {**doc, "versions": [list(row) for row in doc["versions"]]}
+                    for doc_id, doc in sorted(documents.items())
+                }
+                for file_id, documents in sorted(self.sets.items())
+            },
+        }
+
+    @classmethod
+    def load(cls, path: str = VERSION_INDEX_FILE) -> Optional["VersionIndex"]:
+        try:
+            data = jsonio.load(path)
+        except (OSError, ValueError):
+            return None
+        sets = data.get("sets") if isinstance(data, dict) else None
+        if not isinstance(sets, dict):
+            return None
+        for documents in sets.values():
+            for doc in documents.values():
+                doc["versions"] = [tuple(row) for row in doc.get("versions") or []]
+        return cls(sets)
+
+
+def build_index(
+    log_dir: str,
+    hashes: Dict[str, Dict[str, Any]],
+    store: blobs.BlobStore,
+    *,
+    snapshots_dir: str = "snapshots",
+) -> VersionIndex:
+    """Index every version the archive and the stored state know of."""
+    index = VersionIndex()
+
+    for file_id, archives in blobs.archived_snapshots(log_dir).items():
+        for stamp, path in archives:
+            if path.endswith(blobs.SNAPSHOT_MANIFEST_SUFFIX):
+                manifest = blobs.read_manifest(path) or {}
+                for url, blob in manifest.get("documents") or []:
+                    index.observe(file_id, url, stamp, blob, IN_BLOBS)
+                continue
+            with open(path, "r", encoding="utf-8", newline="") as handle:
+                sections = content.split_aggregate(handle.read())
+            for url, text in sections.items():
+                index.observe(file_id, url, stamp, content.content_hash(text), path)
+
+    for entry in hashes.values():
+        file_id = entry.get("file_id") if isinstance(entry, dict) else None
+        if not file_id:
+            continue
+        for url, record in (entry.get("documents") or {}).items():
+            label = record.get("label", "")
+            for text_hash, info in (record.get("seen_hashes") or {}).items():
+                if info.get("seen_at") and store.has(text_hash):
+                    index.observe(file_id, url, info["seen_at"], text_hash, IN_BLOBS, label)
+            current = record.get("hash")
+            checked = record.get("last_changed") or record.get("last_success") or entry.get("last_checked")
+            if not current or not checked:
+                continue
+            if store.has(current):
+                index.observe(file_id, url, checked, current, IN_BLOBS, label)
+                continue
+            doc_id = record.get("doc_id") or content.document_id(url)
+            legacy = os.path.join(snapshots_dir, file_id, f"{doc_id}.txt")
+            if os.path.exists(legacy):
+                index.observe(file_id, url, checked, current, legacy, label)
+
+    return index.settle()
+
+
+def write_index(index: VersionIndex, path: str = VERSION_INDEX_FILE) -> bool:
+    """Returns whether the file changed; it is not rewritten when it didn't."""
+    return commit.replace_if_changed(path, jsonio.dumps(index.to_json()))
+
+
+def text_of(row: Row, url: str, store: blobs.BlobStore) -> str:
+    """The text a row points at. BlobError / OSError if it has gone."""
+    _, text_hash, where = row
+    if where == IN_BLOBS:
+        return store.get(text_hash)
+    with open(where, "r", encoding="utf-8", newline="") as handle:
+        text = handle.read()
+    if where.endswith(blobs.LEGACY_SNAPSHOT_SUFFIX):
+        text = content.split_aggregate(text).get(url, "")
+    return text
+
+
+def text_at(
+    index: VersionIndex, store: blobs.BlobStore, file_id: str, doc: str, timestamp: str
+) -> Optional[str]:
+    """A document's text as it stood at `timestamp`; None before its first version."""
+    row = index.at(file_id, doc, timestamp)
+    if row is None:
+        return None
+    return text_of(row, index.find(file_id, doc)[1]["url"], store)
+
+
+def diff_between(
+    index: VersionIndex,
+    store: blobs.BlobStore,
+    file_id: str,
+    doc: str,
+    older: str,
+    newer: str,
+    *,
+    context_lines: int = 3,
+    max_chars: int = 0,
+) -> diffing.DiffResult:
+    """The diff from the version in force at `older` to the one at `newer`.
+
+    Its headers name each side by the timestamp and hash of the version it
+    resolved to. `max_chars` of 0 leaves the diff untruncated.
+    """
+    _, entry = index.find(file_id, doc)
+    sides = []
+    for timestamp in (older, newer):
+        row = index.at(file_id, doc, timestamp)
+        if row is None:
+            sides.append(("", f"none as early as {timestamp}"))
+        else:
+            sides.append((text_of(row, entry["url"], store), f"{row[0]} {row[1][:12]}"))
+    (before, before_name), (after, after_name) = sides
+    return diffing.compute_diff(
+        before,
+        after,
+        label=entry.get("label") or entry["url"],
+        context_lines=context_lines,
+        max_chars=max_chars or sys.maxsize,
+        versions=(before_name, after_name),
+    )
+
+
+# --- CLI -------------------------------------------------------------------------
+
+
+def _load_hashes(path: str) -> Dict[str, Any]:
+    try:
+        return state.read_hashes(path)
+    except (OSError, ValueError):
+        return {}
+
+
+def _resolve_file_id(index: VersionIndex, name: str) -> str:
+    """A file_id as given, or the file_id of a set name (main.slugify_set_name)."""
+    if name in index.sets:
+        return name
+    return re.sub(r"[^a-zA-Z0-9\-]+", "_", name).strip("_")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="main.py history", description="Read any archived version of a document."
+    )
+    parser.add_argument("--index", default=VERSION_INDEX_FILE)
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index from logs/ and hashes.json first")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    listing = commands.add_parser("list", help="list a set's documents, or one document's versions")
+    listing.add_argument("file_id", help="file_id or set name")
+    listing.add_argument("doc", nargs="?")
+
+    show = commands.add_parser("show", help="print a document's text as of a time")
+    show.add_argument("file_id")
+    show.add_argument("doc")
+    show.add_argument("--at", default=datetime.now(AEST_TZ).isoformat())
+
+    between = commands.add_parser("diff", help="diff a document between two times")
+    between.add_argument("file_id")
+    between.add_argument("doc")
+    between.add_argument("older")
+    between.add_argument("newer", nargs="?", default=datetime.now(AEST_TZ).isoformat())
+    between.add_argument("--context", type=int, default=3)
+
+    args = parser.parse_args(argv)
+    store = blobs.BlobStore()
+
+    index = None if args.rebuild else VersionIndex.load(args.index)
+    if index is None:
+        index = build_index("logs", _load_hashes("hashes.json"), store)
+        write_index(index, args.index)
+
+    file_id = _resolve_file_id(index, args.file_id)
+    try:
+        if args.command == "list" and not args.doc:
+            if file_id not in index.sets:
+                print(f"No versions recorded for {args.file_id!r}")
+                return 1
+            for doc_id, entry in sorted(index.sets[file_id].items()):
+                print(f"{doc_id}  {len(entry['versions'])} version(s)  {entry['url']}")
+            return 0
+        if args.command == "list":
+            for timestamp, text_hash, where in index.versions(file_id, args.doc):
+                print(f"{timestamp}  {text_hash[:12]}  {where}")
+            return 0
+        if args.command == "show":
+            text = text_at(index, store, file_id, args.doc, args.at)
+            if text is None:
+                print(f"No version of {args.doc!r} as early as {args.at}")
+                return 1
+            print(text)
+            return 0
+        diff = diff_between(
+            index, store, file_id, args.doc, args.older, args.newer, context_lines=args.context
+        )
+        print(diff.text if not diff.is_empty else f"No difference between {args.older} and {args.newer}")
+        return 0
+    except (KeyError, ValueError) as exc:
+        print(exc.args[0] if exc.args else exc)
+        return 1
+    except (blobs.BlobError, OSError) as exc:
+        print(f"Could not read that version: {exc}")
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
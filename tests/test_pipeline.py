@@ -12,26 +12,60 @@ false alert on the dashboard:
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
+import shutil
 import sys
 import tempfile
+import threading
+import time
 import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import main
-from steward import PIPELINE_VERSION, analysis, config, content, diffing, fetching, health, history
+from steward import (
+    PIPELINE_VERSION,
+    analysis,
+    analytics,
+    archive,
+    benchmark,
+    blobs,
+    budget,
+    commit,
+    config,
+    content,
+    diffing,
+    examine,
+    fetching,
+    health,
+    history,
+    jsonio,
+    pipeline,
+    routing,
+    runlog,
+    standin,
+    state,
+    triage,
+    versions,
+)
+from steward.cache import AnalysisCache
+from steward.ratelimit import RateLimiter
 from steward.validation import BLOCK_PAGE, SHRANK, TOO_SHORT, validate_capture
 
 REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-PERPLEXITY_8_AUG = os.path.join(
-    REPO_ROOT, "logs", "Perplexity_AI_Legal_Policies_20260808_120221_snapshot.txt"
-)
-PERPLEXITY_7_AUG = os.path.join(
-    REPO_ROOT, "logs", "Perplexity_AI_Legal_Policies_20260807_125653_snapshot.txt"
-)
+# Copies of archived Perplexity snapshots. Every run reshapes logs/ (sharding,
+# the blob store, retention), so the tests never read from it by path.
+FIXTURES = os.path.join(REPO_ROOT, "tests", "fixtures")
+PERPLEXITY_8_AUG = os.path.join(FIXTURES, "Perplexity_AI_Legal_Policies_20260808_120221_snapshot.txt")
+PERPLEXITY_7_AUG = os.path.join(FIXTURES, "Perplexity_AI_Legal_Policies_20260807_125653_snapshot.txt")
 TOS_URL = "https://www.perplexity.ai/hub/legal/terms-of-service"
+AUP_URL = "https://www.perplexity.ai/hub/legal/aup"
+PRIVACY_URL = "https://www.perplexity.ai/hub/legal/privacy-policy"
 
 
 def read_fixture(path: str) -> str:
@@ -154,7 +188,7 @@ class CosmeticDiffMakesNoModelCall(unittest.TestCase):
 
 
 class SizeDeltaGuardRejectsThe8AugustCapture(unittest.TestCase):
-    """The capture that produced two false criticals, replayed from logs/."""
+    """The capture that produced two false criticals, replayed from tests/fixtures/."""
 
     def setUp(self):
         self.cfg = load_cfg()
@@ -276,8 +310,1271 @@ class SchemaValidationRejectsBadResponses(unittest.TestCase):
 
     def test_no_timestamp_is_requested_from_the_model(self):
         prompt = analysis.build_prompt("Set", "@@ -1 +1 @@\n-a\n+b")
-        self.assertNotIn("date_time", prompt)
-        self.assertIn("Do not include a timestamp", prompt)
+        self.assertNotIn("date_time", prompt + analysis.SYSTEM_INSTRUCTION)
+        self.assertIn("Do not include a timestamp", analysis.SYSTEM_INSTRUCTION)
+
+
+GOOD_REPLY = json.dumps(
+    {"verdict": "material_change", "summary": "s", "analysis": "a", "priority": "high"}
+)
+
+
+class StatusError(Exception):
+    """Stands in for google.genai.errors.APIError, which carries `.code`."""
+
+    def __init__(self, code: int) -> None:
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FakeAsyncClient:
+    """The `client.aio.models.generate_content` surface, scripted per call.
+
+    Each reply is response text, or an exception to raise.
+    """
+
+    def __init__(self, replies=(), default=GOOD_REPLY, delay=0.0):
+        self.replies = list(replies)
+        self.default = default
+        self.delay = delay
+        self.calls = 0
+        self.models_called = []
+        self.in_flight = 0
+        self.peak = 0
+        self.sent = []
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self._generate))
+
+    async def _generate(self, *, model, contents, config):
+        self.calls += 1
+        self.models_called.append(model)
+        self.sent.append((contents, config))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            reply = self.replies.pop(0) if self.replies else self.default
+            if isinstance(reply, Exception):
+                raise reply
+            usage = SimpleNamespace(prompt_token_count=100, candidates_token_count=20)
+            return SimpleNamespace(text=reply, usage_metadata=usage)
+        finally:
+            self.in_flight -= 1
+
+
+class FakeClient:
+    """The synchronous `client.models.generate_content` surface."""
+
+    def __init__(self, replies=(), default=GOOD_REPLY):
+        self.replies = list(replies)
+        self.default = default
+        self.calls = 0
+        self.models_called = []
+        self.sent = []
+        self.models = SimpleNamespace(generate_content=self._generate)
+
+    def _generate(self, *, model, contents, config):
+        self.calls += 1
+        self.models_called.append(model)
+        self.sent.append((contents, config))
+        reply = self.replies.pop(0) if self.replies else self.default
+        usage = SimpleNamespace(prompt_token_count=100, candidates_token_count=20)
+        return SimpleNamespace(text=reply, usage_metadata=usage)
+
+
+async def _no_sleep(_seconds):
+    return None
+
+
+class RateLimiterHoldsTheWindow(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.slept = []
+
+        async def sleep(seconds):
+            self.slept.append(seconds)
+            self.now += seconds
+
+        self.sleep = sleep
+
+    def limiter(self, rpm=0, tpm=0):
+        return RateLimiter(rpm, tpm, clock=lambda: self.now, sleep=self.sleep)
+
+    def test_requests_past_the_quota_wait_for_the_window(self):
+        limiter = self.limiter(rpm=2)
+
+        async def go():
+            for _ in range(3):
+                await limiter.acquire()
+
+        asyncio.run(go())
+        self.assertEqual(self.slept, [60.0])
+
+    def test_tokens_past_the_quota_wait_for_the_window(self):
+        limiter = self.limiter(tpm=1000)
+
+        async def go():
+            await limiter.acquire(600)
+            self.now = 10.0
+            await limiter.acquire(600)
+
+        asyncio.run(go())
+        self.assertEqual(self.slept, [50.0])
+
+    def test_an_oversized_call_is_not_starved(self):
+        limiter = self.limiter(tpm=1000)
+        waited = asyncio.run(limiter.acquire(5000))
+        self.assertEqual(waited, 0.0)
+
+    def test_zero_means_unlimited(self):
+        limiter = self.limiter()
+
+        async def go():
+            for _ in range(50):
+                await limiter.acquire(10**6)
+
+        asyncio.run(go())
+        self.assertEqual(self.slept, [])
+
+
+class ConcurrentAnalysisRetriesTransientErrors(unittest.TestCase):
+    def request(self, name="Set"):
+        return analysis.AnalysisRequest(name, "@@ -1 +1 @@\n-a\n+b", ["Terms"], [])
+
+    def analyse(self, client, max_retries=3):
+        return asyncio.run(
+            analysis.analyse_change_async(
+                self.request(), model="m", client=client, max_retries=max_retries, sleep=_no_sleep
+            )
+        )
+
+    def test_a_429_is_retried_without_spending_the_schema_retry(self):
+        client = FakeAsyncClient([StatusError(429), StatusError(503)])
+        outcome = self.analyse(client)
+        self.assertTrue(outcome.ok)
+        self.assertEqual(outcome.attempts, 1)
+        self.assertEqual(outcome.retries, 2)
+        self.assertEqual(client.calls, 3)
+
+    def test_a_client_error_is_not_retried(self):
+        client = FakeAsyncClient([StatusError(400), StatusError(400)])
+        outcome = self.analyse(client)
+        self.assertFalse(outcome.ok)
+        self.assertEqual(outcome.retries, 0)
+        self.assertEqual(client.calls, 2)
+        self.assertIn("400", outcome.error)
+
+    def test_retries_are_bounded(self):
+        client = FakeAsyncClient([StatusError(429)] * 10)
+        outcome = self.analyse(client, max_retries=2)
+        self.assertFalse(outcome.ok)
+        self.assertEqual(outcome.attempts, 2)
+        self.assertEqual(outcome.retries, 4)
+        self.assertEqual(client.calls, 6)
+
+    def test_the_schema_retry_still_applies(self):
+        client = FakeAsyncClient(['{"verdict": "material_change"}'])
+        outcome = self.analyse(client)
+        self.assertTrue(outcome.ok)
+        self.assertEqual(outcome.attempts, 2)
+        self.assertEqual(outcome.prompt_tokens, 200)
+
+    def test_several_sets_share_one_client_and_run_concurrently(self):
+        client = FakeAsyncClient(delay=0.05)
+        settings = config.AnalysisConfig(concurrency=3, requests_per_minute=0, tokens_per_minute=0)
+        requests = [self.request(f"Set {i}") for i in range(6)]
+        outcomes = analysis.analyse_changes(requests, model="m", settings=settings, client=client)
+        self.assertEqual(len(outcomes), 6)
+        self.assertTrue(all(o.ok for o in outcomes))
+        self.assertEqual(client.calls, 6)
+        self.assertEqual(client.peak, 3)
+
+    def test_no_api_key_fails_every_request_cleanly(self):
+        original = os.environ.pop("GEMINI_API_KEY", None)
+        if original is not None:
+            self.addCleanup(os.environ.__setitem__, "GEMINI_API_KEY", original)
+        outcomes = analysis.analyse_changes(
+            [self.request()], model="m", settings=config.AnalysisConfig()
+        )
+        self.assertFalse(outcomes[0].ok)
+        self.assertIn("GEMINI_API_KEY", outcomes[0].error)
+
+
+class RepeatedDiffsAreAnsweredFromTheCache(unittest.TestCase):
+    DIFF = "@@ -1 +1 @@\n-Fees are $5.\n+Fees are $6."
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "analysis_cache.json")
+        self.cache = AnalysisCache(self.path)
+
+    def analyse(self, client, **kwargs):
+        args = {"model": "m", "changed_documents": ["Terms"], "tags": ["money"], **kwargs}
+        return analysis.analyse_change("Set", self.DIFF, client=client, cache=self.cache, **args)
+
+    def test_the_second_identical_diff_costs_nothing(self):
+        client = FakeClient()
+        first = self.analyse(client)
+        second = self.analyse(client)
+        self.assertEqual(client.calls, 1)
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        self.assertEqual(second.result, first.result)
+        self.assertEqual((second.prompt_tokens, second.output_tokens, second.attempts), (0, 0, 0))
+
+    def test_anything_that_shapes_the_answer_is_a_miss(self):
+        client = FakeClient()
+        self.analyse(client)
+        self.analyse(client, model="other")
+        self.analyse(client, tags=["money", "date"])
+        self.analyse(client, changed_documents=["Privacy"])
+        self.assertEqual(client.calls, 4)
+
+    def test_the_prompt_version_is_part_of_the_key(self):
+        before = analysis.cache_key("m", self.DIFF)
+        original = analysis.PROMPT_VERSION
+        analysis.PROMPT_VERSION = original + 1
+        self.addCleanup(setattr, analysis, "PROMPT_VERSION", original)
+        self.assertNotEqual(before, analysis.cache_key("m", self.DIFF))
+
+    def test_a_rejected_response_is_not_cached(self):
+        client = FakeClient(['{"verdict": "nope"}', '{"verdict": "nope"}'])
+        self.assertFalse(self.analyse(client).ok)
+        self.assertEqual(self.cache.entries, {})
+
+    def test_the_cache_survives_a_save_and_load(self):
+        self.analyse(FakeClient())
+        self.cache.save()
+        self.cache = AnalysisCache.load(self.path)
+        client = FakeClient()
+        self.assertTrue(self.analyse(client).cached)
+        self.assertEqual(client.calls, 0)
+
+    def test_eviction_by_age_and_size(self):
+        cache = AnalysisCache(self.path, max_age_days=30, max_entries=2)
+        for key, stored in (
+            ("stale", "2020-01-01T00:00:00+00:00"),
+            ("old", "2099-01-01T00:00:00+00:00"),
+            ("mid", "2099-01-02T00:00:00+00:00"),
+            ("new", "2099-01-03T00:00:00+00:00"),
+        ):
+            cache.entries[key] = {"result": {"verdict": "uncertain"}, "stored_at": stored, "last_used": stored}
+        self.assertEqual(cache.evict(), 2)
+        self.assertEqual(set(cache.entries), {"mid", "new"})
+
+
+class TheTokenBudgetIsSpentInPriorityOrder(unittest.TestCase):
+    ORDER = ["Australian Government", "State Government", "Private Sector"]
+
+    def candidate(self, name, tokens, tags=(), category="Private Sector"):
+        return budget.Candidate(name, category, list(tags), tokens)
+
+    def test_watchlist_hits_then_tags_then_category(self):
+        candidates = [
+            self.candidate("plain private", 100),
+            self.candidate("plain federal", 100, category="Australian Government"),
+            self.candidate("tagged", 100, tags=["date"]),
+            self.candidate("watchlist", 100, tags=["watchlist:arbitration"]),
+        ]
+        plan = budget.schedule(candidates, run_tokens=250, category_order=self.ORDER)
+        self.assertEqual(plan.admitted, [3, 2])
+        self.assertEqual(plan.deferred, [1, 0])
+
+    def test_a_change_that_does_not_fit_does_not_block_smaller_ones(self):
+        candidates = [
+            self.candidate("huge", 5000, tags=["watchlist:liability"]),
+            self.candidate("small", 100),
+        ]
+        plan = budget.schedule(candidates, run_tokens=1000)
+        self.assertEqual(plan.admitted, [1])
+        self.assertEqual(plan.deferred, [0])
+
+    def test_a_change_over_the_whole_run_budget_gets_a_run_to_itself(self):
+        huge = self.candidate("huge", 5000, tags=["watchlist:liability"])
+        plan = budget.schedule([huge, self.candidate("huger", 9000)], run_tokens=1000)
+        self.assertEqual(plan.admitted, [0])
+        self.assertEqual(plan.deferred, [1])
+        self.assertEqual(plan.estimated_tokens, 5000)
+
+        # Not while a change that fits is waiting, nor once the day is spent.
+        self.assertEqual(budget.schedule([huge, self.candidate("small", 100)], run_tokens=1000).admitted, [1])
+        spent = budget.schedule([huge], run_tokens=1000, day_tokens=2000, spent_today=2000)
+        self.assertEqual(spent.admitted, [])
+
+    def test_the_day_budget_counts_what_earlier_runs_spent(self):
+        candidates = [self.candidate("a", 400), self.candidate("b", 400)]
+        plan = budget.schedule(candidates, run_tokens=10000, day_tokens=1000, spent_today=500)
+        self.assertEqual(len(plan.admitted), 1)
+
+    def test_zero_means_unlimited(self):
+        candidates = [self.candidate(str(i), 10**6) for i in range(5)]
+        plan = budget.schedule(candidates)
+        self.assertEqual(len(plan.admitted), 5)
+        self.assertEqual(plan.deferred, [])
+
+    def test_the_estimate_covers_the_built_prompt(self):
+        request = analysis.AnalysisRequest("Set", "+x" * 4000, ["Terms"], ["money"])
+        prompt = analysis.build_prompt("Set", request.diff_text, ["Terms"], ["money"])
+        estimate = analysis.estimate_request_tokens(request)
+        self.assertGreaterEqual(estimate, len(prompt) // 4)
+        self.assertGreater(estimate, len(request.diff_text) // 4 + analysis.OUTPUT_TOKEN_ALLOWANCE)
+
+    def test_a_cached_request_is_free(self):
+        request = analysis.AnalysisRequest("Set", "+x", ["Terms"], [])
+        cache = AnalysisCache(os.devnull)
+        cache.put(analysis.cache_key("m", "+x", ["Terms"], []), {"verdict": "uncertain"})
+        self.assertEqual(analysis.estimate_request_tokens(request, model="m", cache=cache), 0)
+        self.assertEqual(cache.hits, 0, "estimating must not count as a lookup")
+
+    def test_spend_since_midnight_is_read_from_the_run_log(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(tmp, "runs")
+            now = datetime.now(runlog.SEGMENT_TZ)
+            yesterday = now - timedelta(days=1)
+            log = runlog.RunLog("test", directory)
+            for when, tokens in ((yesterday, 5000), (now, 300), (now, 200)):
+                log.record(timestamp=when.isoformat(), prompt_tokens=tokens, output_tokens=10)
+            log.flush()
+            since = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            self.assertEqual(runlog.tokens_since(since, directory), 520)
+
+
+UNCERTAIN_REPLY = json.dumps(
+    {"verdict": "uncertain", "summary": "s", "analysis": "a", "priority": "medium"}
+)
+
+
+class RoutineDiffsGoToTheFastModel(unittest.TestCase):
+    def setUp(self):
+        self.cfg = load_cfg()
+        self.cfg.routing.fast_model = "fast-model"
+        self.cfg.routing.max_changed_lines = 10
+        self.cfg.routing.fast_tags = ["date"]
+
+    def test_a_small_date_bump_goes_to_the_fast_model(self):
+        chosen = routing.route(2, ["date"], self.cfg)
+        self.assertEqual(chosen.tier, routing.FAST)
+        self.assertEqual(chosen.model, "fast-model")
+        self.assertEqual(chosen.escalate_to, self.cfg.model)
+
+    def test_large_or_flagged_diffs_go_to_the_main_model(self):
+        self.assertEqual(routing.route(11, [], self.cfg).tier, routing.MAIN)
+        self.assertEqual(routing.route(2, ["obligation"], self.cfg).tier, routing.MAIN)
+        # A watchlist hit is never routine, even if listed as a fast tag.
+        self.cfg.routing.fast_tags.append("watchlist:arbitration")
+        self.assertEqual(routing.route(2, ["watchlist:arbitration"], self.cfg).tier, routing.MAIN)
+
+    def test_no_fast_model_means_no_routing(self):
+        self.cfg.routing.fast_model = ""
+        chosen = routing.route(1, [], self.cfg)
+        self.assertEqual((chosen.tier, chosen.model), (routing.MAIN, self.cfg.model))
+
+    def test_an_uncertain_fast_answer_is_escalated(self):
+        client = FakeClient(replies=[UNCERTAIN_REPLY, GOOD_REPLY])
+        outcome = analysis.analyse_change(
+            "Set", "+ 1 June", model="fast-model", client=client,
+            tier=routing.FAST, escalate_to="main-model",
+        )
+        self.assertEqual(client.models_called, ["fast-model", "main-model"])
+        self.assertEqual(outcome.result["verdict"], "material_change")
+        self.assertEqual((outcome.model, outcome.tier), ("main-model", routing.MAIN))
+        self.assertEqual(set(outcome.tiers), {routing.FAST, routing.MAIN})
+        self.assertEqual(outcome.prompt_tokens, 200)
+
+    def test_a_confident_fast_answer_is_kept(self):
+        client = FakeAsyncClient()
+        request = analysis.AnalysisRequest(
+            "Set", "+ 1 June", model="fast-model", tier=routing.FAST, escalate_to="main-model"
+        )
+        (outcome,) = analysis.analyse_changes(
+            [request], model="main-model", settings=self.cfg.analysis, client=client
+        )
+        self.assertEqual(client.models_called, ["fast-model"])
+        self.assertEqual(list(outcome.tiers), [routing.FAST])
+
+    def test_token_totals_are_split_by_tier(self):
+        log = runlog.RunLog("test")
+        log.record(
+            llm_called=True, prompt_tokens=300, output_tokens=40,
+            tiers={"fast": {"calls": 1, "prompt_tokens": 100, "output_tokens": 20, "ms": 30},
+                   "main": {"calls": 1, "prompt_tokens": 200, "output_tokens": 20, "ms": 90}},
+        )
+        log.record(
+            llm_called=True, prompt_tokens=100, output_tokens=20,
+            tiers={"fast": {"calls": 1, "prompt_tokens": 100, "output_tokens": 20, "ms": 10}},
+        )
+        by_tier = log.token_totals()["by_tier"]
+        self.assertEqual(by_tier["fast"], {"calls": 2, "prompt_tokens": 200, "output_tokens": 40, "ms": 40})
+        self.assertEqual(by_tier["main"]["ms"], 90)
+
+
+def _one_line_diff(old: str, new: str) -> list:
+    return [("Terms", diffing.compute_diff(f"Intro\n{old}\nOutro", f"Intro\n{new}\nOutro"))]
+
+
+class TrivialDiffsAreClassifiedLocally(unittest.TestCase):
+    def classify(self, old, new):
+        return triage.classify(_one_line_diff(old, new))
+
+    def test_a_copyright_year_is_a_date_stamp(self):
+        verdict = self.classify("© Copyright 2025 Perplexity", "© Copyright 2026 Perplexity")
+        self.assertEqual(verdict.rule, triage.DATE_STAMP)
+        self.assertEqual(verdict.result["verdict"], analysis.NO_MATERIAL_CHANGE)
+        self.assertEqual(verdict.result["priority"], "low")
+        # Same contract as a model answer.
+        self.assertEqual(analysis.validate_result(verdict.result), verdict.result)
+
+    def test_quotes_dashes_and_spacing_are_typography(self):
+        verdict = self.classify(
+            'For UK inquiries - see the "DMCA" notice', "For UK  inquiries — see the “DMCA” notice."
+        )
+        self.assertEqual(verdict.rule, triage.TYPOGRAPHY)
+
+    def test_a_download_size_is_a_link_label(self):
+        self.assertEqual(self.classify("157KB .xlsx", "156KB .xlsx").rule, triage.LINK)
+        self.assertEqual(
+            self.classify("See https://x.com/terms/?utm=a", "See https://x.com/terms#top").rule, triage.LINK
+        )
+
+    def test_a_link_label_that_says_something_else_goes_to_the_model(self):
+        self.assertIsNone(
+            self.classify(
+                "We [do not sell your personal information](https://x.com/privacy) to anyone.",
+                "We [sell your personal information](https://x.com/privacy) to anyone.",
+            )
+        )
+        for old, new in (
+            ("[Terms (157KB .pdf)](https://x.com/t.pdf)", "[Terms (156KB .pdf)](https://x.com/t.pdf)"),
+            ("[https://x.com/terms](https://x.com/terms)", "[https://x.com/terms/](https://x.com/terms/?utm=a)"),
+            ("See [“Privacy”](https://x.com/p)", 'See ["Privacy"](https://x.com/p?ref=nav)'),
+        ):
+            with self.subTest(old=old):
+                self.assertEqual(self.classify(old, new).rule, triage.LINK)
+
+    def test_a_date_inside_a_term_goes_to_the_model(self):
+        self.assertIsNone(
+            self.classify(
+                "You must give notice of any dispute to us in writing before 1 July 2026 at the latest.",
+                "You must give notice of any dispute to us in writing before 1 June 2026 at the latest.",
+            )
+        )
+
+    def test_numbers_and_amounts_are_not_masked(self):
+        self.assertIsNone(self.classify("A fee of 1.5% applies.", "A fee of 2.5% applies."))
+        self.assertIsNone(self.classify("Fee: $2000", "Fee: $2020"))
+        self.assertIsNone(self.classify("You may share", "You may not share"))
+
+    def test_substantive_edits_that_look_trivial_go_to_the_model(self):
+        for old, new in (
+            ("Fees are payable by 1 July.", "Fees are payable by 1 March."),
+            ("Price increases take effect on 1 July 2025.", "Price increases take effect on 1 July 2024."),
+            ("Data is kept for version 1.2.0", "Data is kept for version 2.0.0"),
+            ("This service is notable.", "This service is not able."),
+            ("Discount: -5%", "Discount: 5%"),
+            ("We will not share", "We will, not share"),
+            ("For U K inquiries:", "For UK inquiries:"),
+            ("These terms are effective from 1 July 2025", "These terms are effective from 1 July 2027"),
+        ):
+            with self.subTest(old=old):
+                self.assertIsNone(self.classify(old, new))
+
+    def test_a_fingerprinted_change_goes_to_the_model(self):
+        old, new = "Last updated 1 July 2025.", "Last updated 1 July 2026."
+        self.assertEqual(self.classify(old, new).rule, triage.DATE_STAMP)
+        self.assertIsNone(triage.classify(_one_line_diff(old, new), tags=["watchlist:arbitration"]))
+        self.assertIsNone(triage.classify(_one_line_diff("You must pay.", "You must pay")))
+        self.assertIsNotNone(triage.classify(_one_line_diff(old, new), tags=["date"]))
+
+    def test_the_config_knows_every_rule(self):
+        self.assertEqual(tuple(config._TRIAGE_RULES), triage.RULES)
+
+    def test_added_or_removed_lines_go_to_the_model(self):
+        added = [("Terms", diffing.compute_diff("Intro\nOutro", "Intro\n© 2026\nOutro"))]
+        self.assertIsNone(triage.classify(added))
+
+    def test_the_archive_audit_pairs_each_snapshot_with_its_analysis(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = "https://example.com/terms"
+            for stamp, year, priority in (("20260101_120000", 2025, "low"), ("20260201_120000", 2026, "low")):
+                with open(os.path.join(tmp, f"Example_{stamp}_snapshot.txt"), "w", encoding="utf-8") as handle:
+                    handle.write(content.build_aggregate([(url, f"Terms\n© Copyright {year} Example")]))
+                with open(os.path.join(tmp, f"Example_{stamp}_analysis.json"), "w", encoding="utf-8") as handle:
+                    json.dump({"summary": "s", "priority": priority}, handle)
+            (row,) = triage.audit(tmp)
+        self.assertEqual((row["stamp"], row["local_rule"], row["model"]), ("20260201_120000", "date_stamp", "agrees"))
+
+
+CHUNK_REPLY = json.dumps({"material": True, "priority": "high", "findings": ["Clause 4 now allows training."]})
+
+
+class OversizedDiffsAreAnalysedInParts(unittest.TestCase):
+    def setUp(self):
+        old = "\n".join(f"Clause {i}. The original wording of this clause." for i in range(300))
+        new = "\n".join(
+            f"Clause {i}. The {'revised' if i % 5 == 0 else 'original'} wording of this clause."
+            for i in range(300)
+        )
+        self.diff = diffing.compute_diff(old, new, label="Terms", max_chars=2000)
+        self.chunks = diffing.chunk_diffs([("Terms", self.diff)], 2000)
+
+    def test_every_changed_line_lands_in_exactly_one_part(self):
+        self.assertTrue(self.diff.truncated)
+        self.assertGreater(len(self.chunks), 1)
+        changed = [line for chunk in self.chunks for line in chunk.splitlines() if line.startswith(("+", "-"))]
+        self.assertEqual(len(changed), self.diff.changed_lines)
+        for chunk in self.chunks:
+            self.assertLessEqual(len(chunk), 2000)
+            self.assertTrue(chunk.startswith("===== Terms"))
+
+    def test_parts_are_mapped_then_reduced(self):
+        client = FakeClient(replies=[CHUNK_REPLY] * len(self.chunks) + [GOOD_REPLY])
+        prompts = []
+        generate = client.models.generate_content
+        client.models.generate_content = lambda **kw: prompts.append(kw["contents"]) or generate(**kw)
+        outcome = analysis.analyse_change(
+            "Set", "\n\n".join(self.chunks), model="m", client=client, chunks=self.chunks
+        )
+        self.assertTrue(outcome.ok)
+        self.assertEqual(client.calls, len(self.chunks) + 1)
+        self.assertIn(f"part 1 of {len(self.chunks)}", prompts[0])
+        self.assertIn("Clause 4 now allows training.", prompts[-1])
+        self.assertEqual(outcome.prompt_tokens, 100 * (len(self.chunks) + 1))
+
+    def test_parts_run_concurrently_and_one_bad_part_fails_the_set(self):
+        client = FakeAsyncClient(default=CHUNK_REPLY, delay=0.01)
+        generate = client.aio.models.generate_content
+
+        async def part_two_is_garbled(*, model, contents, config):
+            response = await generate(model=model, contents=contents, config=config)
+            if "part 2 of" in str(contents):
+                response.text = "not json"
+            return response
+
+        client.aio.models.generate_content = part_two_is_garbled
+        request = analysis.AnalysisRequest("Set", "\n\n".join(self.chunks), chunks=self.chunks)
+        settings = load_cfg().analysis
+        settings.requests_per_minute = 0
+        (outcome,) = analysis.analyse_changes([request], model="m", settings=settings, client=client)
+        self.assertFalse(outcome.ok)
+        self.assertIn(f"part 2 of {len(self.chunks)}", outcome.error)
+        self.assertGreater(client.peak, 1)
+
+    def test_the_map_schema_is_enforced(self):
+        self.assertFalse(
+            analysis.parse_chunk('{"material": "false", "priority": "Low", "findings": []}')["material"]
+        )
+        with self.assertRaises(analysis.SchemaError):
+            analysis.parse_chunk('{"material": true, "priority": "urgent", "findings": []}')
+        with self.assertRaises(analysis.SchemaError):
+            analysis.parse_chunk('{"material": true, "priority": "low", "findings": "x"}')
+
+    def test_the_estimate_covers_every_call(self):
+        request = analysis.AnalysisRequest("Set", "\n\n".join(self.chunks), chunks=self.chunks)
+        single = analysis.AnalysisRequest("Set", self.diff.text)
+        self.assertGreater(
+            analysis.estimate_request_tokens(request), analysis.estimate_request_tokens(single)
+        )
+
+
+class TheInstructionsAreSentOnce(unittest.TestCase):
+    def setUp(self):
+        self.settings = config.AnalysisConfig(
+            requests_per_minute=0, tokens_per_minute=0, context_cache_min_tokens=0
+        )
+        self.requests = [
+            analysis.AnalysisRequest(f"Set {i}", f"@@ -1 +1 @@\n-old {i}\n+new {i}") for i in range(3)
+        ]
+
+    def caching_client(self, fail=False):
+        client = FakeAsyncClient()
+        client.created, client.deleted = [], []
+
+        async def create(*, model, config):
+            if fail:
+                raise StatusError(400)
+            client.created.append(model)
+            return SimpleNamespace(name=f"cachedContents/{model}")
+
+        async def delete(*, name):
+            client.deleted.append(name)
+
+        generate = client.aio.models.generate_content
+
+        async def generate_with_cache_usage(*, model, contents, config):
+            response = await generate(model=model, contents=contents, config=config)
+            if config.cached_content:
+                response.usage_metadata.cached_content_token_count = 60
+            return response
+
+        client.aio.models.generate_content = generate_with_cache_usage
+        client.aio.caches = SimpleNamespace(create=create, delete=delete)
+        return client
+
+    def test_the_prompt_carries_only_the_change(self):
+        client = FakeClient()
+        analysis.analyse_change("Set", "@@ -1 +1 @@\n-a\n+b", model="m", client=client)
+        contents, generate_config = client.sent[0]
+        self.assertNotIn("Verdict definitions", contents)
+        self.assertEqual(generate_config.system_instruction, analysis.SYSTEM_INSTRUCTION)
+
+    def test_the_schema_retry_is_a_follow_up_turn(self):
+        client = FakeClient(replies=["not json", GOOD_REPLY])
+        outcome = analysis.analyse_change("Set", "@@ -1 +1 @@\n-a\n+b", model="m", client=client)
+        self.assertTrue(outcome.ok)
+        first, _ = client.sent[0]
+        retry, _ = client.sent[1]
+        self.assertEqual([turn["role"] for turn in retry], ["user", "model", "user"])
+        self.assertEqual(retry[0]["parts"][0]["text"], first)
+        self.assertEqual(retry[1]["parts"][0]["text"], "not json")
+        self.assertTrue(retry[2]["parts"][0]["text"].startswith("Your previous response was rejected"))
+
+    def test_one_cached_context_per_model_serves_every_call(self):
+        client = self.caching_client()
+        outcomes = analysis.analyse_changes(
+            self.requests, model="m", settings=self.settings, client=client
+        )
+        self.assertEqual(client.created, ["m"])
+        self.assertEqual(client.deleted, ["cachedContents/m"])
+        self.assertTrue(all(config.cached_content == "cachedContents/m" for _, config in client.sent))
+        self.assertTrue(all(o.prefix_cached and o.cached_tokens == 60 for o in outcomes))
+
+    def test_without_caching_the_instructions_go_inline(self):
+        client = self.caching_client(fail=True)
+        outcomes = analysis.analyse_changes(
+            self.requests, model="m", settings=self.settings, client=client
+        )
+        self.assertTrue(all(o.ok and not o.prefix_cached for o in outcomes))
+        self.assertTrue(
+            all(c.system_instruction == analysis.SYSTEM_INSTRUCTION for _, c in client.sent)
+        )
+
+    def test_instructions_below_the_provider_minimum_are_not_offered(self):
+        client = self.caching_client()
+        settings = config.AnalysisConfig(requests_per_minute=0, tokens_per_minute=0)
+        analysis.analyse_changes(self.requests, model="m", settings=settings, client=client)
+        self.assertEqual(client.created, [])
+
+
+BAD_VERDICT_REPLY = json.dumps(
+    {"verdict": "significant", "summary": "s", "analysis": "a" * 2000, "priority": "high"}
+)
+
+
+class StreamingClient:
+    """The streaming surface, each reply sent in 16-character pieces."""
+
+    def __init__(self, replies=()):
+        self.replies = list(replies)
+        self.pieces_sent = 0
+        self.models = SimpleNamespace(generate_content_stream=self._stream)
+
+    def _pieces(self):
+        reply = self.replies.pop(0) if self.replies else GOOD_REPLY
+        pieces = [reply[i:i + 16] for i in range(0, len(reply), 16)]
+        for index, piece in enumerate(pieces, 1):
+            self.pieces_sent += 1
+            usage = None
+            if index == len(pieces):
+                usage = SimpleNamespace(prompt_token_count=100, candidates_token_count=20)
+            yield SimpleNamespace(text=piece, usage_metadata=usage)
+
+    def _stream(self, *, model, contents, config):
+        return self._pieces()
+
+
+class StreamedAnswersAreRejectedEarly(unittest.TestCase):
+    def test_an_impossible_verdict_is_abandoned_before_the_reply_ends(self):
+        client = StreamingClient([BAD_VERDICT_REPLY, GOOD_REPLY])
+        outcome = analysis.analyse_change("Set", "+a", model="m", client=client, stream=True)
+        self.assertTrue(outcome.ok)
+        self.assertEqual((outcome.attempts, outcome.abandoned), (2, 1))
+        self.assertLess(client.pieces_sent, len(BAD_VERDICT_REPLY) // 16)
+        # The abandoned attempt reported no usage; its prompt is estimated.
+        self.assertGreater(outcome.prompt_tokens, 100 + analysis.estimate_tokens(analysis.SYSTEM_INSTRUCTION))
+
+    def test_a_valid_stream_is_read_to_the_end(self):
+        client = StreamingClient()
+        outcome = analysis.analyse_change("Set", "+a", model="m", client=client, stream=True)
+        self.assertTrue(outcome.ok)
+        self.assertEqual((outcome.prompt_tokens, outcome.output_tokens), (100, 20))
+
+    def test_the_concurrent_path_streams_when_configured(self):
+        client = StreamingClient([BAD_VERDICT_REPLY, BAD_VERDICT_REPLY])
+        settings = config.AnalysisConfig(requests_per_minute=0, tokens_per_minute=0, streaming=True)
+        (outcome,) = analysis.analyse_changes(
+            [analysis.AnalysisRequest("Set", "+a")], model="m", settings=settings, client=client
+        )
+        self.assertFalse(outcome.ok)
+        self.assertEqual(outcome.abandoned, 2)
+        self.assertIn("verdict must be one of", outcome.error)
+
+    def test_only_what_is_already_certain_rejects(self):
+        self.assertEqual(analysis.early_schema_error('```json\n{"verdict": "materi'), "")
+        self.assertEqual(analysis.early_schema_error('{"summary": "a \\" , \\"x\\": ", "pri'), "")
+        self.assertIn("unexpected key", analysis.early_schema_error('{"verdict": "uncertain", "date_time"'))
+        self.assertIn("priority must be", analysis.early_schema_error('{"priority": "urgent"'))
+        self.assertIn("not a JSON object", analysis.early_schema_error("Sure! Here"))
+
+
+def _bundle_reply(*entries) -> str:
+    return json.dumps({analysis.bundle_key(i): e for i, e in enumerate(entries, 1)})
+
+
+class SmallDiffsShareOneCall(unittest.TestCase):
+    def setUp(self):
+        self.settings = config.AnalysisConfig(
+            requests_per_minute=0, tokens_per_minute=0, bundle=True, bundle_max_sets=3
+        )
+        self.requests = [
+            analysis.AnalysisRequest(f"Set {i}", f"@@ -1 +1 @@\n-old {i}\n+new {i}", ["Terms"])
+            for i in range(1, 4)
+        ]
+        self.good = json.loads(GOOD_REPLY)
+
+    def test_three_small_diffs_are_answered_by_one_call(self):
+        client = FakeAsyncClient([_bundle_reply(self.good, self.good, self.good)])
+        outcomes = analysis.analyse_changes(
+            self.requests, model="m", settings=self.settings, client=client
+        )
+        self.assertEqual(client.calls, 1)
+        self.assertTrue(all(o.ok and o.bundled == 3 for o in outcomes))
+        self.assertEqual(sum(o.prompt_tokens for o in outcomes), 100)
+        self.assertEqual(sum(o.tiers[routing.MAIN]["calls"] for o in outcomes), 1)
+
+    def test_only_the_bad_entry_is_sent_again_alone(self):
+        client = FakeAsyncClient([_bundle_reply(self.good, {"verdict": "material_change"}, self.good)])
+        outcomes = analysis.analyse_changes(
+            self.requests, model="m", settings=self.settings, client=client
+        )
+        self.assertEqual(client.calls, 2)
+        self.assertTrue(all(o.ok for o in outcomes))
+        self.assertEqual(outcomes[1].attempts, 2)
+        self.assertEqual(outcomes[1].prompt_tokens, 33 + 100)
+
+    def test_an_unusable_reply_sends_every_set_alone(self):
+        client = FakeAsyncClient(["not json"])
+        outcomes = analysis.analyse_changes(
+            self.requests, model="m", settings=self.settings, client=client
+        )
+        self.assertEqual(client.calls, 4)
+        self.assertTrue(all(o.ok for o in outcomes))
+
+    def test_large_cached_or_chunked_diffs_go_alone(self):
+        cache = AnalysisCache(os.devnull)
+        cached = analysis.AnalysisRequest("Cached", "@@ -1 +1 @@\n-a\n+b")
+        cache.put(analysis.cache_key("m", cached.diff_text), dict(self.good))
+        large = analysis.AnalysisRequest("Large", "+x" * 4000)
+        chunked = analysis.AnalysisRequest("Chunked", "+y", chunks=["+y"])
+        fast = analysis.AnalysisRequest("Fast", "+z", model="lite")
+        requests = [*self.requests, cached, large, chunked, fast]
+        groups = analysis.plan_bundles(requests, model="m", max_sets=2, max_chars=6000, cache=cache)
+        self.assertEqual(groups, [[0, 1]])
+
+    def test_the_bundle_prompt_keys_every_set(self):
+        prompt = analysis.build_bundle_prompt(self.requests)
+        for i, request in enumerate(self.requests, 1):
+            self.assertIn(f'=== set_{i}: "{request.set_name}" ===', prompt)
+            self.assertIn(request.diff_text, prompt)
+        self.assertEqual(
+            [e for _, e in analysis.parse_bundle(_bundle_reply(self.good), 2)], ["", "no entry for set_2"]
+        )
+
+
+class TheStandInSpeaksTheApi(unittest.TestCase):
+    def settings(self, **overrides):
+        return config.AnalysisConfig(
+            concurrency=1, requests_per_minute=0, tokens_per_minute=0, backoff_seconds=0.01,
+            **overrides,
+        )
+
+    def test_the_real_client_retries_its_bursts_and_bad_answers(self):
+        behaviour = standin.Behaviour(
+            latency_ms=0, jitter_ms=0, burst_every=3, burst_length=1, malformed_rate=0.25, seed=3
+        )
+        requests = [analysis.AnalysisRequest(f"Set {i}", "@@ -1 +1 @@\n-a\n+b") for i in range(4)]
+        with standin.StandInServer(behaviour) as server:
+            client = analysis.make_client(server.url, api_key="stand-in")
+            for streaming in (False, True):
+                outcomes = analysis.analyse_changes(
+                    requests, model="m", settings=self.settings(streaming=streaming), client=client
+                )
+                self.assertTrue(all(o.ok for o in outcomes))
+                self.assertTrue(all(o.prompt_tokens > 0 for o in outcomes))
+            self.assertGreater(server.stats.rate_limited, 0)
+            self.assertGreater(server.stats.malformed, 0)
+            self.assertGreater(server.stats.streamed, 0)
+
+    def test_the_benchmark_replays_the_archive(self):
+        requests = benchmark.requests_from_archive(os.path.join(REPO_ROOT, "logs"), limit=3)
+        self.assertEqual(len(requests), 3)
+        self.assertTrue(all(r.diff_text.startswith("=====") for r in requests))
+        summary = benchmark.run(
+            requests, settings=self.settings(), behaviour=standin.Behaviour(latency_ms=0, jitter_ms=0)
+        )
+        self.assertEqual((summary["sets"], summary["analysed"], summary["calls"]), (3, 3, 3))
+        self.assertEqual(benchmark.percentile([5, 1, 4, 2, 3], 0.95), 5.0)
+
+
+class TextIsStoredOncePerVersion(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.join(self.tmp.name, "blobs")
+
+    def test_every_codec_round_trips_and_a_repeat_is_not_rewritten(self):
+        text = "Terms of Service\n\nWe may change these terms — à tout moment.\n" * 40
+        for codec in ("zlib", "lzma"):
+            store = blobs.BlobStore(os.path.join(self.root, codec), codec=codec)
+            blob = store.put(text)
+            self.assertEqual(blob, content.content_hash(text))
+            self.assertLess(os.path.getsize(store.path_for(blob)), len(text.encode("utf-8")) / 4)
+            written = os.stat(store.path_for(blob)).st_mtime_ns
+            store.put(text)
+            self.assertEqual(os.stat(store.path_for(blob)).st_mtime_ns, written)
+            self.assertEqual(store.get(blob), text)
+
+    def test_a_trained_dictionary_shrinks_small_documents_and_old_blobs_stay_readable(self):
+        store = blobs.BlobStore(self.root, codec="zlib")
+        boilerplate = "".join(f"Clause {n}: the provider may suspend the service without notice.\n" for n in range(30))
+        plain = store.put(boilerplate + "Version one.")
+        store.install_dictionary(blobs.train_dictionary([boilerplate + "a", boilerplate + "b"]))
+        trained = store.put(boilerplate + "Version two.")
+        self.assertLess(os.path.getsize(store.path_for(trained)), os.path.getsize(store.path_for(plain)))
+        self.assertEqual(store.get(plain), boilerplate + "Version one.")
+        self.assertEqual(store.get(trained), boilerplate + "Version two.")
+
+    def test_a_damaged_blob_is_refused(self):
+        store = blobs.BlobStore(self.root, codec="zlib")
+        blob = store.put("some text")
+        with open(store.path_for(blob), "r+b") as handle:
+            handle.seek(-2, os.SEEK_END)
+            handle.write(b"xx")
+        with self.assertRaises(blobs.BlobError):
+            store.get(blob)
+        self.assertEqual(store.get_or(blob, "fallback"), "fallback")
+
+    def test_migrating_real_archives_is_byte_identical_and_shares_unchanged_documents(self):
+        logs = os.path.join(self.tmp.name, "logs")
+        os.makedirs(logs)
+        names = sorted(
+            n for n in os.listdir(FIXTURES)
+            if n.startswith("Perplexity_AI_Legal_Policies_") and n.endswith("_snapshot.txt")
+        )[:6]
+        originals = {}
+        for name in names:
+            shutil.copy(os.path.join(FIXTURES, name), logs)
+            with open(os.path.join(logs, name), "rb") as handle:
+                originals[name] = handle.read()
+
+        store = blobs.BlobStore(self.root, codec="zlib")
+        counts = blobs.migrate(store, snapshots_dir=os.path.join(self.tmp.name, "snapshots"), log_dir=logs)
+        self.assertEqual(counts["archives"], len(names))
+        for name, original in originals.items():
+            self.assertFalse(os.path.exists(os.path.join(logs, name)))
+            prefix = os.path.join(logs, name[: -len("_snapshot.txt")])
+            self.assertEqual(blobs.read_archived_snapshot(store, prefix).encode("utf-8"), original)
+        # Three documents per archive, but most archives change only one, and
+        # the versions that did change are kept as deltas of the next.
+        self.assertLess(len(list(store.ids())), 3 * len(names))
+        self.assertLess(blobs.stats(store)["bytes"], sum(map(len, originals.values())) / 10)
+        self.assertLessEqual(max(blobs.chain_depths(store)), store.keyframe_interval - 1)
+        self.assertEqual(blobs.verify(store, logs), [])
+
+    def test_migrating_the_real_archive_leaves_what_the_tests_read(self):
+        # `python -m steward.blobs migrate` without --keep deletes every
+        # flat _snapshot.txt under logs/; none of them is a fixture.
+        logs = os.path.join(self.tmp.name, "logs")
+        os.makedirs(logs)
+        for member in archive.files(os.path.join(REPO_ROOT, "logs"), suffixes=(archive.SNAPSHOT_TEXT,)):
+            shutil.copy(member.path, logs)
+        fixtures = {name: read_fixture(os.path.join(FIXTURES, name)) for name in os.listdir(FIXTURES)}
+
+        store = blobs.BlobStore(self.root, codec="zlib")
+        blobs.migrate(store, snapshots_dir=os.path.join(self.tmp.name, "snapshots"), log_dir=logs)
+        self.assertFalse([n for n in os.listdir(logs) if n.endswith(archive.SNAPSHOT_TEXT)])
+        self.assertEqual({name: read_fixture(os.path.join(FIXTURES, name)) for name in fixtures}, fixtures)
+        self.assertEqual(read_fixture(PERPLEXITY_7_AUG), fixtures[os.path.basename(PERPLEXITY_7_AUG)])
+
+    def test_blobs_nothing_refers_to_are_swept(self):
+        store = blobs.BlobStore(self.root, codec="zlib")
+        kept, dropped = store.put("current"), store.put("long gone")
+        hashes = {"S": {"documents": {"https://a": {"hash": kept, "seen_hashes": {kept: {}}}}}}
+        self.assertEqual(blobs.sweep(store, blobs.referenced(hashes, self.tmp.name)), 1)
+        self.assertTrue(store.has(kept))
+        self.assertFalse(store.has(dropped))
+
+
+class OldVersionsAreReverseDeltas(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = blobs.BlobStore(os.path.join(self.tmp.name, "blobs"), codec="zlib", keyframe_interval=4)
+        with open(PERPLEXITY_7_AUG, encoding="utf-8") as handle:
+            self.base = handle.read()
+
+    def versions(self, count):
+        return [self.base + "".join(f"\nClause {n} was amended." for n in range(v)) for v in range(count)]
+
+    def store_in_order(self, texts):
+        previous = None
+        for text in texts:
+            previous = self.store.put(text, previous)
+        return [blobs.blob_id(text) for text in texts]
+
+    def test_the_newest_is_whole_and_no_version_is_more_than_a_keyframe_away(self):
+        texts = self.versions(20)
+        ids = self.store_in_order(texts)
+        self.assertEqual(self.store.layout(ids[-1])[0], "run")
+        self.assertEqual(self.store.layout(ids[-2]), ("delta", ids[-1]))
+        self.assertLessEqual(max(blobs.chain_depths(self.store)), 3)
+        for blob, text in zip(ids, texts):
+            self.assertEqual(self.store.get(blob), text)
+        delta = os.path.getsize(self.store.path_for(ids[-2]))
+        self.assertLess(delta, os.path.getsize(self.store.path_for(ids[-1])) / 5)
+
+    def test_a_return_to_an_old_version_makes_it_whole_without_a_cycle(self):
+        first, second = self.versions(2)
+        a, b, _ = self.store_in_order([first, second, first])
+        self.assertEqual(self.store.layout(a)[0], "run")
+        self.assertEqual(self.store.layout(b), ("delta", a))
+        self.assertEqual((self.store.get(a), self.store.get(b)), (first, second))
+
+    def test_line_endings_and_unusual_separators_survive(self):
+        old = "one\r\ntwo\u2028three\x0bfour\nno newline at the end"
+        new = "one\r\n2\u2028three\x0bfour\n"
+        self.assertEqual(blobs.apply_delta(new, blobs.line_delta(old, new)), old)
+
+    def test_sweeping_keeps_what_an_old_version_is_rebuilt_from(self):
+        ids = self.store_in_order(self.versions(3))
+        self.assertEqual(blobs.sweep(self.store, {ids[0]}), 0)
+        self.assertEqual(self.store.get(ids[0]), self.versions(3)[0])
+
+
+class TheRunLogIsAppendedByDay(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = os.path.join(self.tmp.name, "runs")
+        self.now = datetime.now(runlog.SEGMENT_TZ)
+
+    def flush(self, *days_ago, outcome="unchanged", retention_days=90):
+        log = runlog.RunLog("run", self.directory)
+        for ago in days_ago:
+            log.record(timestamp=(self.now - timedelta(days=ago)).isoformat(), outcome=outcome)
+        log.flush(retention_days)
+        return log
+
+    def days(self):
+        return [day for day, _ in runlog.segments(self.directory)]
+
+    def test_a_flush_only_appends_to_the_days_it_wrote(self):
+        self.flush(3, 0)
+        old = os.path.join(self.directory, f"{(self.now - timedelta(days=3)).date()}.jsonl")
+        with open(old, "rb") as handle:
+            before = handle.read()
+        self.flush(0, 0)
+        with open(old, "rb") as handle:
+            self.assertEqual(handle.read(), before)
+        self.assertEqual(len(runlog.load_records(self.directory, days=1)), 3)
+
+    def test_retention_deletes_whole_days(self):
+        self.flush(40, 20, 1)
+        self.flush(0, retention_days=30)
+        self.assertEqual(self.days(), [(self.now - timedelta(days=d)).date() for d in (20, 1, 0)])
+
+    def test_only_segments_in_the_window_are_read(self):
+        self.flush(10, 5, 0)
+        # An unreadable segment outside the window must not be opened.
+        with open(os.path.join(self.directory, f"{(self.now - timedelta(days=10)).date()}.jsonl"), "wb") as handle:
+            handle.write(b"\xff\xfe not utf-8")
+        self.flush(0, outcome="fetch_failed")
+        self.assertEqual(len(runlog.load_records(self.directory, days=6)), 3)
+        self.assertAlmostEqual(runlog.error_rate(days=1, directory=self.directory), 0.5)
+
+    def test_a_torn_last_line_does_not_swallow_the_next_run(self):
+        self.flush(0)
+        (_, path), = runlog.segments(self.directory)
+        with open(path, "ab") as handle:
+            handle.write(b'{"run_id": "killed", "timest')
+        self.flush(0)
+        self.assertEqual(len(runlog.load_records(self.directory, days=1)), 2)
+
+    def test_the_single_file_log_is_split_into_days(self):
+        legacy = os.path.join(self.tmp.name, runlog.RUN_LOG_FILE)
+        with open(legacy, "w", encoding="utf-8") as handle:
+            for ago in (2, 1, 1):
+                when = (self.now - timedelta(days=ago)).isoformat()
+                handle.write(json.dumps({"timestamp": when, "outcome": "unchanged"}) + "\n")
+        self.flush(0)
+        self.assertFalse(os.path.exists(legacy))
+        self.assertEqual(len(self.days()), 3)
+        self.assertEqual(len(runlog.load_records(self.directory, days=3)), 4)
+
+
+class RunRecordsAreQueriedAsColumns(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = os.path.join(self.tmp.name, "columns")
+        start = datetime(2026, 7, 30, 9, tzinfo=runlog.SEGMENT_TZ)
+        self.records = []
+        for i in range(60):
+            host = ("www.perplexity.ai", "www.anthropic.com", "www.digital.gov.au")[i % 3]
+            self.records.append({
+                "timestamp": (start + timedelta(hours=8 * i)).isoformat(),
+                "set_name": f"Set {i % 3}",
+                "url": f"https://{host}/legal/{i % 2}",
+                "outcome": "fetch_failed" if i % 7 == 0 else "unchanged",
+                "fetch_ms": (i * 37) % 1000,
+                "prompt_tokens": 1000 + i if i % 5 == 0 else None,
+                "llm_called": i % 5 == 0,
+            })
+        # Two runs, so the second appends to partitions the first created.
+        analytics.append(self.records[:25], self.directory)
+        analytics.append(self.records[25:], self.directory)
+
+    def expected_p95(self, host):
+        values = sorted(r["fetch_ms"] for r in self.records if f"//{host}/" in r["url"])
+        return values[-(-95 * len(values) // 100) - 1]
+
+    def query(self, *args, **kwargs):
+        return analytics.query(*args, directory=self.directory, use_numpy=False, **kwargs)
+
+    def test_group_by_matches_the_records(self):
+        rows = self.query(["host"], ["count", "p95:fetch_ms", "max:fetch_ms"])
+        self.assertEqual([row["host"] for row in rows], sorted({content.host_of(r["url"]) for r in self.records}))
+        for row in rows:
+            self.assertEqual(row["count"], 20)
+            self.assertEqual(row["p95:fetch_ms"], self.expected_p95(row["host"]))
+
+        months = self.query(["month"], ["sum:prompt_tokens", "sum:llm_called"])
+        self.assertEqual([row["month"] for row in months], ["2026-07", "2026-08"])
+        self.assertEqual(
+            sum(row["sum:prompt_tokens"] for row in months),
+            sum(r["prompt_tokens"] or 0 for r in self.records),
+        )
+        self.assertEqual(sum(row["sum:llm_called"] for row in months), 12)
+
+    def test_filters_narrow_by_value_and_time(self):
+        (row,) = self.query(where={"outcome": "fetch_failed"})
+        self.assertEqual(row["count"], sum(1 for r in self.records if r["outcome"] == "fetch_failed"))
+        (row,) = self.query(since="2026-08-01", until="2026-08-02")
+        days = ("2026-08-01", "2026-08-02")
+        self.assertEqual(row["count"], sum(1 for r in self.records if r["timestamp"][:10] in days))
+        self.assertEqual(self.query(where={"set_name": "No such set"}), [])
+        with self.assertRaises(analytics.AnalyticsError):
+            self.query(metrics=["p95:outcome"])
+
+    def test_a_torn_append_is_cut_back_on_the_next_one(self):
+        partition = os.path.join(self.directory, "2026-08")
+        with open(os.path.join(partition, "fetch_ms.f64"), "ab") as handle:
+            handle.write(b"\x00" * 12)
+        with open(os.path.join(partition, "strings.jsonl"), "ab") as handle:
+            handle.write(b'"half a str')
+        extra = dict(self.records[-1], url="https://example.org/new")
+        analytics.append([extra], self.directory)
+        self.records.append(extra)
+        rows = {row["host"]: row for row in self.query(["host"], ["count", "p95:fetch_ms"])}
+        self.assertEqual(rows["example.org"]["count"], 1)
+        self.assertEqual(rows["www.perplexity.ai"]["p95:fetch_ms"], self.expected_p95("www.perplexity.ai"))
+
+    @unittest.skipIf(analytics._numpy() is None, "numpy is not installed")
+    def test_numpy_gives_the_same_answers(self):
+        for by in ([], ["host"], ["month", "outcome"], ["day"]):
+            metrics = ["count", "sum:prompt_tokens", "mean:fetch_ms", "min:fetch_ms", "p50:fetch_ms"]
+            self.assertEqual(
+                analytics.query(by, metrics, directory=self.directory, use_numpy=True),
+                self.query(by, metrics),
+            )
+
+
+class AnyVersionCanBeRecalled(unittest.TestCase):
+    STAMPS = ("20260801_133410", "20260802_133448", "20260803_133518")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.logs = os.path.join(self.tmp.name, "logs")
+        os.makedirs(self.logs)
+        self.sections = {}
+        for stamp in self.STAMPS:
+            name = f"Perplexity_AI_Legal_Policies_{stamp}_snapshot.txt"
+            shutil.copy(os.path.join(FIXTURES, name), self.logs)
+            with open(os.path.join(self.logs, name), encoding="utf-8", newline="") as handle:
+                self.sections[stamp] = content.split_aggregate(handle.read())
+        self.store = blobs.BlobStore(os.path.join(self.tmp.name, "blobs"), codec="zlib")
+        self.file_id = "Perplexity_AI_Legal_Policies"
+
+    def test_timestamps_in_every_form_compare_as_aest(self):
+        self.assertEqual(versions.as_timestamp("20260802_133448"), "2026-08-02T13:34:48+10:00")
+        self.assertEqual(versions.as_timestamp("2026-08-02T03:34:48+00:00"), "2026-08-02T13:34:48+10:00")
+        self.assertEqual(versions.as_timestamp("2026-08-02", end_of_day=True), "2026-08-02T23:59:59+10:00")
+
+    def test_the_text_in_force_at_any_moment_and_the_diff_between_two(self):
+        index = versions.build_index(self.logs, {}, self.store)
+        self.assertEqual(len(index.versions(self.file_id, AUP_URL)), 3)
+        # The privacy policy did not change on 3 August, so that capture is not a version.
+        self.assertEqual(len(index.versions(self.file_id, PRIVACY_URL)), 2)
+        self.assertIsNone(index.at(self.file_id, AUP_URL, "2026-07-31"))
+
+        at_second = versions.text_at(index, self.store, self.file_id, AUP_URL, "2026-08-02T20:00:00+10:00")
+        self.assertEqual(at_second, self.sections["20260802_133448"][AUP_URL])
+        diff = versions.diff_between(index, self.store, self.file_id, AUP_URL, "2026-08-01", "2026-08-03T14:00")
+        self.assertTrue(diff.text)
+        first, _, third = index.versions(self.file_id, AUP_URL)
+        expected = diffing.compute_diff(
+            self.sections["20260801_133410"][AUP_URL],
+            self.sections["20260803_133518"][AUP_URL],
+            label=AUP_URL,
+            max_chars=10**9,
+            versions=(f"{first[0]} {first[1][:12]}", f"{third[0]} {third[1][:12]}"),
+        )
+        self.assertEqual(diff.text, expected.text)
+        # The headers say which versions were compared, not "stored" and "current".
+        headers = diff.text.splitlines()[:2]
+        self.assertEqual(headers[0], f"--- {AUP_URL} (2026-08-01T13:34:10+10:00 {first[1][:12]})")
+        self.assertEqual(headers[1], f"+++ {AUP_URL} (2026-08-03T13:35:18+10:00 {third[1][:12]})")
+
+    def test_the_index_follows_the_archive_into_the_blob_store(self):
+        before = versions.build_index(self.logs, {}, self.store)
+        blobs.migrate(self.store, snapshots_dir=os.path.join(self.tmp.name, "snapshots"), log_dir=self.logs)
+        after = versions.build_index(self.logs, {}, self.store)
+        path = os.path.join(self.tmp.name, "versions.json")
+        versions.write_index(after, path)
+        loaded = versions.VersionIndex.load(path)
+
+        for doc in (AUP_URL, PRIVACY_URL, TOS_URL):
+            old, new = before.versions(self.file_id, doc), loaded.versions(self.file_id, doc)
+            self.assertEqual([r[:2] for r in old], [r[:2] for r in new])
+            self.assertTrue(all(where == versions.IN_BLOBS for _, _, where in new))
+            for stamp in self.STAMPS:
+                self.assertEqual(
+                    versions.text_at(loaded, self.store, self.file_id, doc, stamp),
+                    self.sections[stamp][doc],
+                )
+
+
+class StateIsKeptPerSet(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db = os.path.join(self.tmp.name, "state.db")
+        self.hashes = os.path.join(self.tmp.name, "hashes.json")
+        shutil.copy(os.path.join(REPO_ROOT, "hashes.json"), self.hashes)
+
+    def open(self, name="state.db"):
+        store = state.StateStore.open(os.path.join(self.tmp.name, name))
+        self.addCleanup(store.close)
+        return store
+
+    def test_the_real_hashes_file_round_trips_byte_for_byte(self):
+        with open(self.hashes, encoding="utf-8") as handle:
+            original = json.load(handle)
+        store = self.open()
+        self.assertTrue(store.sync_from(self.hashes))
+        out = os.path.join(self.tmp.name, "exported.json")
+        checks = os.path.join(self.tmp.name, "exported_checks.json")
+        store.export(out, checks)
+        self.assertEqual(state.read_hashes(out, checks), original)
+
+        with open(out, "rb") as handle:
+            exported = handle.read()
+        again = self.open("again.db")
+        again.import_json(out, checks)
+        again.export(out, checks)
+        with open(out, "rb") as handle:
+            self.assertEqual(handle.read(), exported)
+
+    def test_check_times_stay_out_of_hashes_json(self):
+        store = self.open()
+        store.sync_from(self.hashes)
+        out = os.path.join(self.tmp.name, "hashes.json")
+        store.export(out)
+        with open(out, "rb") as handle:
+            before = handle.read()
+        self.assertNotIn(b'"last_checked"', before)
+        self.assertNotIn(b'"fetch_ms"', before)
+
+        name = next(iter(store.load()))
+        entry = store.get_set(name)
+        entry["last_checked"] = "2026-10-19T09:00:00+10:00"
+        for record in entry["documents"].values():
+            record["last_checked"] = entry["last_checked"]
+            record["fetch_ms"] = 1234
+        store.put_set(name, entry)
+        store.export(out)
+        with open(out, "rb") as handle:
+            self.assertEqual(handle.read(), before)
+        self.assertEqual(state.read_hashes(out)[name]["last_checked"], "2026-10-19T09:00:00+10:00")
+
+    def settle_as_a_dead_run(self, changed):
+        """Settle the first set, as a run would, then stop before the commit."""
+        store = self.open()
+        store.sync_from(self.hashes)
+        name = next(iter(store.load()))
+        entry = store.get_set(name)
+        entry["last_checked"] = "2026-10-19T09:00:00+10:00"
+        entry["consecutive_failures"] = 2
+        if changed:
+            url = next(iter(entry["documents"]))
+            entry["documents"][url]["hash"] = "f" * 64
+        store.put_set(name, entry)
+        store.close()
+        return name, entry
+
+    def test_a_set_settled_by_a_run_that_died_is_kept(self):
+        name, entry = self.settle_as_a_dead_run(changed=False)
+        # hashes.json is the one the store last read, so the store's newer
+        # state wins over it once reconciled.
+        reopened = self.open()
+        self.assertFalse(reopened.sync_from(self.hashes))
+        self.assertEqual(reopened.get_set(name), entry)
+        self.assertEqual(list(reopened.load())[0], name)
+
+    def test_a_change_whose_files_never_landed_is_put_back(self):
+        name, _ = self.settle_as_a_dead_run(changed=True)
+        reopened = self.open()
+        self.assertFalse(reopened.sync_from(self.hashes))
+        self.assertEqual(reopened.get_set(name), state.read_hashes(self.hashes)[name])
+        self.assertEqual(list(reopened.load())[0], name)
+
+    def test_a_set_new_since_hashes_json_is_dropped_if_the_run_died(self):
+        store = self.open()
+        store.sync_from(self.hashes)
+        store.put_set("New", {"hash": "h", "documents": {"https://a": {"hash": "1"}}})
+        self.assertEqual(store.reconcile(self.hashes), ["New"])
+        self.assertNotIn("New", store.load())
+
+    def test_a_committed_change_stands(self):
+        name, entry = self.settle_as_a_dead_run(changed=True)
+        store = self.open()
+        store.committed()
+        self.assertEqual(store.reconcile(self.hashes), [])
+        self.assertFalse(store.sync_from(self.hashes))
+        self.assertEqual(store.get_set(name), entry)
+
+    def test_removed_documents_and_versions_are_dropped(self):
+        store = self.open()
+        store.put_set("S", {"hash": "h", "documents": {
+            "https://a": {"hash": "1", "seen_hashes": {"1": {"seen_at": "x"}, "0": {"seen_at": "w"}}},
+            "https://b": {"hash": "2"},
+        }})
+        store.put_set("S", {"hash": "h", "documents": {
+            "https://a": {"hash": "1", "seen_hashes": {"1": {"seen_at": "x"}}},
+        }})
+        self.assertEqual(store.get_set("S"), {"hash": "h", "documents": {
+            "https://a": {"hash": "1", "seen_hashes": {"1": {"seen_at": "x"}}},
+        }})
+        count = store.connection.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+        self.assertEqual(count, 1)
+
+    def test_a_changed_hashes_file_is_imported_again(self):
+        store = self.open()
+        store.sync_from(self.hashes)
+        with open(self.hashes, "w", encoding="utf-8") as handle:
+            json.dump({"Only": {"hash": "h", "documents": {}}}, handle)
+        self.assertTrue(store.sync_from(self.hashes))
+        self.assertEqual(store.load(), {"Only": {"hash": "h", "documents": {}}})
 
 
 class ConfigIsValidated(unittest.TestCase):
@@ -370,6 +1667,26 @@ class HealthMakesBrokenSourcesVisible(unittest.TestCase):
         self.assertEqual(health.render_alert_markdown(report), "")
 
 
+    def test_a_saved_report_moves_only_when_health_does(self):
+        def saved(checked):
+            hashes = {
+                "Fine": {
+                    "file_id": "Fine",
+                    "last_success": checked,
+                    "consecutive_failures": 0,
+                    "documents": {"https://example.gov.au/p": {"consecutive_failures": 0}},
+                }
+            }
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "health.json")
+                health.write_report(health.build_report(hashes, self.cfg), path)
+                with open(path, "rb") as handle:
+                    return handle.read()
+
+        self.assertEqual(saved("2026-08-13T00:00:00+10:00"), saved("2026-08-14T00:00:00+10:00"))
+        self.assertNotIn(b"generated_at", saved("2026-08-13T00:00:00+10:00"))
+
+
 class HistoryIndexesTheArchive(unittest.TestCase):
     def test_it_parses_the_real_log_directory(self):
         index = history.build_index(os.path.join(REPO_ROOT, "logs"))
@@ -383,6 +1700,413 @@ class HistoryIndexesTheArchive(unittest.TestCase):
         index = history.build_index(os.path.join(REPO_ROOT, "logs"), known_file_ids={"Google_AI_Policies"})
         self.assertEqual(set(index["entries"]), {"Google_AI_Policies"})
 
+    def test_the_incremental_index_matches_a_full_scan(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            logs = os.path.join(tmp, "logs")
+            os.makedirs(logs)
+            # Flat, as before sharding, whatever shape the real archive is in.
+            for member in archive.files(os.path.join(REPO_ROOT, "logs")):
+                shutil.copy2(member.path, logs)
+            manifest = os.path.join(tmp, history.HISTORY_MANIFEST_FILE)
+            parsed = []
+            original = history._record
+            self.addCleanup(setattr, history, "_record", original)
+
+            def counting(log_dir, member, present):
+                built = original(log_dir, member, present)
+                if built is not None:
+                    parsed.append(member.name)
+                return built
+
+            history._record = counting
+
+            def check(**kwargs):
+                parsed.clear()
+                incremental = history.update_index(logs, manifest_path=manifest, **kwargs)
+                read = sorted(parsed)
+                # Key order too: history.json is rewritten only when its bytes change.
+                self.assertEqual(json.dumps(incremental), json.dumps(history.build_index(logs)))
+                return read
+
+            everything = len(check())
+            self.assertGreater(everything, 200)
+            self.assertEqual(check(), [])
+            archive.migrate(logs, hashes_path=None)
+            self.assertEqual(len(check()), everything)
+            self.assertEqual(check(), [])
+
+            analyses = sorted(archive.files(logs, suffixes=(archive.ANALYSIS,)), key=lambda m: m.name)
+            os.remove(analyses[0].path)
+            added = archive.path_for(logs, "New_Set", "20991231_000000", archive.ANALYSIS)
+            os.makedirs(os.path.dirname(added))
+            shutil.copy(analyses[1].path, added)
+            with open(f"{analyses[2].prefix}_{archive.DIFF}", "w") as handle:
+                handle.write("+ a diff that arrived late\n")
+            with open(analyses[3].path, "r", encoding="utf-8") as handle:
+                stored = json.load(handle)
+            stored["summary"] = "Edited by hand."
+            with open(analyses[3].path + ".new", "w", encoding="utf-8") as handle:
+                json.dump(stored, handle)
+            os.replace(analyses[3].path + ".new", analyses[3].path)
+            # A fresh checkout moves every mtime without changing a byte.
+            os.utime(analyses[4].path, (0, 0))
+            os.utime(os.path.dirname(analyses[4].path), (0, 0))
+            self.assertEqual(
+                check(), sorted(["New_Set_20991231_000000_analysis.json", analyses[2].name, analyses[3].name])
+            )
+            self.assertEqual(len(check(rebuild=True)), everything)
+
+
+class ArchivesAreShardedBySourceAndMonth(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.logs = os.path.join(self.tmp.name, "logs")
+        os.makedirs(self.logs)
+
+    def touch(self, name):
+        with open(os.path.join(self.logs, name), "w", encoding="utf-8") as handle:
+            handle.write("{}")
+
+    def test_preserving_links_where_it_can_and_copies_where_it_cannot(self):
+        source = os.path.join(self.tmp.name, "current.json")
+        with open(source, "w", encoding="utf-8") as handle:
+            handle.write('{"v": 1}')
+        linked = os.path.join(self.logs, "linked.json")
+        copied = os.path.join(self.logs, "copied.json")
+
+        self.assertEqual(archive.preserve(source, linked), "link")
+        self.assertTrue(os.path.samefile(source, linked))
+        with mock.patch.object(archive.os, "link", side_effect=OSError("EXDEV")), \
+                mock.patch.object(archive, "_reflink", side_effect=OSError("EOPNOTSUPP")):
+            self.assertEqual(archive.preserve(source, copied), "copy")
+        self.assertFalse(os.path.samefile(source, copied))
+        for path in (linked, copied):
+            with open(path, encoding="utf-8") as handle:
+                self.assertEqual(handle.read(), '{"v": 1}')
+
+    def test_migration_moves_flat_files_and_the_paths_recorded_for_them(self):
+        self.touch("Set_A_20250904_114856_analysis.json")
+        self.touch("Set_A_20250904_114856_snapshot.txt")
+        self.touch("Set_B_20260801_000000_diff.txt")
+        self.touch("notes.txt")
+        hashes = os.path.join(self.tmp.name, "hashes.json")
+        with open(hashes, "w", encoding="utf-8") as handle:
+            json.dump({"A": {"documents": {"u": {"seen_hashes": {"h": {
+                "analysis_path": "logs/Set_A_20250904_114856_analysis.json"}}}}}}, handle)
+
+        moved = archive.migrate(self.logs, hashes)
+        self.assertEqual(len(moved), 3)
+        self.assertEqual(sorted(os.listdir(self.logs)), ["Set_A", "Set_B", "notes.txt"])
+        shard = os.path.join(self.logs, "Set_A", "2025", "09")
+        self.assertTrue(os.path.exists(os.path.join(shard, "Set_A_20250904_114856_snapshot.txt")))
+        with open(hashes, encoding="utf-8") as handle:
+            recorded = json.load(handle)["A"]["documents"]["u"]["seen_hashes"]["h"]["analysis_path"]
+        self.assertEqual(recorded, "logs/Set_A/2025/09/Set_A_20250904_114856_analysis.json")
+        self.assertEqual(archive.migrate(self.logs, hashes), {})
+
+    def test_pruning_drops_whole_months_and_checks_only_the_boundary(self):
+        now = datetime.now()
+        old, boundary, kept = now - timedelta(days=500), now - timedelta(days=30), now - timedelta(days=1)
+        for when in (old, boundary - timedelta(days=1), boundary + timedelta(hours=1), kept):
+            self.touch(f"Set_A_{when:%Y%m%d_%H%M%S}_analysis.json")
+        archive.migrate(self.logs, None)
+
+        self.assertEqual(history.prune(self.logs, 30), 2)
+        left = sorted(member.stamp[:8] for member in archive.files(self.logs))
+        self.assertEqual(left, sorted([f"{boundary + timedelta(hours=1):%Y%m%d}", f"{kept:%Y%m%d}"]))
+        self.assertFalse(os.path.exists(os.path.join(self.logs, "Set_A", f"{old:%Y}", f"{old:%m}")))
+
+    def test_the_fixtures_outlive_a_run_reshaping_the_archive(self):
+        # The archives the fixtures were copied from, put through what a run
+        # does to logs/: sharded, then moved into the blob store.
+        fixtures = sorted(n for n in os.listdir(FIXTURES) if n.endswith(archive.SNAPSHOT_TEXT))
+        self.assertIn(os.path.basename(PERPLEXITY_7_AUG), fixtures)
+        for member in archive.files(os.path.join(REPO_ROOT, "logs"), suffixes=(archive.SNAPSHOT_TEXT,)):
+            if member.name in fixtures:
+                shutil.copy(member.path, self.logs)
+        archive.migrate(self.logs, None)
+        store = blobs.BlobStore(os.path.join(self.tmp.name, "blobs"), codec="zlib")
+        blobs.migrate(store, snapshots_dir=os.path.join(self.tmp.name, "snapshots"), log_dir=self.logs)
+        self.assertFalse(list(archive.files(self.logs, suffixes=(archive.SNAPSHOT_TEXT,))))
+
+        archived = {
+            f"{m.file_id}_{m.stamp}_{archive.SNAPSHOT_TEXT}": m.prefix
+            for m in archive.files(self.logs, suffixes=(archive.SNAPSHOT_MANIFEST,))
+        }
+        for name in fixtures:
+            text = read_fixture(os.path.join(FIXTURES, name))
+            self.assertTrue(content.split_aggregate(text))
+            # Retention may have pruned the original since; the copy stays.
+            if name in archived:
+                self.assertEqual(text, blobs.read_archived_snapshot(store, archived[name]))
+
+    def test_the_real_archive_reads_the_same_once_sharded(self):
+        for member in archive.files(os.path.join(REPO_ROOT, "logs")):
+            shutil.copy2(member.path, self.logs)
+        before = history.build_index(self.logs)["entries"]
+        snapshots = blobs.archived_snapshots(self.logs)
+        archive.migrate(self.logs, None)
+
+        after = history.build_index(self.logs)["entries"]
+        self.assertEqual(
+            {file_id: [(r["timestamp"], r["analysis_path"].rsplit("/", 1)[1]) for r in records]
+             for file_id, records in before.items()},
+            {file_id: [(r["timestamp"], r["analysis_path"].rsplit("/", 1)[1]) for r in records]
+             for file_id, records in after.items()},
+        )
+        record = after["Perplexity_AI_Legal_Policies"][0]
+        self.assertTrue(record["analysis_path"].startswith("logs/Perplexity_AI_Legal_Policies/20"))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, *record["analysis_path"].split("/"))))
+        self.assertEqual(
+            {k: [stamp for stamp, _ in v] for k, v in blobs.archived_snapshots(self.logs).items()},
+            {k: [stamp for stamp, _ in v] for k, v in snapshots.items()},
+        )
+
+
+class ARunCommitsWholeOrNotAtAll(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.staging = os.path.join(self.tmp.name, ".commit")
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def write(self, path, text):
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(text)
+
+    def read(self, path):
+        with open(path, encoding="utf-8") as handle:
+            return handle.read()
+
+    def stage_two(self):
+        self.write(self.path("hashes.json"), "old")
+        self.write(self.path("alert.md"), "stale")
+        tx = commit.Transaction.open(self.staging)
+        self.write(tx.stage(self.path("analysis/a.json")), "new analysis")
+        self.write(tx.stage(self.path("hashes.json")), "new")
+        tx.remove(self.path("alert.md"))
+        return tx
+
+    def test_nothing_moves_until_the_commit(self):
+        tx = self.stage_two()
+        self.assertFalse(os.path.exists(self.path("analysis/a.json")))
+        self.assertEqual(self.read(self.path("hashes.json")), "old")
+        self.assertEqual(self.read(tx.current(self.path("hashes.json"))), "new")
+
+        self.assertEqual(
+            tx.commit(),
+            [self.path("analysis/a.json"), self.path("hashes.json"), self.path("alert.md")],
+        )
+        self.assertEqual(self.read(self.path("analysis/a.json")), "new analysis")
+        self.assertEqual(self.read(self.path("hashes.json")), "new")
+        self.assertFalse(os.path.exists(self.path("alert.md")))
+        self.assertFalse(os.path.exists(self.staging))
+        self.assertIsNone(commit.recover(self.staging))
+
+    def test_restaging_a_target_replaces_what_was_staged(self):
+        tx = commit.Transaction.open(self.staging)
+        self.write(tx.stage(self.path("a.txt")), "first")
+        self.write(tx.stage(self.path("a.txt")), "second")
+        self.assertEqual(len(os.listdir(self.staging)), 1)
+        tx.commit()
+        self.assertEqual(self.read(self.path("a.txt")), "second")
+
+    def test_a_file_staged_with_the_bytes_already_there_is_left_alone(self):
+        self.write(self.path("health.json"), "same")
+        before = os.stat(self.path("health.json"))
+        tx = commit.Transaction.open(self.staging)
+        self.write(tx.stage(self.path("health.json")), "same")
+        self.write(tx.stage(self.path("hashes.json")), "new")
+        tx.remove(self.path("never_written.md"))
+        self.assertEqual(tx.commit(), [self.path("hashes.json")])
+        self.assertEqual(os.stat(self.path("health.json")).st_ino, before.st_ino)
+
+        self.assertFalse(commit.replace_if_changed(self.path("hashes.json"), b"new"))
+        self.assertTrue(commit.replace_if_changed(self.path("hashes.json"), b"newer"))
+
+    def test_a_run_that_stopped_before_committing_is_rolled_back(self):
+        self.stage_two()
+        self.assertEqual(commit.recover(self.staging), commit.ROLLED_BACK)
+        self.assertFalse(os.path.exists(self.path("analysis/a.json")))
+        self.assertEqual(self.read(self.path("hashes.json")), "old")
+        self.assertEqual(self.read(self.path("alert.md")), "stale")
+        self.assertFalse(os.path.exists(self.staging))
+
+    def test_a_commit_that_stopped_part_way_is_rolled_forward(self):
+        tx = self.stage_two()
+        applied = []
+        real_replace = os.replace
+
+        def dies_after_the_first_rename(src, dst):
+            if applied:
+                raise KeyboardInterrupt
+            real_replace(src, dst)
+            if not src.endswith(".tmp"):
+                applied.append(dst)
+
+        with mock.patch.object(commit.os, "replace", side_effect=dies_after_the_first_rename):
+            with self.assertRaises(KeyboardInterrupt):
+                tx.commit()
+        self.assertEqual(applied, [self.path("analysis/a.json")])
+        self.assertEqual(self.read(self.path("hashes.json")), "old")
+
+        self.assertEqual(commit.recover(self.staging), commit.ROLLED_FORWARD)
+        self.assertEqual(self.read(self.path("analysis/a.json")), "new analysis")
+        self.assertEqual(self.read(self.path("hashes.json")), "new")
+        self.assertFalse(os.path.exists(self.path("alert.md")))
+        self.assertFalse(os.path.exists(self.staging))
+
+
+class JsonIsTheSameWhicheverLibraryWritesIt(unittest.TestCase):
+    FILES = ("hashes.json", "history.json", "policy_sets.json")
+
+    def written(self, value, fast, **kwargs):
+        with mock.patch.object(jsonio, "_fast", fast):
+            return jsonio.dumps(value, **kwargs)
+
+    @unittest.skipIf(jsonio._orjson() is None, "orjson is not installed")
+    def test_both_backends_write_the_repos_files_byte_for_byte(self):
+        for name in self.FILES:
+            with open(os.path.join(REPO_ROOT, name), "rb") as handle:
+                value = json.loads(handle.read())
+            for layout in ({"pretty": True}, {}, {"sort_keys": True}):
+                self.assertEqual(
+                    self.written(value, jsonio._orjson(), **layout),
+                    self.written(value, None, **layout),
+                    f"{name} {layout}",
+                )
+
+    def test_the_standard_library_stands_in(self):
+        value = {"set": {"summary": "Mise à jour — §3", "count": 2, "tags": ["a", "b"]}}
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(jsonio, "_fast", None):
+            path = os.path.join(tmp, "out.json")
+            jsonio.save(value, path, pretty=True)
+            with open(path, encoding="utf-8") as handle:
+                text = handle.read()
+            self.assertEqual(jsonio.load(path), value)
+            self.assertEqual(jsonio.backend(), "json")
+        self.assertIn('\n  "set": {\n    "summary": "Mise à jour — §3"', text)
+        self.assertEqual(jsonio.dumps([1, {"a": None}]), b'[1,{"a":null}]')
+        self.assertEqual(jsonio.line({"a": 1}), b'{"a":1}\n')
+        with self.assertRaises(ValueError):
+            jsonio.loads(b"{not json")
+
+    def test_the_benchmark_grows_both_files(self):
+        rows = jsonio.bench(
+            os.path.join(REPO_ROOT, "hashes.json"), os.path.join(REPO_ROOT, "history.json"), scale=2, repeat=1
+        )
+        self.assertEqual({row["file"] for row in rows}, {"hashes.json", "history.json"})
+        self.assertIn("json", {row["backend"] for row in rows})
+        self.assertTrue(all(row["bytes"] > 0 for row in rows))
+
+
+class StagesRunSideBySide(unittest.TestCase):
+    def run_all(self, stages, items, depth=8):
+        line = pipeline.Pipeline(stages, depth=depth)
+        return dict(line.run(items)), line
+
+    def test_every_item_comes_out_once_and_a_failure_stays_with_its_item(self):
+        def check(n):
+            if n == 3:
+                raise ValueError("three")
+            return n * 10
+
+        results, line = self.run_all(
+            [pipeline.Stage("fetch", lambda n: n + 1, 3), pipeline.Stage("check", check, 2)], range(6)
+        )
+        self.assertEqual(sorted(results), list(range(6)))
+        self.assertIsInstance(results[2], ValueError)
+        self.assertEqual({n: v for n, v in results.items() if n != 2}, {0: 10, 1: 20, 3: 40, 4: 50, 5: 60})
+        self.assertEqual([(s.items, s.failed) for s in line.stats], [(6, 0), (6, 1)])
+
+    def test_the_network_and_the_cpu_are_busy_at_once(self):
+        def fetch(n):
+            time.sleep(0.1)  # waiting on a socket
+            return n
+
+        started = time.monotonic()
+        results, line = self.run_all(
+            [pipeline.Stage("fetch", fetch, 8), pipeline.Stage("check", lambda n: n, 1)], range(8)
+        )
+        self.assertEqual(len(results), 8)
+        self.assertLess(time.monotonic() - started, 0.5)  # one after another: 0.8s
+        self.assertIn("fetch: 8 item(s)", line.report()[0])
+
+    def test_a_slow_stage_holds_the_one_before_it_back(self):
+        def check(n):
+            time.sleep(0.02)
+            return n
+
+        results, line = self.run_all(
+            [pipeline.Stage("fetch", lambda n: n, 2), pipeline.Stage("check", check, 1)], range(20), depth=2
+        )
+        self.assertEqual(len(results), 20)
+        self.assertLessEqual(line.stats[1].queue_max, 2)
+        self.assertGreater(line.stats[0].blocked_seconds, 0.1)
+
+    def test_stopping_early_stops_the_workers(self):
+        line = pipeline.Pipeline([pipeline.Stage("fetch", lambda n: n, 2)], depth=1)
+        results = line.run(range(100))
+        next(results)
+        results.close()
+        self.assertFalse([t for t in threading.enumerate() if t.name.startswith("pipeline-")])
+
+
+class TheCheckWorkIsOneFunctionOfPlainData(unittest.TestCase):
+    PAGE = "<html><body><article><h1>Terms</h1>{}</article></body></html>".format(
+        "".join(f"<p>Clause {n}. You may not resell the service in any territory.</p>" for n in range(30))
+    )
+
+    def setUp(self):
+        self.cfg = load_cfg()
+        self.rules = examine.Rules.from_config(self.cfg)
+        self.baseline = examine.examine(examine.Page(TOS_URL, "Terms", html=self.PAGE), self.rules).text
+
+    def page(self, html, **fields):
+        return examine.Page(TOS_URL, "Terms", html=html, **fields)
+
+    def test_an_unread_page_is_extracted_and_hashed(self):
+        finding = examine.examine(self.page(self.PAGE), self.rules)
+        self.assertTrue(finding.usable and finding.verdict.ok)
+        self.assertEqual(finding.extractor, fetching.EXTRACTOR_TRAFILATURA)
+        self.assertIn("Clause 29. You may not resell", finding.text)
+        self.assertEqual(finding.hash, content.content_hash(finding.text))
+        self.assertIsNone(finding.diff)
+
+    def test_an_unusable_page_is_handed_back_for_escalation(self):
+        block = "<html><body><p>Just a moment...</p><p>Verifying you are human.</p></body></html>"
+        finding = examine.examine(self.page(block), self.rules)
+        self.assertFalse(finding.usable)
+        self.assertIsNone(finding.verdict)
+
+    def test_the_baseline_is_not_sent_back(self):
+        prior = {"prior_hash": content.content_hash(self.baseline), "baseline": self.baseline}
+        finding = examine.examine(self.page(self.PAGE, **prior), self.rules)
+        self.assertIsNone(finding.text)
+        self.assertIsNone(finding.diff)
+        self.assertEqual(finding.length, len(self.baseline))
+
+    def test_a_change_comes_back_diffed_unless_it_is_a_known_version(self):
+        edited = self.PAGE.replace("Clause 7. You may not", "Clause 7. You may")
+        prior = {"prior_hash": content.content_hash(self.baseline), "baseline": self.baseline}
+        finding = examine.examine(self.page(edited, **prior), self.rules)
+        self.assertEqual((finding.diff.added, finding.diff.removed), (1, 1))
+
+        known = examine.examine(self.page(edited, known_hashes=frozenset({finding.hash}), **prior), self.rules)
+        self.assertIsNone(known.diff)
+        self.assertEqual(known.text, finding.text)
+
+    def test_the_benchmark_replays_the_archive_as_pages(self):
+        pages = examine.archived_pages(os.path.join(REPO_ROOT, "logs"), self.cfg, limit=3)
+        self.assertEqual(len(pages), 3)
+        self.assertTrue(all(page.html.startswith("<html>") and page.baseline for page in pages))
+        rows = examine.bench(pages, self.rules, workers=(1,))
+        self.assertEqual([row["backend"] for row in rows], ["inline", "thread", "process"])
+        self.assertTrue(all(row["pages"] == 3 and row["pages_per_s"] > 0 for row in rows))
+
 
 class DocumentLabelsAreReadable(unittest.TestCase):
     def test_labels_derive_from_the_url_path(self):
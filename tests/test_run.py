@@ -5,25 +5,41 @@ The unit tests pin each gate. These drive a whole policy set through
 thing the steward actually sees: whether the set gets badged, whether
 `last_amended` moves, and whether a model call happens at all.
 
-The 7, 8 and 9 August 2026 Perplexity runs are replayed from the archives in
-logs/ — the same files that produced the two false criticals.
+The 7, 8 and 9 August 2026 Perplexity runs are replayed from copies of their
+archives in tests/fixtures/ — the same files that produced the two false
+criticals.
 """
 
 from __future__ import annotations
 
+import contextlib
+import io
 import json
 import os
 import sys
 import tempfile
 import unittest
+from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import main
-from steward import PIPELINE_VERSION, analysis as llm, content, fetching, health, runlog
+from steward import (
+    PIPELINE_VERSION,
+    analysis as llm,
+    archive,
+    blobs,
+    commit,
+    content,
+    examine,
+    fetching,
+    health,
+    routing,
+    runlog,
+)
 
 REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-LOGS = os.path.join(REPO_ROOT, "logs")
+FIXTURES = os.path.join(REPO_ROOT, "tests", "fixtures")
 
 TOS = "https://www.perplexity.ai/hub/legal/terms-of-service"
 PRIVACY = "https://www.perplexity.ai/hub/legal/privacy-policy"
@@ -43,7 +59,7 @@ def archived(day: str) -> dict:
         "7aug": "Perplexity_AI_Legal_Policies_20260807_125653_snapshot.txt",
         "8aug": "Perplexity_AI_Legal_Policies_20260808_120221_snapshot.txt",
     }[day]
-    with open(os.path.join(LOGS, name), encoding="utf-8") as handle:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as handle:
         return content.split_aggregate(handle.read())
 
 
@@ -71,6 +87,7 @@ class RunHarness(unittest.TestCase):
 
         original_fetch = fetching.fetch_document
         original_analyse = llm.analyse_change
+        self.real_analyse = original_analyse
         self.addCleanup(setattr, fetching, "fetch_document", original_fetch)
         self.addCleanup(setattr, llm, "analyse_change", original_analyse)
 
@@ -79,7 +96,7 @@ class RunHarness(unittest.TestCase):
 
     # --- Stubs ---
 
-    def _fetch(self, url_data, prior, cfg, policy_set=None):
+    def _fetch(self, url_data, prior, cfg, policy_set=None, extract=True):
         url = url_data["url"]
         if url not in self.responses:
             return fetching.FetchResult(url, fetching.FAILED, error="no fixture registered")
@@ -90,13 +107,29 @@ class RunHarness(unittest.TestCase):
             url, fetching.OK, text=text, extractor=fetching.EXTRACTOR_TRAFILATURA
         )
 
-    def _analyse(self, set_name, diff_text, *, model, changed_documents=(), tags=(), client=None):
+    def _analyse(
+        self,
+        set_name,
+        diff_text,
+        *,
+        model,
+        changed_documents=(),
+        tags=(),
+        client=None,
+        cache=None,
+        tier=routing.MAIN,
+        escalate_to="",
+        chunks=(),
+    ):
         self.llm_calls.append(
             {
                 "set_name": set_name,
                 "diff": diff_text,
                 "changed_documents": list(changed_documents),
                 "tags": list(tags),
+                "model": model,
+                "tier": tier,
+                "chunks": list(chunks),
             }
         )
         return llm.AnalysisOutcome(
@@ -184,7 +217,7 @@ class TheEighthOfAugustProducesNoAlert(RunHarness):
     def test_the_bad_capture_does_not_overwrite_the_stored_snapshot(self):
         entry, _ = self.run_set(self.previous)
         doc_id = content.document_id(TOS)
-        stored = main.read_text(main.document_snapshot_path(FILE_ID, doc_id))
+        stored = main.stored_document_text(FILE_ID, doc_id, entry["documents"][TOS]["hash"])
         self.assertEqual(
             content.content_hash(stored), self.previous["documents"][TOS]["hash"]
         )
@@ -272,6 +305,41 @@ class AGenuineChangeStillGetsThrough(RunHarness):
         self.assertEqual(stored["date_time"], entry["last_amended"])
         self.assertNotIn("Unknown", stored.values())
 
+    def test_text_is_stored_once_by_hash_and_archived_as_a_manifest(self):
+        entry, _ = self.run_set(self.previous)
+        with open(main.aggregate_snapshot_path(FILE_ID), "r", encoding="utf-8", newline="") as handle:
+            aggregate = handle.read()
+
+        changed = entry["documents"][AUP]["hash"]
+        self.assertTrue(main.blob_store.has(changed))
+        self.assertEqual(content.content_hash(main.blob_store.get(changed)), changed)
+        shard = archive.shard_dir(main.LOG_DIR, FILE_ID, "20260807_125653")
+        self.assertEqual(list(archive.flat_files(main.LOG_DIR)), [])
+        self.assertFalse(any(name.endswith("_snapshot.txt") for name in os.listdir(shard)))
+        archived = blobs.read_archived_snapshot(main.blob_store, os.path.join(shard, f"{FILE_ID}_20260807_125653"))
+        self.assertEqual(archived, aggregate)
+
+    def test_the_outgoing_analysis_is_archived_without_being_rewritten(self):
+        main.save_json_file({"summary": "The July change."}, main.analysis_path(FILE_ID))
+        self.run_set(self.previous)
+
+        shard = archive.shard_dir(main.LOG_DIR, FILE_ID, "20260807_125653")
+        (archived,) = [f for f in archive.files_in(shard) if f.suffix == archive.ANALYSIS]
+        self.assertEqual(json.loads(main.read_text(archived.path)), {"summary": "The July change."})
+        self.assertIn("arbitration", main.read_text(main.analysis_path(FILE_ID)))
+        self.assertFalse(os.path.samefile(archived.path, main.analysis_path(FILE_ID)))
+
+    def test_history_reads_back_the_version_just_stored(self):
+        entry, _ = self.run_set(self.previous)
+        main.save_json_file({PERPLEXITY_SET["setName"]: entry}, main.HASHES_FILE)
+
+        printed = io.StringIO()
+        with contextlib.redirect_stdout(printed):
+            self.assertEqual(main.main(["history", "show", FILE_ID, AUP]), 0)
+        self.assertIn("binding arbitration in Delaware", printed.getvalue())
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(main.main(["history", "show", FILE_ID, AUP, "--at", "2020-01-01"]), 1)
+
     def test_the_timestamp_comes_from_the_code_not_the_model(self):
         entry, _ = self.run_set(self.previous)
         stored = json.loads(main.read_text(main.analysis_path(FILE_ID)))
@@ -287,6 +355,352 @@ class AGenuineChangeStillGetsThrough(RunHarness):
         self.assertFalse(os.path.exists(main.diff_path(FILE_ID)))
 
 
+class TheRunsArtefactsLandTogether(RunHarness):
+    """The 7 August change again, with the run's transaction open."""
+
+    def setUp(self):
+        super().setUp()
+        self.seventh = archived("7aug")
+        self.previous = self.seed_from(self.seventh)
+        edited = self.seventh[AUP].replace(
+            "Acceptable Use Policy",
+            "Acceptable Use Policy\n\nDisputes are resolved by binding arbitration in Delaware.",
+            1,
+        )
+        self.responses = {TOS: self.seventh[TOS], PRIVACY: self.seventh[PRIVACY], AUP: edited}
+        main.save_json_file({"summary": "The July change."}, main.analysis_path(FILE_ID))
+        self.before = {
+            path: main.read_text(path)
+            for path in (main.analysis_path(FILE_ID), main.aggregate_snapshot_path(FILE_ID))
+        }
+        main.transaction = commit.Transaction.open()
+        self.addCleanup(setattr, main, "transaction", None)
+
+    def test_nothing_is_in_place_until_the_commit(self):
+        self.run_set(self.previous)
+        for path, text in self.before.items():
+            self.assertEqual(main.read_text(path), text)
+        self.assertFalse(os.path.exists(main.diff_path(FILE_ID)))
+        self.assertEqual(list(archive.files(main.LOG_DIR)), [])
+
+        main.transaction.commit()
+        self.assertIn("arbitration", main.read_text(main.analysis_path(FILE_ID)))
+        self.assertIn("arbitration", main.read_text(main.aggregate_snapshot_path(FILE_ID)))
+        (archived,) = archive.files(main.LOG_DIR, suffixes=[archive.ANALYSIS])
+        self.assertEqual(json.loads(main.read_text(archived.path)), {"summary": "The July change."})
+
+    def test_an_interrupted_run_leaves_the_last_one_whole(self):
+        self.run_set(self.previous)
+        main.transaction = None
+        self.assertEqual(commit.recover(), commit.ROLLED_BACK)
+        for path, text in self.before.items():
+            self.assertEqual(main.read_text(path), text)
+        self.assertEqual(list(archive.files(main.LOG_DIR)), [])
+
+
+class AQuietRunRewritesNothing(RunHarness):
+    def setUp(self):
+        super().setUp()
+        self.seventh = archived("7aug")
+        self.previous = self.seed_from(self.seventh)
+        self.responses = dict(self.seventh)
+        main.transaction = commit.Transaction.open()
+        self.addCleanup(setattr, main, "transaction", None)
+
+    def test_only_the_check_times_move(self):
+        entry, _ = self.run_set(self.previous)
+        main.state.write_hashes(
+            {PERPLEXITY_SET["setName"]: entry},
+            main.transaction.stage(main.HASHES_FILE),
+            main.transaction.stage(main.CHECKS_FILE),
+        )
+        self.assertEqual(main.transaction.commit(), [main.HASHES_FILE, main.CHECKS_FILE])
+        self.assertFalse(main._quiet([main.CHECKS_FILE]))  # no indexes built yet
+
+        with open(main.HASHES_FILE, "rb") as handle:
+            before = handle.read()
+        main.transaction = commit.Transaction.open()
+        again, _ = self.run_set(entry)
+        self.assertNotEqual(again["last_checked"], entry["last_checked"])
+        main.state.write_hashes(
+            {PERPLEXITY_SET["setName"]: again},
+            main.transaction.stage(main.HASHES_FILE),
+            main.transaction.stage(main.CHECKS_FILE),
+        )
+        self.assertEqual(main.transaction.commit(), [main.CHECKS_FILE])
+        with open(main.HASHES_FILE, "rb") as handle:
+            self.assertEqual(handle.read(), before)
+
+
+class ChangedSetsWaitForTheirAnalysis(RunHarness):
+    """main() gathers every changed set before making any model call, so the
+    calls can run concurrently. Nothing is written for a set in between."""
+
+    def setUp(self):
+        super().setUp()
+        self.seventh = archived("7aug")
+        self.previous = self.seed_from(self.seventh)
+        edited = self.seventh[AUP] + "\n\nWe may indemnify you for up to $500.\n"
+        self.responses = {TOS: self.seventh[TOS], PRIVACY: self.seventh[PRIVACY], AUP: edited}
+
+    def test_preparing_makes_no_call_and_writes_nothing(self):
+        log = runlog.RunLog("test")
+        _, pending = main.prepare_policy_set(PERPLEXITY_SET, self.previous, self.cfg, log, False)
+        self.assertIsNotNone(pending)
+        self.assertEqual(self.llm_calls, [])
+        self.assertEqual(pending.request.changed_documents, ["Aup"])
+        self.assertFalse(os.path.exists(main.diff_path(FILE_ID)))
+
+    def test_completing_matches_the_inline_path(self):
+        log = runlog.RunLog("test")
+        _, pending = main.prepare_policy_set(PERPLEXITY_SET, self.previous, self.cfg, log, False)
+        outcome = llm.AnalysisOutcome(result=self.verdict, attempts=1, retries=2, latency_ms=40)
+        entry = main.complete_policy_set(pending, outcome, log)
+
+        self.assertEqual(entry["last_priority"], "high")
+        self.assertEqual(entry["last_change"]["changed_documents"], ["Aup"])
+        self.assertTrue(os.path.exists(main.diff_path(FILE_ID)))
+        analysed = [r for r in log.records if r.get("llm_called")]
+        self.assertEqual(analysed[0]["llm_retries"], 2)
+
+
+class EveryDocumentIsCheckedInStages(RunHarness):
+    """main() runs every document through the fetch and check stages at once,
+    and settles the sets in their usual order."""
+
+    OTHER_SET = {**PERPLEXITY_SET, "setName": "Perplexity Again"}
+
+    def setUp(self):
+        super().setUp()
+        self.seventh = archived("7aug")
+        self.previous = self.seed_from(self.seventh)
+        edited = self.seventh[AUP] + "\n\nWe may indemnify you for up to $500.\n"
+        self.responses = {TOS: self.seventh[TOS], PRIVACY: self.seventh[PRIVACY], AUP: edited}
+
+    def check(self, policy_sets, previous):
+        stages = main.document_stages(self.cfg)
+        return list(main.check_policy_sets(policy_sets, previous, self.cfg, stages)), stages
+
+    def test_the_stages_reach_the_same_answer_as_one_document_at_a_time(self):
+        (checked,), stages = self.check([PERPLEXITY_SET], {PERPLEXITY_SET["setName"]: self.previous})
+        policy_set, context, results = checked
+        entry, pending = main.assemble_policy_set(context, results, self.cfg, runlog.RunLog("test"), False)
+        _, inline = main.prepare_policy_set(
+            PERPLEXITY_SET, self.previous, self.cfg, runlog.RunLog("test"), False
+        )
+
+        self.assertIs(policy_set, PERPLEXITY_SET)
+        self.assertEqual(pending.outcomes, inline.outcomes)
+        self.assertEqual(pending.combined_diff, inline.combined_diff)
+        self.assertEqual(entry["hash"], inline.entry["hash"])
+        self.assertEqual([s.items for s in stages.stats], [3, 3])
+
+    def test_a_document_that_raises_stops_only_its_set(self):
+        def fetch(url_data, prior, cfg, policy_set=None, extract=True):
+            if policy_set["setName"] == self.OTHER_SET["setName"] and url_data["url"] == PRIVACY:
+                raise RuntimeError("boom")
+            return self._fetch(url_data, prior, cfg, policy_set, extract)
+
+        fetching.fetch_document = fetch
+        checked, stages = self.check(
+            [self.OTHER_SET, PERPLEXITY_SET], {PERPLEXITY_SET["setName"]: self.previous}
+        )
+
+        self.assertEqual(
+            [policy_set["setName"] for policy_set, _, _ in checked],
+            [self.OTHER_SET["setName"], PERPLEXITY_SET["setName"]],
+        )
+        self.assertIsInstance(checked[0][2], RuntimeError)
+        self.assertEqual(
+            [outcome for _, outcome, _, _ in checked[1][2]],
+            [main.DOC_UNCHANGED, main.DOC_UNCHANGED, main.DOC_CHANGED],
+        )
+        self.assertEqual(stages.stats[0].failed, 1)
+
+    def test_an_unusable_page_is_fetched_again_with_escalation(self):
+        calls = []
+
+        def fetch(url_data, prior, cfg, policy_set=None, extract=True):
+            calls.append((url_data["url"], extract))
+            if url_data["url"] == TOS and not extract:
+                block = "<html><body><p>Just a moment...</p><p>Verifying you are human.</p></body></html>"
+                return fetching.FetchResult(TOS, fetching.OK, html=block, http_status=200)
+            return self._fetch(url_data, prior, cfg, policy_set, extract)
+
+        fetching.fetch_document = fetch
+        (checked,), _ = self.check([PERPLEXITY_SET], {PERPLEXITY_SET["setName"]: self.previous})
+
+        self.assertEqual(calls.count((TOS, False)), 1)
+        self.assertEqual(calls.count((TOS, True)), 1)
+        self.assertEqual(
+            [outcome for _, outcome, _, _ in checked[2]],
+            [main.DOC_UNCHANGED, main.DOC_UNCHANGED, main.DOC_CHANGED],
+        )
+
+    def test_worker_processes_reach_the_same_answer_as_threads(self):
+        previous = {PERPLEXITY_SET["setName"]: self.previous}
+        (threaded,), _ = self.check([PERPLEXITY_SET], previous)
+        with examine.process_pool(2) as pool:
+            stages = main.document_stages(self.cfg, pool)
+            (pooled,) = main.check_policy_sets([PERPLEXITY_SET], previous, self.cfg, stages)
+
+        for (record, outcome, diff, text), (expected, *rest) in zip(pooled[2], threaded[2]):
+            self.assertEqual((outcome, diff, text), tuple(rest))
+            self.assertEqual(record["hash"], expected["hash"])
+
+
+class ChangesOverBudgetAreDeferredNotDropped(RunHarness):
+    def setUp(self):
+        super().setUp()
+        self.seventh = archived("7aug")
+        self.previous = self.seed_from(self.seventh)
+        edited = self.seventh[AUP] + "\n\nWe may indemnify you for up to $500.\n"
+        self.responses = {TOS: self.seventh[TOS], PRIVACY: self.seventh[PRIVACY], AUP: edited}
+        self.cfg.budget.run_tokens = 10
+        # An earlier run spent the day, so the set is not admitted on its own
+        # as one that would never fit.
+        self.cfg.budget.day_tokens = 20
+        earlier = runlog.RunLog("earlier")
+        earlier.record(timestamp=datetime.now(main.AEST_TZ).isoformat(), prompt_tokens=20)
+        earlier.flush()
+
+    def test_a_deferred_set_is_analysed_on_the_next_run(self):
+        log = runlog.RunLog("test")
+        _, pending = main.prepare_policy_set(PERPLEXITY_SET, self.previous, self.cfg, log, False)
+        admitted, deferred = main.schedule_analyses([pending], self.cfg)
+        self.assertEqual(admitted, [])
+        self.assertGreater(deferred[0].estimated_tokens, 10)
+
+        entry = main.defer_policy_set(deferred[0], log)
+        self.assertEqual(entry["documents"][AUP]["status"], "analysis_pending")
+        self.assertEqual(entry["documents"][AUP]["hash"], self.previous["documents"][AUP]["hash"])
+        self.assertEqual(entry["schema_failures"], 0)
+        self.assertEqual(entry["last_amended"], self.previous["last_amended"])
+        self.assertEqual(log.counts_by_outcome()["deferred"], 1)
+        self.assertFalse(os.path.exists(main.diff_path(FILE_ID)))
+
+        again, _ = self.run_set(entry)
+        self.assertEqual(len(self.llm_calls), 1)
+        self.assertEqual(again["last_change"]["changed_documents"], ["Aup"])
+
+    def test_a_set_no_run_could_afford_is_not_deferred_for_good(self):
+        self.cfg.budget.day_tokens = 0
+        log = runlog.RunLog("test")
+        _, pending = main.prepare_policy_set(PERPLEXITY_SET, self.previous, self.cfg, log, False)
+        admitted, deferred = main.schedule_analyses([pending], self.cfg)
+        self.assertEqual(admitted, [pending])
+        self.assertEqual(deferred, [])
+
+
+class AnAlreadyAnsweredDiffIsNotPaidForTwice(RunHarness):
+    """The schema-failure path restores the old hash, so tomorrow's run sends
+    the identical diff again. With the cache it is answered from disk."""
+
+    def setUp(self):
+        super().setUp()
+        from steward.cache import AnalysisCache
+
+        self.seventh = archived("7aug")
+        self.previous = self.seed_from(self.seventh)
+        edited = self.seventh[AUP] + "\n\nWe may indemnify you for up to $500.\n"
+        self.responses = {TOS: self.seventh[TOS], PRIVACY: self.seventh[PRIVACY], AUP: edited}
+        self.cache = AnalysisCache(os.path.join(self.tmp.name, "analysis_cache.json"))
+
+        reply = json.dumps(self.verdict)
+        self.model_calls = 0
+
+        def generate(**_kwargs):
+            self.model_calls += 1
+            return type("Response", (), {"text": reply, "usage_metadata": None})()
+
+        client = type("Client", (), {})()
+        client.models = type("Models", (), {"generate_content": staticmethod(generate)})()
+        real = self.real_analyse
+        llm.analyse_change = lambda *a, **k: real(*a, **{**k, "client": client})
+
+    def test_the_second_run_is_a_cache_hit(self):
+        first_log = runlog.RunLog("first")
+        main.process_policy_set(PERPLEXITY_SET, self.previous, self.cfg, first_log, False, self.cache)
+        # Put the stored baseline back, as a failed run would have left it.
+        self.seed_from(self.seventh)
+        second_log = runlog.RunLog("second")
+        entry = main.process_policy_set(
+            PERPLEXITY_SET, self.previous, self.cfg, second_log, False, self.cache
+        )
+
+        self.assertEqual(self.model_calls, 1)
+        self.assertEqual(entry["last_priority"], "high")
+        record = [r for r in second_log.records if r["label"] == "(policy set)"][0]
+        self.assertTrue(record["cache_hit"])
+        self.assertFalse(record["llm_called"])
+        self.assertEqual(second_log.token_totals()["llm_calls"], 0)
+
+
+class ARevertToAKnownVersionIsNotReanalysed(RunHarness):
+    """A page that flips back to a version already seen costs a dict lookup,
+    not a diff and a model call."""
+
+    def setUp(self):
+        super().setUp()
+        self.seventh = archived("7aug")
+        self.previous = self.seed_from(self.seventh)
+        self.original = {url: self.seventh[url] for url in (TOS, PRIVACY, AUP)}
+        self.edited = dict(self.original)
+        self.edited[AUP] = self.seventh[AUP] + "\n\nDisputes are resolved by binding arbitration.\n"
+
+    def run_with(self, responses, previous):
+        self.responses = responses
+        return self.run_set(previous)
+
+    def test_flipping_back_makes_no_call_and_does_not_badge(self):
+        changed, _ = self.run_with(self.edited, self.previous)
+        self.assertEqual(len(self.llm_calls), 1)
+
+        restored, log = self.run_with(self.original, changed)
+        self.assertEqual(len(self.llm_calls), 1, "a known version must not reach the model")
+        self.assertEqual(restored["documents"][AUP]["status"], main.DOC_REVERTED)
+        self.assertEqual(restored["documents"][AUP]["hash"], self.previous["documents"][AUP]["hash"])
+        self.assertEqual(restored["last_amended"], changed["last_amended"])
+        self.assertEqual(restored["last_review"]["verdict"], "reverted")
+        self.assertIn("reverted to version of 7 August 2026", restored["last_review"]["summary"])
+        self.assertEqual(log.counts_by_outcome()[main.DOC_REVERTED], 1)
+
+        stored = main.stored_document_text(
+            FILE_ID, content.document_id(AUP), restored["documents"][AUP]["hash"]
+        )
+        self.assertEqual(content.content_hash(stored), self.previous["documents"][AUP]["hash"])
+
+    def test_flipping_forward_again_attaches_the_earlier_analysis(self):
+        changed, _ = self.run_with(self.edited, self.previous)
+        restored, _ = self.run_with(self.original, changed)
+        again, _ = self.run_with(self.edited, restored)
+
+        self.assertEqual(len(self.llm_calls), 1)
+        earlier = again["last_review"]["reverted_to"][0]
+        self.assertEqual(earlier["summary"], self.verdict["summary"])
+        self.assertEqual(earlier["priority"], "high")
+        self.assertTrue(os.path.exists(earlier["analysis_path"]))
+
+    def test_the_ring_is_bounded(self):
+        self.cfg.diff.history_size = 2
+        entry = self.previous
+        for n in range(4):
+            responses = dict(self.original)
+            responses[AUP] = self.seventh[AUP] + f"\n\nRevision {n} of clause 9.\n"
+            entry, _ = self.run_with(responses, entry)
+        self.assertEqual(len(entry["documents"][AUP]["seen_hashes"]), 2)
+
+        # The original has fallen out of the ring, so it is a change again.
+        self.run_with(self.original, entry)
+        self.assertEqual(len(self.llm_calls), 5)
+
+    def test_an_unanalysed_change_is_not_remembered(self):
+        llm.analyse_change = lambda *a, **k: llm.AnalysisOutcome(error="schema", attempts=2)
+        failed, _ = self.run_with(self.edited, self.previous)
+        edited_hash = content.content_hash(self.normalised(AUP, self.edited))
+        self.assertNotIn(edited_hash, failed["documents"][AUP].get("seen_hashes", {}))
+
+
 class TheModelIsAllowedToDecline(RunHarness):
     verdict = {
         "verdict": "no_material_change",
@@ -327,6 +741,61 @@ class TheModelIsAllowedToDecline(RunHarness):
         self.assertEqual(stored["summary"], "A real change.")
 
 
+class AStampBumpIsAnsweredLocally(RunHarness):
+    def setUp(self):
+        super().setUp()
+        self.seventh = archived("7aug")
+        self.previous = self.seed_from(self.seventh)
+        bumped = self.seventh[TOS].replace(
+            "Last updated: January 23rd, 2026", "Last updated: August 9th, 2026"
+        )
+        self.assertNotEqual(bumped, self.seventh[TOS])
+        self.responses = {TOS: bumped, PRIVACY: self.seventh[PRIVACY], AUP: self.seventh[AUP]}
+
+    def test_no_model_call_and_no_badge(self):
+        entry, log = self.run_set(self.previous)
+        self.assertEqual(self.llm_calls, [])
+        self.assertEqual(entry["last_amended"], self.previous["last_amended"])
+        self.assertEqual(entry["last_review"]["verdict"], "no_material_change")
+        (record,) = [r for r in log.records if r["label"] == "(policy set)"]
+        self.assertEqual(record["local_rule"], "date_stamp")
+        self.assertFalse(record["llm_called"])
+
+    def test_triage_can_be_switched_off(self):
+        self.cfg.triage.enabled = False
+        self.run_set(self.previous)
+        self.assertEqual(len(self.llm_calls), 1)
+
+
+class ALargeRewriteIsAnalysedWhole(RunHarness):
+    def setUp(self):
+        super().setUp()
+        self.seventh = archived("7aug")
+        self.previous = self.seed_from(self.seventh)
+        rewritten = "\n".join(
+            f"{line} (revised)" if line.strip() else line
+            for line in self.seventh[AUP].splitlines()
+        )
+        self.responses = {TOS: self.seventh[TOS], PRIVACY: self.seventh[PRIVACY], AUP: rewritten}
+        self.cfg.diff.max_diff_chars = 3000
+
+    def test_the_model_sees_every_part(self):
+        entry, log = self.run_set(self.previous)
+        (call,) = self.llm_calls
+        self.assertGreater(len(call["chunks"]), 1)
+        self.assertNotIn("diff truncated", call["diff"])
+        self.assertEqual(entry["last_priority"], "high")
+        (record,) = [r for r in log.records if r["label"] == "(policy set)"]
+        self.assertEqual(record["llm_chunks"], len(call["chunks"]))
+
+    def test_past_the_part_cap_the_diff_is_sent_truncated(self):
+        self.cfg.analysis.max_chunks = 1
+        self.run_set(self.previous)
+        (call,) = self.llm_calls
+        self.assertEqual(call["chunks"], [])
+        self.assertIn("diff truncated", call["diff"])
+
+
 class SchemaFailureLosesNothing(RunHarness):
     def setUp(self):
         super().setUp()